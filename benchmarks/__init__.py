@@ -0,0 +1 @@
+"""Offline benchmarks of the task service and its building blocks."""
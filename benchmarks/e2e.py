@@ -0,0 +1,287 @@
+"""
+End-to-end benchmark of the scheduled service against fake backends.
+
+Runs scheduled_service.main_loop with the real TaskOrchestrator, CrewManager,
+ModelCascade and NotionAPI, but with Notion, the chat models and the research
+crew replaced by the fakes in benchmarks.fakes. Tasks are seeded up front and/or
+arrive as a Poisson process while the service polls, and the run ends when
+every task has reached Review. The JSON report gives throughput, pickup and
+completion latency percentiles, Notion requests per task, 429s and per-endpoint
+request counts, alongside the configuration, so runs can be compared.
+
+Usage:
+    python -m benchmarks.e2e --tasks 100 --arrival-rate 30 --research-fraction 0.2 \\
+        --notion-latency lognormal:0.08,0.5 --crew-latency lognormal:5,0.4 --output report.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterator, List, Optional, cast
+
+from benchmarks.fakes import FakeChatModel, FakeNotion, FakeResearchCrew, NotionLimits
+from benchmarks.notion_server import NotionServer
+from crews.research_crew.crew import ResearchCrew
+from crews.research_crew.pool import ResearchCrewPool
+from orchestrator.crew_manager import CrewManager
+from orchestrator.model_cascade import CascadeStats, ModelCascade
+from orchestrator.notion_api import NotionAPI
+from orchestrator.orchestrator import TaskOrchestrator
+
+logger = logging.getLogger(__name__)
+
+DATABASE_ID = "00000000-0000-4000-8000-0000000000db"
+
+TOPICS = [
+    "the state of solid-state batteries",
+    "remote work productivity studies",
+    "how to write a good commit message",
+    "the capital of Australia",
+    "vector databases for retrieval",
+    "summarize the plot of Hamlet",
+]
+
+
+@dataclass
+class E2EConfig:
+    """
+    Workload and backend settings of one benchmark run.
+
+    Latencies are service-time specs as accepted by benchmarks.fakes.service_time.
+    `notion_limits` enforces Notion's rate and size limits; `http` serves the fake
+    Notion over a local HTTP server instead of an in-process transport.
+    """
+
+    tasks: int = 20
+    initial_backlog: int = 0
+    arrival_rate: float = 60.0
+    research_fraction: float = 0.2
+    poll_interval: float = 1.0
+    notion_latency: str = "lognormal:0.05,0.4"
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    llm_latency: str = "lognormal:0.3,0.3"
+    crew_latency: str = "lognormal:2,0.3"
+    crew_pool_size: int = 1
+    notion_limits: bool = False
+    http: bool = False
+    timeout: float = 1800.0
+    seed: int = 0
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """
+    Summarize latencies with nearest-rank percentiles.
+
+    Returns:
+        Dict[str, Any]: count, mean, p50, p95, p99 and max in seconds
+    """
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(quantile: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(quantile * len(ordered) + 0.5) - 1))
+        return round(ordered[index], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": rank(0.5),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+@contextlib.contextmanager
+def isolated_state(directory: str, notion_url: Optional[str] = None) -> Iterator[None]:
+    """Point artifacts, usage, iteration state and traces at a scratch directory."""
+    overrides = {
+        "NOTION_BASE_URL": notion_url,
+        "ARTIFACT_DIR": os.path.join(directory, "artifacts"),
+        "ACCOUNTING_DB": os.path.join(directory, "usage.sqlite3"),
+        "ITERATION_STATE_PATH": os.path.join(directory, "iteration_state.json"),
+        "TRACING_DIR": os.path.join(directory, "traces"),
+        "SEMANTIC_CACHE_PATH": os.path.join(directory, "semantic_cache"),
+        "METRICS_PORT": None,
+    }
+    saved = {name: os.environ.get(name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def build_orchestrator(
+    config: E2EConfig,
+    notion: FakeNotion,
+    database_id: str = DATABASE_ID,
+    http: bool = False
+) -> TaskOrchestrator:
+    """
+    Build a TaskOrchestrator whose Notion, chat models and crews are fakes.
+
+    With `http`, Notion requests go over the network to NOTION_BASE_URL instead
+    of straight to `notion`.
+    """
+    def chat_model(model: str) -> FakeChatModel:
+        seed = config.seed + zlib.crc32(model.encode())
+        return FakeChatModel(model, config.llm_latency, config.research_fraction, seed)
+
+    api = NotionAPI(
+        notion_api_key="benchmark",
+        openai_api_key="benchmark",
+        database_id=database_id,
+        transport=None if http else notion.transport()
+    )
+    crews = ResearchCrewPool(
+        size=config.crew_pool_size,
+        # The fake stands in for ResearchCrew through the pool's duck-typed interface
+        factory=lambda model: cast(ResearchCrew, FakeResearchCrew(config.crew_latency, config.seed))
+    )
+    cascade = ModelCascade(stats=CascadeStats(), llm_factory=chat_model)
+    crew_manager = CrewManager(cascade=cascade, crew_pool=crews)
+    return TaskOrchestrator(notion_api=api, crew_manager=crew_manager)
+
+
+async def _drive(
+    config: E2EConfig,
+    notion: FakeNotion,
+    orchestrator: TaskOrchestrator
+) -> List[str]:
+    from scheduled_service import main_loop
+
+    rng = random.Random(config.seed)
+    pages: List[str] = []
+
+    def add_task(index: int) -> None:
+        topic = TOPICS[index % len(TOPICS)]
+        pages.append(notion.add_page(DATABASE_ID, f"Task {index}: {topic}"))
+
+    notion.create_database(DATABASE_ID)
+    for index in range(min(config.initial_backlog, config.tasks)):
+        add_task(index)
+    service = asyncio.create_task(main_loop(orchestrator, config.poll_interval))
+    deadline = time.monotonic() + config.timeout
+    try:
+        for index in range(len(pages), config.tasks):
+            if config.arrival_rate > 0:
+                await asyncio.sleep(rng.expovariate(config.arrival_rate / 60))
+            add_task(index)
+        while time.monotonic() < deadline and service.done() is False:
+            if all("Review" in notion.events[page_id] for page_id in pages):
+                break
+            await asyncio.sleep(0.05)
+        else:
+            if service.done():
+                service.result()
+            logger.warning(f"Benchmark timed out after {config.timeout:g}s")
+    finally:
+        service.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await service
+    return pages
+
+
+def run_benchmark(config: E2EConfig, notion: Optional[FakeNotion] = None) -> Dict[str, Any]:
+    """
+    Run the service against fake backends until every task is done.
+
+    Args:
+        config (E2EConfig): The workload and backend settings
+        notion (Optional[FakeNotion]): The fake Notion to use, built from the config if omitted
+
+    Returns:
+        Dict[str, Any]: The benchmark report
+    """
+    notion = notion or FakeNotion(
+        latency=config.notion_latency,
+        rate_limit_rate=config.rate_limit_rate,
+        retry_after=config.retry_after,
+        limits=NotionLimits() if config.notion_limits else None,
+        seed=config.seed
+    )
+    with contextlib.ExitStack() as stack:
+        server = stack.enter_context(NotionServer(notion)) if config.http else None
+        directory = stack.enter_context(tempfile.TemporaryDirectory(prefix="e2e-benchmark-"))
+        stack.enter_context(isolated_state(directory, server.url if server else None))
+        orchestrator = build_orchestrator(config, notion, http=config.http)
+        started = time.time()
+        pages = asyncio.run(_drive(config, notion, orchestrator))
+        finished = time.time()
+
+    events = [notion.events[page_id] for page_id in pages]
+    done = [event for event in events if "Review" in event]
+    pickup = [event["In progress"] - event["created"] for event in events if "In progress" in event]
+    completion = [event["Review"] - event["created"] for event in done]
+    elapsed = (max(event["Review"] for event in done) - started) if done else finished - started
+    requests = sum(notion.requests.values())
+    return {
+        "config": asdict(config),
+        "tasks": len(pages),
+        "completed": len(done),
+        "duration_seconds": round(finished - started, 3),
+        "throughput_tasks_per_minute": round(len(done) / elapsed * 60, 3) if elapsed > 0 else None,
+        "pickup_latency_seconds": summarize(pickup),
+        "completion_latency_seconds": summarize(completion),
+        "notion": {
+            "requests": requests,
+            "requests_per_task": round(requests / len(done), 2) if done else None,
+            "rate_limited": notion.rate_limited,
+            "bytes_sent": notion.bytes_in,
+            "bytes_received": notion.bytes_out,
+            "endpoints": dict(notion.requests.most_common()),
+        },
+        "cascade": orchestrator.crew_manager.cascade.stats.snapshot(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    defaults = E2EConfig()
+    for field in fields(E2EConfig):
+        default = getattr(defaults, field.name)
+        if isinstance(default, bool):
+            parser.add_argument(f"--{field.name.replace('_', '-')}", action="store_true")
+        else:
+            option = f"--{field.name.replace('_', '-')}"
+            parser.add_argument(option, type=type(default), default=default)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    config = E2EConfig(**{field.name: getattr(args, field.name) for field in fields(E2EConfig)})
+    # Importing the service configures logging; quieten it unless asked
+    import scheduled_service  # noqa: F401
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    report = json.dumps(run_benchmark(config), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,908 @@
+"""
+Offline stand-ins for Notion, the chat models and the research crew.
+
+FakeNotion keeps databases, pages, blocks and comments in memory and answers
+the Notion API requests that NotionAPI makes, as an httpx transport, so the
+real client code runs unchanged. Every response can be delayed by a latency
+distribution and turned into a 429 with a Retry-After header, and list
+endpoints paginate like Notion. Status changes are timestamped per page, which
+gives benchmarks the pickup and completion time of every task.
+
+FakeChatModel and FakeResearchCrew replace ChatOpenAI and ResearchCrew with
+configurable service-time distributions, and return outputs that pass the
+model cascade's quality gates.
+"""
+
+import gc
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl
+
+import httpx
+from crewai.types.usage_metrics import UsageMetrics
+
+from crews.research_crew.crew import InitialResearchOutput, ResearchOutput
+from orchestrator.accounting import NOTION_PROPERTIES
+from orchestrator.metrics import endpoint_label
+
+Sampler = Callable[[], float]
+
+# Properties of the fake task database besides the usage totals
+DEFAULT_SCHEMA = {
+    "Task": "title",
+    "Status": "status",
+    "Response": "rich_text",
+    "Depth": "select",
+    "Profile": "checkbox",
+    **{name: "number" for name in NOTION_PROPERTIES.values()},
+}
+
+EMPTY_RESPONSE = {"id": "response", "type": "rich_text", "rich_text": []}
+RATE_LIMITED_MESSAGE = "You have been rate limited."
+
+
+def service_time(spec: Any, seed: Optional[int] = None) -> Sampler:
+    """
+    Build a sampler of durations in seconds from a distribution spec.
+
+    Args:
+        spec (Any): A number for a constant, or "uniform:low,high", "exp:mean",
+            "normal:mean,stddev" or "lognormal:median,sigma"
+        seed (Optional[int]): Seed for reproducible samples
+
+    Returns:
+        Sampler: Returns a non-negative duration per call
+    """
+    rng = random.Random(seed)
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        value = float(kind)
+        return lambda: value
+    params = [float(arg) for arg in args.split(",")]
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(params[0]), params[1]) if params[0] > 0 else 0.0
+    raise ValueError(f"Unknown service time distribution: {spec}")
+
+
+def _iso(timestamp: float) -> str:
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _rich_text(text: str) -> List[Dict[str, Any]]:
+    return [{"type": "text", "text": {"content": text}, "plain_text": text}]
+
+
+def _plain_text(value: Dict[str, Any]) -> str:
+    kind = value.get("type")
+    parts = value.get(kind) if kind in ("title", "rich_text") else None
+    return "".join(
+        part.get("plain_text") or part.get("text", {}).get("content", "") for part in parts or []
+    )
+
+
+def _error(status: int, code: str, message: str) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+    return status, {}, {"object": "error", "status": status, "code": code, "message": message}
+
+
+def _invalid(message: str) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+    return _error(400, "validation_error", f"body failed validation: {message}")
+
+
+@dataclass
+class NotionLimits:
+    """
+    Request limits documented by Notion, enforced by FakeNotion when given.
+
+    Attributes:
+        requests_per_second (float): Average request rate per integration
+        burst (int): Requests allowed at once before the average rate applies
+        max_children (int): Blocks per children array, e.g. per append
+        max_block_elements (int): Blocks per request, including nested children
+        max_nesting (int): Levels of nested children per request
+        max_rich_text_items (int): Segments per rich_text array
+        max_text_length (int): Characters per text.content
+        max_url_length (int): Characters per link URL
+        max_payload_bytes (int): Request body size
+        max_page_size (int): Largest page_size of list endpoints
+    """
+
+    requests_per_second: float = 3.0
+    burst: int = 3
+    max_children: int = 100
+    max_block_elements: int = 1000
+    max_nesting: int = 2
+    max_rich_text_items: int = 100
+    max_text_length: int = 2000
+    max_url_length: int = 2000
+    max_payload_bytes: int = 500_000
+    max_page_size: int = 100
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def acquire(self) -> float:
+        """Take a token, returning 0, or return the seconds until one is available."""
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+def _compile(condition: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+    """Turn a database query filter into a predicate over pages."""
+    if "and" in condition:
+        parts = [_compile(part) for part in condition["and"]]
+        return lambda page: all(part(page) for part in parts)
+    if "or" in condition:
+        parts = [_compile(part) for part in condition["or"]]
+        return lambda page: any(part(page) for part in parts)
+    if "timestamp" in condition:
+        field_name = condition["timestamp"]
+        test = _comparison(condition[field_name])
+        return lambda page: test(page[field_name])
+    name = condition["property"]
+    kind = next(key for key in condition if key != "property")
+    test = _comparison(condition[kind])
+    if kind in ("title", "rich_text"):
+        return lambda page: test(_plain_text(page["properties"].get(name, {})))
+    if kind in ("status", "select"):
+        return lambda page: test((page["properties"].get(name, {}).get(kind) or {}).get("name"))
+    return lambda page: test(page["properties"].get(name, {}).get(kind))
+
+
+def _comparison(test: Dict[str, Any]) -> Callable[[Any], bool]:
+    operator, expected = next(iter(test.items()))
+    if operator == "equals":
+        return lambda actual: actual == expected
+    if operator == "does_not_equal":
+        return lambda actual: actual != expected
+    if operator == "contains":
+        return lambda actual: expected in (actual or "")
+    if operator == "does_not_contain":
+        return lambda actual: expected not in (actual or "")
+    if operator == "is_empty":
+        return lambda actual: not actual
+    if operator == "is_not_empty":
+        return lambda actual: bool(actual)
+    if operator in ("after", "greater_than"):
+        return lambda actual: actual is not None and actual > expected
+    if operator in ("on_or_after", "greater_than_or_equal_to"):
+        return lambda actual: actual is not None and actual >= expected
+    if operator in ("before", "less_than"):
+        return lambda actual: actual is not None and actual < expected
+    if operator in ("on_or_before", "less_than_or_equal_to"):
+        return lambda actual: actual is not None and actual <= expected
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def _status_equals(condition: Optional[Dict[str, Any]]) -> Optional[str]:
+    """The Status a filter selects, if it is a single Status equals condition."""
+    if not condition or condition.get("property") != "Status":
+        return None
+    if set(condition.get("status") or {}) == {"equals"}:
+        return condition["status"]["equals"]
+    return None
+
+
+def _sort_key(sort: Dict[str, Any]) -> Callable[[Dict[str, Any]], Any]:
+    if "timestamp" in sort:
+        return lambda page: page[sort["timestamp"]]
+
+    def key(page: Dict[str, Any]) -> Any:
+        value = page["properties"].get(sort["property"], {})
+        kind = value.get("type")
+        if kind in ("title", "rich_text"):
+            return _plain_text(value)
+        if kind in ("status", "select"):
+            return (value.get(kind) or {}).get("name") or ""
+        return value.get(kind) or 0
+    return key
+
+
+class FakeNotion:
+    """
+    In-memory Notion workspace answering the API calls NotionAPI makes.
+
+    Supports database queries with compound filters, sorts and cursors, page
+    retrieval and property updates, block children list/append/delete and
+    comment listing. With `limits`, requests are rate limited with 429 and
+    Retry-After, and bodies beyond Notion's size limits fail validation.
+
+    Attributes:
+        requests (Counter): Requests per endpoint, e.g. "POST /databases/{id}/query"
+        rate_limited (int): Requests answered with 429
+        bytes_in (int): Request body bytes received
+        bytes_out (int): Response body bytes sent
+        events (Dict[str, Dict[str, float]]): Per page, the time it was created and
+            first set to each status
+    """
+
+    def __init__(
+        self,
+        latency: Any = 0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        max_page_size: int = 100,
+        schema: Optional[Dict[str, str]] = None,
+        limits: Optional[NotionLimits] = None,
+        seed: int = 0,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the fake.
+
+        Args:
+            latency (Any): Service-time spec of every response, see service_time()
+            rate_limit_rate (float): Probability of answering a request with 429
+            retry_after (int): Seconds sent in the Retry-After header of injected 429 responses
+            max_page_size (int): Maximum results per page of list endpoints
+            schema (Optional[Dict[str, str]]): Property name to type of new databases
+            limits (Optional[NotionLimits]): Rate and size limits to enforce, none if omitted
+            seed (int): Seed for latency and 429 injection
+            clock (Callable[[], float]): Source of creation, edit and event times, e.g. a
+                simulated clock
+        """
+        self.latency = service_time(latency, seed)
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self.schema = dict(schema or DEFAULT_SCHEMA)
+        self.limits = limits
+        self.clock = clock
+        self.requests: Counter = Counter()
+        self.rate_limited = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.events: Dict[str, Dict[str, float]] = {}
+        self._rng = random.Random(seed + 1)
+        self._bucket = TokenBucket(limits.requests_per_second, limits.burst) if limits else None
+        self._lock = threading.RLock()
+        self._databases: Dict[str, Dict[str, Any]] = {}
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._children: Dict[str, List[Dict[str, Any]]] = {}
+        self._parents: Dict[str, str] = {}
+        self._comments: Dict[str, List[Dict[str, Any]]] = {}
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        # Row positions per database and Status, so status-filtered queries skip other rows
+        self._positions: Dict[str, int] = {}
+        self._status_rows: Dict[str, Dict[str, Set[int]]] = {}
+        # Sorted query results, reused while no page changes
+        self._version = 0
+        self._sorted: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+
+    # Workspace setup
+
+    def create_database(
+        self,
+        database_id: Optional[str] = None,
+        schema: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Create an empty database and return its ID."""
+        database_id = database_id or str(uuid.uuid4())
+        with self._lock:
+            self._databases[database_id] = {
+                "schema": dict(schema or self.schema),
+                "rows": [],
+                "parent": {"type": "database_id", "database_id": database_id},
+            }
+        return database_id
+
+    def _status_property(self, status: str) -> Dict[str, Any]:
+        # Property values are replaced on update, never modified, so rows share them
+        value = self._statuses.get(status)
+        if value is None:
+            value = {"id": "status", "type": "status", "status": {"name": status}}
+            self._statuses[status] = value
+        return value
+
+    def _new_page(
+        self,
+        database_id: str,
+        page_id: str,
+        title: str,
+        status: str,
+        created: float
+    ) -> Dict[str, Any]:
+        stamp = _iso(created)
+        page = {
+            "object": "page",
+            "id": page_id,
+            "created_time": stamp,
+            "last_edited_time": stamp,
+            "archived": False,
+            "parent": self._databases[database_id]["parent"],
+            "properties": {
+                "Task": {"id": "title", "type": "title", "title": _rich_text(title)},
+                "Status": self._status_property(status),
+                "Response": EMPTY_RESPONSE,
+            },
+        }
+        rows = self._databases[database_id]["rows"]
+        self._positions[page_id] = len(rows)
+        self._status_rows.setdefault(database_id, {}).setdefault(status, set()).add(len(rows))
+        rows.append(page_id)
+        self._pages[page_id] = page
+        self.events[page_id] = {"created": created, status: created}
+        return page
+
+    def add_page(
+        self,
+        database_id: str,
+        title: str,
+        status: str = "Execute",
+        properties: Optional[Dict[str, Any]] = None,
+        created: Optional[float] = None
+    ) -> str:
+        """
+        Add a task row to a database.
+
+        Args:
+            database_id (str): The database, created on first use
+            title (str): The task title
+            status (str): The initial Status
+            properties (Optional[Dict[str, Any]]): Extra property values in API format
+            created (Optional[float]): Creation time, defaults to now
+
+        Returns:
+            str: The new page's ID
+        """
+        page_id = str(uuid.uuid4())
+        with self._lock:
+            if database_id not in self._databases:
+                self.create_database(database_id)
+            if created is None:
+                created = self.clock()
+            page = self._new_page(database_id, page_id, title, status, created)
+            for name, value in (properties or {}).items():
+                page["properties"][name] = self._property_value(name, value)
+            self._version += 1
+        return page_id
+
+    def seed(
+        self,
+        database_id: str,
+        rows: int,
+        statuses: Optional[Dict[str, float]] = None,
+        age: float = 90 * 86400,
+        seed: int = 0
+    ) -> List[str]:
+        """
+        Add many synthetic task rows at once, e.g. 100k for load tests.
+
+        Args:
+            database_id (str): The database, created on first use
+            rows (int): Number of rows to add
+            statuses (Optional[Dict[str, float]]): Relative weight of each Status,
+                by default mostly Done with a few open tasks
+            age (float): Rows are created evenly over this many seconds before now
+            seed (int): Seed of the page IDs and statuses
+
+        Returns:
+            List[str]: The new pages' IDs, oldest first
+        """
+        statuses = statuses or {"Done": 0.9, "Review": 0.07, "Iterate": 0.01, "Execute": 0.02}
+        rng = random.Random(seed)
+        names, weights = list(statuses), list(statuses.values())
+        choices = rng.choices(names, weights, k=rows)
+        start = self.clock() - age
+        step = age / rows if rows else 0
+        page_ids = []
+        # Millions of small dicts would otherwise trigger repeated full garbage collections
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with self._lock:
+                if database_id not in self._databases:
+                    self.create_database(database_id)
+                for index in range(rows):
+                    page_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+                    title, created = f"Seeded task {index}", start + index * step
+                    self._new_page(database_id, page_id, title, choices[index], created)
+                    page_ids.append(page_id)
+                self._version += 1
+        finally:
+            if collecting:
+                gc.enable()
+        return page_ids
+
+    def add_comment(self, block_id: str, text: str) -> None:
+        """Add a comment to a page or block."""
+        with self._lock:
+            self._comments.setdefault(block_id, []).append({
+                "object": "comment", "id": str(uuid.uuid4()), "rich_text": _rich_text(text)
+            })
+
+    def set_status(self, page_id: str, status: str) -> None:
+        """Change a page's Status as a user editing it in Notion would."""
+        with self._lock:
+            self._update_properties(self._pages[page_id], {"Status": {"status": {"name": status}}})
+
+    def status(self, page_id: str) -> str:
+        with self._lock:
+            return self._pages[page_id]["properties"]["Status"]["status"]["name"]
+
+    def page(self, page_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self._pages[page_id]))
+
+    def blocks(self, page_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._children.get(page_id, []))
+
+    # Request handling
+
+    def transport(self) -> httpx.BaseTransport:
+        """Return an httpx transport that sends requests to this fake."""
+        return FakeNotionTransport(self)
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, str],
+        body: Optional[Dict[str, Any]],
+        body_bytes: Optional[int] = None
+    ):
+        """
+        Answer one API request.
+
+        Args:
+            method (str): The HTTP method
+            path (str): The path after /v1/, e.g. "pages/<id>"
+            query (Dict[str, str]): Query string parameters
+            body (Optional[Dict[str, Any]]): The JSON body
+            body_bytes (Optional[int]): Size of the request body, measured from `body` if omitted
+
+        Returns:
+            Tuple[int, Dict[str, str], Dict[str, Any]]: Status code, headers and JSON body
+        """
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.requests[endpoint_label(method, f"/v1/{path}")] += 1
+            if self.rate_limit_rate and self._rng.random() < self.rate_limit_rate:
+                self.rate_limited += 1
+                status, headers, payload = _error(429, "rate_limited", RATE_LIMITED_MESSAGE)
+                return status, {"Retry-After": str(self.retry_after)}, payload
+            if self.limits is not None and self._bucket is not None:
+                wait = self._bucket.acquire()
+                if wait > 0:
+                    self.rate_limited += 1
+                    status, headers, payload = _error(429, "rate_limited", RATE_LIMITED_MESSAGE)
+                    return status, {"Retry-After": str(max(1, math.ceil(wait)))}, payload
+                if body_bytes is None:
+                    body_bytes = len(json.dumps(body).encode("utf-8")) if body else 0
+                error = self._validate(self.limits, body or {}, query, body_bytes)
+                if error is not None:
+                    return error
+            return self._route(method, path.strip("/").split("/"), query, body or {})
+
+    def serve(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, str],
+        content: bytes
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Answer one request given its raw body, returning the encoded JSON response.
+
+        Used by the httpx transport and the HTTP server; counts bytes in both directions.
+        """
+        try:
+            body = json.loads(content) if content else None
+        except ValueError:
+            status, headers, payload = _error(400, "invalid_json", "Error parsing JSON body.")
+        else:
+            status, headers, payload = self.handle(method, path, query, body, len(content))
+        with self._lock:
+            # Encoded under the lock, since other requests may be updating the same page
+            encoded = json.dumps(payload).encode("utf-8")
+            self.bytes_in += len(content)
+            self.bytes_out += len(encoded)
+        return status, headers, encoded
+
+    def _validate(
+        self,
+        limits: NotionLimits,
+        body: Dict[str, Any],
+        query: Dict[str, str],
+        body_bytes: int
+    ):
+        """Check a request against the size limits, returning a validation error or None."""
+        if body_bytes > limits.max_payload_bytes:
+            return _invalid(
+                f"request body size {body_bytes} exceeds the limit of "
+                f"{limits.max_payload_bytes} bytes."
+            )
+        page_size = body.get("page_size", query.get("page_size"))
+        if page_size is not None and int(page_size) > limits.max_page_size:
+            return _invalid(
+                f"body.page_size should be ≤ `{limits.max_page_size}`, instead was `{page_size}`."
+            )
+        elements = [0]
+
+        def check(value: Any, path: str, depth: int) -> Optional[str]:
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if key == "children" and isinstance(item, list):
+                        if len(item) > limits.max_children:
+                            return (
+                                f"{path}.children.length should be ≤ `{limits.max_children}`, "
+                                f"instead was `{len(item)}`."
+                            )
+                        if depth > limits.max_nesting:
+                            return (
+                                f"{path}.children exceeds the maximum nesting depth of "
+                                f"{limits.max_nesting}."
+                            )
+                        elements[0] += len(item)
+                        for index, child in enumerate(item):
+                            problem = check(child, f"{path}.children[{index}]", depth + 1)
+                            if problem:
+                                return problem
+                    elif key in ("rich_text", "title", "caption") and isinstance(item, list):
+                        if len(item) > limits.max_rich_text_items:
+                            return (
+                                f"{path}.{key}.length should be ≤ `{limits.max_rich_text_items}`, "
+                                f"instead was `{len(item)}`."
+                            )
+                        for index, segment in enumerate(item):
+                            text = segment.get("text") or {}
+                            content = text.get("content") or ""
+                            if len(content) > limits.max_text_length:
+                                return (
+                                    f"{path}.{key}[{index}].text.content.length should be ≤ "
+                                    f"`{limits.max_text_length}`, instead was `{len(content)}`."
+                                )
+                            url = (text.get("link") or {}).get("url") or ""
+                            if len(url) > limits.max_url_length:
+                                return (
+                                    f"{path}.{key}[{index}].text.link.url.length should be ≤ "
+                                    f"`{limits.max_url_length}`, instead was `{len(url)}`."
+                                )
+                    else:
+                        problem = check(item, f"{path}.{key}", depth)
+                        if problem:
+                            return problem
+            return None
+
+        problem = check(body, "body", 0)
+        if problem is None and elements[0] > limits.max_block_elements:
+            problem = (
+                f"the request has {elements[0]} block elements, "
+                f"more than the limit of {limits.max_block_elements}."
+            )
+        return _invalid(problem) if problem else None
+
+    def _route(self, method: str, parts: List[str], query: Dict[str, str], body: Dict[str, Any]):
+        if parts[0] == "databases" and len(parts) == 3 and parts[2] == "query" and method == "POST":
+            return self._query(parts[1], body)
+        if parts[0] == "pages" and len(parts) == 2:
+            page = self._pages.get(parts[1])
+            if page is None:
+                return _error(404, "object_not_found", f"Could not find page with ID: {parts[1]}.")
+            if method == "GET":
+                return 200, {}, page
+            if method == "PATCH":
+                return self._update_page(page, body)
+        if parts[0] == "blocks" and len(parts) == 3 and parts[2] == "children":
+            if method == "GET":
+                return self._paginate(self._children.get(parts[1], []), query)
+            if method == "PATCH":
+                return self._append(parts[1], body)
+        if parts[0] == "blocks" and len(parts) == 2 and method == "DELETE":
+            return self._delete_block(parts[1])
+        if parts[0] == "comments" and method == "GET":
+            return self._paginate(self._comments.get(query.get("block_id", ""), []), query)
+        return _error(
+            400, "invalid_request_url", f"Invalid request URL: {method} /{'/'.join(parts)}"
+        )
+
+    def _page_size(self, params: Dict[str, Any]) -> int:
+        return min(int(params.get("page_size") or self.max_page_size), self.max_page_size)
+
+    def _paginate(self, items: List[Any], params: Dict[str, Any]):
+        # Like Notion, the cursor is the ID of the next item, so a caller deleting the
+        # items it has already listed still resumes at the right one
+        page_size = self._page_size(params)
+        start = 0
+        cursor = params.get("start_cursor")
+        if cursor:
+            start = next((i for i, item in enumerate(items) if item["id"] == cursor), -1)
+            if start < 0:
+                return _invalid(f"start_cursor {cursor} is not a valid cursor.")
+        chunk = items[start:start + page_size]
+        more = start + page_size < len(items)
+        return 200, {}, {
+            "object": "list",
+            "results": chunk,
+            "has_more": more,
+            "next_cursor": items[start + page_size]["id"] if more else None,
+        }
+
+    def _query(self, database_id: str, body: Dict[str, Any]):
+        database = self._databases.get(database_id)
+        if database is None:
+            return _error(
+                404, "object_not_found", f"Could not find database with ID: {database_id}."
+            )
+        try:
+            matches = _compile(body["filter"]) if body.get("filter") else None
+        except (KeyError, StopIteration, ValueError) as e:
+            return _invalid(f"body.filter is invalid: {str(e)}")
+        if body.get("sorts"):
+            # Sorting is done once per query and reused for the following pages
+            key = json.dumps([body.get("filter"), body["sorts"]], sort_keys=True)
+            cached = self._sorted.get(key)
+            if cached is None or cached[0] != self._version:
+                pages = [self._pages[page_id] for page_id in database["rows"]]
+                if matches is not None:
+                    pages = [page for page in pages if matches(page)]
+                for sort in reversed(body["sorts"]):
+                    pages.sort(key=_sort_key(sort), reverse=sort.get("direction") == "descending")
+                cached = self._sorted[key] = (self._version, pages)
+            return self._paginate(cached[1], body)
+
+        # Unsorted queries return rows in creation order; the cursor is the next row to scan,
+        # so paging through a large database scans it once
+        rows = database["rows"]
+        page_size = self._page_size(body)
+        start = int(body.get("start_cursor") or 0)
+        status = _status_equals(body.get("filter"))
+        positions: Sequence[int]
+        if status is not None:
+            # A plain Status filter is answered from the index, like a database would
+            positions = sorted(
+                position for position in self._status_rows.get(database_id, {}).get(status, ())
+                if position >= start
+            )
+            matches = None
+        else:
+            positions = range(start, len(rows))
+        results: List[Dict[str, Any]] = []
+        next_cursor = None
+        for position in positions:
+            page = self._pages[rows[position]]
+            if matches is None or matches(page):
+                if len(results) == page_size:
+                    next_cursor = str(position)
+                    break
+                results.append(page)
+        return 200, {}, {
+            "object": "list",
+            "results": results,
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
+        }
+
+    def _property_value(self, name: str, value: Dict[str, Any]) -> Dict[str, Any]:
+        kind = next(key for key in value if key not in ("id", "type"))
+        stored = {"id": name.lower().replace(" ", "_"), "type": kind, kind: value[kind]}
+        if kind in ("title", "rich_text"):
+            stored[kind] = [
+                dict(part, plain_text=part.get("text", {}).get("content", ""))
+                for part in value[kind]
+            ]
+        return stored
+
+    def _update_properties(self, page: Dict[str, Any], properties: Dict[str, Any]) -> None:
+        now = self.clock()
+        previous = page["properties"]["Status"]["status"]["name"]
+        for name, value in properties.items():
+            page["properties"][name] = self._property_value(name, value)
+        page["last_edited_time"] = _iso(now)
+        status = page["properties"]["Status"]["status"]["name"]
+        if status != previous:
+            index = self._status_rows[page["parent"]["database_id"]]
+            position = self._positions[page["id"]]
+            index[previous].discard(position)
+            index.setdefault(status, set()).add(position)
+        self.events.setdefault(page["id"], {}).setdefault(status, now)
+        self._version += 1
+
+    def _update_page(self, page: Dict[str, Any], body: Dict[str, Any]):
+        properties = body.get("properties") or {}
+        schema = self._databases[page["parent"]["database_id"]]["schema"]
+        unknown = [name for name in properties if name not in schema]
+        if unknown:
+            return _error(400, "validation_error", f"{unknown[0]} is not a property that exists.")
+        self._update_properties(page, properties)
+        return 200, {}, page
+
+    def _append(self, block_id: str, body: Dict[str, Any]):
+        if block_id not in self._pages and block_id not in self._parents:
+            return _error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        added = []
+        for child in body.get("children") or []:
+            block = dict(child, object="block", id=str(uuid.uuid4()), has_children=False)
+            self._parents[block["id"]] = block_id
+            added.append(block)
+        self._children.setdefault(block_id, []).extend(added)
+        return 200, {}, {"object": "list", "results": added, "has_more": False, "next_cursor": None}
+
+    def _delete_block(self, block_id: str):
+        parent = self._parents.pop(block_id, None)
+        children = self._children.get(parent, []) if parent is not None else []
+        for index, block in enumerate(children):
+            if block["id"] == block_id:
+                del children[index]
+                self._children.pop(block_id, None)
+                return 200, {}, dict(block, archived=True)
+        return _error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+
+
+class FakeNotionTransport(httpx.BaseTransport):
+    """httpx transport answering requests from a FakeNotion."""
+
+    def __init__(self, notion: FakeNotion):
+        self.notion = notion
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.startswith("/v1/"):
+            path = path[len("/v1/"):]
+        status, headers, content = self.notion.serve(
+            request.method, path, dict(parse_qsl(request.url.query.decode())), request.read()
+        )
+        return httpx.Response(
+            status,
+            headers={**headers, "Content-Type": "application/json"},
+            content=content,
+            request=request
+        )
+
+
+def _stable_fraction(text: str) -> float:
+    return (zlib.crc32(text.encode("utf-8")) % 10_000) / 10_000
+
+
+class FakeMessage:
+    """Chat response with langchain's content and usage_metadata attributes."""
+
+    def __init__(self, content: str, prompt_tokens: int, completion_tokens: int):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatOpenAI that answers routing prompts and default tasks.
+
+    A stable hash of the task text decides whether the router sends it to the
+    research crew, so the same workload always takes the same paths.
+    """
+
+    def __init__(self, model: str, latency: Any = 0, research_fraction: float = 0.0, seed: int = 0):
+        self.model_name = model
+        self.latency = service_time(latency, seed)
+        self.research_fraction = research_fraction
+
+    def invoke(self, messages: List[Any]) -> FakeMessage:
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        system = getattr(messages[0], "content", "") if messages else ""
+        task = getattr(messages[-1], "content", "") if messages else ""
+        prompt_tokens = sum(len(str(getattr(message, "content", ""))) for message in messages) // 4
+        if "task router" in system:
+            if _stable_fraction(task) < self.research_fraction:
+                content = "research_crew [quick]: This task needs web research"
+            else:
+                content = "default: This is a general task"
+        else:
+            content = (
+                f"Here is a complete answer to the task.\n\n{task}\n\n" + "Supporting detail. " * 20
+            )
+        return FakeMessage(content, prompt_tokens, len(content) // 4)
+
+
+def fake_research_output(topic: str) -> ResearchOutput:
+    """A structured research result that passes the research quality gate."""
+    return ResearchOutput(
+        executive_summary=f"Summary of research on {topic}.",
+        initial_research=InitialResearchOutput(
+            key_facts=[f"Fact {index} about {topic}" for index in range(5)],
+            recent_developments=["A recent development"],
+            expert_opinions=[{"opinion": "Promising", "source": "Analyst"}],
+            statistics=[{"statistic": "42%", "source": "Survey"}],
+            sources=["https://example.com/a", "https://example.com/b"],
+        ),
+        key_findings=[f"Finding {index}" for index in range(4)],
+        trend_analysis={"Adoption": "Rising"},
+        recommendations=["Keep watching the space"],
+    )
+
+
+class FakeCrewOutput:
+    """Crew result with CrewOutput's raw, pydantic and token_usage attributes."""
+
+    def __init__(self, topic: str):
+        self.pydantic = fake_research_output(topic)
+        self.raw = self.pydantic.model_dump_json(indent=2)
+        self.token_usage = UsageMetrics(
+            total_tokens=12_000, prompt_tokens=10_000, completion_tokens=2_000,
+            successful_requests=6
+        )
+
+
+class FakeAgent:
+    def __init__(self):
+        self.max_iter = 25
+        self.max_execution_time = None
+        self.llm = None
+        self.tools: List[Any] = []
+        self.step_callback = None
+
+
+class FakeTask:
+    def __init__(self, description: str):
+        self.description = description
+
+
+class FakeCrew:
+    """Crew whose kickoff sleeps for a sampled service time and returns a fixed result."""
+
+    def __init__(self, latency: Sampler):
+        self.latency = latency
+        self.agents = [FakeAgent(), FakeAgent()]
+        self.tasks = [FakeTask("Research {topic}"), FakeTask("Synthesize research on {topic}")]
+
+    def copy(self) -> "FakeCrew":
+        return FakeCrew(self.latency)
+
+    def kickoff(self, inputs: Optional[Dict[str, Any]] = None) -> FakeCrewOutput:
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        return FakeCrewOutput((inputs or {}).get("topic", ""))
+
+
+class FakeResearchCrew:
+    """Stand-in for ResearchCrew, to be built by a ResearchCrewPool factory."""
+
+    def __init__(self, latency: Any = 0, seed: int = 0):
+        self._crew = FakeCrew(service_time(latency, seed))
+
+    def crew(self) -> FakeCrew:
+        return self._crew
+
+    def reset_task_state(self) -> None:
+        pass
+
+    def task_stats(self) -> Dict[str, Any]:
+        return {}
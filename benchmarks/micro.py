@@ -0,0 +1,405 @@
+"""
+Micro-benchmarks of the pure-Python Notion publishing and reading paths.
+
+Covers text chunking (split_text, rich_text), block construction for a
+published result (markdown_to_blocks, plain_text_blocks,
+research_output_to_blocks and the full page as _publish_results builds it),
+request batching (batch_blocks) and comment flattening
+(NotionAPI.format_comments). The inputs are generated to realistic
+worst-case sizes: a 200 KB report, a 1,000-block page and a 500-comment
+thread, scaled by --scale.
+
+Each case reports the best time per call over several timeit repeats, calls
+and megabytes per second, and from one traced call with tracemalloc, the peak
+memory and the number of allocations. Results can be saved as a baseline and
+later runs compared against it; a case regresses when it is slower, or peaks
+at more memory, than the baseline by more than the threshold.
+
+Usage:
+    python -m benchmarks.micro --save-baseline
+    python -m benchmarks.micro --compare --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from orchestrator.notion_api import NotionAPI
+from orchestrator.notion_blocks import (
+    batch_blocks,
+    divider,
+    heading,
+    markdown_to_blocks,
+    paragraph,
+    plain_text_blocks,
+    research_output_to_blocks,
+    rich_text,
+    split_text,
+)
+
+DEFAULT_BASELINE = "./.benchmarks/micro.json"
+
+REPORT_BYTES = 200_000
+PAGE_BLOCKS = 1_000
+THREAD_COMMENTS = 500
+
+WORDS = (
+    "adoption battery cell chemistry cost density energy growth lithium market model "
+    "performance policy production research safety scale solid state supply technology"
+).split()
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _inline(rng: random.Random) -> str:
+    """A sentence with the inline markdown models produce: bold, italics, code and links."""
+    parts = [_sentence(rng)]
+    kind = rng.randrange(4)
+    if kind == 0:
+        parts.append(f"**{rng.choice(WORDS)} {rng.choice(WORDS)}**")
+    elif kind == 1:
+        parts.append(f"*{rng.choice(WORDS)}*")
+    elif kind == 2:
+        parts.append(f"`{rng.choice(WORDS)}_{rng.randrange(100)}`")
+    else:
+        parts.append(f"[{rng.choice(WORDS)}](https://example.com/{rng.randrange(10_000)})")
+    parts.append(_sentence(rng, 8))
+    return " ".join(parts)
+
+
+def report_markdown(size: int = REPORT_BYTES, seed: int = 0) -> str:
+    """
+    Generate a markdown research report of about `size` bytes.
+
+    Sections mix headings, long paragraphs, nested bullets, numbered lists,
+    quotes, code fences and rules, in the proportions of typical crew output.
+    """
+    rng = random.Random(seed)
+    lines: List[str] = []
+    length = 0
+    section = 0
+    while length < size:
+        section += 1
+        block = [f"## Section {section}: {_sentence(rng, 4)}", ""]
+        block.append(" ".join(_inline(rng) for _ in range(rng.randint(3, 12))))
+        block.append("")
+        for _ in range(rng.randint(2, 6)):
+            block.append(f"- {_inline(rng)}")
+            if rng.random() < 0.3:
+                block.append(f"  - {_sentence(rng)}")
+        block.append("")
+        for index in range(rng.randint(0, 4)):
+            block.append(f"{index + 1}. {_inline(rng)}")
+        if rng.random() < 0.2:
+            block.extend(["", f"> {_sentence(rng, 20)}"])
+        if rng.random() < 0.1:
+            block.extend(["", "```python", "print('example')", "```"])
+        if rng.random() < 0.1:
+            block.extend(["", "---"])
+        block.append("")
+        lines.extend(block)
+        length += sum(len(line) + 1 for line in block)
+    return "\n".join(lines)
+
+
+def thought_process_text(size: int = REPORT_BYTES, seed: int = 0) -> str:
+    """Generate a plain-text agent trace of about `size` bytes."""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    length = 0
+    while length < size:
+        line = f"Thought: {_sentence(rng, 20)}\nAction: search\nObservation: {_sentence(rng, 40)}\n"
+        lines.append(line)
+        length += len(line)
+    return "".join(lines)
+
+
+def research_output(findings: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """Generate a large structured research result as stored in research_output.json."""
+    rng = random.Random(seed)
+    return {
+        "executive_summary": " ".join(_inline(rng) for _ in range(20)),
+        "initial_research": {
+            "key_facts": [_inline(rng) for _ in range(findings)],
+            "recent_developments": [_inline(rng) for _ in range(findings // 2)],
+            "expert_opinions": [
+                {"opinion": _sentence(rng), "source": f"Expert {index}"}
+                for index in range(findings // 4)
+            ],
+            "statistics": [
+                {"statistic": f"{rng.randrange(100)}%", "source": f"Survey {index}"}
+                for index in range(findings // 4)
+            ],
+            "sources": [f"https://example.com/source/{index}" for index in range(findings // 2)],
+        },
+        "key_findings": [_inline(rng) for _ in range(findings)],
+        "trend_analysis": {f"Trend {index}": _sentence(rng, 30) for index in range(findings // 10)},
+        "recommendations": [_inline(rng) for _ in range(findings // 2)],
+    }
+
+
+def page_blocks(count: int = PAGE_BLOCKS, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate the blocks of a long published page, as built before appending."""
+    rng = random.Random(seed)
+    blocks: List[Dict[str, Any]] = []
+    while len(blocks) < count:
+        if len(blocks) % 25 == 0:
+            blocks.append(heading(_sentence(rng, 4), 2))
+        else:
+            blocks.extend(paragraph(" ".join(_inline(rng) for _ in range(rng.randint(1, 4)))))
+    return blocks[:count]
+
+
+def retrieved_block(seed: int = 0) -> Dict[str, Any]:
+    """A paragraph block as the API returns it, with an ID and plain_text."""
+    rng = random.Random(seed)
+    segments = rich_text(" ".join(_inline(rng) for _ in range(3)))
+    for segment in segments:
+        segment["plain_text"] = segment["text"]["content"]
+    return {
+        "object": "block", "id": f"block-{seed}", "type": "paragraph",
+        "paragraph": {"rich_text": segments}
+    }
+
+
+def comment_thread(count: int = THREAD_COMMENTS, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate comment objects as the comments endpoint returns them."""
+    rng = random.Random(seed)
+    comments = []
+    for index in range(count):
+        segments = rich_text(" ".join(_inline(rng) for _ in range(rng.randint(1, 3))))
+        for segment in segments:
+            segment["plain_text"] = segment["text"]["content"]
+        comments.append({"object": "comment", "id": f"comment-{index}", "rich_text": segments})
+    return comments
+
+
+def publish_blocks(report: str, thought_process: str) -> List[List[Dict[str, Any]]]:
+    """Build and batch a result page the way TaskOrchestrator._publish_results does."""
+    blocks = [heading("AI Response", 2)]
+    blocks.extend(markdown_to_blocks(report))
+    blocks.append(divider())
+    blocks.append(heading("Thought Process", 2))
+    blocks.extend(plain_text_blocks(thought_process))
+    return batch_blocks(blocks)
+
+
+@dataclass
+class Case:
+    """One benchmarked call with its prepared argument."""
+
+    name: str
+    function: Callable[[Any], Any]
+    argument: Any
+    input_bytes: int
+
+
+def build_cases(scale: float = 1.0, seed: int = 0) -> List[Case]:
+    """
+    Generate the inputs and return the benchmark cases.
+
+    Args:
+        scale (float): Multiplier of the input sizes (1.0 is a 200 KB report, a
+            1,000-block page and a 500-comment thread)
+        seed (int): Seed of the generated inputs
+    """
+    report = report_markdown(int(REPORT_BYTES * scale), seed)
+    trace = thought_process_text(int(REPORT_BYTES * scale), seed)
+    blocks = page_blocks(max(1, int(PAGE_BLOCKS * scale)), seed)
+    structured = research_output(max(4, int(200 * scale)), seed)
+    thread = comment_thread(max(1, int(THREAD_COMMENTS * scale)), seed)
+    block = retrieved_block(seed)
+    paragraphs = " ".join(line for line in report.splitlines() if line and line[0].isalpha())
+
+    def size(value: Any) -> int:
+        text = value if isinstance(value, str) else json.dumps(value)
+        return len(text.encode("utf-8"))
+
+    return [
+        Case("split_text", split_text, report, size(report)),
+        Case("rich_text", rich_text, paragraphs, size(paragraphs)),
+        Case("markdown_to_blocks", markdown_to_blocks, report, size(report)),
+        Case("plain_text_blocks", plain_text_blocks, trace, size(trace)),
+        Case("research_output_to_blocks", research_output_to_blocks, structured, size(structured)),
+        Case("batch_blocks", batch_blocks, blocks, size(blocks)),
+        Case(
+            "publish_blocks", lambda args: publish_blocks(*args), (report, trace),
+            size(report) + size(trace)
+        ),
+        Case("format_comments_page", NotionAPI.format_comments, thread, size(thread)),
+        Case(
+            "format_comments_inline",
+            lambda comments: NotionAPI.format_comments(comments, block),
+            thread,
+            size(thread)
+        ),
+    ]
+
+
+def measure(case: Case, repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Time a case with timeit and trace one call's allocations.
+
+    Args:
+        case (Case): The case to run
+        repeat (int): Timing repeats; the fastest is reported
+        min_time (float): Minimum seconds per repeat, as timeit's autorange
+
+    Returns:
+        Dict[str, Any]: Seconds per call, calls and MB per second, peak traced bytes and allocations
+    """
+    timer = timeit.Timer(lambda: case.function(case.argument))
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline_bytes, _ = tracemalloc.get_traced_memory()
+        result = case.function(case.argument)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    allocations = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "lineno"))
+    del result
+
+    return {
+        "seconds_per_call": seconds,
+        "calls_per_second": round(1 / seconds, 2) if seconds else None,
+        "mb_per_second": round(case.input_bytes / seconds / 1e6, 2) if seconds else None,
+        "input_bytes": case.input_bytes,
+        "peak_bytes": max(0, peak - baseline_bytes),
+        "allocations": allocations,
+    }
+
+
+def run_suite(
+    scale: float = 1.0,
+    repeat: int = 5,
+    min_time: float = 0.2,
+    only: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Run every case (or those named in `only`) and return their results by name."""
+    return {
+        case.name: measure(case, repeat, min_time)
+        for case in build_cases(scale)
+        if not only or case.name in only
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = 0.2
+) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): Results of run_suite
+        baseline (Dict[str, Dict[str, Any]]): Saved results of an earlier run
+        threshold (float): Allowed relative slowdown or peak memory growth, e.g. 0.2 for 20%
+
+    Returns:
+        List[str]: A description of each regression, empty if there are none
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("seconds_per_call", "peak_bytes"):
+            old, new = previous.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + threshold):
+                increase = (new / old - 1) * 100
+                regressions.append(f"{name}: {metric} {old:.6g} -> {new:.6g} (+{increase:.0f}%)")
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]], scale: float) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        baseline = {"scale": scale, "python": sys.version.split()[0], "results": results}
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def _table(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'case':<28}{'ms/call':>10}{'MB/s':>9}{'peak KB':>10}{'allocs':>9}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<28}{result['seconds_per_call'] * 1000:>10.3f}"
+            f"{result['mb_per_second'] or 0:>9.1f}"
+            f"{result['peak_bytes'] / 1024:>10.0f}{result['allocations']:>9}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the input sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Minimum seconds per timing repeat"
+    )
+    parser.add_argument("--case", action="append", help="Run only this case (repeatable)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store the results as the baseline"
+    )
+    parser.add_argument(
+        "--compare", action="store_true", help="Fail if a case regressed against the baseline"
+    )
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON instead of a table"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scale, args.repeat, args.min_time, args.case)
+    print(json.dumps(results, indent=2) if args.json else _table(results))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.scale)
+        print(f"Saved baseline to {args.baseline}")
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(
+                f"No baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr
+            )
+            return 2
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Local stand-in for the Notion API, for load tests that must not touch a real workspace.
+
+Serves the subset of the API that NotionAPI uses over HTTP, backed by
+FakeNotion: database queries with filters, sorts and cursors, page retrieval
+and updates, block children list/append/delete, and comment listing. By
+default it enforces Notion's documented limits (3 requests per second with
+429 and Retry-After, 100 children per append, 2000 characters per rich text
+item, 500 KB bodies) and can be seeded with a synthetic database of e.g. 100k
+rows.
+
+Usage:
+    python -m benchmarks.notion_server --rows 100000 --port 8765
+
+then point the service at it:
+    NOTION_BASE_URL=http://127.0.0.1:8765 python scheduled_service.py
+"""
+
+import argparse
+import json
+import logging
+import socket
+import sys
+import threading
+import time
+from dataclasses import fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.fakes import FakeNotion, NotionLimits
+
+logger = logging.getLogger(__name__)
+
+# NotionAPI's default database, so the service needs no DATABASE_ID to use the server
+DEFAULT_DATABASE_ID = "180ee158-0432-8041-b9f0-c28906016b3f"
+
+
+class NotionRequestHandler(BaseHTTPRequestHandler):
+    """Translates HTTP requests to FakeNotion.serve calls."""
+
+    protocol_version = "HTTP/1.1"
+    server: "NotionServer"
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def do_PATCH(self) -> None:
+        self._dispatch()
+
+    def do_DELETE(self) -> None:
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        url = urlsplit(self.path)
+        content = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not url.path.startswith("/v1/"):
+            self._respond(*self._error(400, "invalid_request_url", "Invalid request URL."))
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._respond(*self._error(401, "unauthorized", "API token is invalid."))
+            return
+        status, headers, body = self.server.notion.serve(
+            self.command, url.path[len("/v1/"):], dict(parse_qsl(url.query)), content
+        )
+        self._respond(status, headers, body)
+
+    @staticmethod
+    def _error(status: int, code: str, message: str):
+        body = {"object": "error", "status": status, "code": code, "message": message}
+        return status, {}, json.dumps(body).encode("utf-8")
+
+    def _respond(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class NotionServer(ThreadingHTTPServer):
+    """
+    HTTP server exposing a FakeNotion.
+
+    Attributes:
+        notion (FakeNotion): The workspace answering requests
+    """
+
+    daemon_threads = True
+
+    def __init__(self, notion: FakeNotion, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the server.
+
+        Args:
+            notion (FakeNotion): The workspace answering requests
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 for any free port
+        """
+        super().__init__((host, port), NotionRequestHandler)
+        self.notion = notion
+        self._thread: Optional[threading.Thread] = None
+        # Open client connections, closed on stop so keep-alive handler threads exit
+        self._connections: Set[socket.socket] = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request, client_address) -> None:
+        with self._connections_lock:
+            self._connections.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request) -> None:
+        with self._connections_lock:
+            self._connections.discard(request)
+        super().shutdown_request(request)
+
+    @property
+    def url(self) -> str:
+        """The base URL to set as NOTION_BASE_URL."""
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def start(self) -> "NotionServer":
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="notion-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self) -> "NotionServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def parse_status_mix(spec: str) -> Dict[str, float]:
+    """Parse "Done=0.9,Execute=0.1" into relative Status weights."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-id", default=DEFAULT_DATABASE_ID)
+    parser.add_argument(
+        "--rows", type=int, default=0, help="Synthetic rows to seed the database with"
+    )
+    parser.add_argument(
+        "--status-mix", default="Done=0.9,Review=0.07,Iterate=0.01,Execute=0.02",
+        help="Relative weight of each Status among the seeded rows"
+    )
+    parser.add_argument(
+        "--latency", default="0", help="Service time of every response, e.g. lognormal:0.1,0.4"
+    )
+    parser.add_argument(
+        "--no-limits", action="store_true", help="Do not enforce rate and size limits"
+    )
+    for field in fields(NotionLimits):
+        option = f"--{field.name.replace('_', '-')}"
+        parser.add_argument(option, type=type(field.default), default=field.default)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    limits = None
+    if not args.no_limits:
+        limits = NotionLimits(
+            **{field.name: getattr(args, field.name) for field in fields(NotionLimits)}
+        )
+    notion = FakeNotion(latency=args.latency, limits=limits, seed=args.seed)
+    notion.create_database(args.database_id)
+    if args.rows:
+        started = time.perf_counter()
+        notion.seed(args.database_id, args.rows, parse_status_mix(args.status_mix), seed=args.seed)
+        logger.info(f"Seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    server = NotionServer(notion, args.host, args.port)
+    logger.info(
+        f"Serving Notion API for database {args.database_id} at {server.url} "
+        f"({'no limits' if limits is None else f'{limits.requests_per_second:g} req/s'}); "
+        f"set NOTION_BASE_URL={server.url}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Requests served: {dict(notion.requests.most_common())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
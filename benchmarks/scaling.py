@@ -0,0 +1,403 @@
+"""
+Scaling benchmark of the poll path against large task databases.
+
+Seeds the fake Notion with 1k, 10k and 100k rows (or any sizes) at each
+status mix, then simulates hours of polling on a virtual clock: between polls,
+users edit rows at the given rate, asking for work (Execute or Iterate) or
+closing tasks, and each poll runs NotionAPI.query_tasks_to_execute and
+query_tasks_to_iterate in every query mode. Tasks a poll returns are taken
+over by a simulated worker, which moves them to Review without further
+requests, so only the cost of polling is measured: requests and bytes per
+poll, peak memory allocated during a poll (emulator included, since it runs
+in-process), poll wall time and pickup latency in simulated seconds. The
+report also fits how each cost grows with database size, and with
+matplotlib installed it can be plotted.
+
+Usage:
+    python -m benchmarks.scaling --sizes 1000,10000,100000 --hours 24 --plot scaling.png
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import math
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from benchmarks.e2e import isolated_state, summarize
+from benchmarks.fakes import FakeNotion
+from benchmarks.notion_server import parse_status_mix
+from orchestrator.notion_api import NotionAPI
+
+logger = logging.getLogger(__name__)
+
+DATABASE_ID = "00000000-0000-4000-8000-00000000000a"
+QUERY_ENDPOINT = "POST /databases/{id}/query"
+OPEN_STATUSES = ("Execute", "Iterate")
+
+STATUS_MIXES = {
+    # A workspace whose open backlog grows with its history
+    "busy": "Done=0.9,Review=0.07,Iterate=0.01,Execute=0.02",
+    # A workspace where nearly everything is done and few tasks wait at any time
+    "settled": "Done=0.995,Review=0.004,Iterate=0.0005,Execute=0.0005",
+}
+
+
+@dataclass
+class ScalingConfig:
+    """
+    Database sizes, workloads and query modes to benchmark.
+
+    `edit_rates` are row edits per simulated hour; `work_fraction` of them ask for
+    work (Execute, or Iterate for `iterate_fraction` of those) and the rest close a
+    task (Done or Review). Tracing allocations slows a poll several times over, so
+    memory is measured on the first poll and every `memory_every` polls after it.
+    """
+
+    sizes: List[int] = field(default_factory=lambda: [1_000, 10_000, 100_000])
+    status_mixes: Dict[str, str] = field(default_factory=lambda: dict(STATUS_MIXES))
+    edit_rates: List[float] = field(default_factory=lambda: [60.0, 600.0])
+    work_fraction: float = 0.5
+    iterate_fraction: float = 0.2
+    modes: List[str] = field(default_factory=lambda: ["single", "paginated"])
+    hours: float = 24.0
+    poll_interval: float = 300.0
+    memory_every: int = 12
+    seed: int = 0
+
+
+class Simulation:
+    """
+    One database size, status mix, edit rate and query mode, polled on a virtual clock.
+
+    Attributes:
+        notion (FakeNotion): The seeded workspace
+        api (NotionAPI): The client under test, in the simulation's query mode
+        now (float): The simulated time
+    """
+
+    def __init__(self, config: ScalingConfig, rows: int, mix: str, edit_rate: float, mode: str):
+        self.config = config
+        self.rows = rows
+        self.mix = mix
+        self.edit_rate = edit_rate
+        self.mode = mode
+        self.now = 1_700_000_000.0
+        self.notion = FakeNotion(seed=config.seed, clock=lambda: self.now)
+        weights = parse_status_mix(config.status_mixes[mix])
+        self.page_ids = self.notion.seed(DATABASE_ID, rows, weights, seed=config.seed)
+        self.api = NotionAPI(
+            notion_api_key="benchmark",
+            openai_api_key="benchmark",
+            database_id=DATABASE_ID,
+            transport=self.notion.transport(),
+            query_mode=mode
+        )
+        self._rng = random.Random(config.seed + rows)
+        # Work requested during the run and not yet picked up, with the time it was asked for
+        self.requested: Dict[str, float] = {}
+        self.initial_backlog = {
+            page_id for page_id in self.page_ids if self.notion.status(page_id) in OPEN_STATUSES
+        }
+
+    def _edit(self) -> None:
+        page_id = self.page_ids[self._rng.randrange(len(self.page_ids))]
+        if self._rng.random() < self.config.work_fraction:
+            status = "Iterate" if self._rng.random() < self.config.iterate_fraction else "Execute"
+            if self.notion.status(page_id) not in OPEN_STATUSES:
+                self.requested[page_id] = self.now
+            self.notion.set_status(page_id, status)
+        else:
+            self.notion.set_status(page_id, self._rng.choice(["Done", "Review"]))
+            self.requested.pop(page_id, None)
+            self.initial_backlog.discard(page_id)
+
+    def _advance(self, until: float) -> None:
+        """Apply the edits arriving before `until` as a Poisson process."""
+        rate = self.edit_rate / 3600
+        while rate > 0:
+            step = self._rng.expovariate(rate)
+            if self.now + step >= until:
+                break
+            self.now += step
+            self._edit()
+        self.now = until
+
+    async def _poll(self) -> List[Dict[str, Any]]:
+        execute = await self.api.query_tasks_to_execute()
+        iterate = await self.api.query_tasks_to_iterate()
+        return execute.get("results", []) + iterate.get("results", [])
+
+    def run(self) -> Dict[str, Any]:
+        """Simulate the configured hours of polling and report its cost."""
+        polls = max(1, int(self.config.hours * 3600 / self.config.poll_interval))
+        requests_before = self.notion.requests[QUERY_ENDPOINT]
+        bytes_before = (self.notion.bytes_in, self.notion.bytes_out)
+        poll_seconds, peaks, returned, pickups = [], [], [], []
+        drained_at = 0 if not self.initial_backlog else None
+        start = self.now
+
+        loop = asyncio.new_event_loop()
+        # The seeded rows never change shape; keeping them out of collections stops
+        # the emulator's 100k dicts from dominating every poll's time
+        gc.collect()
+        gc.freeze()
+        try:
+            for poll in range(1, polls + 1):
+                self._advance(start + poll * self.config.poll_interval)
+                traced = poll == 1 or poll % self.config.memory_every == 0
+                if traced:
+                    tracemalloc.start()
+                started = time.perf_counter()
+                tasks = loop.run_until_complete(self._poll())
+                if traced:
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                else:
+                    poll_seconds.append(time.perf_counter() - started)
+                returned.append(len(tasks))
+                for task in tasks:
+                    page_id = task["id"]
+                    if page_id in self.requested:
+                        pickups.append(self.now - self.requested.pop(page_id))
+                    self.initial_backlog.discard(page_id)
+                    self.notion.set_status(page_id, "Review")
+                if drained_at is None and not self.initial_backlog:
+                    drained_at = poll
+        finally:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            gc.unfreeze()
+            loop.close()
+
+        requests = self.notion.requests[QUERY_ENDPOINT] - requests_before
+        bytes_sent = self.notion.bytes_in - bytes_before[0]
+        bytes_received = self.notion.bytes_out - bytes_before[1]
+        return {
+            "rows": self.rows,
+            "status_mix": self.mix,
+            "edit_rate_per_hour": self.edit_rate,
+            "mode": self.mode,
+            "polls": polls,
+            "requests": requests,
+            "requests_per_poll": round(requests / polls, 3),
+            "bytes_sent": bytes_sent,
+            "bytes_received": bytes_received,
+            "bytes_per_poll": round((bytes_sent + bytes_received) / polls),
+            "peak_poll_memory_bytes": max(peaks),
+            "poll_seconds": summarize(poll_seconds),
+            "tasks_per_poll": {"mean": round(sum(returned) / polls, 2), "max": max(returned)},
+            "pickup_latency_seconds": summarize(pickups),
+            "waiting_at_end": len(self.requested),
+            "initial_backlog_drained_after_polls": drained_at,
+        }
+
+
+def growth(results: List[Dict[str, Any]], metric: str) -> Optional[float]:
+    """
+    Fit the exponent k of metric ~ rows^k over results of different sizes.
+
+    Below 1 the cost grows sublinearly with the database; None if it cannot be fitted.
+    """
+    points = [
+        (math.log(result["rows"]), math.log(value))
+        for result in results
+        if (value := _metric(result, metric)) and value > 0 and result["rows"] > 0
+    ]
+    if len({x for x, _ in points}) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    slope = covariance / sum((x - mean_x) ** 2 for x, _ in points)
+    return round(slope, 3)
+
+
+def _metric(result: Dict[str, Any], metric: str) -> Optional[float]:
+    value: Any = result
+    for part in metric.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+GROWTH_METRICS = (
+    "requests_per_poll", "bytes_per_poll", "peak_poll_memory_bytes", "pickup_latency_seconds.p95"
+)
+
+
+def run_scaling(config: ScalingConfig) -> Dict[str, Any]:
+    """
+    Run every combination of size, status mix, edit rate and query mode.
+
+    Returns:
+        Dict[str, Any]: The configuration, one result per run and, per mix, edit
+            rate and mode, the growth exponent of each cost against database size
+    """
+    results = []
+    temporary = tempfile.TemporaryDirectory(prefix="scaling-benchmark-")
+    with temporary as directory, isolated_state(directory):
+        for mix in config.status_mixes:
+            for edit_rate in config.edit_rates:
+                for rows in config.sizes:
+                    for mode in config.modes:
+                        started = time.perf_counter()
+                        result = Simulation(config, rows, mix, edit_rate, mode).run()
+                        results.append(result)
+                        logger.info(
+                            f"{rows} rows, {mix}, {edit_rate:g} edits/h, {mode}: "
+                            f"{result['requests_per_poll']} requests and "
+                            f"{result['bytes_per_poll']} bytes per poll, "
+                            f"pickup p95 {result['pickup_latency_seconds']['p95']}s "
+                            f"({time.perf_counter() - started:.1f}s)"
+                        )
+                        gc.collect()
+
+    scaling = []
+    for mix in config.status_mixes:
+        for edit_rate in config.edit_rates:
+            for mode in config.modes:
+                series = [
+                    result for result in results
+                    if result["status_mix"] == mix and result["edit_rate_per_hour"] == edit_rate
+                    and result["mode"] == mode
+                ]
+                scaling.append({
+                    "status_mix": mix,
+                    "edit_rate_per_hour": edit_rate,
+                    "mode": mode,
+                    **{metric: growth(series, metric) for metric in GROWTH_METRICS},
+                })
+    return {"config": asdict(config), "results": results, "growth": scaling}
+
+
+def plot(report: Dict[str, Any], path: str) -> None:
+    """
+    Plot each cost against database size, one line per mix, edit rate and mode.
+
+    Raises:
+        ImportError: If matplotlib is not installed
+    """
+    import matplotlib  # type: ignore[import-not-found]
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt  # type: ignore[import-not-found]
+
+    panels = [
+        ("requests_per_poll", "Requests per poll"),
+        ("bytes_per_poll", "Bytes per poll"),
+        ("peak_poll_memory_bytes", "Peak memory per poll (bytes)"),
+        ("pickup_latency_seconds.p95", "Pickup latency p95 (s)"),
+    ]
+    figure, axes = plt.subplots(2, 2, figsize=(12, 9))
+    for axis, (metric, title) in zip(axes.flat, panels):
+        for line in report["growth"]:
+            series = sorted(
+                (result for result in report["results"]
+                 if (result["status_mix"], result["edit_rate_per_hour"], result["mode"])
+                 == (line["status_mix"], line["edit_rate_per_hour"], line["mode"])),
+                key=lambda result: result["rows"]
+            )
+            axis.plot(
+                [result["rows"] for result in series],
+                [_metric(result, metric) or 0 for result in series],
+                marker="o",
+                label=f"{line['mode']}, {line['status_mix']}, {line['edit_rate_per_hour']:g}/h"
+            )
+        axis.set_xscale("log")
+        axis.set_yscale("symlog")
+        axis.set_xlabel("Database rows")
+        axis.set_title(title)
+        axis.grid(True, which="both", alpha=0.3)
+    axes.flat[0].legend(fontsize="small")
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def _list(kind):
+    return lambda value: [kind(part) for part in value.split(",") if part.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    defaults = ScalingConfig()
+    parser.add_argument(
+        "--sizes", type=_list(int), default=defaults.sizes, help="Comma-separated row counts"
+    )
+    parser.add_argument(
+        "--status-mix", action="append", metavar="NAME=SPEC",
+        help='A named status mix, e.g. "busy=Done=0.9,Execute=0.1"; '
+             'repeat for more (default: busy and settled)'
+    )
+    parser.add_argument(
+        "--edit-rates", type=_list(float), default=defaults.edit_rates, help="Row edits per hour"
+    )
+    parser.add_argument("--work-fraction", type=float, default=defaults.work_fraction)
+    parser.add_argument("--iterate-fraction", type=float, default=defaults.iterate_fraction)
+    parser.add_argument(
+        "--modes", type=_list(str), default=defaults.modes, help="NotionAPI query modes"
+    )
+    parser.add_argument(
+        "--hours", type=float, default=defaults.hours, help="Simulated hours of polling"
+    )
+    parser.add_argument("--poll-interval", type=float, default=defaults.poll_interval)
+    parser.add_argument(
+        "--memory-every", type=int, default=defaults.memory_every,
+        help="Polls between memory samples"
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--plot", help="Plot the results to this image file (needs matplotlib)")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    # Per-request logs of the client would swamp hours of simulated polls
+    logging.getLogger("orchestrator").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    mixes = defaults.status_mixes
+    if args.status_mix:
+        mixes = dict(spec.split("=", 1) for spec in args.status_mix)
+    config = ScalingConfig(
+        sizes=args.sizes,
+        status_mixes=mixes,
+        edit_rates=args.edit_rates,
+        work_fraction=args.work_fraction,
+        iterate_fraction=args.iterate_fraction,
+        modes=args.modes,
+        hours=args.hours,
+        poll_interval=args.poll_interval,
+        memory_every=args.memory_every,
+        seed=args.seed
+    )
+    if args.plot:
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            logger.error("--plot needs matplotlib: pip install matplotlib")
+            return 2
+
+    report = run_scaling(config)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.plot:
+        plot(report, args.plot)
+        logger.info(f"Plotted {len(report['results'])} runs to {args.plot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
-from crewai_tools import (
-	SerperDevTool,
-	WebsiteSearchTool,
-	ScrapeWebsiteTool
-)
+from crewai.tools import BaseTool
+from crewai_tools import WebsiteSearchTool
+from .extraction import ExtractionPipeline
+from .prefetch import Prefetcher
+from .structured_output import structured_output_stats, structured_task_options
+from .tool_cache import CachedScrapeWebsiteTool, CachedSerperDevTool, default_tool_cache
+from .vector_store import ManagedWebsiteSearchTool, default_vector_store
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class InitialResearchOutput(BaseModel):
     """Output model for initial research task"""
@@ -24,6 +26,32 @@ class ResearchOutput(BaseModel):
     trend_analysis: Dict[str, str] = Field(..., description="Analysis of identified trends")
     recommendations: List[str] = Field(..., description="Actionable recommendations based on the research")
 
+def build_research_tools() -> list:
+    """Instantiate the researcher's web tools, returning an empty list if they cannot be set up"""
+    try:
+        # Search and scrape results are shared across tasks via the on-disk tool cache
+        cache = default_tool_cache()
+        # Scraped pages are reduced to deduplicated main content before the agent sees them
+        scrape_tool = CachedScrapeWebsiteTool(cache=cache, pipeline=ExtractionPipeline.from_env())
+        # Top search results are fetched in the background while the agent thinks
+        # Failed prefetches raise, so they are not buffered and the scrape itself retries
+        prefetcher = Prefetcher.from_env(lambda url: scrape_tool.fetch(url, raise_for_status=True))
+        scrape_tool.attach_prefetcher(prefetcher)
+        search_tool = CachedSerperDevTool(cache=cache, prefetcher=prefetcher)
+        # Website embeddings are kept in a managed, size-bounded store and reused across tasks
+        vector_store = default_vector_store()
+        website_search_tool: BaseTool
+        if vector_store is not None:
+            website_search_tool = ManagedWebsiteSearchTool(store=vector_store, load_page=scrape_tool.load)
+        else:
+            website_search_tool = WebsiteSearchTool()
+        
+        return [search_tool, website_search_tool, scrape_tool]
+    except Exception as e:
+        print(f"Error initializing tools: {str(e)}")
+        # Fallback to simpler tools if needed
+        return []
+
 def callback_function(output):
     """Callback function to track agent's thought process"""
     try:
@@ -48,25 +76,50 @@ def callback_function(output):
 class ResearchCrew:
     """Research crew for analyzing topics"""
 
+    def __init__(self, llm: Optional[str] = None, tools: Optional[list] = None):
+        """
+        Args:
+            llm: Optional model name overriding the agents' configured LLM,
+                used by the model cascade (e.g. "openai/gpt-4o-mini")
+            tools: Optional pre-built researcher tools; built on first use otherwise
+        """
+        self.llm = llm
+        self.research_tools = tools
+
+    def _extraction_pipelines(self) -> list:
+        return [
+            tool.pipeline for tool in self.research_tools or []
+            if getattr(tool, "pipeline", None) is not None
+        ]
+
+    def reset_task_state(self) -> None:
+        """Clear per-task tool state, such as the scrape dedupe history, before a new task"""
+        for pipeline in self._extraction_pipelines():
+            pipeline.reset()
+
+    def task_stats(self) -> Dict[str, dict]:
+        """Return per-task tool statistics, e.g. how much scraped text extraction removed"""
+        stats = {}
+        pipelines = self._extraction_pipelines()
+        if pipelines:
+            stats["extraction"] = pipelines[0].stats()
+        for tool in self.research_tools or []:
+            if getattr(tool, "store", None) is not None:
+                stats["vector_store"] = tool.store.stats()
+        # Process-wide, so the re-ask rate covers every task run so far
+        stats["structured_output"] = structured_output_stats.snapshot()
+        return stats
+
     @agent
     def researcher(self) -> Agent:
-        # Initialize tools with proper error handling
-        try:
-            search_tool = SerperDevTool()
-            website_search_tool = WebsiteSearchTool()
-            scrape_tool = ScrapeWebsiteTool()
-            
-            tools = [search_tool, website_search_tool, scrape_tool]
-        except Exception as e:
-            print(f"Error initializing tools: {str(e)}")
-            # Fallback to simpler tools if needed
-            tools = []
+        if self.research_tools is None:
+            self.research_tools = build_research_tools()
         
         return Agent(
             config=self.agents_config['researcher'],
+            llm=self.llm,
             step_callback=callback_function,
-            output_pydantic=InitialResearchOutput,
-            tools=tools,
+            tools=self.research_tools,
             verbose=True
         )
 
@@ -74,22 +127,23 @@ class ResearchCrew:
     def senior_researcher(self) -> Agent:
         return Agent(
             config=self.agents_config['senior_researcher'],
+            llm=self.llm,
             step_callback=callback_function,
-            output_pydantic=ResearchOutput,
             verbose=True
         )
 
     @task
     def initial_research(self) -> Task:
         return Task(
-            config=self.tasks_config['initial_research']
+            config=self.tasks_config['initial_research'],
+            **structured_task_options(InitialResearchOutput, "researcher")
         )
 
     @task
     def analysis_and_synthesis(self) -> Task:
         return Task(
             config=self.tasks_config['analysis_and_synthesis'],
-            output_file='output/final_analysis.md'
+            **structured_task_options(ResearchOutput, "senior_researcher")
         )
 
     @crew
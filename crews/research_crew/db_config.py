@@ -8,12 +8,17 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
-def configure_chromadb():
-    """Configure the ChromaDB environment."""
+def configure_chromadb(db_dir=None):
+    """
+    Configure the ChromaDB environment.
+
+    Args:
+        db_dir: Persist directory; defaults to CHROMA_DB_DIR or ./chroma_db
+    """
     try:
         # Create a persistent directory for ChromaDB
-        db_dir = Path("./chroma_db")
-        db_dir.mkdir(exist_ok=True)
+        db_dir = Path(db_dir or os.getenv("CHROMA_DB_DIR", "./chroma_db"))
+        db_dir.mkdir(parents=True, exist_ok=True)
         
         # Set environment variables for ChromaDB - using the new client format
         os.environ["CHROMA_PERSIST_DIRECTORY"] = str(db_dir.absolute())
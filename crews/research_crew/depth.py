@@ -0,0 +1,153 @@
+"""
+Research depth profiles that bound how much work a ResearchCrew run may do.
+
+A profile (quick, standard or deep) caps agent iterations, tool calls, tokens
+per LLM response, wall-clock time per agent and the number of parallel
+sub-questions. It is applied to a fresh crew copy before kickoff: tools are
+wrapped so every call is counted against the task's budget, and each tool
+result tells the agent how many calls and how much time it has left.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from crewai import Crew
+from crewai.tools import BaseTool
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DepthProfile:
+    """Limits for one research depth."""
+
+    name: str
+    max_iter: int
+    max_tool_calls: int
+    max_execution_time: int
+    max_tokens: int
+    max_subquestions: int
+
+
+DEPTH_PROFILES: Dict[str, DepthProfile] = {
+    "quick": DepthProfile("quick", max_iter=3, max_tool_calls=3, max_execution_time=60, max_tokens=1500,
+                          max_subquestions=1),
+    "standard": DepthProfile("standard", max_iter=8, max_tool_calls=12, max_execution_time=300, max_tokens=4000,
+                             max_subquestions=3),
+    "deep": DepthProfile("deep", max_iter=20, max_tool_calls=40, max_execution_time=1200, max_tokens=8000,
+                         max_subquestions=6),
+}
+
+
+def get_profile(name: Optional[str] = None) -> DepthProfile:
+    """
+    Look up a depth profile by name.
+
+    Args:
+        name (Optional[str]): quick, standard or deep; RESEARCH_DEPTH (default standard) when empty or unknown
+
+    Returns:
+        DepthProfile: The profile
+    """
+    key = (name or "").strip().lower()
+    if key not in DEPTH_PROFILES:
+        if key:
+            logger.warning(f"Unknown research depth '{name}', using the default")
+        key = os.getenv("RESEARCH_DEPTH", "standard").lower()
+    return DEPTH_PROFILES.get(key, DEPTH_PROFILES["standard"])
+
+
+def depth_from_properties(properties: Dict[str, Any]) -> Optional[str]:
+    """Return the value of a Notion task's "Depth" select property, if set."""
+    select = (properties or {}).get("Depth", {}).get("select")
+    return select.get("name") if select else None
+
+
+class ToolBudget:
+    """
+    Thread-safe count of tool calls and elapsed time for one research run.
+
+    Attributes:
+        max_calls (int): Maximum tool calls across all agents
+        deadline (float): Monotonic time at which the run's time budget ends
+    """
+
+    def __init__(self, max_calls: int, seconds: float):
+        self.max_calls = max_calls
+        self.deadline = time.monotonic() + seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """Count a tool call, returning False if the call or time budget is spent."""
+        with self._lock:
+            if self.calls >= self.max_calls or time.monotonic() >= self.deadline:
+                return False
+            self.calls += 1
+            return True
+
+    def remaining(self) -> str:
+        """Describe the remaining budget for the agent."""
+        seconds = max(0, int(self.deadline - time.monotonic()))
+        return f"{max(0, self.max_calls - self.calls)} of {self.max_calls} tool calls and about {seconds}s remaining"
+
+
+class BudgetedTool(BaseTool):
+    """Wraps a tool so its calls count against a shared ToolBudget."""
+
+    _tool: Any = PrivateAttr(default=None)
+    _budget: Any = PrivateAttr(default=None)
+
+    def __init__(self, tool: BaseTool, budget: ToolBudget):
+        super().__init__(
+            name=tool.name,
+            # BaseTool prefixes the name and argument schema again, so keep only the original text
+            description=tool.description.split("Tool Description: ", 1)[-1],
+            args_schema=tool.args_schema
+        )
+        self._tool = tool
+        self._budget = budget
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        if not self._budget.claim():
+            return (f"Research budget exhausted ({self._budget.remaining()}). "
+                    "Do not call more tools; give your final answer with what you have.")
+        result = self._tool._run(*args, **kwargs)
+        return f"{result}\n\n[Budget: {self._budget.remaining()}]"
+
+
+def apply_depth_profile(crew: Crew, profile: DepthProfile) -> ToolBudget:
+    """
+    Bound a crew copy by a depth profile.
+
+    Must only be applied to a per-task copy (e.g. from ResearchCrewPool.checkout),
+    since agents, tasks and LLM settings are modified in place.
+
+    Args:
+        crew (Crew): The crew to bound
+        profile (DepthProfile): The limits to apply
+
+    Returns:
+        ToolBudget: The tool-call and time budget shared by the crew's agents
+    """
+    budget = ToolBudget(profile.max_tool_calls, profile.max_execution_time * len(crew.agents))
+    for crew_agent in crew.agents:
+        crew_agent.max_iter = profile.max_iter
+        crew_agent.max_execution_time = profile.max_execution_time  # type: ignore[attr-defined]
+        if crew_agent.llm is not None and hasattr(crew_agent.llm, "max_tokens"):
+            # Agent.copy() gives each copy its own LLM object, so this does not leak across tasks
+            crew_agent.llm.max_tokens = profile.max_tokens
+        if crew_agent.tools:
+            crew_agent.tools = [BudgetedTool(tool, budget) for tool in crew_agent.tools]
+    for crew_task in crew.tasks:
+        crew_task.description += (
+            f"\n\nThis is a {profile.name} research task. Use at most {profile.max_tool_calls} tool calls "
+            f"in total and finish within {profile.max_execution_time} seconds; tool results report the remaining budget."
+        )
+    logger.info(f"Applied {profile.name} research depth: {profile}")
+    return budget
@@ -0,0 +1,372 @@
+"""
+Token-efficient extraction stage between website scraping and the researcher.
+
+Scraped pages are reduced to their main content, whitespace is normalized,
+paragraphs that were already seen in another source of the same task are
+dropped using MinHash similarity, and each source is capped at a token budget.
+Per-task statistics report how much text each stage removed.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import tiktoken
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+_BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "footer", "header", "aside", "form", "iframe", "svg", "button"]
+# A whole class or id token naming site chrome, e.g. "sidebar", "site-footer" or "cookie-banner"
+_BOILERPLATE_HINTS = re.compile(
+    r"((site|main|global|top|page)[-_])?"
+    r"(nav|navbar|navigation|menu|footer|header|sidebar|cookies?|consent|banner|subscribe|"
+    r"newsletter|share|sharing|social|breadcrumbs?|related|promo|advert|ads?|comments?)"
+    r"([-_](bar|banner|notice|share|links|buttons|icons|widget|box|wrapper|container|"
+    r"posts|articles))?",
+    re.IGNORECASE
+)
+# Elements that hold the page itself; never removed because of a class or id hint
+_PROTECTED_TAGS = {"html", "body", "main", "article"}
+# A hinted element holding more than this share of the page's text is content, not chrome
+_MAX_CHROME_SHARE = 0.5
+_BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "blockquote", "td", "th", "dt", "dd", "figcaption"]
+_WORD_RE = re.compile(r"\w+")
+# Whole plain-text lines that are site chrome rather than content
+_BOILERPLATE_LINE = re.compile(
+    r"(share( this( article| story| post| page)?)?( on \w+)?|tweet|print|e-?mail|menu|home|search|"
+    r"skip to (main )?content|back to top|read more|continue reading|load more|show more|"
+    r"sign (in|up|out)|log ?(in|out)|register|subscribe( now)?|follow us( on \w+)?|"
+    r"accept( all)?( cookies)?|(privacy|cookie) (policy|settings)|terms( of (use|service))?|"
+    r"advertisement|sponsored|related (articles|posts|stories)|all rights reserved)",
+    re.IGNORECASE
+)
+_COPYRIGHT_LINE = re.compile(r"^(©|\(c\)|copyright\b)", re.IGNORECASE)
+_MENU_SEPARATOR = re.compile(r"\s[|·•»]\s")
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _default_token_counter() -> Callable[[str], int]:
+    encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text))
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces and tabs and limit blank lines to paragraph breaks."""
+    text = re.sub(r"[ \t ]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def extract_main_text(html: str) -> str:
+    """
+    Extract the main content of an HTML page as paragraphs separated by blank lines.
+
+    Navigation, headers, footers, scripts and small elements whose class or id marks
+    them as boilerplate are removed. An <article> or <main> element is preferred when
+    present; it and the page's outer elements are never removed for their hints.
+
+    Args:
+        html (str): The page HTML
+
+    Returns:
+        str: The main text with one paragraph per block element
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(_BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(attrs={"role": ["navigation", "banner", "contentinfo", "complementary"]}):
+        tag.decompose()
+
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    if not isinstance(root, Tag):
+        root = soup
+    # The content root and everything containing it stay, whatever their class says
+    protected = {id(root)} | {id(parent) for parent in root.parents}
+    page_chars = len(soup.get_text(" ", strip=True))
+    for tag in soup.find_all(True):
+        if not isinstance(tag, Tag) or tag.decomposed or tag.attrs is None:
+            continue
+        if tag.name in _PROTECTED_TAGS or id(tag) in protected:
+            continue
+        tokens = tag.get_attribute_list("class") + str(tag.get("id") or "").split()
+        if not any(_BOILERPLATE_HINTS.fullmatch(token) for token in tokens if token):
+            continue
+        if len(tag.get_text(" ", strip=True)) <= page_chars * _MAX_CHROME_SHARE:
+            tag.decompose()
+
+    paragraphs = []
+    for block in root.find_all(_BLOCK_TAGS):
+        # Skip containers whose text is reported by a nested block element
+        if not isinstance(block, Tag) or block.find(_BLOCK_TAGS):
+            continue
+        text = block.get_text(" ", strip=True)
+        if text:
+            paragraphs.append(text)
+    if not paragraphs:
+        return normalize_whitespace(root.get_text("\n"))
+    return normalize_whitespace("\n\n".join(paragraphs))
+
+
+def _looks_like_boilerplate(paragraph: str) -> bool:
+    """
+    Heuristic for plain-text site chrome such as menus, 'Share this' links and copyright lines.
+
+    Short lines that are not chrome, like section headings, are kept.
+    """
+    words = _WORD_RE.findall(paragraph)
+    if not words:
+        return True
+    if _BOILERPLATE_LINE.fullmatch(paragraph.strip(" .:!|>»›-–—")):
+        return True
+    if _COPYRIGHT_LINE.match(paragraph) and len(words) <= 15:
+        return True
+    return paragraph.count("|") >= 3 or len(_MENU_SEPARATOR.findall(paragraph)) >= 3
+
+
+class MinHashDeduper:
+    """
+    Near-duplicate paragraph detector using MinHash signatures and LSH banding.
+
+    Attributes:
+        threshold (float): Estimated Jaccard similarity at which a paragraph is a duplicate
+        shingle_size (int): Number of words per shingle
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, threshold: float = 0.8, seed: int = 7):
+        """
+        Initialize the deduper.
+
+        Args:
+            num_perm (int): Number of hash permutations per signature
+            bands (int): Number of LSH bands (must divide num_perm)
+            shingle_size (int): Number of words per shingle
+            threshold (float): Estimated Jaccard similarity at which a paragraph is a duplicate
+            seed (int): Seed for the permutation coefficients
+        """
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all paragraphs seen so far."""
+        self._exact: set = set()
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") & _MERSENNE_PRIME
+             for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def is_duplicate(self, paragraph: str) -> bool:
+        """
+        Check a paragraph against those seen before, remembering it if it is new.
+
+        Args:
+            paragraph (str): The paragraph text
+
+        Returns:
+            bool: True if an identical or near-identical paragraph was seen before
+        """
+        words = [word.lower() for word in _WORD_RE.findall(paragraph)]
+        if not words:
+            return True
+        exact_key = hashlib.sha1(" ".join(words).encode("utf-8")).digest()
+        if exact_key in self._exact:
+            return True
+
+        signature = self._signature(words)
+        band_keys = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+        candidates = {index for key in band_keys for index in self._buckets.get(key, [])}
+        for index in candidates:
+            if np.mean(self._signatures[index] == signature) >= self.threshold:
+                return True
+
+        self._exact.add(exact_key)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(index)
+        return False
+
+
+@dataclass
+class ExtractedSource:
+    """The text kept from one scraped source and why the rest was dropped."""
+
+    text: str
+    duplicate_paragraphs: int = 0
+    capped: bool = False
+
+
+class ExtractionPipeline:
+    """
+    Streaming scrape post-processing shared by all sources of one research task.
+
+    Attributes:
+        token_cap (int): Maximum tokens kept per source
+        deduper (MinHashDeduper): Cross-source paragraph deduper
+    """
+
+    def __init__(
+        self,
+        token_cap: int = 1500,
+        deduper: Optional[MinHashDeduper] = None,
+        token_counter: Optional[Callable[[str], int]] = None
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            token_cap (int): Maximum tokens kept per source
+            deduper (Optional[MinHashDeduper]): Cross-source paragraph deduper
+            token_counter (Optional[Callable[[str], int]]): Counts tokens in a text (tiktoken by default)
+        """
+        self.token_cap = token_cap
+        self.deduper = deduper or MinHashDeduper()
+        self._token_counter = token_counter
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_env(cls) -> Optional["ExtractionPipeline"]:
+        """Build the pipeline from SCRAPE_* environment variables, or None if disabled."""
+        if os.getenv("SCRAPE_EXTRACTION_ENABLED", "true").lower() == "false":
+            return None
+        return cls(
+            token_cap=int(os.getenv("SCRAPE_TOKEN_CAP", "1500")),
+            deduper=MinHashDeduper(threshold=float(os.getenv("SCRAPE_DEDUPE_THRESHOLD", "0.8")))
+        )
+
+    def reset(self) -> None:
+        """Start a new task: forget seen paragraphs and zero the statistics."""
+        with self._lock:
+            self.deduper.reset()
+            self._stats = {
+                "sources": 0, "raw_chars": 0, "main_chars": 0, "boilerplate_paragraphs": 0,
+                "duplicate_paragraphs": 0, "capped_sources": 0, "output_chars": 0, "output_tokens": 0
+            }
+
+    def count_tokens(self, text: str) -> int:
+        if self._token_counter is None:
+            self._token_counter = _default_token_counter()
+        return self._token_counter(text)
+
+    def _paragraphs(self, content: str) -> Iterator[str]:
+        if "<" in content and re.search(r"<(html|body|p|div)[\s>]", content, re.IGNORECASE):
+            text = extract_main_text(content)
+        else:
+            text = normalize_whitespace(content)
+        self._stats["main_chars"] += len(text)
+        for paragraph in re.split(r"\n\s*\n|\n", text):
+            paragraph = paragraph.strip()
+            if paragraph:
+                yield paragraph
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Return the longest word prefix of a text that fits max_tokens."""
+        words = text.split(" ")
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:middle])) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low])
+
+    def extract(self, url: str, content: str) -> ExtractedSource:
+        """
+        Reduce one scraped source to deduplicated main content within the token cap.
+
+        The paragraph that crosses the cap is truncated to the remaining budget, so a
+        source whose first paragraph alone is over the cap still contributes text.
+
+        Args:
+            url (str): The source URL, used for logging
+            content (str): The scraped HTML or text
+
+        Returns:
+            ExtractedSource: The text passed on to the agent and what was dropped
+        """
+        with self._lock:
+            self._stats["sources"] += 1
+            self._stats["raw_chars"] += len(content)
+            kept: List[str] = []
+            tokens = 0
+            duplicates = 0
+            capped = False
+            for paragraph in self._paragraphs(content):
+                if _looks_like_boilerplate(paragraph):
+                    self._stats["boilerplate_paragraphs"] += 1
+                    continue
+                paragraph_tokens = self.count_tokens(paragraph)
+                if tokens + paragraph_tokens > self.token_cap:
+                    capped = True
+                    paragraph = self.truncate_to_tokens(paragraph, self.token_cap - tokens)
+                    if not paragraph:
+                        break
+                    paragraph_tokens = self.count_tokens(paragraph)
+                # Only text that is passed on is remembered, not the part cut by the cap
+                if self.deduper.is_duplicate(paragraph):
+                    duplicates += 1
+                    continue
+                kept.append(paragraph)
+                tokens += paragraph_tokens
+                if capped:
+                    break
+
+            output = "\n\n".join(kept)
+            self._stats["duplicate_paragraphs"] += duplicates
+            self._stats["capped_sources"] += int(capped)
+            self._stats["output_chars"] += len(output)
+            self._stats["output_tokens"] += tokens
+        logger.debug(f"Extracted {len(output)} of {len(content)} chars from {url}")
+        return ExtractedSource(text=output, duplicate_paragraphs=duplicates, capped=capped)
+
+    def process(self, url: str, content: str) -> str:
+        """
+        Reduce one scraped source to deduplicated main content within the token cap.
+
+        Args:
+            url (str): The source URL, used for logging
+            content (str): The scraped HTML or text
+
+        Returns:
+            str: The text passed on to the agent
+        """
+        return self.extract(url, content).text
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return per-stage statistics for the current task.
+
+        Returns:
+            dict: Counts per stage and the overall character reduction ratio
+        """
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+        stats["reduction"] = 1 - stats["output_chars"] / stats["raw_chars"] if stats["raw_chars"] else 0.0
+        return stats
@@ -0,0 +1,250 @@
+"""
+Map-reduce research mode for the ResearchCrew.
+
+Instead of one researcher covering the whole topic, the topic is decomposed
+into sub-questions that separate copies of the researcher investigate
+concurrently under a concurrency cap. Their InitialResearchOutput results are
+merged and deduplicated, then the senior researcher synthesizes the merged
+findings in a single analysis task.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, cast
+
+from crewai import Crew, Process, Task
+from crewai.crews.crew_output import CrewOutput
+from crewai.types.usage_metrics import UsageMetrics
+
+from .crew import InitialResearchOutput, ResearchOutput
+from .extraction import MinHashDeduper
+from .structured_output import structured_task_options
+from .tool_cache import canonical_url
+
+logger = logging.getLogger(__name__)
+
+DECOMPOSE_PROMPT = """Break the research topic below into at most {max_questions} focused, non-overlapping
+sub-questions that together cover it. A narrow topic may need only one.
+Respond with a JSON array of strings and nothing else.
+
+Topic: {topic}"""
+
+SYNTHESIS_CONTEXT = """
+
+The research team investigated these sub-questions in parallel and gathered the
+following merged, deduplicated findings. Base your analysis on them:
+{research}"""
+
+
+def parse_sub_questions(text: str, max_questions: int) -> List[str]:
+    """
+    Parse the decomposition LLM response into a list of sub-questions.
+
+    Args:
+        text (str): The LLM response, expected to contain a JSON array of strings
+        max_questions (int): Maximum number of sub-questions to keep
+
+    Returns:
+        List[str]: The sub-questions, empty if the response could not be parsed
+    """
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    if not match:
+        return []
+    try:
+        questions = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    return [q.strip() for q in questions if isinstance(q, str) and q.strip()][:max_questions]
+
+
+def _usage_since(llm: Any, before: Optional[UsageMetrics]) -> UsageMetrics:
+    """Return the tokens an LLM used since the `before` snapshot of its usage summary."""
+    summary = getattr(llm, "get_token_usage_summary", None)
+    if before is None or summary is None:
+        return UsageMetrics()
+    after = summary()
+    return UsageMetrics(**{
+        field: getattr(after, field) - getattr(before, field) for field in UsageMetrics.model_fields
+    })
+
+
+def _dedupe_texts(items: List[Any], key, deduper: MinHashDeduper) -> List[Any]:
+    kept = []
+    for item in items:
+        if not deduper.is_duplicate(key(item)):
+            kept.append(item)
+    return kept
+
+
+def merge_initial_research(outputs: List[InitialResearchOutput]) -> InitialResearchOutput:
+    """
+    Merge researcher outputs, dropping near-duplicate entries and repeated sources.
+
+    Args:
+        outputs (List[InitialResearchOutput]): Findings of each sub-question
+
+    Returns:
+        InitialResearchOutput: The combined findings in sub-question order
+    """
+    def collect(field: str) -> List[Any]:
+        return [item for output in outputs for item in getattr(output, field)]
+
+    def dict_text(item: Dict[str, str]) -> str:
+        return " ".join(str(value) for value in item.values())
+
+    sources, seen = [], set()
+    for source in collect("sources"):
+        key = canonical_url(source) if source.startswith(("http://", "https://")) else source.strip().lower()
+        if key not in seen:
+            seen.add(key)
+            sources.append(source)
+
+    # Each field gets its own deduper so a fact and a statistic with similar wording both survive
+    return InitialResearchOutput(
+        key_facts=_dedupe_texts(collect("key_facts"), str, MinHashDeduper()),
+        recent_developments=_dedupe_texts(collect("recent_developments"), str, MinHashDeduper()),
+        expert_opinions=_dedupe_texts(collect("expert_opinions"), dict_text, MinHashDeduper()),
+        statistics=_dedupe_texts(collect("statistics"), dict_text, MinHashDeduper()),
+        sources=sources
+    )
+
+
+class ParallelResearch:
+    """
+    Runs a ResearchCrew as decompose, parallel research, merge and synthesize.
+
+    Attributes:
+        max_concurrency (int): Maximum researcher crews running at once
+        max_questions (int): Maximum number of sub-questions per topic
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_questions: int = 4):
+        """
+        Initialize the runner.
+
+        Args:
+            max_concurrency (int): Maximum researcher crews running at once
+            max_questions (int): Maximum number of sub-questions per topic
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_questions = max(1, max_questions)
+
+    @classmethod
+    def from_env(cls) -> Optional["ParallelResearch"]:
+        """Build the runner when RESEARCH_MODE=parallel, otherwise return None."""
+        if os.getenv("RESEARCH_MODE", "sequential").lower() != "parallel":
+            return None
+        return cls(
+            max_concurrency=int(os.getenv("RESEARCH_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1)))),
+            max_questions=int(os.getenv("RESEARCH_MAX_SUBQUESTIONS", "4"))
+        )
+
+    def decompose(self, llm: Any, topic: str, max_questions: Optional[int] = None) -> List[str]:
+        """
+        Split a topic into sub-questions using the researcher's LLM.
+
+        Args:
+            llm (Any): A CrewAI LLM with a call() method
+            topic (str): The research topic
+            max_questions (Optional[int]): Overrides the runner's sub-question limit
+
+        Returns:
+            List[str]: The sub-questions, or the topic itself if decomposition fails
+        """
+        max_questions = min(max_questions or self.max_questions, self.max_questions)
+        if max_questions == 1:
+            return [topic]
+        try:
+            response = llm.call([
+                {"role": "user", "content": DECOMPOSE_PROMPT.format(max_questions=max_questions, topic=topic)}
+            ])
+            questions = parse_sub_questions(response, max_questions)
+        except Exception as e:
+            logger.error(f"Error decomposing research topic: {str(e)}")
+            questions = []
+        return questions or [topic]
+
+    def kickoff(self, crew: Crew, topic: str, max_questions: Optional[int] = None) -> Any:
+        """
+        Run the crew's research task once per sub-question in parallel, then synthesize.
+
+        Args:
+            crew (Crew): A ResearchCrew crew with the research task first and the synthesis task last
+            topic (str): The research topic
+            max_questions (Optional[int]): Overrides the sub-question limit, e.g. from a depth profile
+
+        Returns:
+            CrewOutput: The synthesis result, with token usage summed over the decomposition
+                and all crews
+        """
+        research_task, synthesis_task = crew.tasks[0], crew.tasks[-1]
+        researcher, senior_researcher = research_task.agent, synthesis_task.agent
+        if researcher is None or senior_researcher is None:
+            raise ValueError("Parallel research needs an agent on the research and synthesis tasks")
+
+        llm = researcher.llm
+        usage_summary = getattr(llm, "get_token_usage_summary", None)
+        before = usage_summary() if usage_summary is not None else None
+        questions = self.decompose(llm, topic, max_questions)
+        decompose_usage = _usage_since(llm, before)
+        if len(questions) == 1:
+            logger.info("Topic did not decompose, running research sequentially")
+            # The crew reports its agents' lifetime LLM usage, which already includes decompose
+            return crew.kickoff(inputs={"topic": topic})
+
+        if research_task.output_pydantic is None:
+            options = structured_task_options(InitialResearchOutput, "researcher")
+            for key, value in (options or {"output_pydantic": InitialResearchOutput}).items():
+                setattr(research_task, key, value)
+        research_crew = Crew(agents=[researcher], tasks=[research_task], process=Process.sequential)
+
+        def research(question: str) -> Any:
+            started = time.perf_counter()
+            result = research_crew.copy().kickoff(inputs={"topic": question})
+            logger.info(f"Researched sub-question in {time.perf_counter() - started:.1f}s: {question}")
+            return result
+
+        started = time.perf_counter()
+        logger.info(f"Researching {len(questions)} sub-questions with up to {self.max_concurrency} crews")
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(questions)),
+                                thread_name_prefix="research") as executor:
+            # Each sub-question runs in a copy of the caller's context, so tracing spans nest under the task
+            futures = [executor.submit(contextvars.copy_context().run, research, q) for q in questions]
+            results = []
+            for question, future in zip(questions, futures):
+                # A failed sub-question is dropped so the others' findings are still merged
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Error researching sub-question '{question}': {str(e)}")
+        logger.info(f"Parallel research finished in {time.perf_counter() - started:.1f}s: "
+                    f"{len(results)} of {len(questions)} sub-questions succeeded")
+
+        findings = [result.pydantic for result in results if isinstance(result.pydantic, InitialResearchOutput)]
+        if not findings:
+            raise ValueError("No sub-question produced structured research findings")
+        merged = merge_initial_research(findings)
+
+        synthesis = Task(
+            description=synthesis_task.description + SYNTHESIS_CONTEXT,
+            expected_output=synthesis_task.expected_output,
+            agent=senior_researcher,
+            **(structured_task_options(ResearchOutput, "senior_researcher") or {"output_pydantic": ResearchOutput})
+        )
+        synthesis_crew = Crew(agents=[senior_researcher], tasks=[synthesis], process=Process.sequential)
+        output = cast(CrewOutput, synthesis_crew.kickoff(
+            inputs={"topic": topic, "research": merged.model_dump_json(indent=2)}
+        ))
+
+        if isinstance(output.pydantic, ResearchOutput):
+            # The merged findings are authoritative; the synthesizer only restates them
+            output.pydantic.initial_research = merged
+        output.token_usage.add_usage_metrics(decompose_usage)
+        for result in results:
+            output.token_usage.add_usage_metrics(result.token_usage)
+        return output
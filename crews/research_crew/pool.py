@@ -0,0 +1,137 @@
+"""
+Pool of pre-warmed ResearchCrew instances.
+
+Building a ResearchCrew parses the agent/task YAML and instantiates the web
+tools, which takes seconds. The pool builds instances ahead of time (per model)
+and hands out a fresh copy of each warm crew per task: agents and tasks are
+new, so no per-task state leaks, while the parsed config, LLM clients and tool
+instances are reused. Each warm instance is used by one task at a time.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from crewai import Crew
+
+from .crew import ResearchCrew
+
+logger = logging.getLogger(__name__)
+
+
+class ResearchCrewPool:
+    """
+    Bounded pool of warm ResearchCrew instances, keyed by model.
+
+    Attributes:
+        size (int): Maximum number of instances per model
+        acquire_timeout (float): Seconds to wait for a free instance before failing
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        acquire_timeout: float = 600.0,
+        factory: Optional[Callable[[Optional[str]], ResearchCrew]] = None
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            size (int): Maximum number of instances per model
+            acquire_timeout (float): Seconds to wait for a free instance before failing
+            factory (Optional[Callable]): Builds a ResearchCrew for a model name
+                (defaults to ResearchCrew)
+        """
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.factory = factory or (lambda model: ResearchCrew(llm=model))
+        self._lock = threading.Lock()
+        self._idle: Dict[Optional[str], "queue.LifoQueue[ResearchCrew]"] = {}
+        self._created: Dict[Optional[str], int] = {}
+
+    @classmethod
+    def from_env(cls) -> "ResearchCrewPool":
+        """Build the pool from RESEARCH_CREW_POOL_SIZE in the environment."""
+        return cls(size=int(os.getenv("RESEARCH_CREW_POOL_SIZE", "1")))
+
+    def _build(self, model: Optional[str]) -> ResearchCrew:
+        started = time.perf_counter()
+        instance = self.factory(model)
+        # Instantiating the crew builds the agents, their tools and the tasks
+        instance.crew()
+        logger.info(f"Warmed ResearchCrew for {model or 'configured model'} in {time.perf_counter() - started:.2f}s")
+        return instance
+
+    def _reserve(self, model: Optional[str]) -> bool:
+        """Reserve a slot for a new instance, returning False if the pool is full."""
+        with self._lock:
+            self._idle.setdefault(model, queue.LifoQueue())
+            if self._created.get(model, 0) >= self.size:
+                return False
+            self._created[model] = self._created.get(model, 0) + 1
+            return True
+
+    def _release_slot(self, model: Optional[str]) -> None:
+        with self._lock:
+            self._created[model] -= 1
+
+    def warm_up(self, models: List[Optional[str]]) -> None:
+        """
+        Build instances for the given models until each has a full pool.
+
+        Args:
+            models (List[Optional[str]]): Model names, e.g. the research cascade
+        """
+        for model in models:
+            while self._reserve(model):
+                try:
+                    self._idle[model].put(self._build(model))
+                except Exception as e:
+                    self._release_slot(model)
+                    logger.error(f"Error warming ResearchCrew for {model}: {str(e)}")
+                    break
+
+    def warm_up_in_background(self, models: List[Optional[str]]) -> threading.Thread:
+        """Warm the pool in a daemon thread so service start-up is not delayed."""
+        thread = threading.Thread(
+            target=self.warm_up, args=(list(models),), name="research-crew-warmup", daemon=True
+        )
+        thread.start()
+        return thread
+
+    @contextmanager
+    def checkout(self, model: Optional[str] = None) -> Iterator[Crew]:
+        """
+        Borrow a warm instance and yield a fresh Crew built from it.
+
+        Args:
+            model (Optional[str]): The model the crew's agents should use
+
+        Yields:
+            Crew: A copy of the warm crew with new agents and tasks
+        """
+        try:
+            instance = self._idle.get(model, queue.LifoQueue()).get_nowait()
+        except queue.Empty:
+            if self._reserve(model):
+                try:
+                    instance = self._build(model)
+                except Exception:
+                    self._release_slot(model)
+                    raise
+            else:
+                logger.debug(f"Waiting for a free ResearchCrew for {model}")
+                instance = self._idle[model].get(timeout=self.acquire_timeout)
+
+        try:
+            instance.reset_task_state()
+            yield instance.crew().copy()
+        finally:
+            for name, stats in instance.task_stats().items():
+                logger.info(f"ResearchCrew {name} stats: {stats}")
+            self._idle[model].put(instance)
@@ -0,0 +1,189 @@
+"""
+Concurrent prefetch of top search results for the researcher.
+
+When a Serper search returns, the top-k result URLs are fetched in the
+background while the agent's LLM decides what to do next. A later scrape of one
+of those URLs is then served from the in-memory buffer (or waits for the
+in-flight fetch) instead of starting a new download.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .tool_cache import canonical_url
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Bounded, host-polite background fetcher with an in-memory LRU buffer.
+
+    Attributes:
+        top_k (int): Number of search results to prefetch per search
+        per_host_interval (float): Minimum seconds between requests to one host
+        buffer_bytes (int): Maximum bytes of fetched text kept in memory
+        wait_timeout (float): Seconds a scrape waits for an in-flight prefetch
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], str],
+        top_k: int = 3,
+        max_workers: int = 4,
+        per_host_interval: float = 1.0,
+        buffer_bytes: int = 8 * 1024 * 1024,
+        wait_timeout: float = 20.0
+    ):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            fetch (Callable[[str], str]): Downloads a URL and returns its text
+            top_k (int): Number of search results to prefetch per search
+            max_workers (int): Maximum concurrent fetches
+            per_host_interval (float): Minimum seconds between requests to one host
+            buffer_bytes (int): Maximum bytes of fetched text kept in memory
+            wait_timeout (float): Seconds a scrape waits for an in-flight prefetch
+        """
+        self.fetch = fetch
+        self.top_k = top_k
+        self.per_host_interval = per_host_interval
+        self.buffer_bytes = buffer_bytes
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._buffer: "OrderedDict[str, str]" = OrderedDict()
+        self._buffered_bytes = 0
+        self._in_flight: Dict[str, Future] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._host_last: Dict[str, float] = {}
+        self._stats = {"scheduled": 0, "fetched": 0, "failed": 0, "hits": 0, "waited": 0, "evicted_unused": 0}
+        self._used: set = set()
+
+    @classmethod
+    def from_env(cls, fetch: Callable[[str], str]) -> Optional["Prefetcher"]:
+        """Build a prefetcher from PREFETCH_* environment variables, or None if disabled."""
+        if os.getenv("PREFETCH_ENABLED", "true").lower() == "false":
+            return None
+        return cls(
+            fetch,
+            top_k=int(os.getenv("PREFETCH_TOP_K", "3")),
+            max_workers=int(os.getenv("PREFETCH_MAX_WORKERS", "4")),
+            per_host_interval=float(os.getenv("PREFETCH_PER_HOST_INTERVAL", "1.0"))
+        )
+
+    def schedule_from_results(self, results: Any) -> None:
+        """Schedule the top-k organic result links of a Serper response."""
+        if not isinstance(results, dict):
+            return
+        links = [item.get("link") for item in results.get("organic", []) if isinstance(item, dict)]
+        self.schedule([link for link in links if link][:self.top_k])
+
+    def schedule(self, urls: List[str]) -> None:
+        """
+        Start fetching URLs in the background if they are not already buffered or in flight.
+
+        Args:
+            urls (List[str]): The URLs to prefetch
+        """
+        for url in urls:
+            key = canonical_url(url)
+            with self._lock:
+                if key in self._buffer or key in self._in_flight:
+                    continue
+                self._stats["scheduled"] += 1
+                # Fetch in a copy of the caller's context, so downloads count against the task that searched
+                self._in_flight[key] = self._executor.submit(contextvars.copy_context().run, self._fetch, key, url)
+
+    def _polite_wait(self, host: str) -> threading.Lock:
+        with self._lock:
+            host_lock = self._host_locks.setdefault(host, threading.Lock())
+        host_lock.acquire()
+        delay = self._host_last.get(host, 0.0) + self.per_host_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return host_lock
+
+    def _fetch(self, key: str, url: str) -> Optional[str]:
+        host_lock = self._polite_wait(urlsplit(url).hostname or "")
+        try:
+            text = self.fetch(url)
+        except Exception as e:
+            logger.debug(f"Prefetch of {url} failed: {str(e)}")
+            with self._lock:
+                self._stats["failed"] += 1
+                self._in_flight.pop(key, None)
+            return None
+        finally:
+            with self._lock:
+                self._host_last[urlsplit(url).hostname or ""] = time.monotonic()
+            host_lock.release()
+
+        with self._lock:
+            self._stats["fetched"] += 1
+            self._in_flight.pop(key, None)
+            self._store(key, text)
+        return text
+
+    def _store(self, key: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.buffer_bytes:
+            return
+        self._buffer[key] = text
+        self._buffered_bytes += size
+        while self._buffered_bytes > self.buffer_bytes:
+            old_key, old_text = self._buffer.popitem(last=False)
+            self._buffered_bytes -= len(old_text.encode("utf-8"))
+            if old_key in self._used:
+                self._used.discard(old_key)
+            else:
+                self._stats["evicted_unused"] += 1
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        Return prefetched text for a URL, waiting for an in-flight fetch if needed.
+
+        Args:
+            url (str): The URL being scraped
+
+        Returns:
+            Optional[str]: The text, or None if the URL was not prefetched
+        """
+        key = canonical_url(url)
+        with self._lock:
+            if key in self._buffer:
+                self._buffer.move_to_end(key)
+                self._used.add(key)
+                self._stats["hits"] += 1
+                return self._buffer[key]
+            future = self._in_flight.get(key)
+        if future is None:
+            return None
+
+        try:
+            text = future.result(timeout=self.wait_timeout)
+        except Exception:
+            return None
+        if text is not None:
+            with self._lock:
+                self._used.add(key)
+                self._stats["hits"] += 1
+                self._stats["waited"] += 1
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of scheduled, fetched, failed and served prefetches."""
+        with self._lock:
+            return dict(self._stats, buffered_bytes=self._buffered_bytes)
+
+    def close(self) -> None:
+        """Stop accepting work and cancel pending fetches."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
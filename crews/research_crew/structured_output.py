@@ -0,0 +1,381 @@
+"""
+Structured-output enforcement for the ResearchCrew's tasks.
+
+Tasks declare their pydantic output model together with a strict JSON schema
+derived from it, so models that support it answer through the provider's
+native JSON-schema response format. Free-form ``Dict`` fields cannot be
+expressed in a strict schema, so they are sent as lists of key/value entries
+and mapped back afterwards.
+
+When an answer still fails to parse, it is repaired locally (code fences,
+trailing commas, single quotes, Python literals, truncated output) before the
+converter spends another LLM round trip re-asking for it. Every conversion is
+counted per agent, so the re-ask rate can be monitored.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, ClassVar, Dict, List, Optional, Type, get_args, get_origin
+
+from crewai.utilities.converter import Converter, ConverterError
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+_strict_models: Dict[Type[BaseModel], Type[BaseModel]] = {}
+_strict_lock = threading.Lock()
+
+
+def _scan(text: str):
+    """
+    Rewrite JSON-like text into JSON, one character at a time.
+
+    Returns:
+        tuple: The rewritten text, the closers needed for still-open brackets,
+            and (position, closers) cut points at each comma outside strings
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cuts = []
+    quote = None
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < len(text):
+                # \' is not a valid JSON escape
+                out.append("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            else:
+                out.append('\\"' if ch == '"' else ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            _drop_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                break
+        elif ch == ",":
+            cuts.append((len(out), list(stack)))
+            out.append(ch)
+        elif ch.isalpha():
+            # Non-ASCII letters do not start a literal and are copied as they are
+            match = re.match(r"[A-Za-z_]+", text[i:])
+            word = match.group(0) if match else ch
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    if quote:
+        out.append('"')
+    return "".join(out), stack, cuts
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip().rstrip(",").rstrip()
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Parse JSON from an LLM answer, repairing common defects locally.
+
+    Handles surrounding prose and code fences, trailing commas, single-quoted
+    strings, Python literals (True/False/None) and output truncated by a token
+    limit, in which case the last incomplete element is dropped.
+
+    Args:
+        text (str): The LLM answer
+
+    Returns:
+        Any: The parsed JSON value, or None if it could not be recovered
+    """
+    if not text:
+        return None
+    fence = _FENCE.search(text)
+    candidate = fence.group(1) if fence else text
+    starts = [pos for pos in (candidate.find("{"), candidate.find("[")) if pos != -1]
+    if not starts:
+        return None
+    candidate = candidate[min(starts):]
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        pass
+
+    rewritten, stack, cuts = _scan(candidate)
+    attempts = [_close(rewritten, stack)]
+    # Truncated output: drop trailing elements until the remainder closes cleanly
+    attempts += [_close(rewritten[:position], closers) for position, closers in reversed(cuts)]
+    for attempt in attempts:
+        try:
+            return json.loads(attempt, strict=False)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _camel(name: str) -> str:
+    return "".join(part.capitalize() for part in name.split("_"))
+
+
+def _strict_annotation(annotation: Any, name: str) -> Any:
+    origin = get_origin(annotation)
+    if origin is dict:
+        _, value_type = get_args(annotation)
+        entry = create_model(
+            f"{name}Entry",
+            key=(str, Field(..., description="Entry name")),
+            value=(_strict_annotation(value_type, name), Field(..., description="Entry value"))
+        )
+        return List[entry]  # type: ignore[valid-type]
+    if origin is list:
+        (item_type,) = get_args(annotation)
+        return List[_strict_annotation(item_type, name)]  # type: ignore[misc]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return strict_schema_model(annotation)
+    return annotation
+
+
+def strict_schema_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Derive a model whose JSON schema is valid in strict structured-output mode.
+
+    ``Dict[K, V]`` fields become lists of ``{"key": ..., "value": ...}`` entries;
+    everything else is kept. Use :func:`from_strict` to map answers back.
+
+    Args:
+        model (Type[BaseModel]): The task's output model
+
+    Returns:
+        Type[BaseModel]: The wire-format model (cached per output model)
+    """
+    with _strict_lock:
+        if model in _strict_models:
+            return _strict_models[model]
+    fields: Dict[str, Any] = {
+        field_name: (
+            _strict_annotation(field.annotation, f"{model.__name__}{_camel(field_name)}"),
+            Field(..., description=field.description)
+        )
+        for field_name, field in model.model_fields.items()
+    }
+    strict = create_model(f"{model.__name__}Schema", __doc__=model.__doc__, **fields)
+    with _strict_lock:
+        return _strict_models.setdefault(model, strict)
+
+
+def _from_strict(value: Any, annotation: Any) -> Any:
+    origin = get_origin(annotation)
+    if origin is dict and isinstance(value, list):
+        _, value_type = get_args(annotation)
+        return {
+            str(entry["key"]): _from_strict(entry.get("value"), value_type)
+            for entry in value if isinstance(entry, dict) and "key" in entry
+        }
+    if origin is list and isinstance(value, list):
+        (item_type,) = get_args(annotation)
+        return [_from_strict(item, item_type) for item in value]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel) and isinstance(value, dict):
+        return from_strict(value, annotation)
+    return value
+
+
+def from_strict(data: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Map wire-format data from :func:`strict_schema_model` back onto the output model's shape.
+
+    Data already in the output model's shape is returned unchanged.
+
+    Args:
+        data (dict): Parsed answer
+        model (Type[BaseModel]): The task's output model
+
+    Returns:
+        dict: Data ready for ``model.model_validate``
+    """
+    return {
+        key: _from_strict(value, model.model_fields[key].annotation) if key in model.model_fields else value
+        for key, value in data.items()
+    }
+
+
+class StructuredOutputStats:
+    """
+    Thread-safe, process-wide counts of structured-output conversions per agent.
+
+    Each conversion is counted once as parsed (valid as returned), repaired
+    (fixed locally) or re-asked; re-asks additionally count every extra LLM
+    round trip, and failed counts conversions that never produced a model.
+    """
+
+    FIELDS = ("outputs", "parsed", "repaired", "reasked", "reasks", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent: str, outcome: str, count: int = 1) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(agent, dict.fromkeys(self.FIELDS, 0))
+            counts[outcome] += count
+
+    def reask_rate(self, agent: str) -> float:
+        """Extra LLM round trips per structured output produced by an agent."""
+        with self._lock:
+            counts = self._counts.get(agent)
+            return counts["reasks"] / counts["outputs"] if counts and counts["outputs"] else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return the counts and re-ask rate of every agent."""
+        with self._lock:
+            return {
+                agent: {**counts, "reask_rate": round(counts["reasks"] / counts["outputs"], 3) if counts["outputs"] else 0.0}
+                for agent, counts in self._counts.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+structured_output_stats = StructuredOutputStats()
+
+
+class RepairingConverter(Converter):
+    """
+    Converter that parses and repairs answers locally before re-asking the LLM.
+
+    Re-asks use the strict wire schema when the LLM supports native structured
+    output. Use :func:`repairing_converter` to get a subclass bound to an agent.
+    """
+
+    agent_role: ClassVar[str] = "agent"
+
+    def _coerce(self, answer: Any) -> Optional[BaseModel]:
+        if isinstance(answer, self.model):
+            return answer
+        data: Any
+        if isinstance(answer, BaseModel):
+            data = answer.model_dump()
+        elif isinstance(answer, dict):
+            data = answer
+        else:
+            data = repair_json(str(answer))
+        if not isinstance(data, dict):
+            return None
+        try:
+            return self.model.model_validate(from_strict(data, self.model))
+        except ValidationError:
+            return None
+
+    def _direct(self) -> Optional[BaseModel]:
+        try:
+            data = json.loads(self.text, strict=False)
+        except (json.JSONDecodeError, TypeError):
+            return None
+        return self._coerce(data) if isinstance(data, dict) else None
+
+    def _reask(self) -> Any:
+        native = self.llm.supports_function_calling()
+        return self.llm.call(
+            messages=[
+                {"role": "system", "content": self.instructions},
+                {"role": "user", "content": self.text},
+            ],
+            response_model=strict_schema_model(self.model) if native else None
+        )
+
+    def to_pydantic(self, current_attempt: int = 1) -> BaseModel:
+        """
+        Convert the agent's answer into the output model.
+
+        Raises:
+            ConverterError: If neither repair nor any re-ask produced a valid model
+        """
+        stats = structured_output_stats
+        stats.record(self.agent_role, "outputs")
+        result = self._direct()
+        if result is not None:
+            stats.record(self.agent_role, "parsed")
+            return result
+        result = self._coerce(self.text)
+        if result is not None:
+            stats.record(self.agent_role, "repaired")
+            return result
+
+        stats.record(self.agent_role, "reasked")
+        logger.warning(f"Could not repair {self.agent_role} output locally, re-asking the LLM")
+        for attempt in range(current_attempt, self.max_attempts + 1):
+            stats.record(self.agent_role, "reasks")
+            try:
+                result = self._coerce(self._reask())
+            except Exception as e:
+                logger.error(f"Error re-asking for structured output: {str(e)}")
+                result = None
+            if result is not None:
+                return result
+        stats.record(self.agent_role, "failed")
+        raise ConverterError(f"Failed to convert {self.agent_role} output into {self.model.__name__}")
+
+    def to_json(self, current_attempt: int = 1) -> Any:
+        try:
+            return self.to_pydantic(current_attempt).model_dump_json()
+        except ConverterError as e:
+            return e
+
+
+def repairing_converter(agent_role: str) -> Type[RepairingConverter]:
+    """Return a RepairingConverter subclass that records its stats under an agent's name."""
+    return type(f"RepairingConverter_{agent_role}", (RepairingConverter,),
+                {"agent_role": agent_role, "__module__": __name__})
+
+
+def structured_task_options(model: Type[BaseModel], agent_role: str) -> Dict[str, Any]:
+    """
+    Task keyword arguments that enforce a structured output model.
+
+    Returns an empty dict when STRUCTURED_OUTPUT_ENABLED is false.
+
+    Args:
+        model (Type[BaseModel]): The task's output model
+        agent_role (str): Name under which conversions are counted, e.g. "researcher"
+
+    Returns:
+        dict: output_pydantic, response_model and converter_cls for crewai.Task
+    """
+    if os.getenv("STRUCTURED_OUTPUT_ENABLED", "true").lower() != "true":
+        return {}
+    return {
+        "output_pydantic": model,
+        "response_model": strict_schema_model(model),
+        "converter_cls": repairing_converter(agent_role),
+    }
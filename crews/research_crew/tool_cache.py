@@ -0,0 +1,396 @@
+"""
+Content-addressed on-disk cache for the researcher's Serper and scrape tools.
+
+Results are keyed by a normalized search query or canonical URL. Bodies are
+stored zlib-compressed under their SHA-256 digest, so identical pages fetched
+via different URLs are stored once. Each tool has its own TTL, and the store
+evicts least recently used entries once it exceeds its size budget.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests  # type: ignore[import-untyped]
+from bs4 import BeautifulSoup
+from crewai_tools import ScrapeWebsiteTool, SerperDevTool
+from crewai_tools.security.safe_path import validate_url
+from pydantic import PrivateAttr
+
+from orchestrator.accounting import record_usage
+
+logger = logging.getLogger(__name__)
+
+_TRACKING_PARAMS = re.compile(r"^(utm_.*|gclid|fbclid|mc_cid|mc_eid|ref|ref_src)$", re.IGNORECASE)
+
+DEFAULT_TTLS = {
+    "serper": 24 * 3600,
+    "scrape": 7 * 24 * 3600,
+}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonicalize a URL for use as a cache key.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the query string and removes a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query: lowercase with collapsed whitespace."""
+    return " ".join(query.lower().split())
+
+
+class ToolCache:
+    """
+    Content-addressed store of tool results with per-tool TTLs and LRU eviction.
+
+    Attributes:
+        root (Path): Directory holding the index and compressed objects
+        max_bytes (int): Size budget for the compressed objects
+        ttls (Dict[str, int]): Time-to-live in seconds per tool
+    """
+
+    def __init__(self, root: str = "./.tool_cache", max_bytes: int = 256 * 1024 * 1024, ttls: Optional[Dict[str, int]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            root (str): Directory holding the index and compressed objects
+            max_bytes (int): Size budget for the compressed objects
+            ttls (Optional[Dict[str, int]]): Time-to-live in seconds per tool
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "tool TEXT, key TEXT, digest TEXT, stored REAL, accessed REAL, size INTEGER, "
+            "PRIMARY KEY (tool, key))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, compressed_size INTEGER)"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["ToolCache"]:
+        """
+        Build the cache from TOOL_CACHE_* environment variables.
+
+        Returns None when TOOL_CACHE_ENABLED is "false".
+        """
+        if os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "false":
+            return None
+        return cls(
+            root=os.getenv("TOOL_CACHE_DIR", "./.tool_cache"),
+            max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttls={
+                tool: int(os.getenv(f"TOOL_CACHE_TTL_{tool.upper()}", str(ttl)))
+                for tool, ttl in DEFAULT_TTLS.items()
+            }
+        )
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def _count(self, tool: str, field: str, amount: int = 1) -> None:
+        entry = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_stored": 0})
+        entry[field] += amount
+
+    def get(self, tool: str, key: str) -> Optional[bytes]:
+        """
+        Return the cached body for a key, or None if missing or expired.
+
+        Args:
+            tool (str): The tool namespace, e.g. "serper" or "scrape"
+            key (str): The normalized query or canonical URL
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, stored, size FROM entries WHERE tool = ? AND key = ?", (tool, key)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttls.get(tool, 0):
+                self._count(tool, "misses")
+                return None
+            digest, _, size = row
+            try:
+                body = zlib.decompress(self._object_path(digest).read_bytes())
+            except (OSError, zlib.error):
+                self._db.execute("DELETE FROM entries WHERE tool = ? AND key = ?", (tool, key))
+                self._db.commit()
+                self._count(tool, "misses")
+                return None
+            self._db.execute(
+                "UPDATE entries SET accessed = ? WHERE tool = ? AND key = ?", (now, tool, key)
+            )
+            self._db.commit()
+            self._count(tool, "hits")
+            self._count(tool, "bytes_saved", size)
+            return body
+
+    def put(self, tool: str, key: str, body: bytes) -> str:
+        """
+        Store a body under a key and return its content digest.
+
+        Args:
+            tool (str): The tool namespace, e.g. "serper" or "scrape"
+            key (str): The normalized query or canonical URL
+            body (bytes): The uncompressed result body
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self._lock:
+            path = self._object_path(digest)
+            if not path.exists():
+                compressed = zlib.compress(body, 6)
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_bytes(compressed)
+                os.replace(tmp, path)
+            self._db.execute(
+                "INSERT OR IGNORE INTO objects (digest, compressed_size) VALUES (?, ?)",
+                (digest, path.stat().st_size)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (tool, key, digest, stored, accessed, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tool, key, digest, now, now, len(body))
+            )
+            self._db.commit()
+            self._count(tool, "bytes_stored", len(body))
+            self._evict()
+        return digest
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until under the size budget."""
+        now = time.time()
+        for tool, ttl in self.ttls.items():
+            self._db.execute("DELETE FROM entries WHERE tool = ? AND stored < ?", (tool, now - ttl))
+        total = self._db.execute("SELECT COALESCE(SUM(compressed_size), 0) FROM objects").fetchone()[0]
+        if total > self.max_bytes:
+            for tool, key, digest in self._db.execute(
+                "SELECT tool, key, digest FROM entries ORDER BY accessed"
+            ).fetchall():
+                self._db.execute("DELETE FROM entries WHERE tool = ? AND key = ?", (tool, key))
+                if not self._db.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone():
+                    size = self._remove_object(digest)
+                    total -= size
+                if total <= self.max_bytes:
+                    break
+        # Remove objects no longer referenced by any entry (e.g. after expiry)
+        for (digest,) in self._db.execute(
+            "SELECT digest FROM objects WHERE digest NOT IN (SELECT digest FROM entries)"
+        ).fetchall():
+            self._remove_object(digest)
+        self._db.commit()
+
+    def _remove_object(self, digest: str) -> int:
+        row = self._db.execute("SELECT compressed_size FROM objects WHERE digest = ?", (digest,)).fetchone()
+        self._db.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+        try:
+            self._object_path(digest).unlink()
+        except FileNotFoundError:
+            pass
+        return row[0] if row else 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return per-tool hit/miss counts, hit rate and bytes saved.
+
+        Returns:
+            dict: Statistics keyed by tool name
+        """
+        with self._lock:
+            stats = {}
+            for tool, entry in self._stats.items():
+                lookups = entry["hits"] + entry["misses"]
+                stats[tool] = dict(entry, hit_rate=entry["hits"] / lookups if lookups else 0.0)
+            stats["store"] = {
+                "compressed_bytes": self._db.execute(
+                    "SELECT COALESCE(SUM(compressed_size), 0) FROM objects"
+                ).fetchone()[0],
+                "entries": self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            }
+            return stats
+
+
+_default_cache: Optional[ToolCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_tool_cache() -> Optional[ToolCache]:
+    """Return the process-wide ToolCache configured from the environment, or None if disabled."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ToolCache.from_env()
+        return _default_cache
+
+
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool that serves repeated searches from the ToolCache and triggers prefetching."""
+
+    _cache: Optional[ToolCache] = PrivateAttr(default=None)
+    _prefetcher: Any = PrivateAttr(default=None)
+
+    def __init__(self, cache: Optional[ToolCache] = None, prefetcher: Any = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._prefetcher = prefetcher
+
+    def _run(self, **kwargs: Any) -> Any:
+        results = self._search(**kwargs)
+        if self._prefetcher is not None:
+            # Start downloading the top results while the agent reads them
+            self._prefetcher.schedule_from_results(results)
+        return results
+
+    def _search(self, **kwargs: Any) -> Any:
+        cache = self._cache
+        search_query = kwargs.get("search_query") or kwargs.get("query")
+        if cache is None or not search_query or kwargs.get("save_file", self.save_file):
+            record_usage(serper_calls=1)
+            return super()._run(**kwargs)
+
+        search_type = kwargs.get("search_type", self.search_type)
+        key = f"{search_type}:{self.n_results}:{self.country}:{self.locale}:{normalize_query(search_query)}"
+        cached = cache.get("serper", key)
+        if cached is not None:
+            logger.debug(f"Serper cache hit for '{search_query}'")
+            return json.loads(cached)
+
+        record_usage(serper_calls=1)
+        results = super()._run(**kwargs)
+        cache.put("serper", key, json.dumps(results).encode("utf-8"))
+        return results
+
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    """
+    ScrapeWebsiteTool that serves pages from the prefetch buffer or the ToolCache
+    before going to the network.
+
+    Raw page HTML is cached and buffered; when an ExtractionPipeline is attached
+    the agent receives the deduplicated main content instead of the full page text.
+    """
+
+    _cache: Optional[ToolCache] = PrivateAttr(default=None)
+    _prefetcher: Any = PrivateAttr(default=None)
+    _pipeline: Any = PrivateAttr(default=None)
+
+    def __init__(self, cache: Optional[ToolCache] = None, pipeline: Any = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._pipeline = pipeline
+
+    def attach_prefetcher(self, prefetcher: Any) -> None:
+        """Serve scrapes from a Prefetcher's buffer when it has the page."""
+        self._prefetcher = prefetcher
+
+    @property
+    def pipeline(self) -> Any:
+        """The ExtractionPipeline applied to scraped pages, if any."""
+        return self._pipeline
+
+    def fetch(self, website_url: str, raise_for_status: bool = False) -> str:
+        """
+        Download a page's HTML and store it in the cache, bypassing the prefetch buffer.
+
+        Only successful responses are cached, so an error page or a rate limit is
+        retried on the next scrape instead of being served for the cache TTL.
+
+        Args:
+            website_url (str): The page to download
+            raise_for_status (bool): Raise on an error response instead of returning
+                its body, e.g. so the prefetcher does not buffer it
+        """
+        page = requests.get(
+            validate_url(website_url),
+            timeout=15,
+            headers=self.headers,
+            cookies=self.cookies if self.cookies else {}
+        )
+        record_usage(scrape_bytes=len(page.content))
+        if not page.ok:
+            logger.warning(f"Scrape of {website_url} returned HTTP {page.status_code}, not cached")
+            if raise_for_status:
+                page.raise_for_status()
+        page.encoding = page.apparent_encoding
+        html = page.text
+        if page.ok and self._cache is not None:
+            self._cache.put("scrape", canonical_url(website_url), html.encode("utf-8"))
+        return html
+
+    def load(self, website_url: str) -> str:
+        """Return a page's HTML from the prefetch buffer, the cache or the network."""
+        if self._prefetcher is not None:
+            prefetched = self._prefetcher.get(website_url)
+            if prefetched is not None:
+                logger.debug(f"Prefetch buffer hit for {website_url}")
+                return prefetched
+
+        if self._cache is not None:
+            cached = self._cache.get("scrape", canonical_url(website_url))
+            if cached is not None:
+                logger.debug(f"Scrape cache hit for {website_url}")
+                return cached.decode("utf-8")
+
+        return self.fetch(website_url)
+
+    def _run(self, **kwargs: Any) -> Any:
+        website_url = kwargs.get("website_url", self.website_url)
+        if not website_url:
+            return super()._run(**kwargs)
+
+        html = self.load(website_url)
+        if self._pipeline is not None:
+            extracted = self._pipeline.extract(website_url, html)
+            if not extracted.text:
+                if extracted.duplicate_paragraphs:
+                    return (
+                        "The page had no new content beyond what was already scraped for this task."
+                    )
+                return "The page had no readable main content."
+            text = "The following text is scraped website content:\n\n" + extracted.text
+            if extracted.capped:
+                text += (
+                    f"\n\n[Truncated at the {self._pipeline.token_cap}-token limit per source; "
+                    "the rest of the page was omitted.]"
+                )
+            return text
+
+        # Same rendering as ScrapeWebsiteTool when extraction is disabled
+        text = "The following text is scraped website content:\n\n"
+        text += BeautifulSoup(html, "html.parser").get_text(" ")
+        text = re.sub("[ \t]+", " ", text)
+        return re.sub("\\s+\n\\s+", "\n", text)
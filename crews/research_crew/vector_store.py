@@ -0,0 +1,476 @@
+"""
+Managed ChromaDB store behind the researcher's website search tool.
+
+Each website gets one collection keyed by its canonical URL, and a manifest
+records the hash of the content that was embedded. Searching a page whose
+content has not changed reuses the stored embeddings instead of re-chunking and
+re-embedding it. Collections expire after a TTL and are evicted least recently
+used first once the store exceeds its size budget; a background thread compacts
+the database directory so deleted collections actually free disk space. The
+Chroma client is stopped while compaction removes files and reopened afterwards.
+A website's collection is never evicted or replaced while another thread holds
+it through VectorStore.website().
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import chromadb
+import numpy as np
+from crewai.tools import BaseTool
+from crewai_tools.rag.data_types import DataType
+from crewai_tools.tools.website_search.website_search_tool import WebsiteSearchToolSchema
+from pydantic import BaseModel, PrivateAttr
+
+from .db_config import configure_chromadb
+from .extraction import extract_main_text
+from .tool_cache import canonical_url
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+
+def openai_embedder(model: str = "text-embedding-3-small", batch_size: int = 100) -> Embedder:
+    """
+    Build an embedder that calls the OpenAI embeddings API in batches.
+
+    Args:
+        model (str): The embedding model
+        batch_size (int): Maximum inputs per API request
+
+    Returns:
+        Embedder: Maps a list of texts to their embeddings
+    """
+    from openai import OpenAI
+
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), batch_size):
+            response = client.embeddings.create(model=model, input=texts[start:start + batch_size])
+            embeddings.extend(item.embedding for item in response.data)
+        return embeddings
+
+    return embed
+
+
+def _directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class VectorStore:
+    """
+    Persistent, size-bounded set of per-website Chroma collections.
+
+    Attributes:
+        path (Path): The Chroma persist directory
+        max_bytes (int): Estimated size budget for all collections
+        ttl (float): Seconds after which an unused collection expires
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedder: Embedder,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: float = 14 * 24 * 3600,
+        chunker: Optional[Callable[[str], List[str]]] = None
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            path (str): The Chroma persist directory
+            embedder (Embedder): Maps a list of texts to their embeddings
+            max_bytes (int): Estimated size budget for all collections
+            ttl (float): Seconds after which an unused collection expires
+            chunker (Optional[Callable]): Splits page text into chunks (website chunker by default)
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.chunker = chunker or DataType.WEBSITE.get_chunker().chunk
+        self._client = self._open_client()
+        self._lock = threading.RLock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._manifest = sqlite3.connect(str(self.path / "manifest.sqlite3"), check_same_thread=False)
+        self._manifest.execute(
+            "CREATE TABLE IF NOT EXISTS collections ("
+            "url_key TEXT PRIMARY KEY, collection TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "chunks INTEGER NOT NULL, bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._manifest.commit()
+        self._stats = {"embeddings_computed": 0, "embeddings_reused": 0, "searches": 0, "evicted": 0, "compactions": 0}
+        self._stop = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+    def _open_client(self) -> Any:
+        return chromadb.PersistentClient(
+            path=str(self.path), settings=chromadb.Settings(anonymized_telemetry=False)
+        )
+
+    def _stop_client(self) -> bool:
+        """
+        Stop the Chroma client so it holds no open segment files or database handles.
+
+        Chroma has no public API to stop a single client, so this reaches into its
+        shared system cache. If those internals are missing or fail, e.g. after a
+        chromadb upgrade, the client is left running and False is returned.
+
+        Returns:
+            bool: True if the client was stopped and must be reopened
+        """
+        try:
+            from chromadb.api.shared_system_client import SharedSystemClient
+
+            system = self._client._system
+            identifier = self._client._identifier
+            systems = SharedSystemClient._identifier_to_system
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Cannot stop the Chroma client, skipping file compaction: {str(e)}")
+            return False
+        try:
+            system.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping the Chroma client, skipping file compaction: {str(e)}")
+            return False
+        # Chroma shares one system per path between clients, so drop it from the cache too
+        systems.pop(identifier, None)
+        return True
+
+    @classmethod
+    def from_env(cls) -> Optional["VectorStore"]:
+        """Build the store from VECTOR_STORE_* environment variables, or None if disabled."""
+        if os.getenv("VECTOR_STORE_ENABLED", "true").lower() == "false":
+            return None
+        if not configure_chromadb():
+            return None
+        store = cls(
+            path=os.environ["CHROMA_PERSIST_DIRECTORY"],
+            embedder=openai_embedder(os.getenv("VECTOR_STORE_EMBEDDING_MODEL", "text-embedding-3-small")),
+            max_bytes=int(os.getenv("VECTOR_STORE_MAX_BYTES", str(512 * 1024 * 1024))),
+            ttl=float(os.getenv("VECTOR_STORE_TTL", str(14 * 24 * 3600)))
+        )
+        store.start_compaction(float(os.getenv("VECTOR_STORE_COMPACT_INTERVAL", "3600")))
+        return store
+
+    def _url_lock(self, url_key: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url_key, threading.Lock())
+
+    def ensure(self, url: str, text: str) -> str:
+        """
+        Make sure the collection for a website holds embeddings of the given text.
+
+        Embeddings are reused when the manifest records the same content hash;
+        otherwise the page is chunked and embedded into a fresh collection.
+
+        Args:
+            url (str): The website URL
+            text (str): The page text
+
+        Returns:
+            str: The collection name
+        """
+        url_key = canonical_url(url)
+        with self._url_lock(url_key):
+            return self._ensure(url, url_key, text)
+
+    @contextmanager
+    def website(self, url: str, text: str) -> Iterator[str]:
+        """
+        Ensure a website's collection and hold it for searching until the block exits.
+
+        The website's lock is held throughout, so eviction, compaction or a re-embed
+        of the same page from another thread cannot drop the collection mid-search.
+
+        Args:
+            url (str): The website URL
+            text (str): The page text
+
+        Yields:
+            str: The collection name, to pass to search()
+        """
+        url_key = canonical_url(url)
+        with self._url_lock(url_key):
+            yield self._ensure(url, url_key, text)
+
+    def _ensure(self, url: str, url_key: str, text: str) -> str:
+        """Embed a website's text unless already stored; the caller holds the website's lock."""
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        collection_name = f"site-{hashlib.sha1(url_key.encode('utf-8')).hexdigest()[:24]}"
+
+        with self._lock:
+            row = self._manifest.execute(
+                "SELECT content_hash, chunks FROM collections WHERE url_key = ?", (url_key,)
+            ).fetchone()
+            if row and row[0] == content_hash:
+                self._manifest.execute(
+                    "UPDATE collections SET last_used = ? WHERE url_key = ?", (time.time(), url_key)
+                )
+                self._manifest.commit()
+                self._stats["embeddings_reused"] += row[1]
+                logger.debug(f"Reusing {row[1]} embeddings for {url_key}")
+                return collection_name
+
+        chunks = [chunk for chunk in self.chunker(text) if chunk.strip()] or [text]
+        embeddings = self.embedder(chunks)
+        with self._lock:
+            if row:
+                self._delete_collection(collection_name)
+            collection = self._client.get_or_create_collection(
+                collection_name, embedding_function=None, metadata={"hnsw:space": "cosine"}
+            )
+            collection.add(
+                ids=[f"{content_hash[:16]}-{i}" for i in range(len(chunks))],
+                documents=chunks,
+                embeddings=np.asarray(embeddings, dtype=np.float32),
+                metadatas=[{"source": url, "chunk_index": i} for i in range(len(chunks))]
+            )
+            # Chunk text plus float32 vectors, doubled for the HNSW index copy
+            size = (
+                sum(len(chunk.encode("utf-8")) for chunk in chunks)
+                + 8 * len(embeddings[0]) * len(chunks)
+            )
+            now = time.time()
+            self._manifest.execute(
+                "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url_key, collection_name, content_hash, len(chunks), size, now, now)
+            )
+            self._manifest.commit()
+            self._stats["embeddings_computed"] += len(chunks)
+            self._evict()
+        logger.info(f"Embedded {len(chunks)} chunks for {url_key}")
+        return collection_name
+
+    def search(self, collection_name: str, query: str, limit: int = 5, similarity_threshold: float = 0.6) -> List[str]:
+        """
+        Return the chunks of a collection most similar to a query.
+
+        Call this inside website() so the collection cannot be evicted while it is queried.
+
+        Args:
+            collection_name (str): The collection returned by ensure()
+            query (str): The search query
+            limit (int): Maximum number of chunks
+            similarity_threshold (float): Minimum cosine similarity of returned chunks
+
+        Returns:
+            List[str]: Matching chunks, most similar first
+        """
+        query_embedding = self.embedder([query])[0]
+        with self._lock:
+            self._stats["searches"] += 1
+            collection = self._client.get_collection(collection_name)
+            results = collection.query(
+                query_embeddings=np.asarray([query_embedding], dtype=np.float32),
+                n_results=limit,
+                include=["documents", "distances"]
+            )
+        documents = (results["documents"] or [[]])[0]
+        distances = (results["distances"] or [[]])[0]
+        return [
+            document
+            for document, distance in zip(documents, distances)
+            if 1 - distance >= similarity_threshold
+        ]
+
+    def _delete_collection(self, collection_name: str) -> None:
+        try:
+            self._client.delete_collection(collection_name)
+        except Exception as e:
+            logger.debug(f"Collection {collection_name} was already gone: {str(e)}")
+
+    def _evict(self) -> None:
+        """Drop expired collections, then least recently used ones until within the size budget."""
+        with self._lock:
+            expired = self._manifest.execute(
+                "SELECT url_key, collection FROM collections WHERE last_used < ?", (time.time() - self.ttl,)
+            ).fetchall()
+            victims = list(expired)
+            total = self._manifest.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM collections WHERE last_used >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                for url_key, collection, size in self._manifest.execute(
+                    "SELECT url_key, collection, bytes FROM collections WHERE last_used >= ? ORDER BY last_used",
+                    (time.time() - self.ttl,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((url_key, collection))
+                    total -= size
+
+            evicted = 0
+            for url_key, collection in victims:
+                # A website whose lock is taken is in use; a later pass evicts it
+                url_lock = self._url_locks.get(url_key)
+                if url_lock is not None and not url_lock.acquire(blocking=False):
+                    continue
+                try:
+                    self._delete_collection(collection)
+                    self._manifest.execute("DELETE FROM collections WHERE url_key = ?", (url_key,))
+                finally:
+                    if url_lock is not None:
+                        url_lock.release()
+                evicted += 1
+            self._stats["evicted"] += evicted
+            self._manifest.commit()
+        if evicted:
+            logger.info(f"Evicted {evicted} website collections from the vector store")
+
+    def compact(self) -> None:
+        """
+        Evict, remove segment directories of deleted collections and vacuum Chroma's database.
+
+        Runs under the store lock with the Chroma client stopped, so no search or
+        insert can have a segment or the database open while files are removed.
+        If the client cannot be stopped, only the eviction is done.
+        """
+        with self._lock:
+            self._evict()
+            database = self.path / "chroma.sqlite3"
+            if not database.exists() or not self._stop_client():
+                return
+            try:
+                connection = sqlite3.connect(str(database), timeout=30)
+                try:
+                    live = {row[0] for row in connection.execute("SELECT id FROM segments")}
+                    for entry in self.path.iterdir():
+                        if entry.is_dir() and _SEGMENT_DIR.match(entry.name) and entry.name not in live:
+                            shutil.rmtree(entry, ignore_errors=True)
+                    connection.execute("VACUUM")
+                finally:
+                    connection.close()
+            finally:
+                self._client = self._open_client()
+            self._stats["compactions"] += 1
+        logger.debug(f"Compacted vector store at {self.path}")
+
+    def start_compaction(self, interval: float) -> threading.Thread:
+        """Compact the store every `interval` seconds in a daemon thread."""
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Error compacting vector store: {str(e)}")
+
+        self._compactor = threading.Thread(target=run, name="vector-store-compaction", daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return embedding reuse and storage statistics.
+
+        Returns:
+            dict: Embeddings computed and reused, the reuse rate, collection count,
+                estimated and on-disk bytes, evictions and compactions
+        """
+        with self._lock:
+            collections, estimated = self._manifest.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM collections"
+            ).fetchone()
+            stats: Dict[str, Any] = dict(self._stats)
+        total = stats["embeddings_computed"] + stats["embeddings_reused"]
+        stats.update(
+            reuse_rate=stats["embeddings_reused"] / total if total else 0.0,
+            collections=collections,
+            estimated_bytes=estimated,
+            disk_bytes=_directory_size(self.path)
+        )
+        return stats
+
+    def close(self) -> None:
+        """Stop background compaction and close the manifest."""
+        self._stop.set()
+        with self._lock:
+            self._manifest.close()
+
+
+_default_store: Optional[VectorStore] = None
+_default_store_lock = threading.Lock()
+_default_store_built = False
+
+
+def default_vector_store() -> Optional[VectorStore]:
+    """Return the process-wide vector store configured from the environment."""
+    global _default_store, _default_store_built
+    with _default_store_lock:
+        if not _default_store_built:
+            try:
+                _default_store = VectorStore.from_env()
+            except Exception as e:
+                logger.error(f"Error initializing vector store: {str(e)}")
+            _default_store_built = True
+        return _default_store
+
+
+class ManagedWebsiteSearchTool(BaseTool):
+    """
+    Drop-in replacement for WebsiteSearchTool backed by the managed VectorStore.
+
+    Pages are loaded through the scrape tool, so they come from the tool cache or
+    prefetch buffer when available, and are only embedded when their content changed.
+    """
+
+    name: str = "Search in a specific website"
+    description: str = "A tool that can be used to semantic search a query from a specific URL content."
+    args_schema: type[BaseModel] = WebsiteSearchToolSchema
+    similarity_threshold: float = 0.6
+    limit: int = 5
+
+    _store: Optional[VectorStore] = PrivateAttr(default=None)
+    _load_page: Any = PrivateAttr(default=None)
+
+    def __init__(self, store: VectorStore, load_page: Callable[[str], str], **kwargs: Any):
+        super().__init__(**kwargs)
+        self._store = store
+        self._load_page = load_page
+
+    @property
+    def store(self) -> Optional[VectorStore]:
+        """The VectorStore holding the embedded websites."""
+        return self._store
+
+    def _run(
+        self,
+        search_query: str,
+        website: Optional[str] = None,
+        similarity_threshold: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> str:
+        if not website:
+            return "A website URL is required to search."
+        store = self._store
+        if store is None:
+            return "The website search store is not available."
+        text = extract_main_text(self._load_page(website))
+        if not text:
+            return "No relevant content found."
+        if similarity_threshold is None:
+            similarity_threshold = self.similarity_threshold
+        with store.website(website, text) as collection:
+            chunks = store.search(
+                collection,
+                search_query,
+                limit=limit or self.limit,
+                similarity_threshold=similarity_threshold
+            )
+        return "\n\n".join(chunks) if chunks else "No relevant content found."
@@ -0,0 +1,365 @@
+"""
+Per-task accounting of LLM tokens, cost and external API calls.
+
+Each Notion task gets a TaskUsage that is carried through a context variable,
+like the task's trace, so routing, default answers, crew runs, search and
+scrape tools and Notion requests all record into the task that caused them,
+including from executor threads that copy the context. At publish time the
+totals are written to number properties of the task's page; when the task
+finishes they are appended to a local SQLite store that aggregates usage per
+model and task kind over time.
+
+Recording outside a task is a no-op, as is everything when
+ACCOUNTING_ENABLED is "false".
+"""
+
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_current_usage: contextvars.ContextVar[Optional["TaskUsage"]] = contextvars.ContextVar("current_usage", default=None)
+
+# API call counters kept per task, besides LLM tokens
+COUNTERS = ("serper_calls", "scrape_bytes", "notion_requests")
+
+# Notion number property written for each total at publish time
+NOTION_PROPERTIES = {
+    "prompt_tokens": "Prompt Tokens",
+    "completion_tokens": "Completion Tokens",
+    "cached_tokens": "Cached Tokens",
+    "cost_usd": "Cost (USD)",
+    "serper_calls": "Serper Calls",
+    "scrape_bytes": "Scraped Bytes",
+    "notion_requests": "Notion Requests",
+}
+
+
+def accounting_enabled() -> bool:
+    """Whether per-task accounting is on (ACCOUNTING_ENABLED, default true)."""
+    return os.getenv("ACCOUNTING_ENABLED", "true").lower() != "false"
+
+
+class TaskUsage:
+    """
+    Thread-safe usage totals of one task.
+
+    Attributes:
+        page_id (Optional[str]): The Notion page ID of the task
+        kind (str): The task kind, "execute" or "iterate"
+        started (float): Wall-clock start time in seconds since the epoch
+        models (Dict[str, Dict[str, int]]): Calls and prompt, completion and cached tokens per model
+        counters (Dict[str, int]): Serper calls, scraped bytes and Notion requests
+    """
+
+    def __init__(self, page_id: Optional[str] = None, kind: str = "execute"):
+        self.page_id = page_id
+        self.kind = kind
+        self.started = time.time()
+        self.models: Dict[str, Dict[str, int]] = {}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._token: Optional[contextvars.Token] = None
+
+    def record_llm(
+        self,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+        calls: int = 1
+    ) -> None:
+        """Add the token usage of one or more calls to a model."""
+        with self._lock:
+            entry = self.models.setdefault(model, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0
+            })
+            entry["calls"] += calls
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cached_tokens"] += cached_tokens
+
+    def record(self, **counts: int) -> None:
+        """Add to the API call counters, e.g. record(serper_calls=1)."""
+        with self._lock:
+            for name, amount in counts.items():
+                if name not in self.counters:
+                    raise ValueError(f"Unknown usage counter: {name}")
+                self.counters[name] += amount
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the task started."""
+        return time.perf_counter() - self._started
+
+    def totals(self) -> Dict[str, Any]:
+        """
+        Return the task's totals over all models.
+
+        Returns:
+            dict: LLM calls, prompt, completion and cached tokens, estimated cost and the API counters
+        """
+        from .model_cascade import estimate_cost
+
+        with self._lock:
+            totals: Dict[str, Any] = {
+                "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0
+            }
+            for model, entry in self.models.items():
+                for field in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+                    totals[field] += entry[field]
+                totals["llm_calls"] += entry["calls"]
+                totals["cost_usd"] += estimate_cost(
+                    model, entry["prompt_tokens"], entry["completion_tokens"], entry["cached_tokens"]
+                )
+            totals.update(self.counters)
+        return totals
+
+    def notion_properties(self) -> Dict[str, Any]:
+        """Return the totals as Notion number properties for a page update."""
+        totals = self.totals()
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return {name: {"number": totals[field]} for field, name in NOTION_PROPERTIES.items()}
+
+    def end(self) -> None:
+        """Stop recording into this usage from the current context."""
+        if self._token is not None:
+            try:
+                _current_usage.reset(self._token)
+            except ValueError:
+                # Ended from another context; the usage's own context is left as is
+                pass
+            self._token = None
+
+
+def start_task_usage(page_id: Optional[str], kind: str) -> Optional[TaskUsage]:
+    """
+    Start accounting a task in the current context.
+
+    Args:
+        page_id (Optional[str]): The Notion page ID of the task
+        kind (str): The task kind, "execute" or "iterate"
+
+    Returns:
+        Optional[TaskUsage]: The task's usage, or None when accounting is disabled
+    """
+    if not accounting_enabled():
+        return None
+    usage = TaskUsage(page_id, kind)
+    usage._token = _current_usage.set(usage)
+    return usage
+
+
+def current_usage() -> Optional[TaskUsage]:
+    """Return the usage of the task running in the current context, if any."""
+    return _current_usage.get()
+
+
+def record_llm_usage(model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                     cached_tokens: int = 0, calls: int = 1) -> None:
+    """Record LLM token usage for the current task; a no-op outside a task."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.record_llm(model, prompt_tokens, completion_tokens, cached_tokens, calls)
+
+
+def record_usage(**counts: int) -> None:
+    """Add to the current task's API call counters; a no-op outside a task."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.record(**counts)
+
+
+def notion_usage_properties(usage: Optional[TaskUsage]) -> Optional[Dict[str, Any]]:
+    """
+    Return the usage properties to publish with a task's result.
+
+    Returns None when there is no usage or ACCOUNTING_NOTION_PROPERTIES is "false".
+    """
+    if usage is None or os.getenv("ACCOUNTING_NOTION_PROPERTIES", "true").lower() == "false":
+        return None
+    return usage.notion_properties()
+
+
+class UsageStore:
+    """
+    SQLite store of finished tasks' usage, aggregated on demand.
+
+    Attributes:
+        path (Path): The SQLite database file
+    """
+
+    def __init__(self, path: str = "./.usage/usage.sqlite3"):
+        """
+        Initialize the store, creating its tables if needed.
+
+        Args:
+            path (str): The SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, page_id TEXT, kind TEXT, status TEXT, "
+            "started REAL, duration REAL, serper_calls INTEGER, scrape_bytes INTEGER, notion_requests INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS task_models ("
+            "task_id INTEGER, model TEXT, calls INTEGER, prompt_tokens INTEGER, "
+            "completion_tokens INTEGER, cached_tokens INTEGER, cost_usd REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_started ON tasks (started)")
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["UsageStore"]:
+        """
+        Build the store from ACCOUNTING_* environment variables.
+
+        Returns None when ACCOUNTING_ENABLED is "false".
+        """
+        if not accounting_enabled():
+            return None
+        return cls(os.getenv("ACCOUNTING_DB", "./.usage/usage.sqlite3"))
+
+    def record(self, usage: TaskUsage, status: str) -> None:
+        """
+        Append a finished task's usage.
+
+        Args:
+            usage (TaskUsage): The task's usage
+            status (str): The task's outcome, e.g. "ok" or "error"
+        """
+        from .model_cascade import estimate_cost
+
+        with usage._lock:
+            models = {model: dict(entry) for model, entry in usage.models.items()}
+            counters = dict(usage.counters)
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO tasks (page_id, kind, status, started, duration, serper_calls, scrape_bytes, "
+                "notion_requests) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (usage.page_id, usage.kind, status, usage.started, usage.elapsed,
+                 counters["serper_calls"], counters["scrape_bytes"], counters["notion_requests"])
+            )
+            self._db.executemany(
+                "INSERT INTO task_models VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (cursor.lastrowid, model, entry["calls"], entry["prompt_tokens"], entry["completion_tokens"],
+                     entry["cached_tokens"], estimate_cost(
+                         model, entry["prompt_tokens"], entry["completion_tokens"], entry["cached_tokens"]
+                     ))
+                    for model, entry in models.items()
+                ]
+            )
+            self._db.commit()
+
+    def summary(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Aggregate the recorded usage.
+
+        Args:
+            since (Optional[float]): Only include tasks started at or after this epoch time
+
+        Returns:
+            dict: Totals per task kind and per model, with mean duration and cost per task
+        """
+        since = since or 0.0
+        with self._lock:
+            kinds = self._db.execute(
+                "SELECT t.kind, COUNT(*), AVG(t.duration), SUM(t.serper_calls), SUM(t.scrape_bytes), "
+                "SUM(t.notion_requests), COALESCE(SUM(m.cost), 0) FROM tasks t LEFT JOIN ("
+                "SELECT task_id, SUM(cost_usd) AS cost FROM task_models GROUP BY task_id) m ON m.task_id = t.id "
+                "WHERE t.started >= ? GROUP BY t.kind",
+                (since,)
+            ).fetchall()
+            models = self._db.execute(
+                "SELECT m.model, COUNT(DISTINCT m.task_id), SUM(m.calls), SUM(m.prompt_tokens), "
+                "SUM(m.completion_tokens), SUM(m.cached_tokens), SUM(m.cost_usd) FROM task_models m "
+                "JOIN tasks t ON t.id = m.task_id WHERE t.started >= ? GROUP BY m.model",
+                (since,)
+            ).fetchall()
+        return {
+            "kinds": {
+                kind: {
+                    "tasks": tasks, "mean_duration_seconds": duration or 0.0, "serper_calls": serper or 0,
+                    "scrape_bytes": scraped or 0, "notion_requests": notion or 0, "cost_usd": cost,
+                    "mean_cost_usd": cost / tasks if tasks else 0.0,
+                }
+                for kind, tasks, duration, serper, scraped, notion, cost in kinds
+            },
+            "models": {
+                model: {
+                    "tasks": tasks, "calls": calls, "prompt_tokens": prompt, "completion_tokens": completion,
+                    "cached_tokens": cached, "cost_usd": cost,
+                }
+                for model, tasks, calls, prompt, completion, cached, cost in models
+            },
+        }
+
+
+_default_store: Optional[UsageStore] = None
+_default_store_lock = threading.Lock()
+_default_store_loaded = False
+
+
+def default_usage_store() -> Optional[UsageStore]:
+    """Return the process-wide UsageStore configured from the environment, or None if disabled."""
+    global _default_store, _default_store_loaded
+    with _default_store_lock:
+        if not _default_store_loaded:
+            _default_store = UsageStore.from_env()
+            _default_store_loaded = True
+        return _default_store
+
+
+def finish_task_usage(usage: Optional[TaskUsage], status: str, store: Optional[UsageStore] = None) -> None:
+    """
+    End a task's accounting and append it to the usage store.
+
+    Args:
+        usage (Optional[TaskUsage]): The task's usage; None is ignored
+        status (str): The task's outcome, e.g. "ok" or "error"
+        store (Optional[UsageStore]): The store to record into, the default store if omitted
+    """
+    if usage is None:
+        return
+    usage.end()
+    totals = usage.totals()
+    logger.info(
+        f"Task {usage.page_id} usage: {totals['prompt_tokens']} prompt / {totals['completion_tokens']} completion / "
+        f"{totals['cached_tokens']} cached tokens, ${totals['cost_usd']:.4f}, {totals['serper_calls']} Serper calls, "
+        f"{totals['scrape_bytes']} scraped bytes, {totals['notion_requests']} Notion requests"
+    )
+    store = store or default_usage_store()
+    if store is None:
+        return
+    try:
+        store.record(usage, status)
+    except Exception as e:
+        logger.error(f"Error recording usage for task {usage.page_id}: {str(e)}")
+
+
+class AccountedTransport(httpx.BaseTransport):
+    """httpx transport wrapper that counts each Notion request against the current task."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        record_usage(notion_requests=1)
+        return self._transport.handle_request(request)
+
+    def close(self) -> None:
+        self._transport.close()
@@ -0,0 +1,245 @@
+"""
+Per-task artifact store for crew results.
+
+Every crew run gets its own directory, keyed by Notion page ID and run ID, so
+concurrent tasks never overwrite each other's output. Files are written
+atomically, read back in chunks when publishing, and old runs are removed
+according to a retention policy so the worker's disk does not grow unbounded.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_ARTIFACT = "analysis.md"
+STRUCTURED_ARTIFACT = "research_output.json"
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def _safe(name: str) -> str:
+    return _SAFE_NAME.sub("_", name) or "_"
+
+
+class ArtifactRun:
+    """
+    The artifacts of a single crew run.
+
+    Attributes:
+        page_id (str): The Notion page ID
+        run_id (str): Unique, time-ordered run ID
+        path (Path): Directory holding the run's files
+    """
+
+    def __init__(self, page_id: str, run_id: str, path: Path):
+        self.page_id = page_id
+        self.run_id = run_id
+        self.path = path
+
+    def write_bytes(self, name: str, data: bytes) -> Path:
+        """
+        Atomically write a file in the run directory.
+
+        Args:
+            name (str): The file name
+            data (bytes): The file contents
+
+        Returns:
+            Path: The written file
+        """
+        target = self.path / _safe(name)
+        handle, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f".{target.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as tmp:
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return target
+
+    def write_text(self, name: str, text: str) -> Path:
+        """Atomically write a UTF-8 text file."""
+        return self.write_bytes(name, text.encode("utf-8"))
+
+    def write_json(self, name: str, data: Any) -> Path:
+        """Atomically write a JSON file."""
+        return self.write_text(name, json.dumps(data, ensure_ascii=False, indent=2))
+
+    def write_result(self, result: Any) -> None:
+        """
+        Store a crew result: its markdown text and, if present, its structured output.
+
+        Args:
+            result (Any): A CrewOutput (or any object with raw/pydantic attributes)
+        """
+        raw = getattr(result, "raw", None)
+        self.write_text(MARKDOWN_ARTIFACT, raw if raw is not None else str(result))
+        structured = getattr(result, "pydantic", None)
+        if structured is not None and hasattr(structured, "model_dump"):
+            self.write_json(STRUCTURED_ARTIFACT, structured.model_dump(mode="json"))
+
+    def exists(self, name: str) -> bool:
+        return (self.path / _safe(name)).exists()
+
+    def stream_text(self, name: str, chunk_size: int = 2000) -> Iterator[str]:
+        """
+        Read a text artifact back in chunks without loading it whole.
+
+        Args:
+            name (str): The file name
+            chunk_size (int): Maximum characters per chunk
+
+        Yields:
+            str: Consecutive chunks of the file
+        """
+        with open(self.path / _safe(name), encoding="utf-8") as artifact:
+            while True:
+                chunk = artifact.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def iter_lines(self, name: str) -> Iterator[str]:
+        """Read a text artifact back line by line."""
+        with open(self.path / _safe(name), encoding="utf-8") as artifact:
+            yield from artifact
+
+    def read_text(self, name: str) -> str:
+        return (self.path / _safe(name)).read_text(encoding="utf-8")
+
+    def read_json(self, name: str = STRUCTURED_ARTIFACT) -> Optional[Any]:
+        """Load a JSON artifact, or None if the run has no such file."""
+        target = self.path / _safe(name)
+        if not target.exists():
+            return None
+        with open(target, encoding="utf-8") as artifact:
+            return json.load(artifact)
+
+    def files(self) -> List[str]:
+        return sorted(p.name for p in self.path.iterdir() if not p.name.startswith("."))
+
+
+class ArtifactStore:
+    """
+    Directory tree of runs: <root>/<page_id>/<run_id>/<file>.
+
+    Attributes:
+        root (Path): The store's root directory
+        retention_seconds (float): Age after which runs are deleted
+        max_runs_per_page (int): Number of most recent runs kept per page
+    """
+
+    def __init__(
+        self,
+        root: str = "./artifacts",
+        retention_seconds: float = 7 * 24 * 3600,
+        max_runs_per_page: int = 5,
+        cleanup_interval: float = 3600
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): The store's root directory
+            retention_seconds (float): Age after which runs are deleted
+            max_runs_per_page (int): Number of most recent runs kept per page
+            cleanup_interval (float): Minimum seconds between automatic cleanups
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self.max_runs_per_page = max_runs_per_page
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ArtifactStore":
+        """Build the store from ARTIFACT_* environment variables."""
+        return cls(
+            root=os.getenv("ARTIFACT_DIR", "./artifacts"),
+            retention_seconds=float(os.getenv("ARTIFACT_RETENTION_DAYS", "7")) * 24 * 3600,
+            max_runs_per_page=int(os.getenv("ARTIFACT_MAX_RUNS_PER_PAGE", "5"))
+        )
+
+    def new_run(self, page_id: Optional[str]) -> ArtifactRun:
+        """
+        Create the directory for a new run of a task.
+
+        Args:
+            page_id (Optional[str]): The Notion page ID ("adhoc" when there is none)
+
+        Returns:
+            ArtifactRun: The new, empty run
+        """
+        self._maybe_cleanup()
+        page_id = _safe(page_id or "adhoc")
+        # Microsecond timestamps keep run IDs in creation order
+        run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        path = self.root / page_id / run_id
+        path.mkdir(parents=True)
+        return ArtifactRun(page_id, run_id, path)
+
+    def get_run(self, page_id: str, run_id: str) -> Optional[ArtifactRun]:
+        path = self.root / _safe(page_id) / _safe(run_id)
+        return ArtifactRun(page_id, run_id, path) if path.is_dir() else None
+
+    def runs(self, page_id: str) -> List[ArtifactRun]:
+        """Return a page's runs, oldest first."""
+        page_dir = self.root / _safe(page_id)
+        if not page_dir.is_dir():
+            return []
+        return [ArtifactRun(page_id, p.name, p) for p in sorted(page_dir.iterdir()) if p.is_dir()]
+
+    def latest_run(self, page_id: str) -> Optional[ArtifactRun]:
+        runs = self.runs(page_id)
+        return runs[-1] if runs else None
+
+    def _maybe_cleanup(self) -> None:
+        with self._lock:
+            if time.time() - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = time.time()
+        try:
+            self.cleanup()
+        except Exception as e:
+            logger.error(f"Error cleaning up artifacts: {str(e)}")
+
+    def cleanup(self) -> Dict[str, int]:
+        """
+        Delete runs past the retention age and all but the newest runs of each page.
+
+        Returns:
+            dict: Number of runs and bytes removed
+        """
+        removed = {"runs": 0, "bytes": 0}
+        cutoff = time.time() - self.retention_seconds
+        for page_dir in [p for p in self.root.iterdir() if p.is_dir()]:
+            runs = sorted(p for p in page_dir.iterdir() if p.is_dir())
+            keep = set(runs[-self.max_runs_per_page:]) if self.max_runs_per_page > 0 else set()
+            for run_dir in runs:
+                if run_dir in keep and run_dir.stat().st_mtime >= cutoff:
+                    continue
+                removed["bytes"] += sum(f.stat().st_size for f in run_dir.rglob("*") if f.is_file())
+                shutil.rmtree(run_dir, ignore_errors=True)
+                removed["runs"] += 1
+            if not any(page_dir.iterdir()):
+                page_dir.rmdir()
+        if removed["runs"]:
+            logger.info(f"Removed {removed['runs']} artifact runs ({removed['bytes']} bytes)")
+        return removed
@@ -0,0 +1,478 @@
+"""
+Record and replay HTTP traffic for repeatable runs.
+
+OpenAI (via the openai SDK) and Notion (via notion-client) send requests
+through httpx transports, while Serper and website scrapes use requests. A
+cassette patches httpx.HTTPTransport, httpx.AsyncHTTPTransport and
+requests' HTTPAdapter at class level, so every client in the process is
+covered without being rebuilt:
+
+- record: requests go to the network and each request/response pair is
+  appended to a gzip-compressed JSON lines file with its duration. API keys
+  and tokens are scrubbed from headers, URLs and bodies before writing
+- replay: no request leaves the process. Each request is answered with the
+  recorded response for the same method, URL and body; with loose matching a
+  request whose body changed (e.g. a prompt with a timestamp) gets the next
+  unused response recorded for the same method and URL. The recorded duration
+  is slept, scaled by `timing` (1.0 for the original latency, 0 for none)
+
+CASSETTE_MODE (off, record or replay), CASSETTE_PATH, CASSETTE_TIMING and
+CASSETTE_MATCH (loose or strict) configure the cassette installed by the
+service at start-up.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+REDACTED = "<redacted>"
+CASSETTE_VERSION = 1
+
+# Request and response headers whose values are never written to a cassette
+SECRET_HEADERS = {
+    "authorization",
+    "proxy-authorization",
+    "x-api-key",
+    "api-key",
+    "openai-organization",
+    "openai-project",
+    "cookie",
+    "set-cookie",
+}
+# Query string parameters whose values are never written to a cassette
+SECRET_PARAMS = {"key", "api_key", "apikey", "token", "access_token", "auth"}
+# Environment variables whose values are scrubbed wherever they appear
+SECRET_ENV = ("OPENAI_API_KEY", "SERPER_API_KEY", "NOTION_API_KEY", "ANTHROPIC_API_KEY")
+# Headers describing the encoded body, which no longer apply to the stored decoded body
+_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class Cassette:
+    """
+    A file of recorded HTTP interactions.
+
+    Attributes:
+        path (str): The gzip JSON lines file
+        mode (str): "record" or "replay"
+        timing (float): Scale of the recorded durations slept during replay
+        strict (bool): Whether replay requires the request body to match exactly
+    """
+
+    def __init__(self, path: str, mode: str = "replay", timing: float = 1.0, strict: bool = False):
+        """
+        Initialize the cassette.
+
+        Args:
+            path (str): The gzip JSON lines file
+            mode (str): "record" to write a new cassette, "replay" to answer from one
+            timing (float): Scale of recorded durations during replay, 0 to answer immediately
+            strict (bool): Require an exact body match during replay
+
+        Raises:
+            ValueError: If the mode is unknown
+            FileNotFoundError: If the cassette to replay does not exist
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.strict = strict
+        self.secrets = [
+            value for value in (os.getenv(name) for name in SECRET_ENV) if value and len(value) >= 8
+        ]
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._started = time.monotonic()
+        self._file: Optional[TextIO] = None
+        self._sequence = 0
+        self._exact: Dict[Tuple[str, str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_url: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """
+        Build a cassette from CASSETTE_* environment variables.
+
+        Returns None when CASSETTE_MODE is "off" (the default).
+        """
+        mode = os.getenv("CASSETTE_MODE", "off").lower()
+        if mode == "off":
+            return None
+        return cls(
+            os.getenv("CASSETTE_PATH", "./cassettes/session.jsonl.gz"),
+            mode=mode,
+            timing=float(os.getenv("CASSETTE_TIMING", "1.0")),
+            strict=os.getenv("CASSETTE_MATCH", "loose").lower() == "strict"
+        )
+
+    # Scrubbing and matching
+
+    def scrub(self, text: str) -> str:
+        """Replace the values of known secrets in text."""
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def scrub_url(self, url: str) -> str:
+        parts = urlsplit(self.scrub(url))
+        if not parts.query:
+            return urlunsplit(parts)
+        query = [
+            (name, REDACTED if name.lower() in SECRET_PARAMS else value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        ]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def scrub_headers(self, headers: List[Tuple[str, str]]) -> Dict[str, str]:
+        return {
+            name.lower(): REDACTED if name.lower() in SECRET_HEADERS else self.scrub(value)
+            for name, value in headers
+        }
+
+    def _encode_body(self, body: bytes) -> Dict[str, Any]:
+        try:
+            return {"body": self.scrub(body.decode("utf-8"))}
+        except UnicodeDecodeError:
+            return {"body_base64": base64.b64encode(body).decode("ascii")}
+
+    @staticmethod
+    def _decode_body(entry: Dict[str, Any]) -> bytes:
+        if "body_base64" in entry:
+            return base64.b64decode(entry["body_base64"])
+        return entry.get("body", "").encode("utf-8")
+
+    def _key(self, method: str, url: str, body: bytes) -> Tuple[str, str, str]:
+        scrubbed = self._encode_body(body)
+        digest = hashlib.sha256(json.dumps(scrubbed, sort_keys=True).encode("utf-8")).hexdigest()
+        return method.upper(), self.scrub_url(url), digest
+
+    # Recording
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        request_headers: List[Tuple[str, str]],
+        request_body: bytes,
+        status: int,
+        response_headers: List[Tuple[str, str]],
+        response_body: bytes,
+        started: float,
+        duration: float
+    ) -> None:
+        """Append one interaction to the cassette."""
+        _, scrubbed_url, digest = self._key(method, url, request_body)
+        entry = {
+            "started": round(started - self._started, 6),
+            "duration": round(duration, 6),
+            "request": {
+                "method": method.upper(),
+                "url": scrubbed_url,
+                "headers": self.scrub_headers(request_headers),
+                "body_sha256": digest,
+                **self._encode_body(request_body),
+            },
+            "response": {
+                "status": status,
+                "headers": {
+                    name: value for name, value in self.scrub_headers(response_headers).items()
+                    if name not in _BODY_HEADERS
+                },
+                **self._encode_body(response_body),
+            },
+        }
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                self._file = gzip.open(self.path, "wt", encoding="utf-8")
+                header = {"cassette": CASSETTE_VERSION, "recorded_at": time.time()}
+                self._file.write(json.dumps(header) + "\n")
+            self._sequence += 1
+            entry["sequence"] = self._sequence
+            self._file.write(json.dumps(entry) + "\n")
+            # A sync flush keeps the cassette readable if the process dies mid-session
+            self._file.flush()
+            self._stats["recorded"] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Replay
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"{self.path} is not a version {CASSETTE_VERSION} cassette")
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                request = entry["request"]
+                entry["used"] = False
+                exact_key = (request["method"], request["url"], request["body_sha256"])
+                self._exact[exact_key].append(entry)
+                self._by_url[(request["method"], request["url"])].append(entry)
+                self._stats["loaded"] += 1
+        logger.info(f"Loaded {self._stats['loaded']} recorded interactions from {self.path}")
+
+    def match(self, method: str, url: str, body: bytes) -> Dict[str, Any]:
+        """
+        Take the recorded interaction answering a request.
+
+        Raises:
+            CassetteMissError: If no unused recording matches
+        """
+        key = self._key(method, url, body)
+        with self._lock:
+            entry = self._take(self._exact.get(key))
+            if entry is not None:
+                self._stats["exact"] += 1
+                return entry
+            if not self.strict:
+                entry = self._take(self._by_url.get(key[:2]))
+                if entry is not None:
+                    self._stats["loose"] += 1
+                    return entry
+            self._stats["misses"] += 1
+        raise CassetteMissError(f"No recorded response for {key[0]} {key[1]} in {self.path}")
+
+    @staticmethod
+    def _take(entries: Optional[Deque[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        while entries:
+            entry = entries.popleft()
+            if not entry["used"]:
+                entry["used"] = True
+                return entry
+        return None
+
+    def delay(self, entry: Dict[str, Any]) -> float:
+        """Seconds to wait before answering with a recorded interaction."""
+        return entry["duration"] * self.timing
+
+    def response_parts(self, entry: Dict[str, Any]) -> Tuple[int, Dict[str, str], bytes]:
+        response = entry["response"]
+        return response["status"], response["headers"], self._decode_body(response)
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of recorded, loaded, exactly and loosely matched, and missed interactions."""
+        with self._lock:
+            return dict(self._stats)
+
+
+# Transport patches
+
+_installed: Optional[Cassette] = None
+_originals: Dict[str, Any] = {}
+_install_lock = threading.Lock()
+
+
+def _httpx_response(
+    cassette: Cassette,
+    entry: Dict[str, Any],
+    request: httpx.Request
+) -> httpx.Response:
+    status, headers, body = cassette.response_parts(entry)
+    return httpx.Response(status, headers=headers, content=body, request=request)
+
+
+def _record_httpx(
+    cassette: Cassette,
+    request: httpx.Request,
+    response: httpx.Response,
+    started: float
+) -> httpx.Response:
+    cassette.record(
+        request.method, str(request.url), list(request.headers.items()), request.content,
+        response.status_code, list(response.headers.items()), response.content,
+        started, time.monotonic() - started
+    )
+    headers = [
+        (name, value) for name, value in response.headers.items()
+        if name.lower() not in _BODY_HEADERS
+    ]
+    return httpx.Response(
+        response.status_code, headers=headers, content=response.content,
+        request=request, extensions=response.extensions
+    )
+
+
+def _handle_request(transport: httpx.HTTPTransport, request: httpx.Request) -> httpx.Response:
+    cassette = _installed
+    if cassette is None:
+        return _originals["httpx"](transport, request)
+    body = request.read()
+    if cassette.mode == "replay":
+        entry = cassette.match(request.method, str(request.url), body)
+        time.sleep(cassette.delay(entry))
+        return _httpx_response(cassette, entry, request)
+    started = time.monotonic()
+    response = _originals["httpx"](transport, request)
+    try:
+        response.read()
+    finally:
+        response.close()
+    return _record_httpx(cassette, request, response, started)
+
+
+async def _handle_async_request(
+    transport: httpx.AsyncHTTPTransport,
+    request: httpx.Request
+) -> httpx.Response:
+    cassette = _installed
+    if cassette is None:
+        return await _originals["httpx_async"](transport, request)
+    body = await request.aread()
+    if cassette.mode == "replay":
+        entry = cassette.match(request.method, str(request.url), body)
+        await asyncio.sleep(cassette.delay(entry))
+        return _httpx_response(cassette, entry, request)
+    started = time.monotonic()
+    response = await _originals["httpx_async"](transport, request)
+    try:
+        await response.aread()
+    finally:
+        await response.aclose()
+    return _record_httpx(cassette, request, response, started)
+
+
+def _requests_body(prepared: Any) -> bytes:
+    body = prepared.body
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+
+def _adapter_send(adapter: Any, request: Any, **kwargs: Any) -> Any:
+    import requests  # type: ignore[import-untyped]
+    from requests.structures import CaseInsensitiveDict  # type: ignore[import-untyped]
+    from requests.utils import get_encoding_from_headers  # type: ignore[import-untyped]
+
+    cassette = _installed
+    if cassette is None:
+        return _originals["requests"](adapter, request, **kwargs)
+    if cassette.mode == "record":
+        started = time.monotonic()
+        response = _originals["requests"](adapter, request, **kwargs)
+        cassette.record(
+            request.method, request.url, list(request.headers.items()), _requests_body(request),
+            response.status_code, list(response.headers.items()), response.content,
+            started, time.monotonic() - started
+        )
+        return response
+
+    entry = cassette.match(request.method, request.url, _requests_body(request))
+    time.sleep(cassette.delay(entry))
+    status, headers, body = cassette.response_parts(entry)
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.reason = entry["response"].get("reason", "")
+    response.connection = adapter
+    return response
+
+
+def install_cassette(cassette: Cassette) -> Cassette:
+    """
+    Route all httpx and requests traffic of the process through a cassette.
+
+    Args:
+        cassette (Cassette): The cassette to record to or replay from
+
+    Returns:
+        Cassette: The installed cassette
+    """
+    global _installed
+    import requests.adapters  # type: ignore[import-untyped]
+
+    with _install_lock:
+        if not _originals:
+            _originals["httpx"] = httpx.HTTPTransport.handle_request
+            _originals["httpx_async"] = httpx.AsyncHTTPTransport.handle_async_request
+            _originals["requests"] = requests.adapters.HTTPAdapter.send
+            httpx.HTTPTransport.handle_request = (  # type: ignore[method-assign]
+                _handle_request  # type: ignore[assignment]
+            )
+            httpx.AsyncHTTPTransport.handle_async_request = (  # type: ignore[method-assign]
+                _handle_async_request  # type: ignore[assignment]
+            )
+            requests.adapters.HTTPAdapter.send = _adapter_send
+        _installed = cassette
+    logger.info(f"Cassette {cassette.mode} mode: {cassette.path}")
+    return cassette
+
+
+def uninstall_cassette() -> None:
+    """Restore the original transports and close the installed cassette."""
+    global _installed
+    import requests.adapters  # type: ignore[import-untyped]
+
+    with _install_lock:
+        cassette, _installed = _installed, None
+        if _originals:
+            httpx.HTTPTransport.handle_request = (  # type: ignore[method-assign]
+                _originals.pop("httpx")
+            )
+            httpx.AsyncHTTPTransport.handle_async_request = (  # type: ignore[method-assign]
+                _originals.pop("httpx_async")
+            )
+            requests.adapters.HTTPAdapter.send = _originals.pop("requests")
+    if cassette is not None:
+        cassette.close()
+        logger.info(f"Cassette {cassette.mode} finished: {cassette.stats()}")
+
+
+class use_cassette:
+    """
+    Context manager installing a cassette for the duration of a block.
+
+    Example:
+        with use_cassette("cassettes/research.jsonl.gz", mode="replay", timing=0) as cassette:
+            ...
+    """
+
+    def __init__(self, path: str, mode: str = "replay", timing: float = 1.0, strict: bool = False):
+        self.cassette = Cassette(path, mode=mode, timing=timing, strict=strict)
+
+    def __enter__(self) -> Cassette:
+        return install_cassette(self.cassette)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        uninstall_cassette()
+
+
+def install_cassette_from_env() -> Optional[Cassette]:
+    """Install the cassette configured by CASSETTE_* environment variables, if any."""
+    cassette = Cassette.from_env()
+    if cassette is None:
+        return None
+    return install_cassette(cassette)
@@ -2,17 +2,58 @@
 Manages the selection and execution of specialized crews for task processing.
 """
 
+import asyncio
 import logging
 import os
-from typing import Tuple, Optional, List, Dict, Any
+from typing import Tuple, Optional, List, Dict, Any, Literal
 from openai import AsyncOpenAI
-from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
 from langchain.schema import HumanMessage, SystemMessage
-from crews.research_crew.crew import ResearchCrew
+from crews.research_crew.depth import apply_depth_profile, get_profile
+from crews.research_crew.parallel import ParallelResearch
+from crews.research_crew.pool import ResearchCrewPool
+from crews.research_crew.tool_cache import default_tool_cache
+from .artifacts import ArtifactRun, ArtifactStore
+from .metrics import CREW_DURATION, CREW_RUNS, LLM_CALLS, LLM_LATENCY, install_crewai_listeners, track
+from .tracing import span
+from .semantic_cache import SemanticCache
+from .task_trace import TaskTrace
+from .model_cascade import (
+    ModelCascade,
+    answer_gate,
+    cascade_for_stage,
+    record_langchain_usage,
+    research_gate,
+    routing_gate,
+)
+import re
+import time
 import traceback
 
 logger = logging.getLogger(__name__)
 
+ResearchDepth = Literal["quick", "standard", "deep"]
+
+FUSED_ROUTER_PROMPT = """
+You are a task router that either answers a task directly or hands it to a specialized crew.
+Available crews:
+- research_crew: For tasks requiring web research, information gathering, and synthesis
+- default: For general tasks that don't fit other specialized crews
+
+If the task is a default task, set crew to "default" and put the complete final answer in "answer".
+If the task needs research_crew, set crew to "research_crew", explain why in "reasoning" and leave "answer" empty.
+For research_crew also set "depth": quick for a simple fact lookup, standard for a typical research
+question, deep for broad topics that need thorough, multi-source analysis.
+"""
+
+
+class RouteAndAnswer(BaseModel):
+    """Structured output of the fused route-and-answer call"""
+    crew: Literal["default", "research_crew"] = Field(..., description="The crew that should handle the task")
+    reasoning: str = Field(..., description="Brief explanation of the routing decision")
+    answer: Optional[str] = Field(None, description="The final answer when crew is default")
+    depth: Optional[ResearchDepth] = Field(None, description="Research depth when crew is research_crew")
+
 class CrewManager:
     """
     Manages the selection and execution of specialized crews for task processing.
@@ -23,49 +64,53 @@ class CrewManager:
     3. Falls back to default processing when needed
     """
     
-    def __init__(self):
-        """Initialize the CrewManager."""
+    def __init__(
+        self,
+        cascade: Optional[ModelCascade] = None,
+        crew_pool: Optional[ResearchCrewPool] = None
+    ):
+        """
+        Initialize the CrewManager.
+        
+        Args:
+            cascade: Model cascade for routing and default answers, e.g. with fake models for benchmarks
+            crew_pool: Pool of research crews, e.g. with a fake crew factory for benchmarks
+        """
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.serper_api_key = os.getenv("SERPER_API_KEY")
-        self.llm = ChatOpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY"),
-            model="gpt-4o-mini",
-            temperature=0
-        )
-        # Add a list to store thought process
-        self.thought_process = []
+        # Cheap-first model cascade per stage; self.llm is the first routing model
+        self.cascade = cascade or ModelCascade(api_key=os.environ.get("OPENAI_API_KEY"))
+        self.llm = self.cascade.llm_for(cascade_for_stage("routing")[0])
+        # Opt-in semantic cache for default processing (None when disabled)
+        self.semantic_cache = SemanticCache.from_env()
+        # Route and answer simple tasks in a single structured-output call
+        self.fused_routing = os.getenv("FUSED_ROUTING_ENABLED", "false").lower() == "true"
+        # Warm ResearchCrew instances, reused across tasks
+        self.crew_pool = crew_pool or ResearchCrewPool.from_env()
+        # Map-reduce research over sub-questions (None unless RESEARCH_MODE=parallel)
+        self.parallel_research = ParallelResearch.from_env()
+        # Per-task crew results, kept on disk until they are published
+        self.artifacts = ArtifactStore.from_env()
+        self._pending_artifacts: Dict[str, ArtifactRun] = {}
+        # Count LLM calls made inside crews by model
+        install_crewai_listeners()
     
-    def callback_function(self, output):
-        """Callback function to track agent's thought process"""
-        try:
-            if hasattr(output, 'output'):
-                thought_entry = f"Task completed!\nOutput: {output.output}\n"
-            elif hasattr(output, 'result'):
-                thought_entry = f"Tool result: {output.result}\n"
-            elif hasattr(output, 'content'):
-                thought_entry = f"Content: {output.content}\n"
-            else:
-                thought_entry = f"Tool used: {str(output)}\n"
-            
-            # Limit the length of very long outputs to prevent Notion API issues
-            if len(thought_entry) > 10000:
-                logger.warning(f"Truncating very long thought entry ({len(thought_entry)} chars)")
-                thought_entry = thought_entry[:10000] + "... [truncated due to length]"
-            
-            # Add to thought process list
-            self.thought_process.append(thought_entry)
-            # Also log for debugging
-            logger.debug(f"Thought process entry added ({len(thought_entry)} chars)")
-        except Exception as e:
-            error_entry = f"Error capturing thought: {str(e)}\n"
-            self.thought_process.append(error_entry)
-            logger.error(error_entry)
+    def warm_up_in_background(self):
+        """Start warming the research crew pool for every model in the research cascade."""
+        return self.crew_pool.warm_up_in_background(cascade_for_stage("research"))
     
     async def determine_crew(self, task_content: str) -> Tuple[str, str]:
         """Determine which crew should handle this task."""
-        # Clear thought process for new task
-        self.thought_process = []
+        crew_name, reasoning, _ = await self.route(task_content)
+        return crew_name, reasoning
+    
+    async def route(self, task_content: str) -> Tuple[str, str, Optional[str]]:
+        """
+        Determine which crew should handle this task and, for research, how deep to go.
         
+        Returns:
+            Tuple[str, str, Optional[str]]: Crew name, reasoning and research depth (if given)
+        """
         system_prompt = """
         You are a task router that determines which specialized crew should handle a given task.
             Available crews:
@@ -76,6 +121,10 @@ class CrewManager:
         research_crew: This task requires gathering information from multiple sources
         OR
         default: This is a general task that doesn't require specialized handling
+        
+        For research_crew, add the research depth in brackets: quick for a simple fact lookup,
+        standard for a typical research question, deep for broad topics needing thorough analysis:
+        research_crew [quick]: This is a simple fact lookup
         """
         
         messages = [
@@ -83,12 +132,15 @@ class CrewManager:
             HumanMessage(content=f"Task: {task_content}")
         ]
         
-        response = self.llm.invoke(messages).content.strip()
+        with span("route"):
+            response, _ = await asyncio.to_thread(self.cascade.invoke, "routing", messages, routing_gate)
         
         # Parse the response
         try:
             crew_name, reasoning = response.split(":", 1)
-            crew_name = crew_name.strip().lower()
+            match = re.match(r"\s*([\w-]+)\s*(?:\[\s*(\w+)\s*\])?", crew_name)
+            crew_name = match.group(1).lower() if match else crew_name.strip().lower()
+            depth = match.group(2).lower() if match and match.group(2) else None
             reasoning = reasoning.strip()
             
             # Validate crew name
@@ -96,34 +148,63 @@ class CrewManager:
                 logger.warning(f"Invalid crew name: {crew_name}. Falling back to default.")
                 crew_name = "default"
                 reasoning = "Fallback due to invalid crew determination."
+                depth = None
             
-            return crew_name, reasoning
+            return crew_name, reasoning, depth
             
         except Exception as e:
             logger.error(f"Error parsing crew determination: {str(e)}")
-            return "default", "Fallback due to error in crew determination."
+            return "default", "Fallback due to error in crew determination.", None
     
-    async def process_with_crew(self, crew_name: str, task_content: str) -> Tuple[str, str]:
-        """Process the task with the appropriate crew."""
+    async def process_with_crew(
+        self,
+        crew_name: str,
+        task_content: str,
+        task_id: Optional[str] = None,
+        depth: Optional[str] = None,
+        scope: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Tuple[str, Any]:
+        """
+        Process the task with the appropriate crew.
+        
+        For crew runs the second element is a TaskTrace holding this task's
+        agent steps; it is rendered to text only when published. `depth` selects
+        the research depth profile (quick, standard or deep) bounding the run.
+        `task_id` and `scope` are passed on to default processing when the crew
+        fails, so its answer is cached like any other default answer, unless
+        `use_cache` is False (e.g. for iterations, which refine a specific page).
+        """
         logger.debug(f"Starting process_with_crew with crew_name={crew_name}")
-        self.thought_process = []  # Reset thought process
         
         if crew_name == "research_crew":
+            # Each task records into its own trace so concurrent runs don't interleave
+            trace = TaskTrace.from_env(task_id)
+            profile = get_profile(depth)
             try:
-                logger.debug("Initializing ResearchCrew")
-                crew = ResearchCrew()
-                
-                # Set callbacks for both agents
-                researcher = crew.researcher()
-                researcher.step_callback = self.callback_function
-                
-                senior_researcher = crew.senior_researcher()
-                senior_researcher.step_callback = self.callback_function
+                def run_crew(model: str):
+                    logger.debug(f"Checking out warm ResearchCrew for {model}")
+                    trace.add("note", f"Running {profile.name} research crew with {model}\n")
+                    with self.crew_pool.checkout(model) as crew:
+                        # Set callbacks for both agents
+                        for crew_agent in crew.agents:
+                            crew_agent.step_callback = trace.callback  # type: ignore[attr-defined]
+                        # Bound iterations, tool calls, tokens and time for this task
+                        apply_depth_profile(crew, profile)
+                        
+                        # This is a synchronous call - don't use await
+                        logger.debug("Starting crew.kickoff()")
+                        with span("crew.research", model=model, depth=profile.name), \
+                                track(CREW_RUNS, CREW_DURATION, crew_name):
+                            if self.parallel_research and profile.max_subquestions > 1:
+                                return self.parallel_research.kickoff(crew, task_content, profile.max_subquestions)
+                            return crew.kickoff(inputs={'topic': task_content})
                 
-                # This is a synchronous call - don't use await
-                logger.debug("Starting crew.kickoff()")
-                result = crew.crew().kickoff(inputs={'topic': task_content})
-                logger.debug(f"crew.kickoff() completed, result type: {type(result)}")
+                # Crew runs take minutes; run them off the event loop
+                result, model = await asyncio.to_thread(
+                    self.cascade.run_escalating, "research", run_crew, research_gate
+                )
+                logger.debug(f"crew.kickoff() completed with {model}, result type: {type(result)}")
                 
                 # Extract result text
                 if hasattr(result, 'raw'):
@@ -133,52 +214,261 @@ class CrewManager:
                     result_text = str(result)
                     logger.debug(f"Converted result to string, length: {len(result_text)}")
                 
-                # Join thought process entries
-                thought_process_text = "\n".join(self.thought_process)
-                logger.debug(f"Joined thought process, length: {len(thought_process_text)}")
+                logger.debug(f"Captured thought process, {len(trace)} bytes ({trace.memory_bytes} in memory)")
+                
+                # Keep the markdown and structured output of this run for publishing
+                with span("artifacts.write"):
+                    run = self.artifacts.new_run(task_id)
+                    run.write_result(result)
+                if task_id:
+                    self._pending_artifacts[task_id] = run
+                logger.debug(f"Stored artifacts for run {run.run_id}: {run.files()}")
+                
+                tool_cache = default_tool_cache()
+                if tool_cache:
+                    logger.info(f"Tool cache stats: {tool_cache.stats()}")
                 
                 logger.debug("Returning results from process_with_crew")
-                return result_text, thought_process_text
+                return result_text, trace
             except Exception as e:
                 logger.error(f"Error with research crew: {str(e)}")
                 logger.error(traceback.format_exc())
+                trace.close()
                 # Fall back to default processing
                 logger.debug("Falling back to default processing")
-                return await self._process_with_default(task_content)
+                return await self._process_with_default(
+                    task_content, task_id, scope, check_cache=use_cache, remember=use_cache
+                )
         else:
             logger.debug("Using default processing")
-            return await self._process_with_default(task_content)
+            return await self._process_with_default(
+                task_content, task_id, scope, check_cache=use_cache, remember=use_cache
+            )
     
-    async def _process_with_default(self, task_content: str) -> Tuple[str, str]:
-        """Process the task with the default OpenAI processing."""
+    def pop_artifacts(self, task_id: str) -> Optional[ArtifactRun]:
+        """Return (and forget) the artifacts of the task's latest crew run, if it had one."""
+        return self._pending_artifacts.pop(task_id, None)
+    
+    async def _process_with_default(
+        self,
+        task_content: str,
+        task_id: Optional[str] = None,
+        scope: Optional[str] = None,
+        check_cache: bool = True,
+        remember: bool = True
+    ) -> Tuple[str, str]:
+        """
+        Process the task with the default OpenAI processing.
+        
+        When the semantic cache is enabled, a sufficiently similar task answered
+        earlier in the same scope is served from the cache without an LLM call.
+        
+        Args:
+            task_content: The task text
+            task_id: The Notion page ID the answer will be published to
+            scope: The cache scope, normally the Notion database ID
+            check_cache: False when the caller already looked the task up
+            remember: False to keep the answer out of the semantic cache
+        """
+        if check_cache:
+            cached = await asyncio.to_thread(self._cached_response, task_content, scope)
+            if cached:
+                return cached
+        
         messages = [
             SystemMessage(content="You are a helpful assistant that processes tasks."),
             HumanMessage(content=f"Task: {task_content}")
         ]
         
-        response = self.llm.invoke(messages).content.strip()
+        with span("default.answer"):
+            response, model = await asyncio.to_thread(
+                self.cascade.invoke, "default", messages, lambda answer: answer_gate(task_content, answer)
+            )
         
         # For default processing, we don't have detailed thought process
-        default_thought = "Processed with default OpenAI processing (no detailed thought process available)"
+        default_thought = f"Processed with default OpenAI processing using {model} (no detailed thought process available)"
+        
+        if remember:
+            await asyncio.to_thread(self._remember_response, task_content, response, task_id, scope)
         
         return response, default_thought
     
-    async def process_task(self, task_content: str, task_id: str) -> Tuple[str, Optional[str]]:
-        """Process a task using the appropriate crew or default processing"""
+    def _cached_response(self, task_content: str, scope: Optional[str]) -> Optional[Tuple[str, str]]:
+        """Return a (response, thought) pair from the semantic cache, or None on a miss."""
+        if not self.semantic_cache:
+            return None
+        try:
+            hit = self.semantic_cache.lookup(task_content, scope or "default")
+        except Exception as e:
+            logger.error(f"Error looking up semantic cache: {str(e)}")
+            return None
+        if not hit:
+            return None
+        response = f"{hit.answer}\n\n(cached from {hit.page_id})"
+        cached_thought = (
+            f"Served from semantic cache (cached from {hit.page_id}, "
+            f"similarity {hit.similarity:.3f})"
+        )
+        return response, cached_thought
+    
+    def _remember_response(
+        self,
+        task_content: str,
+        response: str,
+        task_id: Optional[str],
+        scope: Optional[str]
+    ) -> None:
+        """Store a default-path answer in the semantic cache when it is enabled."""
+        if not self.semantic_cache or not task_id:
+            return
         try:
+            self.semantic_cache.store(task_content, response, task_id, scope or "default")
+        except Exception as e:
+            logger.error(f"Error storing answer in semantic cache: {str(e)}")
+    
+    async def route_and_answer(self, task_content: str) -> RouteAndAnswer:
+        """
+        Route a task and, for simple tasks, answer it in the same LLM call.
+        
+        Args:
+            task_content: The task text
+            
+        Returns:
+            RouteAndAnswer: The routing verdict, with the answer filled in for default tasks
+        """
+        # Keep the raw message so its token usage can be accounted to the task
+        structured_llm = self.llm.with_structured_output(RouteAndAnswer, method="json_schema", include_raw=True)
+        messages = [
+            SystemMessage(content=FUSED_ROUTER_PROMPT),
+            HumanMessage(content=f"Task: {task_content}")
+        ]
+        started = time.perf_counter()
+        with span("route_and_answer", model=self.llm.model_name), \
+                track(LLM_CALLS, LLM_LATENCY, self.llm.model_name):
+            output = await asyncio.to_thread(structured_llm.invoke, messages)
+        usage = getattr(output["raw"], "usage_metadata", None) or {}
+        self.cascade.stats.record_call(
+            self.llm.model_name,
+            time.perf_counter() - started,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0)
+        )
+        record_langchain_usage(self.llm.model_name, output["raw"])
+        if output["parsing_error"] is not None:
+            raise output["parsing_error"]
+        return output["parsed"]
+    
+    async def _process_fused(
+        self,
+        task_content: str,
+        task_id: str,
+        scope: Optional[str] = None,
+        depth: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Process a task with a single route-and-answer call, escalating if needed.
+        
+        Research verdicts go to the research crew. A direct answer must pass the
+        same quality gate as default answers; an empty or failing answer is
+        escalated to default processing and its cascade.
+        """
+        try:
+            verdict = await self.route_and_answer(task_content)
+        except Exception as e:
+            logger.error(f"Error in fused route-and-answer call: {str(e)}")
+            crew_name, _, routed_depth = await self.route(task_content)
+            return await self.process_with_crew(
+                crew_name, task_content, task_id, depth or routed_depth, scope
+            )
+        
+        if verdict.crew == "research_crew":
+            logger.info(f"Fused router sent task {task_id} to Research Crew: {verdict.reasoning}")
+            return await self.process_with_crew(
+                verdict.crew, task_content, task_id, depth or verdict.depth, scope
+            )
+        
+        response = (verdict.answer or "").strip()
+        passed, reason = answer_gate(task_content, response)
+        self.cascade.stats.record_task("fused", 0 if passed else 1)
+        if not passed:
+            logger.warning(f"Escalating fused answer for task {task_id} to default processing: {reason}")
+            return await self._process_with_default(task_content, task_id, scope, check_cache=False)
+        
+        logger.info(f"Answered task {task_id} in the fused routing call")
+        await asyncio.to_thread(self._remember_response, task_content, response, task_id, scope)
+        return response, f"Answered directly by the task router ({verdict.reasoning})"
+    
+    async def process_task(
+        self,
+        task_content: str,
+        task_id: str,
+        scope: Optional[str] = None,
+        depth: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Process a task using the appropriate crew or default processing.
+        
+        An explicit `depth` (e.g. from the task's Notion "Depth" property) takes
+        precedence over the depth chosen by the router. A task similar enough to
+        one answered before in the same scope is served from the semantic cache
+        before any routing call is made.
+        """
+        try:
+            cached = await asyncio.to_thread(self._cached_response, task_content, scope)
+            if cached:
+                return cached
+            
+            if self.fused_routing:
+                return await self._process_fused(task_content, task_id, scope, depth)
+            
             # Determine which crew should handle the task
-            crew_type = await self.determine_crew(task_content)
+            crew_type = await self.route(task_content)
             
             if crew_type[0] == "research_crew":
                 logger.info(f"Using Research Crew for task {task_id}")
-                return await self.process_with_crew(crew_type[0], task_content)
+                return await self.process_with_crew(
+                    crew_type[0], task_content, task_id, depth or crew_type[2], scope
+                )
             else:
                 logger.info(f"Using default processing for task {task_id}")
-                return await self._process_with_default(task_content)
+                return await self._process_with_default(task_content, task_id, scope, check_cache=False)
         except Exception as e:
             logger.error(f"Error in process_task: {str(e)}")
             raise
     
+    async def process_iteration(
+        self,
+        feedback_prompt: str,
+        task_id: str,
+        comments: List[str],
+        depth: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Process an 'Iterate' task using its compacted feedback prompt.
+        
+        Args:
+            feedback_prompt: The prompt built from the task, previous response and new feedback
+            task_id: The Notion page ID
+            comments: The new comments included in the prompt
+            depth: Research depth from the task's "Depth" property, overriding the router
+        """
+        logger.info(f"Processing iteration for task {task_id} with {len(comments)} new comments")
+        # Iterations refine a specific page, so they bypass the semantic cache
+        crew_name, _, routed_depth = await self.route(feedback_prompt)
+        if crew_name == "research_crew":
+            return await self.process_with_crew(
+                crew_name, feedback_prompt, task_id, depth or routed_depth, use_cache=False
+            )
+        
+        messages = [
+            SystemMessage(content="You are a helpful assistant that revises a previous answer based on feedback."),
+            HumanMessage(content=feedback_prompt)
+        ]
+        response, model = await asyncio.to_thread(
+            self.cascade.invoke, "default", messages, lambda answer: answer_gate(feedback_prompt, answer)
+        )
+        return response, f"Processed iteration with default OpenAI processing using {model}"
+    
     async def process_with_research_crew(self, task_content: str, task_id: str) -> Tuple[str, str]:
         """Process the task with the research crew."""
         # Implementation of process_with_research_crew method
@@ -191,7 +481,9 @@ class CrewManager:
             HumanMessage(content=f"Task: {task_content}")
         ]
         
-        response = self.llm.invoke(messages).content.strip()
+        message = await asyncio.to_thread(self.llm.invoke, messages)
+        record_langchain_usage(self.llm.model_name, message)
+        response = message.content.strip()
         
         # For default processing, we don't have detailed thought process
         default_thought = "Processed with default OpenAI processing (no detailed thought process available)"
@@ -0,0 +1,269 @@
+"""
+Builds token-budgeted prompts for 'Iterate' feedback loops.
+
+Comments that were already addressed in a previous iteration are skipped by
+their Notion comment ID, the previous response is reduced to a compact summary,
+and the final prompt is kept under a configurable token budget measured with
+the model's tokenizer.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import tiktoken
+
+from .notion_api import PageComment
+
+logger = logging.getLogger(__name__)
+
+
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Count the tokens in a text exactly as the model's tokenizer would.
+
+    Args:
+        text (str): The text to count
+        model (str): The model whose tokenizer should be used
+
+    Returns:
+        int: The number of tokens
+    """
+    return len(_encoding(model).encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """
+    Truncate a text to at most max_tokens tokens, marking the cut with an ellipsis.
+
+    Args:
+        text (str): The text to truncate
+        max_tokens (int): The maximum number of tokens to keep
+        model (str): The model whose tokenizer should be used
+
+    Returns:
+        str: The text, truncated if it was over the limit
+    """
+    encoding = _encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return ""
+    return encoding.decode(tokens[:max_tokens - 1]).rstrip() + "…"
+
+
+def comment_key(comment: str) -> str:
+    """Return a stable identifier for a comment string without a Notion ID."""
+    return hashlib.sha1(comment.encode("utf-8")).hexdigest()
+
+
+def _comment_id(comment: PageComment) -> str:
+    return comment.id or comment_key(comment.text)
+
+
+class IterationStateStore:
+    """
+    Remembers which comments have been addressed for each page.
+
+    State is kept in a small JSON file so it survives service restarts.
+    """
+
+    def __init__(self, path: str = "./.iteration_state.json"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, List[str]]] = {}
+        if self.path.exists():
+            try:
+                self._state = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.error(f"Error loading iteration state from {self.path}: {str(e)}")
+
+    def addressed(self, page_id: str) -> set:
+        """Return the keys of comments already addressed for a page."""
+        with self._lock:
+            return set(self._state.get(page_id, {}).get("addressed", []))
+
+    def mark_addressed(self, page_id: str, keys: List[str]) -> None:
+        """
+        Record comments as addressed for a page.
+
+        Args:
+            page_id (str): The Notion page ID
+            keys (List[str]): Notion IDs of the comments
+        """
+        with self._lock:
+            entry = self._state.setdefault(page_id, {"addressed": []})
+            known = set(entry["addressed"])
+            entry["addressed"].extend(key for key in keys if key not in known)
+            try:
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(json.dumps(self._state), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.error(f"Error saving iteration state to {self.path}: {str(e)}")
+
+
+@dataclass
+class IterationContext:
+    """A built iteration prompt and the comments it covers."""
+
+    prompt: str
+    token_count: int
+    included_comments: List[PageComment] = field(default_factory=list)
+    deferred_comments: List[PageComment] = field(default_factory=list)
+    skipped_comments: int = 0
+
+
+class IterationContextBuilder:
+    """
+    Builds iteration prompts from new feedback and a compact previous answer.
+
+    Attributes:
+        token_budget (int): Maximum number of tokens in the built prompt
+        summary_tokens (int): Token allowance for the previous response summary
+        model (str): The model whose tokenizer is used for counting
+        state (IterationStateStore): Store of already addressed comments
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        summary_tokens: int = 400,
+        model: str = "gpt-4o-mini",
+        state: Optional[IterationStateStore] = None
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            token_budget (int): Maximum number of tokens in the built prompt
+            summary_tokens (int): Token allowance for the previous response summary
+            model (str): The model whose tokenizer is used for counting
+            state (Optional[IterationStateStore]): Store of addressed comments
+        """
+        self.token_budget = token_budget
+        self.summary_tokens = min(summary_tokens, token_budget // 2)
+        self.model = model
+        self.state = state or IterationStateStore()
+
+    @classmethod
+    def from_env(cls) -> "IterationContextBuilder":
+        """Build the builder from ITERATION_* environment variables."""
+        return cls(
+            token_budget=int(os.getenv("ITERATION_TOKEN_BUDGET", "2000")),
+            summary_tokens=int(os.getenv("ITERATION_SUMMARY_TOKENS", "400")),
+            state=IterationStateStore(os.getenv("ITERATION_STATE_PATH", "./.iteration_state.json"))
+        )
+
+    def summarize_previous(self, previous_response: Optional[str]) -> str:
+        """
+        Reduce the previous response to a compact summary.
+
+        Whole leading paragraphs are kept while they fit the summary allowance;
+        the first paragraph that does not fit is truncated at a token boundary.
+        """
+        if not previous_response:
+            return ""
+        summary = ""
+        for paragraph in previous_response.strip().split("\n\n"):
+            candidate = f"{summary}\n\n{paragraph}" if summary else paragraph
+            if count_tokens(candidate, self.model) > self.summary_tokens:
+                if not summary:
+                    summary = truncate_to_tokens(paragraph, self.summary_tokens, self.model)
+                break
+            summary = candidate
+        return summary
+
+    def build(
+        self,
+        page_id: str,
+        task_title: str,
+        comments: List[PageComment],
+        previous_response: Optional[str] = None
+    ) -> IterationContext:
+        """
+        Build the prompt for an iteration.
+
+        Args:
+            page_id (str): The Notion page ID
+            task_title (str): The original task title
+            comments (List[PageComment]): All comments currently on the page
+            previous_response (Optional[str]): The previously published answer
+
+        Returns:
+            IterationContext: The prompt with the comments it includes. Comments that
+            did not fit the budget are returned as deferred and stay unaddressed.
+        """
+        addressed = self.state.addressed(page_id)
+        # State written before comments were tracked by ID holds hashes of their text
+        new_comments = [
+            comment for comment in comments
+            if _comment_id(comment) not in addressed and comment_key(comment.text) not in addressed
+        ]
+        skipped = len(comments) - len(new_comments)
+
+        title = truncate_to_tokens(task_title, self.token_budget // 4, self.model)
+        header = f"Original task: {title}\n\n"
+        summary = self.summarize_previous(previous_response)
+        if summary:
+            header += f"Summary of the previous response:\n{summary}\n\n"
+        header += "New feedback comments:\n"
+
+        used = count_tokens(header, self.model)
+        lines = []
+        included: List[PageComment] = []
+        deferred: List[PageComment] = []
+        for comment in new_comments:
+            line = f"- {comment.text}\n"
+            line_tokens = count_tokens(line, self.model)
+            remaining = self.token_budget - used
+            if deferred or remaining <= 0:
+                deferred.append(comment)
+                continue
+            if line_tokens > remaining:
+                if included:
+                    deferred.append(comment)
+                    continue
+                # Always include at least one comment, truncated if necessary
+                line = truncate_to_tokens(line.rstrip("\n"), remaining - 1, self.model) + "\n"
+                line_tokens = count_tokens(line, self.model)
+            lines.append(line)
+            included.append(comment)
+            used += line_tokens
+
+        prompt = header + "".join(lines)
+        token_count = count_tokens(prompt, self.model)
+        # Tokens can merge across line boundaries, so re-check the joined prompt
+        while token_count > self.token_budget and len(included) > 1:
+            lines.pop()
+            deferred.insert(0, included.pop())
+            prompt = header + "".join(lines)
+            token_count = count_tokens(prompt, self.model)
+        logger.debug(
+            f"Built iteration context for {page_id}: {len(included)} new comments, "
+            f"{len(deferred)} deferred, {skipped} already addressed, {token_count} tokens"
+        )
+        return IterationContext(
+            prompt=prompt,
+            token_count=token_count,
+            included_comments=included,
+            deferred_comments=deferred,
+            skipped_comments=skipped
+        )
+
+    def mark_addressed(self, page_id: str, context: IterationContext) -> None:
+        """Record the comments included in a context as addressed."""
+        self.state.mark_addressed(page_id, [_comment_id(c) for c in context.included_comments])
@@ -0,0 +1,215 @@
+"""
+Event-loop lag and blocking-call watchdog.
+
+A heartbeat coroutine sleeps for a fixed interval and measures how late it
+wakes up; the delay is the event loop's lag and is exported as a histogram
+and as percentiles over recent heartbeats. A monitor thread checks that the
+heartbeat keeps running: once it is overdue by more than the threshold, the
+loop is blocked by synchronous code, and the monitor captures the loop
+thread's current stack with sys._current_frames() while the blocking call is
+still running, so the offending line is logged, not just the lag.
+
+The cost is one timer per interval on the loop and one mostly sleeping
+thread, so it can stay on in production (LOOP_WATCHDOG_ENABLED=true). Tests
+use assert_no_blocks() to fail when a coroutine reintroduces a blocking call.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+from .metrics import LOOP_BLOCKS, LOOP_LAG, LOOP_LAG_QUANTILES
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99, 1.0)
+
+
+@dataclass
+class BlockReport:
+    """One period during which the event loop was blocked."""
+
+    started: float
+    duration: float
+    stack: str
+
+    @property
+    def location(self) -> str:
+        """The innermost frame of the captured stack, e.g. 'File "x.py", line 3, in f'."""
+        frames = [line.strip() for line in self.stack.splitlines() if line.strip().startswith("File ")]
+        return frames[-1] if frames else "unknown"
+
+
+class LoopBlockedError(AssertionError):
+    """Raised by assert_no_blocks() when the event loop was blocked."""
+
+
+class LoopWatchdog:
+    """
+    Measures event-loop lag and reports the stacks of calls that block the loop.
+
+    Attributes:
+        interval (float): Seconds between heartbeats
+        threshold (float): Lag in seconds above which the loop counts as blocked
+        reports (Deque[BlockReport]): The most recent blocking periods
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        window: int = 2048,
+        max_reports: int = 100,
+        on_block: Optional[Callable[[BlockReport], None]] = None
+    ):
+        """
+        Initialize the watchdog.
+
+        Args:
+            interval (float): Seconds between heartbeats
+            threshold (float): Lag in seconds above which the loop counts as blocked
+            window (int): Number of recent heartbeats the lag percentiles are computed over
+            max_reports (int): Number of recent block reports kept
+            on_block (Optional[Callable[[BlockReport], None]]): Called when a blocking period ends
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.on_block = on_block
+        self.reports: Deque[BlockReport] = deque(maxlen=max_reports)
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._beats = 0
+        self._last_beat = 0.0
+        self._pending: Optional[BlockReport] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["LoopWatchdog"]:
+        """
+        Build a watchdog from LOOP_WATCHDOG_* environment variables.
+
+        Returns None unless LOOP_WATCHDOG_ENABLED is "true".
+        """
+        if os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() != "true":
+            return None
+        return cls(
+            interval=float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1")),
+            threshold=float(os.getenv("LOOP_WATCHDOG_THRESHOLD", "0.25"))
+        )
+
+    def start(self) -> "LoopWatchdog":
+        """Start watching the running event loop. Must be called from a coroutine."""
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._monitor = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._monitor.start()
+        logger.info(f"Event loop watchdog started (interval {self.interval}s, threshold {self.threshold}s)")
+        return self
+
+    def stop(self) -> None:
+        """Stop the heartbeat and the monitor thread."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._monitor is not None and self._monitor is not threading.current_thread():
+            self._monitor.join(timeout=1)
+        self._monitor = None
+
+    async def __aenter__(self) -> "LoopWatchdog":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # Let the heartbeat observe a block that ended just before exiting
+        await asyncio.sleep(0)
+        self.stop()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._record_lag(max(0.0, time.monotonic() - self._last_beat - self.interval))
+
+    def _record_lag(self, lag: float) -> None:
+        LOOP_LAG.observe(lag)
+        with self._lock:
+            self._samples.append(lag)
+            self._beats += 1
+            update_quantiles = self._beats % 50 == 0
+            report, self._pending = self._pending, None
+        if update_quantiles:
+            for quantile, value in self.percentiles().items():
+                LOOP_LAG_QUANTILES.labels(str(quantile)).set(value)
+        if lag < self.threshold:
+            return
+
+        if report is None:
+            # Shorter than the monitor's check interval, or the monitor missed it
+            report = BlockReport(started=time.time() - lag, duration=lag, stack="")
+        report.duration = lag
+        LOOP_BLOCKS.inc()
+        self.reports.append(report)
+        logger.warning(f"Event loop was blocked for {lag:.3f}s at {report.location}")
+        if self.on_block is not None:
+            self.on_block(report)
+
+    def _watch(self) -> None:
+        check_interval = min(self.interval, self.threshold / 2)
+        reported_beat = None
+        while not self._stopped.wait(check_interval):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            if overdue < self.threshold or reported_beat == last_beat:
+                continue
+            # Still blocked: the loop thread's stack shows the call that is holding it
+            reported_beat = last_beat
+            frames = sys._current_frames()
+            frame = frames.get(self._loop_thread) if self._loop_thread is not None else None
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            del frame, frames
+            with self._lock:
+                self._pending = BlockReport(started=time.time() - overdue, duration=overdue, stack=stack)
+            logger.warning(f"Event loop blocked for {overdue:.3f}s so far, loop thread stack:\n{stack}")
+
+    def percentiles(self) -> Dict[float, float]:
+        """
+        Return lag percentiles over recent heartbeats.
+
+        Returns:
+            Dict[float, float]: Lag in seconds per quantile (0.5, 0.9, 0.99 and 1.0 for the maximum)
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return dict.fromkeys(QUANTILES, 0.0)
+        return {
+            quantile: samples[min(len(samples) - 1, int(quantile * len(samples)))]
+            for quantile in QUANTILES
+        }
+
+    def assert_no_blocks(self) -> None:
+        """
+        Raise LoopBlockedError if the loop was blocked since the watchdog started.
+
+        Raises:
+            LoopBlockedError: Listing each block's duration and stack
+        """
+        reports: List[BlockReport] = list(self.reports)
+        if reports:
+            details = "\n\n".join(
+                f"Blocked for {report.duration:.3f}s at {report.location}:\n{report.stack}" for report in reports
+            )
+            raise LoopBlockedError(f"Event loop was blocked {len(reports)} time(s):\n\n{details}")
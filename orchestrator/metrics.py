@@ -0,0 +1,496 @@
+"""
+In-process metrics registry exposed in the Prometheus text format.
+
+Counters, gauges and fixed-bucket histograms are kept in memory and rendered
+on request, either by the worker's small HTTP server (METRICS_PORT) or by a
+FastAPI app via add_fastapi_route(). Recording is a dictionary lookup and a
+locked addition, so it is safe on hot paths such as every Notion request.
+
+The service's own metrics (poll cycles, queue depth, Notion requests by
+endpoint and status, LLM calls, tokens and cost by model, model cascade
+escalations, crew runs and publishing) are defined at module level and
+recorded by the orchestrator components.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, cast
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans single Notion requests up to deep research runs
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the with-block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    """
+    A named metric with optional labels.
+
+    Attributes:
+        name (str): The metric name
+        documentation (str): The HELP text
+        labelnames (Tuple[str, ...]): Label names, in order
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **labels: str):
+        """
+        Return the child for a set of label values, creating it on first use.
+
+        Args:
+            *values (str): Label values in labelnames order
+            **labels (str): Label values by name
+
+        Returns:
+            The child metric to record into
+        """
+        key = tuple(str(v) for v in values) if values else tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, such as a queue depth."""
+
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into fixed, cumulative buckets.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets, excluding +Inf
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float("inf")))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+_M = TypeVar("_M", bound=_Metric)
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _M) -> _M:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return cast(_M, existing)
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+POLL_CYCLES = REGISTRY.counter("notion_ops_poll_cycles_total", "Notion poll cycles run", ["kind"])
+POLL_DURATION = REGISTRY.histogram(
+    "notion_ops_poll_duration_seconds", "Duration of a poll cycle including task processing", ["kind"]
+)
+TASKS_QUEUED = REGISTRY.gauge("notion_ops_tasks_queued", "Tasks found waiting in the last poll", ["kind"])
+TASKS_PROCESSED = REGISTRY.counter("notion_ops_tasks_total", "Tasks processed", ["kind", "status"])
+TASK_DURATION = REGISTRY.histogram("notion_ops_task_duration_seconds", "End-to-end task processing time", ["kind"])
+NOTION_REQUESTS = REGISTRY.counter(
+    "notion_ops_notion_requests_total", "Notion API requests", ["endpoint", "status"]
+)
+NOTION_LATENCY = REGISTRY.histogram(
+    "notion_ops_notion_request_duration_seconds", "Notion API request latency", ["endpoint"]
+)
+LLM_CALLS = REGISTRY.counter("notion_ops_llm_calls_total", "LLM calls", ["model", "status"])
+LLM_LATENCY = REGISTRY.histogram("notion_ops_llm_call_duration_seconds", "LLM call latency", ["model"])
+LLM_TOKENS = REGISTRY.counter("notion_ops_llm_tokens_total", "LLM tokens by model", ["model", "kind"])
+LLM_COST = REGISTRY.counter("notion_ops_llm_cost_usd_total", "Estimated LLM cost in USD", ["model"])
+CASCADE_TASKS = REGISTRY.counter(
+    "notion_ops_cascade_tasks_total", "Model cascade runs by stage", ["stage", "escalated"]
+)
+CASCADE_ESCALATIONS = REGISTRY.counter(
+    "notion_ops_cascade_escalations_total", "Escalations to a larger model by stage", ["stage"]
+)
+CASCADE_CALL_DURATION = REGISTRY.histogram(
+    "notion_ops_cascade_call_duration_seconds", "Cascade attempt latency, including crew runs", ["model"]
+)
+CREW_RUNS = REGISTRY.counter("notion_ops_crew_runs_total", "Crew kickoffs", ["crew", "status"])
+CREW_DURATION = REGISTRY.histogram("notion_ops_crew_run_duration_seconds", "Crew kickoff duration", ["crew"])
+PUBLISHES = REGISTRY.counter("notion_ops_publish_total", "Results published to Notion pages", ["status"])
+PUBLISH_DURATION = REGISTRY.histogram(
+    "notion_ops_publish_duration_seconds", "Time to publish a result to its Notion page"
+)
+LOOP_LAG = REGISTRY.histogram(
+    "notion_ops_event_loop_lag_seconds", "Delay of the event loop watchdog's heartbeats",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+LOOP_LAG_QUANTILES = REGISTRY.gauge(
+    "notion_ops_event_loop_lag_quantile_seconds", "Event loop lag percentiles over recent heartbeats", ["quantile"]
+)
+LOOP_BLOCKS = REGISTRY.counter(
+    "notion_ops_event_loop_blocks_total", "Times the event loop was blocked longer than the watchdog threshold"
+)
+
+
+@contextmanager
+def track(counter: Counter, histogram: Histogram, *labels: str) -> Iterator[None]:
+    """
+    Count a call by outcome and observe its duration.
+
+    The counter gets the given labels plus a final "ok" or "error" status label;
+    the histogram gets the given labels only.
+    """
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - started)
+        counter.labels(*labels, status).inc()
+
+
+_ID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+
+
+def endpoint_label(method: str, path: str) -> str:
+    """
+    Turn a request into a low-cardinality endpoint label, e.g. "PATCH /pages/{id}".
+
+    Args:
+        method (str): The HTTP method
+        path (str): The URL path
+
+    Returns:
+        str: The method and path with IDs replaced and the API version prefix dropped
+    """
+    segments = [s for s in path.split("/") if s]
+    if segments and re.match(r"^v\d+$", segments[0]):
+        segments = segments[1:]
+    return f"{method} /" + "/".join("{id}" if _ID_SEGMENT.match(s) else s for s in segments)
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """
+    httpx transport that records request counts by endpoint and status, and latency.
+
+    Attributes:
+        transport (httpx.BaseTransport): The transport that sends the requests
+    """
+
+    def __init__(
+        self,
+        transport: Optional[httpx.BaseTransport] = None,
+        requests: Counter = NOTION_REQUESTS,
+        latency: Histogram = NOTION_LATENCY
+    ):
+        self.transport = transport or httpx.HTTPTransport()
+        self._requests = requests
+        self._latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = endpoint_label(request.method, request.url.path)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.transport.handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            self._latency.labels(endpoint).observe(time.perf_counter() - started)
+            self._requests.labels(endpoint, status).inc()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+_crewai_listeners_installed = False
+_crewai_listeners_lock = threading.Lock()
+
+
+def install_crewai_listeners() -> None:
+    """
+    Record LLM calls made inside crews from CrewAI's event bus. Safe to call repeatedly.
+
+    Call latency is taken from the events' timestamps, so it does not include
+    the time the handlers wait to be dispatched.
+    """
+    global _crewai_listeners_installed
+    with _crewai_listeners_lock:
+        if _crewai_listeners_installed:
+            return
+        _crewai_listeners_installed = True
+
+    from crewai.events import crewai_event_bus
+    from crewai.events.types.llm_events import (
+        LLMCallCompletedEvent,
+        LLMCallFailedEvent,
+        LLMCallStartedEvent,
+    )
+
+    started: Dict[str, float] = {}
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def on_llm_started(source, event):
+        started[event.call_id] = event.timestamp.timestamp()
+
+    def finish(event, status: str) -> None:
+        model = event.model or "unknown"
+        begun = started.pop(event.call_id, None)
+        if begun is not None:
+            LLM_LATENCY.labels(model).observe(max(0.0, event.timestamp.timestamp() - begun))
+        LLM_CALLS.labels(model, status).inc()
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def on_llm_completed(source, event):
+        finish(event, "ok")
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def on_llm_failed(source, event):
+        finish(event, "error")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request: {format % args}")
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serve GET /metrics from a daemon thread.
+
+    Args:
+        port (int): The port to listen on (0 picks a free port)
+        host (str): The interface to bind
+        registry (MetricsRegistry): The metrics to expose
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_metrics_server_from_env() -> Optional[ThreadingHTTPServer]:
+    """Start the metrics server on METRICS_PORT, or return None when it is not set."""
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port), os.getenv("METRICS_HOST", "0.0.0.0"))
+    except Exception as e:
+        logger.error(f"Error starting metrics server: {str(e)}")
+        return None
+
+
+def add_fastapi_route(app, path: str = "/metrics", registry: MetricsRegistry = REGISTRY) -> None:
+    """
+    Expose the metrics on a FastAPI app.
+
+    Args:
+        app: The FastAPI application
+        path (str): The route path
+        registry (MetricsRegistry): The metrics to expose
+    """
+    from fastapi import Response  # type: ignore[import-not-found]
+
+    @app.get(path, include_in_schema=False)
+    def metrics():
+        return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,336 @@
+"""
+Model cascade with quality-gated escalation.
+
+Each processing stage (routing, default answers, research crews) has an ordered
+list of models. The cheapest model is tried first and a quality gate decides
+whether its output is good enough or the next, larger model should be tried.
+Escalations, latency and estimated cost are recorded per stage and model.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .accounting import record_llm_usage
+from .metrics import (
+    CASCADE_CALL_DURATION,
+    CASCADE_ESCALATIONS,
+    CASCADE_TASKS,
+    LLM_CALLS,
+    LLM_COST,
+    LLM_LATENCY,
+    LLM_TOKENS,
+    track,
+)
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Default model order per stage, cheapest first
+DEFAULT_CASCADES = {
+    "routing": ["gpt-4o-mini"],
+    "default": ["gpt-4o-mini", "gpt-4o"],
+    "research": ["openai/gpt-4o-mini", "openai/gpt-4o"],
+}
+
+# USD per million (prompt, completion) tokens, used for cost estimates
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Fraction of the prompt price charged for prompt tokens served from the provider's cache
+CACHED_PROMPT_DISCOUNT = 0.5
+
+_HEDGING_RE = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|i cannot|i can'?t|"
+    r"unable to (?:answer|help|determine)|as an ai\b|i don'?t have (?:access|enough information))",
+    re.IGNORECASE
+)
+
+GateResult = Tuple[bool, str]
+
+
+def cascade_for_stage(stage: str) -> List[str]:
+    """
+    Return the model order for a stage.
+
+    The order can be overridden with a comma-separated MODEL_CASCADE_<STAGE>
+    environment variable, e.g. MODEL_CASCADE_DEFAULT=gpt-4o-mini,gpt-4o.
+    """
+    configured = os.getenv(f"MODEL_CASCADE_{stage.upper()}")
+    if configured:
+        models = [model.strip() for model in configured.split(",") if model.strip()]
+        if models:
+            return models
+    return list(DEFAULT_CASCADES[stage])
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimate the USD cost of a call from its token counts; cached tokens are part of the prompt tokens."""
+    prompt_price, completion_price = MODEL_PRICES.get(model.split("/")[-1], (0.0, 0.0))
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    prompt_cost = (prompt_tokens - cached_tokens) * prompt_price + cached_tokens * prompt_price * CACHED_PROMPT_DISCOUNT
+    return (prompt_cost + completion_tokens * completion_price) / 1_000_000
+
+
+def answer_gate(task_content: str, answer: str) -> GateResult:
+    """
+    Heuristic quality gate for default-processing answers.
+
+    Args:
+        task_content (str): The task text
+        answer (str): The answer produced by the model
+
+    Returns:
+        GateResult: (passed, reason)
+    """
+    text = (answer or "").strip()
+    if not text:
+        return False, "empty answer"
+    if _HEDGING_RE.search(text[:500]):
+        return False, "answer hedges or refuses"
+    if len(task_content) > 200 and len(text) < 80:
+        return False, "answer is too short for a detailed task"
+    return True, "ok"
+
+
+def routing_gate(response: str) -> GateResult:
+    """Quality gate for routing responses: they must parse as '<crew> [<depth>]: <reason>'."""
+    crew_name, _, reasoning = (response or "").partition(":")
+    if crew_name.split("[")[0].strip().lower() not in ("research_crew", "default") or not reasoning.strip():
+        return False, "unparseable routing response"
+    return True, "ok"
+
+
+def research_gate(result: Any) -> GateResult:
+    """Quality gate for research crew results based on the structured ResearchOutput."""
+    output = getattr(result, "pydantic", None)
+    if output is None:
+        return False, "no structured research output"
+    if len(getattr(output, "key_findings", []) or []) < 3:
+        return False, "fewer than 3 key findings"
+    initial = getattr(output, "initial_research", None)
+    if initial is None or len(getattr(initial, "sources", []) or []) < 2:
+        return False, "fewer than 2 sources"
+    return True, "ok"
+
+
+def record_langchain_usage(model: str, message: Any) -> None:
+    """Record a langchain chat response's token usage, including cached prompt tokens, for the current task."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    record_llm_usage(
+        model, usage.get("input_tokens", 0), usage.get("output_tokens", 0), details.get("cache_read", 0) or 0
+    )
+
+
+class CascadeStats:
+    """
+    Thread-safe counters for cascade attempts, escalations, latency and cost.
+
+    Every record is also exported to the Prometheus metrics registry, so the
+    escalation rate and per-model latency and cost are visible in production.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+        self._models: Dict[str, Dict[str, float]] = {}
+
+    def record_call(
+        self,
+        model: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ) -> None:
+        """Record one model call."""
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        CASCADE_CALL_DURATION.labels(model).observe(latency)
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+        LLM_COST.labels(model).inc(cost)
+        with self._lock:
+            entry = self._models.setdefault(model, {
+                "calls": 0, "latency_seconds": 0.0, "prompt_tokens": 0,
+                "completion_tokens": 0, "cost_usd": 0.0
+            })
+            entry["calls"] += 1
+            entry["latency_seconds"] += latency
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += cost
+
+    def record_task(self, stage: str, escalations: int) -> None:
+        """Record the outcome of one cascade run for a stage."""
+        CASCADE_TASKS.labels(stage, "true" if escalations else "false").inc()
+        CASCADE_ESCALATIONS.labels(stage).inc(escalations)
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"tasks": 0, "escalations": 0, "escalated_tasks": 0})
+            entry["tasks"] += 1
+            entry["escalations"] += escalations
+            if escalations:
+                entry["escalated_tasks"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return a copy of the recorded statistics.
+
+        Returns:
+            dict: Per-stage escalation rates and per-model calls, mean latency and cost
+        """
+        with self._lock:
+            stages = {
+                stage: dict(entry, escalation_rate=(
+                    entry["escalated_tasks"] / entry["tasks"] if entry["tasks"] else 0.0
+                ))
+                for stage, entry in self._stages.items()
+            }
+            models = {
+                model: dict(entry, mean_latency_seconds=(
+                    entry["latency_seconds"] / entry["calls"] if entry["calls"] else 0.0
+                ))
+                for model, entry in self._models.items()
+            }
+        return {"stages": stages, "models": models}
+
+
+class ModelCascade:
+    """
+    Runs chat prompts through a per-stage model cascade.
+
+    Attributes:
+        stats (CascadeStats): Recorded escalation, latency and cost statistics
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        stats: Optional[CascadeStats] = None,
+        llm_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        Initialize the cascade.
+
+        Args:
+            api_key (Optional[str]): The OpenAI API key
+            stats (Optional[CascadeStats]): Statistics collector to record into
+            llm_factory (Optional[Callable[[str], Any]]): Builds the chat model for a model
+                name (defaults to ChatOpenAI)
+        """
+        self.api_key = api_key
+        self.stats = stats or CascadeStats()
+        self.llm_factory = llm_factory
+        self._llms: Dict[str, Any] = {}
+
+    def llm_for(self, model: str):
+        """Return a cached chat model client for a model."""
+        llm = self._llms.get(model)
+        if llm is None:
+            if self.llm_factory is not None:
+                llm = self.llm_factory(model)
+            else:
+                from langchain_openai import ChatOpenAI
+                from pydantic import SecretStr
+
+                # Without a key, ChatOpenAI falls back to OPENAI_API_KEY
+                api_key = SecretStr(self.api_key) if self.api_key else None
+                llm = ChatOpenAI(api_key=api_key, model=model, temperature=0)
+            self._llms[model] = llm
+        return llm
+
+    def invoke(self, stage: str, messages: List[Any], gate: Callable[[str], GateResult]) -> Tuple[str, str]:
+        """
+        Run messages through the stage's cascade until an answer passes the gate.
+
+        Args:
+            stage (str): The stage name, e.g. "routing" or "default"
+            messages (List[Any]): The langchain messages to send
+            gate (Callable[[str], GateResult]): Quality gate applied to each answer
+
+        Returns:
+            Tuple[str, str]: The accepted answer and the model that produced it.
+            The last model's answer is accepted regardless of the gate.
+        """
+        models = cascade_for_stage(stage)
+        escalations = 0
+        content = ""
+        for position, model in enumerate(models):
+            started = time.perf_counter()
+            with span("llm", stage=stage, model=model) as llm_span, track(LLM_CALLS, LLM_LATENCY, model):
+                response = self.llm_for(model).invoke(messages)
+            latency = time.perf_counter() - started
+            usage = getattr(response, "usage_metadata", None) or {}
+            llm_span.set_attribute("input_tokens", usage.get("input_tokens", 0))
+            llm_span.set_attribute("output_tokens", usage.get("output_tokens", 0))
+            self.stats.record_call(
+                model, latency, usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            )
+            record_langchain_usage(model, response)
+            content = response.content.strip()
+
+            if position == len(models) - 1:
+                break
+            passed, reason = gate(content)
+            if passed:
+                break
+            escalations += 1
+            logger.info(f"Escalating {stage} from {model} to {models[position + 1]}: {reason}")
+
+        self.stats.record_task(stage, escalations)
+        return content, model
+
+    def run_escalating(
+        self,
+        stage: str,
+        run: Callable[[str], Any],
+        gate: Callable[[Any], GateResult]
+    ) -> Tuple[Any, str]:
+        """
+        Run an arbitrary callable per model, e.g. a crew kickoff, escalating on gate failure.
+
+        Args:
+            stage (str): The stage name, e.g. "research"
+            run (Callable[[str], Any]): Called with the model name; returns the result
+            gate (Callable[[Any], GateResult]): Quality gate applied to each result
+
+        Returns:
+            Tuple[Any, str]: The accepted result and the model that produced it
+        """
+        models = cascade_for_stage(stage)
+        escalations = 0
+        result = None
+        for position, model in enumerate(models):
+            started = time.perf_counter()
+            result = run(model)
+            latency = time.perf_counter() - started
+            usage = getattr(result, "token_usage", None)
+            self.stats.record_call(
+                model,
+                latency,
+                getattr(usage, "prompt_tokens", 0) or 0,
+                getattr(usage, "completion_tokens", 0) or 0
+            )
+            if usage is not None:
+                record_llm_usage(
+                    model,
+                    getattr(usage, "prompt_tokens", 0) or 0,
+                    getattr(usage, "completion_tokens", 0) or 0,
+                    getattr(usage, "cached_prompt_tokens", 0) or 0,
+                    calls=getattr(usage, "successful_requests", 0) or 0
+                )
+
+            if position == len(models) - 1:
+                break
+            passed, reason = gate(result)
+            if passed:
+                break
+            escalations += 1
+            logger.info(f"Escalating {stage} from {model} to {models[position + 1]}: {reason}")
+
+        self.stats.record_task(stage, escalations)
+        return result, model
@@ -3,14 +3,55 @@ Provides a NotionAPI class to interact with the Notion API for reading and updat
 """
 
 import logging
-from typing import Dict, Any, Optional, List
-from notion_client import Client
+from typing import Dict, Any, NamedTuple, Optional, List, Union
+import httpx
+from notion_client import APIErrorCode, Client
 from openai import OpenAI
+import os
 import traceback
 import asyncio
+import contextvars
+import functools
+from .accounting import AccountedTransport
+from .metrics import MeteredTransport
+from .tracing import TracedTransport
+from .notion_blocks import (
+    batch_blocks,
+    divider,
+    heading,
+    markdown_to_blocks,
+    plain_text,
+    plain_text_blocks,
+)
 
 logger = logging.getLogger(__name__)
 
+THOUGHT_PROCESS_HEADING = "Thought Process"
+
+NOTION_VERSION = "2022-06-28"
+NOTION_BASE_URL = "https://api.notion.com"
+
+
+class PageComment(NamedTuple):
+    """A comment flattened to a prompt line, with the Notion comment ID it is tracked by."""
+    
+    id: str
+    text: str
+
+
+def _thought_process_index(blocks: List[Dict[str, Any]]) -> Optional[int]:
+    """Return where the trailing thought process section starts, including its divider."""
+    for index in range(len(blocks) - 1, -1, -1):
+        block_type = blocks[index].get("type", "")
+        if not block_type.startswith("heading_"):
+            continue
+        if plain_text(blocks[index][block_type].get("rich_text", [])) == THOUGHT_PROCESS_HEADING:
+            if index > 0 and blocks[index - 1].get("type") == "divider":
+                return index - 1
+            return index
+    return None
+
+
 class NotionAPI:
     """
     A class to handle all Notion API interactions.
@@ -21,7 +62,14 @@ class NotionAPI:
         database_id (str): The Notion database ID to query
     """
     
-    def __init__(self, notion_api_key: str, openai_api_key: str, database_id: str = "180ee158-0432-8041-b9f0-c28906016b3f"):
+    def __init__(
+        self,
+        notion_api_key: str,
+        openai_api_key: str,
+        database_id: str = "180ee158-0432-8041-b9f0-c28906016b3f",
+        transport: Optional[httpx.BaseTransport] = None,
+        query_mode: Optional[str] = None
+    ):
         """
         Initialize the NotionAPI with both Notion and OpenAI API keys.
         
@@ -29,11 +77,69 @@ class NotionAPI:
             notion_api_key (str): The Notion API key for authentication
             openai_api_key (str): The OpenAI API key for LLM integration
             database_id (str): The Notion database ID to query
+            transport (Optional[httpx.BaseTransport]): Sends the HTTP requests, e.g. an
+                in-process fake for benchmarks; defaults to the network
+            query_mode (Optional[str]): "single" to read the first page of task query results,
+                "paginated" to follow cursors through all of them (NOTION_QUERY_MODE, default single)
         """
-        self.client = Client(auth=notion_api_key)
+        # Every request is counted by endpoint and status, traced as a span of the current task
+        # and accounted to that task
+        self.client = Client(
+            auth=notion_api_key,
+            client=httpx.Client(
+                transport=TracedTransport(AccountedTransport(MeteredTransport(transport)))
+            ),
+            # Database queries and property formats follow this version (NOTION_VERSION overrides it)
+            notion_version=os.getenv("NOTION_VERSION", NOTION_VERSION),
+            # NOTION_BASE_URL points the client at another server, e.g. the local emulator
+            base_url=os.getenv("NOTION_BASE_URL") or NOTION_BASE_URL
+        )
         self.openai_client = OpenAI(api_key=openai_api_key)
         self.database_id = database_id
+        # Cleared when the database rejects the extra properties, e.g. missing usage columns
+        self.extra_properties_supported = True
+        # Single-page queries return at most 100 tasks per poll; paginated ones return the whole
+        # backlog, up to NOTION_QUERY_MAX_PAGES pages (0 for no limit)
+        self.query_mode = (query_mode or os.getenv("NOTION_QUERY_MODE") or "single").lower()
+        self.query_max_pages = int(os.getenv("NOTION_QUERY_MAX_PAGES", "0"))
         
+    def _query_database(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Query the task database.
+        
+        notion-client 3 dropped databases.query in favour of data sources, so the
+        endpoint is called directly; it behaves the same with either client version.
+        """
+        return self.client.request(path=f"databases/{self.database_id}/query", method="POST", body=body)
+    
+    def _status_filter(self, status: str) -> Dict[str, Any]:
+        return {"filter": {"property": "Status", "status": {"equals": status}}}
+    
+    async def _query_tasks(self, status: str) -> Dict[str, Any]:
+        """
+        Query the tasks with a Status, following cursors in paginated mode.
+        
+        Returns:
+            The query response; in paginated mode its results are those of all pages
+            read, and has_more is only set when NOTION_QUERY_MAX_PAGES cut the walk short
+        """
+        body = self._status_filter(status)
+        response = await self._run_notion_api(self._query_database, body)
+        if self.query_mode != "paginated":
+            return response
+        results = list(response.get("results", []))
+        pages = 1
+        while response.get("has_more") and response.get("next_cursor"):
+            if self.query_max_pages and pages >= self.query_max_pages:
+                logger.warning(f"Stopped reading '{status}' tasks after {pages} pages")
+                break
+            response = await self._run_notion_api(
+                self._query_database, dict(body, start_cursor=response["next_cursor"])
+            )
+            results.extend(response.get("results", []))
+            pages += 1
+        return dict(response, results=results)
+    
     async def get_tasks_to_execute(self) -> List[Dict[str, Any]]:
         """
         Query for all tasks with Status = 'Execute'.
@@ -42,17 +148,7 @@ class NotionAPI:
             list: List of tasks to be executed
         """
         try:
-            response = self.client.databases.query(
-                **{
-                    "database_id": self.database_id,
-                    "filter": {
-                        "property": "Status",
-                        "status": {
-                            "equals": "Execute"
-                        }
-                    }
-                }
-            )
+            response = await self._query_tasks("Execute")
             return response.get('results', [])
         except Exception as e:
             logger.error(f"Error querying tasks to execute: {str(e)}")
@@ -66,17 +162,7 @@ class NotionAPI:
             list: List of tasks to be iterated
         """
         try:
-            response = self.client.databases.query(
-                **{
-                    "database_id": self.database_id,
-                    "filter": {
-                        "property": "Status",
-                        "status": {
-                            "equals": "Iterate"
-                        }
-                    }
-                }
-            )
+            response = await self._query_tasks("Iterate")
             return response.get('results', [])
         except Exception as e:
             logger.error(f"Error querying tasks to iterate: {str(e)}")
@@ -93,21 +179,28 @@ class NotionAPI:
             The task details from Notion
         """
         try:
-            return self.client.pages.retrieve(page_id=page_id)
+            return await self._run_notion_api(self.client.pages.retrieve, page_id=page_id)
         except Exception as e:
             logger.error(f"Error retrieving task {page_id}: {str(e)}")
             raise
     
     async def _run_notion_api(self, func, *args, **kwargs):
-        """Run a synchronous Notion API call in a thread pool."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+        """
+        Run a synchronous Notion API call in a thread pool, keeping the task's trace context.
+        
+        Every client call made from a coroutine goes through here, so the event loop
+        is never blocked on a Notion request.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
     
     async def update_task_status(
         self, 
         page_id: str, 
         status: str, 
-        summary: Optional[str] = None
+        summary: Optional[str] = None,
+        properties: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Update a task's status and optionally add a summary.
@@ -116,25 +209,42 @@ class NotionAPI:
             page_id: The Notion page ID
             status: The new status value
             summary: Optional summary text to add
+            properties: Optional extra properties, e.g. usage totals. If the database
+                rejects them, the update is retried without them and they are not sent again.
             
         Returns:
             The updated page data
         """
         try:
             logger.debug(f"Updating task {page_id} status to '{status}'")
-            properties = {
+            base_properties = {
                 "Status": {"status": {"name": status}}
             }
             
             if summary:
                 logger.debug(f"Adding summary (length: {len(summary)})")
-                properties["Response"] = {"rich_text": [{"text": {"content": summary[:2000]}}]}
+                base_properties["Response"] = {"rich_text": [{"text": {"content": summary[:2000]}}]}
+            
+            if properties and self.extra_properties_supported:
+                try:
+                    return await self._run_notion_api(
+                        self.client.pages.update,
+                        page_id=page_id,
+                        properties={**properties, **base_properties}
+                    )
+                except Exception as e:
+                    if getattr(e, "code", None) != APIErrorCode.ValidationError:
+                        raise
+                    logger.warning(
+                        f"Database rejected properties {sorted(properties)}, no longer sending them: {str(e)}"
+                    )
+                    self.extra_properties_supported = False
             
             # Use the helper method to run this in a thread pool
             response = await self._run_notion_api(
                 self.client.pages.update,
                 page_id=page_id,
-                properties=properties
+                properties=base_properties
             )
             logger.debug(f"Task status updated successfully for {page_id}")
             return response
@@ -157,7 +267,8 @@ class NotionAPI:
                 "Response": {"rich_text": [{"text": {"content": f"Error: {error_message[:2000]}"}}]}
             }
             
-            self.client.pages.update(
+            await self._run_notion_api(
+                self.client.pages.update,
                 page_id=page_id,
                 properties=properties
             )
@@ -173,87 +284,46 @@ class NotionAPI:
                 }
             }]
             
-            await self.update_page_content(page_id, blocks)
+            await self.update_page_content(page_id, blocks, replace=False)
             logger.info(f"Error logged to page {page_id}")
         except Exception as e:
             logger.error(f"Error creating error log for {page_id}: {str(e)}")
     
-    async def update_page_content(self, page_id: str, content: str, thought_process: str = None) -> None:
-        """Update the content of a page with formatted blocks and thought process."""
+    async def update_page_content(
+        self,
+        page_id: str,
+        content: Union[str, List[Dict[str, Any]]],
+        thought_process: str = None,
+        replace: bool = True
+    ) -> None:
+        """
+        Update the content of a page with formatted blocks and thought process.
+        
+        Args:
+            page_id: The Notion page ID
+            content: Prepared blocks, or markdown text rendered under an "AI Response" heading
+            thought_process: Optional thought process appended as plain text (text content only)
+            replace: Whether to delete the page's existing blocks first
+        """
         try:
             logger.debug(f"Updating page content for {page_id}")
-            # First, retrieve existing children to avoid duplicating content
-            existing = self.client.blocks.children.list(block_id=page_id)
-            
-            # Delete existing children if any
-            for block in existing.get("results", []):
-                logger.debug(f"Deleting existing block {block['id']}")
-                self.client.blocks.delete(block_id=block["id"])
-            
-            # Create new content blocks
-            blocks = []
-            
-            # Add a heading
-            blocks.append({
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": "AI Response"}}]
-                }
-            })
-            
-            # Split long text into chunks to avoid Notion's 2000 character limit
-            content_chunks = self._chunk_text(content)
-            logger.debug(f"Split content into {len(content_chunks)} chunks")
-            
-            # Add the content as paragraph blocks
-            for i, chunk in enumerate(content_chunks):
-                logger.debug(f"Adding content chunk {i+1}/{len(content_chunks)} (length: {len(chunk)})")
-                blocks.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": chunk}}]
-                    }
-                })
-            
-            # Add thought process if available
-            if thought_process:
-                logger.debug(f"Adding thought process of length {len(thought_process)}")
-                blocks.append({
-                    "object": "block",
-                    "type": "divider",
-                    "divider": {}
-                })
-                
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "Thought Process"}}]
-                    }
-                })
+            if isinstance(content, list):
+                blocks = content
+            else:
+                blocks = [heading("AI Response", 2)] + markdown_to_blocks(content)
                 
-                # Split thought process into chunks
-                thought_chunks = self._chunk_text(thought_process)
-                logger.debug(f"Split thought process into {len(thought_chunks)} chunks")
-                
-                for i, chunk in enumerate(thought_chunks):
-                    logger.debug(f"Adding thought chunk {i+1}/{len(thought_chunks)} (length: {len(chunk)})")
-                    blocks.append({
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": chunk}}]
-                        }
-                    })
+                # Add thought process if available
+                if thought_process:
+                    thought_process = str(thought_process)
+                    logger.debug(f"Adding thought process of length {len(thought_process)}")
+                    blocks.append(divider())
+                    blocks.append(heading(THOUGHT_PROCESS_HEADING, 2))
+                    blocks.extend(plain_text_blocks(thought_process))
             
-            # Update the page with new blocks
-            logger.debug(f"Sending {len(blocks)} blocks to Notion API")
-            response = self.client.blocks.children.append(
-                block_id=page_id,
-                children=blocks
-            )
+            if replace:
+                await self._delete_page_children(page_id)
+            
+            response = await self.append_blocks(page_id, blocks)
             logger.debug(f"Successfully updated page content for {page_id}")
             return response
         except Exception as e:
@@ -261,49 +331,58 @@ class NotionAPI:
             logger.error(traceback.format_exc())
             
             # If the error is related to validation, try a fallback approach
-            if "validation_error" in str(e) and thought_process:
-                logger.warning("Attempting fallback: Updating without thought process")
-                try:
-                    # Remove thought process blocks (everything after the divider)
-                    divider_index = next((i for i, block in enumerate(blocks) if block.get("type") == "divider"), len(blocks))
-                    reduced_blocks = blocks[:divider_index]
-                    
-                    response = self.client.blocks.children.append(
-                        block_id=page_id,
-                        children=reduced_blocks
-                    )
-                    logger.info(f"Fallback successful: Updated page {page_id} without thought process")
-                    return response
-                except Exception as fallback_error:
-                    logger.error(f"Fallback also failed: {str(fallback_error)}")
+            if "validation_error" in str(e):
+                thought_index = _thought_process_index(blocks)
+                if thought_index is not None:
+                    logger.warning("Attempting fallback: Updating without thought process")
+                    try:
+                        # Drop the thought process; the response itself may contain dividers
+                        await self._delete_page_children(page_id)
+                        response = await self.append_blocks(page_id, blocks[:thought_index])
+                        logger.info(f"Fallback successful: Updated page {page_id} without thought process")
+                        return response
+                    except Exception as fallback_error:
+                        logger.error(f"Fallback also failed: {str(fallback_error)}")
             
             # Re-raise the original exception
             raise
     
-    def _chunk_text(self, text: str, chunk_size: int = 1900) -> list:
+    async def _delete_page_children(self, page_id: str) -> None:
+        """Delete all top-level blocks of a page, following pagination."""
+        cursor = None
+        while True:
+            kwargs = {"block_id": page_id}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            existing = await self._run_notion_api(self.client.blocks.children.list, **kwargs)
+            for block in existing.get("results", []):
+                logger.debug(f"Deleting existing block {block['id']}")
+                await self._run_notion_api(self.client.blocks.delete, block_id=block["id"])
+            if not existing.get("has_more"):
+                return
+            cursor = existing.get("next_cursor")
+    
+    async def append_blocks(self, page_id: str, blocks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """
-        Split text into chunks to avoid Notion's 2000 character limit.
+        Append blocks to a page in as few requests as Notion's limits allow.
         
         Args:
-            text (str): The text to split into chunks
-            chunk_size (int): The maximum size of each chunk (default: 1900)
+            page_id: The Notion page ID
+            blocks: The blocks to append, in order
             
         Returns:
-            list: A list of text chunks, each under 2000 characters
+            The response of the last append request
         """
-        if not text:
-            return []
-            
-        chunks = []
-        for i in range(0, len(text), chunk_size):
-            chunk = text[i:i + chunk_size]
-            # Double-check length to be safe
-            if len(chunk) > 2000:
-                logger.warning(f"Chunk exceeds 2000 chars ({len(chunk)}), truncating")
-                chunk = chunk[:1900] + "..."
-            chunks.append(chunk)
-        
-        return chunks
+        batches = batch_blocks(blocks)
+        logger.debug(f"Sending {len(blocks)} blocks to Notion API in {len(batches)} requests")
+        response = None
+        for batch in batches:
+            response = await self._run_notion_api(
+                self.client.blocks.children.append,
+                block_id=page_id,
+                children=batch
+            )
+        return response
     
     async def get_page_blocks(self, page_id: str) -> List[Dict[str, Any]]:
         """
@@ -316,13 +395,42 @@ class NotionAPI:
             List of block objects
         """
         try:
-            response = self.client.blocks.children.list(block_id=page_id)
+            response = await self._run_notion_api(self.client.blocks.children.list, block_id=page_id)
             return response.get('results', [])
         except Exception as e:
             logger.error(f"Error getting page blocks for {page_id}: {str(e)}")
             return []
     
-    async def get_page_comments(self, page_id: str) -> Optional[List[str]]:
+    @staticmethod
+    def format_comments(
+        results: List[Dict[str, Any]],
+        block: Optional[Dict[str, Any]] = None
+    ) -> List[PageComment]:
+        """
+        Flatten the rich text of comments into prompt lines.
+        
+        Args:
+            results: Comment objects from the comments endpoint
+            block: The block the comments are attached to, or None for page-level comments
+            
+        Returns:
+            The comments' IDs with lines such as "Page comment: ..." or
+            "Inline comment on '<block text>': ..."
+        """
+        if block is None:
+            prefix = "Page comment"
+        else:
+            # The block's text gives inline comments their context; flattened once per block
+            block_text = plain_text(block.get(block.get('type', ''), {}).get('rich_text', []))
+            prefix = f"Inline comment on '{block_text}'" if block_text else "Inline comment"
+        lines: List[PageComment] = []
+        for comment in results:
+            comment_text = plain_text(comment.get('rich_text', ()))
+            if comment_text:
+                lines.append(PageComment(comment.get('id', ''), f"{prefix}: {comment_text}"))
+        return lines
+    
+    async def get_page_comments(self, page_id: str) -> Optional[List[PageComment]]:
         """
         Retrieve both page-level and inline comments from a Notion page.
         
@@ -330,22 +438,15 @@ class NotionAPI:
             page_id (str): The Notion page ID
             
         Returns:
-            List of comment strings or None if no comments found
+            List of comments with their IDs, or None if no comments found
         """
-        comments = []
+        comments: List[PageComment] = []
         
         # Get page-level comments
         try:
-            response = self.client.comments.list(block_id=page_id)
+            response = await self._run_notion_api(self.client.comments.list, block_id=page_id)
             
-            for comment in response.get('results', []):
-                if 'rich_text' in comment:
-                    comment_text = ''.join(
-                        text.get('text', {}).get('content', '')
-                        for text in comment['rich_text']
-                    )
-                    if comment_text:
-                        comments.append(f"Page comment: {comment_text}")
+            comments.extend(self.format_comments(response.get('results', [])))
         except Exception as e:
             logger.error(f"Error getting page comments for {page_id}: {str(e)}")
         
@@ -357,25 +458,9 @@ class NotionAPI:
                 if block_id:
                     # Get comments for this block
                     try:
-                        response = self.client.comments.list(block_id=block_id)
+                        response = await self._run_notion_api(self.client.comments.list, block_id=block_id)
                         
-                        for comment in response.get('results', []):
-                            if 'rich_text' in comment:
-                                comment_text = ''.join(
-                                    text.get('text', {}).get('content', '')
-                                    for text in comment['rich_text']
-                                )
-                                if comment_text:
-                                    # Include block content for context if available
-                                    block_content = block.get(block['type'], {}).get('rich_text', [])
-                                    block_text = ''.join(
-                                        text.get('text', {}).get('content', '')
-                                        for text in block_content
-                                    )
-                                    if block_text:
-                                        comments.append(f"Inline comment on '{block_text}': {comment_text}")
-                                    else:
-                                        comments.append(f"Inline comment: {comment_text}")
+                        comments.extend(self.format_comments(response.get('results', []), block))
                     except Exception as e:
                         logger.error(f"Error getting comments for block {block_id}: {str(e)}")
                         continue
@@ -387,18 +472,7 @@ class NotionAPI:
         logger.debug("Entering query_tasks_to_execute")
         try:
             # Use the helper method to run this in a thread pool
-            response = await self._run_notion_api(
-                self.client.databases.query,
-                **{
-                    "database_id": self.database_id,
-                    "filter": {
-                        "property": "Status",
-                        "status": {
-                            "equals": "Execute"
-                        }
-                    }
-                }
-            )
+            response = await self._query_tasks("Execute")
             logger.debug(f"query_tasks_to_execute found {len(response.get('results', []))} tasks")
             return response
         except Exception as e:
@@ -411,17 +485,7 @@ class NotionAPI:
         """Query database for tasks with Status = 'Iterate'"""
         logger.debug("Entering query_tasks_to_iterate")
         try:
-            response = self.client.databases.query(
-                **{
-                    "database_id": self.database_id,
-                    "filter": {
-                        "property": "Status",
-                        "status": {
-                            "equals": "Iterate"
-                        }
-                    }
-                }
-            )
+            response = await self._query_tasks("Iterate")
             logger.debug(f"query_tasks_to_iterate found {len(response.get('results', []))} tasks")
             return response
         except Exception as e:
@@ -0,0 +1,387 @@
+"""
+Renders research results and markdown as native Notion blocks.
+
+Text is split at word boundaries into rich_text segments of at most 2000
+characters, and each block packs as many segments as Notion allows, so a long
+section becomes one block instead of one block per 2000-character slice.
+Structured ResearchOutput data maps directly to headings, bulleted and numbered
+lists, quotes and toggles without re-parsing the model's text.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+# Notion API limits
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_SEGMENTS = 100
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+MAX_REQUEST_BYTES = 450_000
+
+Block = Dict[str, Any]
+
+_INLINE = re.compile(
+    r"(\*\*(?P<bold>.+?)\*\*)|(`(?P<code>[^`]+)`)|(\[(?P<label>[^\]]+)\]\((?P<url>https?://[^)\s]+)\))"
+    r"|((?<![\w*])\*(?P<italic>[^*\s][^*]*?)\*(?![\w*]))"
+)
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_NUMBERED = re.compile(r"^(\s*)\d+[.)]\s+(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+def split_text(text: str, limit: int = MAX_TEXT_LENGTH) -> List[str]:
+    """
+    Split text into pieces of at most `limit` characters, preferring line and word boundaries.
+
+    Args:
+        text (str): The text to split
+        limit (int): Maximum characters per piece
+
+    Returns:
+        List[str]: The pieces, which concatenate back to the original text
+    """
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut < limit // 2:
+            cut = text.rfind(" ", 0, limit)
+        if cut < limit // 2:
+            cut = limit - 1
+        pieces.append(text[:cut + 1])
+        text = text[cut + 1:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _segment(content: str, annotations: Optional[Dict[str, bool]] = None, url: Optional[str] = None) -> Dict[str, Any]:
+    segment: Dict[str, Any] = {"type": "text", "text": {"content": content}}
+    if url:
+        segment["text"]["link"] = {"url": url}
+    if annotations:
+        segment["annotations"] = annotations
+    return segment
+
+
+def rich_text(text: str, markdown: bool = True) -> List[Dict[str, Any]]:
+    """
+    Convert text to rich_text segments of at most 2000 characters each.
+
+    Adjacent runs with the same formatting are merged before splitting, so plain
+    text yields as few segments as possible.
+
+    Args:
+        text (str): The text, optionally with inline markdown (bold, italic, code, links)
+        markdown (bool): Whether to interpret inline markdown
+
+    Returns:
+        List[dict]: The rich_text segments
+    """
+    runs: List[tuple] = []
+    position = 0
+    if markdown:
+        for match in _INLINE.finditer(text):
+            if match.start() > position:
+                runs.append((text[position:match.start()], None, None))
+            if match.group("bold") is not None:
+                runs.append((match.group("bold"), "bold", None))
+            elif match.group("code") is not None:
+                runs.append((match.group("code"), "code", None))
+            elif match.group("label") is not None:
+                runs.append((match.group("label"), None, match.group("url")))
+            else:
+                runs.append((match.group("italic"), "italic", None))
+            position = match.end()
+    if position < len(text):
+        runs.append((text[position:], None, None))
+
+    merged: List[list] = []
+    for content, style, url in runs:
+        if merged and merged[-1][1] == style and merged[-1][2] == url:
+            merged[-1][0] += content
+        elif content:
+            merged.append([content, style, url])
+
+    return [
+        _segment(piece, {style: True} if style else None, url)
+        for content, style, url in merged
+        for piece in split_text(content)
+    ]
+
+
+def plain_text(segments: Iterable[Dict[str, Any]]) -> str:
+    """Join the text content of rich_text segments, ignoring formatting."""
+    return "".join([segment.get("text", {}).get("content", "") for segment in segments])
+
+
+def _text_blocks(block_type: str, segments: List[Dict[str, Any]], **extra: Any) -> List[Block]:
+    """Create one block per 100 segments (usually exactly one block)."""
+    segments = segments or [_segment("")]
+    blocks = []
+    for start in range(0, len(segments), MAX_RICH_TEXT_SEGMENTS):
+        body: Dict[str, Any] = {"rich_text": segments[start:start + MAX_RICH_TEXT_SEGMENTS]}
+        body.update(extra)
+        blocks.append({"object": "block", "type": block_type, block_type: body})
+    return blocks
+
+
+def heading(text: str, level: int = 2) -> Block:
+    block_type = f"heading_{min(max(level, 1), 3)}"
+    return _text_blocks(block_type, rich_text(text)[:MAX_RICH_TEXT_SEGMENTS])[0]
+
+
+def paragraph(text: str, markdown: bool = True) -> List[Block]:
+    return _text_blocks("paragraph", rich_text(text, markdown))
+
+
+def bulleted(text: str, children: Optional[List[Block]] = None) -> List[Block]:
+    blocks = _text_blocks("bulleted_list_item", rich_text(text))
+    if children:
+        blocks[-1]["bulleted_list_item"]["children"] = children
+    return blocks
+
+
+def numbered(text: str) -> List[Block]:
+    return _text_blocks("numbered_list_item", rich_text(text))
+
+
+def quote(text: str) -> List[Block]:
+    return _text_blocks("quote", rich_text(text))
+
+
+def code(text: str, language: str = "plain text") -> List[Block]:
+    return _text_blocks("code", rich_text(text, markdown=False), language=language or "plain text")
+
+
+def divider() -> Block:
+    return {"object": "block", "type": "divider", "divider": {}}
+
+
+def toggle(title: str, children: List[Block]) -> List[Block]:
+    """
+    Create a toggle block, splitting into continued toggles past 100 children.
+
+    Args:
+        title (str): The toggle title
+        children (List[Block]): Blocks shown when the toggle is expanded
+
+    Returns:
+        List[Block]: One toggle, or several for very long content
+    """
+    blocks = []
+    for start in range(0, max(len(children), 1), MAX_CHILDREN_PER_REQUEST):
+        block = _text_blocks("toggle", rich_text(title if start == 0 else f"{title} (continued)"))[0]
+        block["toggle"]["children"] = children[start:start + MAX_CHILDREN_PER_REQUEST]
+        blocks.append(block)
+    return blocks
+
+
+def plain_text_blocks(text: str) -> List[Block]:
+    """Render unformatted text (e.g. a thought process) as densely packed paragraphs."""
+    return paragraph(text, markdown=False) if text else []
+
+
+def _lines(markdown: Union[str, Iterable[str]]) -> Iterator[str]:
+    if isinstance(markdown, str):
+        yield from markdown.splitlines()
+        return
+    for line in markdown:
+        yield line.rstrip("\n")
+
+
+def markdown_to_blocks(markdown: Union[str, Iterable[str]]) -> List[Block]:
+    """
+    Convert markdown to Notion blocks.
+
+    Supports headings, bulleted and numbered lists (one nested level), block
+    quotes, fenced code, horizontal rules and paragraphs with inline formatting.
+
+    Args:
+        markdown (Union[str, Iterable[str]]): The markdown text, or an iterable of its lines
+
+    Returns:
+        List[Block]: The blocks
+    """
+    blocks: List[Block] = []
+    paragraph_lines: List[str] = []
+    quote_lines: List[str] = []
+    code_lines: Optional[List[str]] = None
+    code_language = ""
+
+    def flush() -> None:
+        if paragraph_lines:
+            blocks.extend(paragraph("\n".join(paragraph_lines)))
+            paragraph_lines.clear()
+        if quote_lines:
+            blocks.extend(quote("\n".join(quote_lines)))
+            quote_lines.clear()
+
+    def add_list_item(indent: str, block_list: List[Block]) -> None:
+        parent = blocks[-1] if blocks else None
+        if indent and parent and parent["type"] in ("bulleted_list_item", "numbered_list_item"):
+            parent[parent["type"]].setdefault("children", []).extend(block_list)
+        else:
+            blocks.extend(block_list)
+
+    for line in _lines(markdown):
+        if code_lines is not None:
+            if line.strip().startswith("```"):
+                blocks.extend(code("\n".join(code_lines), code_language))
+                code_lines = None
+            else:
+                code_lines.append(line)
+            continue
+
+        stripped = line.strip()
+        heading_match = _HEADING.match(stripped)
+        bullet_match = _BULLET.match(line)
+        numbered_match = _NUMBERED.match(line)
+        if stripped.startswith("```"):
+            flush()
+            code_lines, code_language = [], stripped[3:].strip()
+        elif not stripped:
+            flush()
+        elif _RULE.match(line):
+            flush()
+            blocks.append(divider())
+        elif heading_match:
+            flush()
+            hashes, text = heading_match.groups()
+            blocks.append(heading(text, len(hashes)))
+        elif stripped.startswith(">"):
+            if paragraph_lines:
+                flush()
+            quote_lines.append(stripped.lstrip(">").strip())
+        elif bullet_match:
+            flush()
+            indent, text = bullet_match.groups()
+            add_list_item(indent, bulleted(text))
+        elif numbered_match:
+            flush()
+            indent, text = numbered_match.groups()
+            add_list_item(indent, numbered(text))
+        else:
+            if quote_lines:
+                flush()
+            paragraph_lines.append(stripped)
+
+    if code_lines is not None:
+        blocks.extend(code("\n".join(code_lines), code_language))
+    flush()
+    return blocks
+
+
+def _as_dict(output: Any) -> Dict[str, Any]:
+    if hasattr(output, "model_dump"):
+        return output.model_dump(mode="json")
+    return dict(output or {})
+
+
+def _attributed(item: Dict[str, str], text_keys: Iterable[str]) -> str:
+    """Format an {opinion/statistic, source} dict as one line."""
+    text = next((item[key] for key in text_keys if item.get(key)), None)
+    source = item.get("source") or item.get("attribution")
+    if text is None:
+        text = "; ".join(f"{key}: {value}" for key, value in item.items() if key not in ("source", "attribution"))
+    return f"{text} — {source}" if source else text
+
+
+def _source_item(source: str) -> List[Block]:
+    if source.startswith(("http://", "https://")):
+        return _text_blocks("bulleted_list_item", [_segment(source[:MAX_TEXT_LENGTH], url=source)])
+    return bulleted(source)
+
+
+def research_output_to_blocks(output: Any) -> List[Block]:
+    """
+    Render a ResearchOutput (model or dict) as native Notion blocks.
+
+    The summary, findings, trends and recommendations are shown directly; the
+    raw initial research is grouped into collapsed toggles.
+
+    Args:
+        output (Any): A ResearchOutput instance or its JSON dict
+
+    Returns:
+        List[Block]: The blocks
+    """
+    data = _as_dict(output)
+    blocks: List[Block] = []
+
+    if data.get("executive_summary"):
+        blocks.append(heading("Executive Summary", 2))
+        blocks.extend(markdown_to_blocks(data["executive_summary"]))
+    if data.get("key_findings"):
+        blocks.append(heading("Key Findings", 2))
+        for finding in data["key_findings"]:
+            blocks.extend(bulleted(finding))
+    if data.get("trend_analysis"):
+        blocks.append(heading("Trend Analysis", 2))
+        for trend, analysis in data["trend_analysis"].items():
+            blocks.extend(bulleted(f"**{trend}**: {analysis}"))
+    if data.get("recommendations"):
+        blocks.append(heading("Recommendations", 2))
+        for recommendation in data["recommendations"]:
+            blocks.extend(numbered(recommendation))
+
+    initial = data.get("initial_research") or {}
+    sections = [
+        ("Key facts", [b for fact in initial.get("key_facts", []) for b in bulleted(fact)]),
+        ("Recent developments", [b for item in initial.get("recent_developments", []) for b in bulleted(item)]),
+        ("Expert opinions", [b for item in initial.get("expert_opinions", [])
+                             for b in quote(_attributed(item, ("opinion", "quote", "statement")))]),
+        ("Statistics", [b for item in initial.get("statistics", [])
+                        for b in bulleted(_attributed(item, ("statistic", "value", "data")))]),
+        ("Sources", [b for source in initial.get("sources", []) for b in _source_item(source)]),
+    ]
+    if any(children for _, children in sections):
+        blocks.append(heading("Research Details", 2))
+        for title, children in sections:
+            if children:
+                blocks.extend(toggle(f"{title} ({len(children)})", children))
+    return blocks
+
+
+def count_blocks(blocks: List[Block]) -> int:
+    """Count blocks including nested children."""
+    total = 0
+    for block in blocks:
+        total += 1
+        total += count_blocks(block.get(block["type"], {}).get("children", []))
+    return total
+
+
+def batch_blocks(blocks: List[Block]) -> List[List[Block]]:
+    """
+    Group top-level blocks into append requests within Notion's limits.
+
+    Each batch has at most 100 top-level blocks, 1000 blocks including children
+    and roughly 450 KB of JSON.
+
+    Args:
+        blocks (List[Block]): The blocks to append
+
+    Returns:
+        List[List[Block]]: The batches, in order
+    """
+    batches: List[List[Block]] = []
+    current: List[Block] = []
+    current_blocks = current_bytes = 0
+    for block in blocks:
+        size = len(json.dumps(block, ensure_ascii=False).encode("utf-8"))
+        nested = count_blocks([block])
+        if current and (
+            len(current) >= MAX_CHILDREN_PER_REQUEST
+            or current_blocks + nested > MAX_BLOCKS_PER_REQUEST
+            or current_bytes + size > MAX_REQUEST_BYTES
+        ):
+            batches.append(current)
+            current, current_blocks, current_bytes = [], 0, 0
+        current.append(block)
+        current_blocks += nested
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
@@ -4,10 +4,36 @@ Core orchestration logic for processing tasks from Notion.
 
 import logging
 import os
-from typing import Tuple, Optional, List, Dict, Any
+import time
+import traceback
+from typing import Tuple, Optional, List, Dict, Any, Union
 
-from .notion_api import NotionAPI
+from crews.research_crew.depth import depth_from_properties
+from .accounting import current_usage, finish_task_usage, notion_usage_properties, start_task_usage
+from .artifacts import MARKDOWN_ARTIFACT, STRUCTURED_ARTIFACT, ArtifactRun
+from .notion_blocks import (
+    divider,
+    heading,
+    markdown_to_blocks,
+    plain_text_blocks,
+    research_output_to_blocks,
+)
+from .notion_api import THOUGHT_PROCESS_HEADING, NotionAPI
+from .profiling import finish_task_profile, start_task_profile
+from .metrics import (
+    POLL_CYCLES,
+    POLL_DURATION,
+    PUBLISH_DURATION,
+    PUBLISHES,
+    TASK_DURATION,
+    TASKS_PROCESSED,
+    TASKS_QUEUED,
+    track,
+)
 from .crew_manager import CrewManager
+from .iteration_context import IterationContextBuilder
+from .task_trace import TaskTrace
+from .tracing import span, start_trace
 
 logger = logging.getLogger(__name__)
 
@@ -22,15 +48,22 @@ class TaskOrchestrator:
     4. Updates Notion with the results
     """
     
-    def __init__(self):
-        """Initialize the TaskOrchestrator with required components."""
-        self.notion_api = NotionAPI(
-            notion_api_key=os.getenv("NOTION_API_KEY"),
-            openai_api_key=os.getenv("OPENAI_API_KEY")
+    def __init__(self, notion_api: Optional[NotionAPI] = None, crew_manager: Optional[CrewManager] = None):
+        """
+        Initialize the TaskOrchestrator with required components.
+        
+        Args:
+            notion_api: The Notion client to use, built from the environment if omitted
+            crew_manager: The crew manager to use, built from the environment if omitted
+        """
+        self.notion_api = notion_api or NotionAPI(
+            notion_api_key=os.getenv("NOTION_API_KEY", ""),
+            openai_api_key=os.getenv("OPENAI_API_KEY", "")
         )
-        self.crew_manager = CrewManager()
+        self.crew_manager = crew_manager or CrewManager()
+        self.iteration_context = IterationContextBuilder.from_env()
     
-    async def process_execute_tasks(self) -> List[Dict[str, Any]]:
+    async def process_execute_tasks(self) -> List[Tuple[str, Optional[str]]]:
         """
         Poll for tasks with 'Execute' status and process them.
         
@@ -40,21 +73,30 @@ class TaskOrchestrator:
         3. Processes the task content using the appropriate crew
         4. Updates the task with the results and changes status to 'Review'
         """
+        poll_started = time.perf_counter()
         try:
             logger.info("Checking for tasks with 'Execute' status...")
             tasks = await self.notion_api.query_tasks_to_execute()
             
             if not tasks or 'results' not in tasks:
                 logger.info("No 'Execute' tasks found")
+                TASKS_QUEUED.labels("execute").set(0)
                 return []
                 
             logger.info(f"Found {len(tasks['results'])} tasks to process")
+            TASKS_QUEUED.labels("execute").set(len(tasks['results']))
             
             results = []
             for task in tasks['results']:
+                task_started = time.perf_counter()
+                task_span = start_trace("task.execute", page_id=task.get('id'))
+                usage = start_task_usage(task.get('id'), "execute")
+                profile = None
                 try:
                     page_id = task['id']
-                    task_content = task['properties']['Task']['title'][0]['text']['content']
+                    task_content = self._extract_task_content(task)
+                    task_span.set_attribute("title", task_content[:200])
+                    profile = start_task_profile(page_id, task_content, task['properties'])
                     logger.info(f"Processing 'Execute' task: {task_content}")
                     
                     # Update status to In Progress
@@ -63,7 +105,10 @@ class TaskOrchestrator:
                     
                     # Process the task with the appropriate crew
                     logger.debug(f"Calling crew_manager.process_task for {page_id}")
-                    result = await self.crew_manager.process_task(task_content, page_id)
+                    result = await self.crew_manager.process_task(
+                        task_content, page_id, scope=self.notion_api.database_id,
+                        depth=depth_from_properties(task['properties'])
+                    )
                     logger.debug(f"crew_manager.process_task returned result type: {type(result)}")
                     
                     # Check if result is a tuple with response and thought process
@@ -73,18 +118,23 @@ class TaskOrchestrator:
                         
                         # Update Notion with the results
                         logger.debug(f"Updating Notion with results for {page_id}")
-                        await self._update_notion_with_results(page_id, response_text, thought_process)
+                        await self._update_notion_with_results(
+                            page_id, response_text, thought_process,
+                            artifacts=self.crew_manager.pop_artifacts(page_id)
+                        )
                         logger.debug(f"Notion update completed for {page_id}")
                     else:
                         logger.warning(f"Unexpected result format from process_task: {result}")
                     
                     results.append(result)
                     logger.info(f"Successfully processed task: {task_content}")
+                    self._record_task("execute", "ok", task_started, task_span, usage, profile)
                     
                 except Exception as e:
                     logger.error(f"Error processing task {page_id}: {str(e)}")
                     logger.error(traceback.format_exc())
                     await self.notion_api.create_error_log(page_id, str(e))
+                    self._record_task("execute", "error", task_started, task_span, usage, profile)
                     continue
                     
             return results
@@ -92,8 +142,11 @@ class TaskOrchestrator:
             logger.error(f"Error processing tasks: {str(e)}")
             logger.error(traceback.format_exc())
             return []
+        finally:
+            POLL_CYCLES.labels("execute").inc()
+            POLL_DURATION.labels("execute").observe(time.perf_counter() - poll_started)
     
-    async def process_iteration_tasks(self) -> List[Dict[str, Any]]:
+    async def process_iteration_tasks(self) -> List[Tuple[str, Optional[str]]]:
         """
         Poll for tasks with 'Iterate' status and process them with feedback.
         
@@ -103,21 +156,30 @@ class TaskOrchestrator:
         3. Processes the task with comments as feedback
         4. Updates the task with new results
         """
+        poll_started = time.perf_counter()
         try:
             logger.info("Checking for tasks with 'Iterate' status...")
             tasks = await self.notion_api.query_tasks_to_iterate()
             
             if not tasks or 'results' not in tasks:
                 logger.info("No 'Iteration' tasks found")
+                TASKS_QUEUED.labels("iterate").set(0)
                 return []
                 
             logger.info(f"Found {len(tasks['results'])} tasks to iterate")
+            TASKS_QUEUED.labels("iterate").set(len(tasks['results']))
             
             results = []
             for task in tasks['results']:
+                task_started = time.perf_counter()
+                task_span = start_trace("task.iterate", page_id=task.get('id'))
+                usage = start_task_usage(task.get('id'), "iterate")
+                profile = None
                 try:
                     page_id = task['id']
                     task_title = task['properties']['Task']['title'][0]['text']['content']
+                    task_span.set_attribute("title", task_title[:200])
+                    profile = start_task_profile(page_id, task_title, task['properties'])
                     logger.info(f"Processing 'Iteration' task: {task_title}")
                     
                     # Update status to In Progress
@@ -126,38 +188,84 @@ class TaskOrchestrator:
                     # Get comments from the page
                     comments = await self.notion_api.get_page_comments(page_id)
                     
-                    if comments:
-                        logger.info(f"Found {len(comments)} comments for iteration")
+                    # Only send feedback that has not been addressed yet, within the token budget
+                    context = self.iteration_context.build(
+                        page_id,
+                        task_title,
+                        comments or [],
+                        previous_response=self._extract_previous_response(task)
+                    )
+                    
+                    if context.included_comments:
+                        logger.info(
+                            f"Found {len(context.included_comments)} new comments for iteration "
+                            f"({context.skipped_comments} already addressed, {context.token_count} prompt tokens)"
+                        )
                         
                         # Process the task with comments as feedback
-                        feedback_prompt = f"Original task: {task_title}\n\nFeedback comments:\n"
-                        for comment in comments:
-                            feedback_prompt += f"- {comment}\n"
+                        included = [comment.text for comment in context.included_comments]
+                        result = await self.crew_manager.process_iteration(
+                            context.prompt, page_id, included,
+                            depth=depth_from_properties(task['properties'])
+                        )
+                        
+                        if isinstance(result, tuple) and len(result) >= 2:
+                            response_text, thought_process = result
+                            await self._update_notion_with_results(
+                                page_id, response_text, thought_process, is_iteration=True,
+                                artifacts=self.crew_manager.pop_artifacts(page_id)
+                            )
+                            self.iteration_context.mark_addressed(page_id, context)
+                        else:
+                            logger.warning(f"Unexpected result format from process_iteration: {result}")
                         
-                        result = await self.crew_manager.process_iteration(feedback_prompt, page_id, comments)
                         results.append(result)
                         
                         logger.info(f"Successfully processed iteration for task: {task_title}")
+                        self._record_task("iterate", "ok", task_started, task_span, usage, profile)
                     else:
-                        logger.warning(f"No comments found for iteration on task: {task_title}")
+                        logger.warning(f"No new comments found for iteration on task: {task_title}")
                         await self.notion_api.update_task_status(page_id, "Review")
+                        self._record_task("iterate", "skipped", task_started, task_span, usage, profile)
                     
                 except Exception as e:
                     logger.error(f"Error processing iteration task {page_id}: {str(e)}")
                     await self.notion_api.create_error_log(page_id, str(e))
+                    self._record_task("iterate", "error", task_started, task_span, usage, profile)
                     continue
                     
             return results
         except Exception as e:
             logger.error(f"Error processing iteration tasks: {str(e)}")
             return []
+        finally:
+            POLL_CYCLES.labels("iterate").inc()
+            POLL_DURATION.labels("iterate").observe(time.perf_counter() - poll_started)
+    
+    def _record_task(
+        self, kind: str, status: str, started: float, task_span=None, usage=None, profile=None
+    ) -> None:
+        """Count a processed task by outcome, observe its duration and end its trace, accounting and profile."""
+        TASKS_PROCESSED.labels(kind, status).inc()
+        TASK_DURATION.labels(kind).observe(time.perf_counter() - started)
+        finish_task_profile(profile, status)
+        finish_task_usage(usage, status)
+        if task_span is not None:
+            task_span.end(status=status)
+    
+    def _extract_previous_response(self, task: Dict[str, Any]) -> Optional[str]:
+        """Return the plain text of the task's current 'Response' property, if any."""
+        rich_text = task.get('properties', {}).get('Response', {}).get('rich_text', [])
+        text = ''.join(part.get('text', {}).get('content', '') for part in rich_text)
+        return text or None
     
     async def _update_notion_with_results(
         self, 
         page_id: str, 
         response_text: str, 
-        thought_process: Optional[str] = None,
-        is_iteration: bool = False
+        thought_process: Optional[Union[str, TaskTrace]] = None,
+        is_iteration: bool = False,
+        artifacts: Optional[ArtifactRun] = None
     ) -> None:
         """
         Update a Notion page with task processing results.
@@ -165,76 +273,70 @@ class TaskOrchestrator:
         Args:
             page_id: The Notion page ID
             response_text: The response text to add
-            thought_process: Optional thought process to include
+            thought_process: Optional thought process to include, as text or a TaskTrace
             is_iteration: Whether this is an iteration update
+            artifacts: Stored crew run whose structured output or markdown is rendered into the page
         """
-        # Update status and summary
+        with span("notion.publish"), track(PUBLISHES, PUBLISH_DURATION):
+            await self._publish_results(page_id, response_text, thought_process, is_iteration, artifacts)
+    
+    async def _publish_results(
+        self,
+        page_id: str,
+        response_text: str,
+        thought_process: Optional[Union[str, TaskTrace]],
+        is_iteration: bool,
+        artifacts: Optional[ArtifactRun]
+    ) -> None:
+        """Write the status, summary and rendered page content of a result to Notion."""
+        # Render the per-task trace only now that it is being published
+        if isinstance(thought_process, TaskTrace):
+            trace = thought_process
+            thought_process = trace.render()
+            trace.close()
+        
+        # Update status and summary, with the task's usage totals so far
         await self.notion_api.update_task_status(
             page_id=page_id,
             status="Review",
-            summary=response_text[:2000]
+            summary=response_text[:2000],
+            properties=notion_usage_properties(current_usage())
         )
         
         # Create blocks for page content
-        blocks = []
-        
-        # Add AI Response section
         response_title = "AI Response (Iteration)" if is_iteration else "AI Response"
-        blocks.append({
-            "object": "block",
-            "type": "heading_2",
-            "heading_2": {
-                "rich_text": [{"type": "text", "text": {"content": response_title}}]
-            }
-        })
+        blocks = [heading(response_title, 2)]
         
-        # Add response content in chunks
-        for i in range(0, len(response_text), 2000):
-            chunk = response_text[i:i+2000]
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": chunk}}]
-                }
-            })
+        # Prefer the run's structured output, then its stored markdown, then the response text
+        structured = artifacts.read_json(STRUCTURED_ARTIFACT) if artifacts is not None else None
+        if structured:
+            blocks.extend(research_output_to_blocks(structured))
+        elif artifacts is not None and artifacts.exists(MARKDOWN_ARTIFACT):
+            blocks.extend(markdown_to_blocks(artifacts.iter_lines(MARKDOWN_ARTIFACT)))
+        else:
+            blocks.extend(markdown_to_blocks(response_text))
         
         # Add thought process if available
         if thought_process:
-            blocks.append({
-                "object": "block",
-                "type": "divider",
-                "divider": {}
-            })
-            
-            blocks.append({
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": "Thought Process"}}]
-                }
-            })
-            
-            for i in range(0, len(thought_process), 2000):
-                chunk = thought_process[i:i+2000]
-                blocks.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": chunk}}]
-                    }
-                })
+            blocks.append(divider())
+            blocks.append(heading(THOUGHT_PROCESS_HEADING, 2))
+            blocks.extend(plain_text_blocks(thought_process))
         
         # Update the page content
         await self.notion_api.update_page_content(page_id, blocks)
 
-    async def process_task(self, task: Dict[str, Any]):
+    @staticmethod
+    def _extract_task_content(task: Dict[str, Any]) -> str:
+        """Return the text of a task page's "Task" title property."""
+        return task['properties']['Task']['title'][0]['text']['content']
+
+    async def process_task(self, task: Dict[str, Any]) -> None:
         """Process a single task."""
         page_id = task["id"]
         
         try:
             # Update status to In Progress
-            await self.notion_api.update_task_status(page_id, "In Progress")
+            await self.notion_api.update_task_status(page_id, "In progress")
             
             # Extract task content
             task_content = self._extract_task_content(task)
@@ -243,26 +345,29 @@ class TaskOrchestrator:
             crew_name, crew_reasoning = await self.crew_manager.determine_crew(task_content)
             
             # Process the task with the appropriate crew
-            # This is now a synchronous call - don't await it
-            result_text, thought_process = self.crew_manager.process_with_crew(crew_name, task_content)
-            
-            # Update the task with the result
-            await self.notion_api.update_task_response(page_id, result_text)
+            result_text, thought_process = await self.crew_manager.process_with_crew(
+                crew_name, task_content, task_id=page_id, scope=self.notion_api.database_id
+            )
+            if isinstance(thought_process, TaskTrace):
+                thought_process = thought_process.render()
             
             # Update the page content with more detailed information
-            content = f"Task processed by: {crew_name}\n\nReasoning: {crew_reasoning}\n\nResult:\n{result_text}"
+            content = (
+                f"Task processed by: {crew_name}\n\nReasoning: {crew_reasoning}\n\n"
+                f"Result:\n{result_text}"
+            )
             await self.notion_api.update_page_content(page_id, content, thought_process)
             
-            # Update status to Done
-            await self.notion_api.update_task_status(page_id, "Done")
+            # Update status to Done, with the result as the task's summary
+            await self.notion_api.update_task_status(page_id, "Done", summary=result_text[:2000])
             
             logger.info(f"Successfully processed task {page_id}")
             
         except Exception as e:
             logger.error(f"Error processing task {page_id}: {str(e)}")
+            logger.error(traceback.format_exc())
             # Update status to indicate error - use a valid status
-            await self.notion_api.update_task_response(page_id, f"Error: {str(e)}")
-            await self.notion_api.update_task_status(page_id, "Review")  # Use a valid status like Review
+            await self.notion_api.update_task_status(page_id, "Review", summary=f"Error: {str(e)}")
 
     # Add this debug method to help isolate the issue
     async def debug_api_connection(self):
@@ -0,0 +1,351 @@
+"""
+On-demand CPU and memory profiling of individual tasks.
+
+A task is profiled when its Notion "Profile" checkbox is ticked, when its page
+ID or title matches PROFILE_TASK_PATTERN, or at random with probability
+PROFILE_SAMPLE_RATE. While it runs, a background thread samples the stacks of
+all threads with sys._current_frames(), since crews and Notion calls run in
+worker threads, and tracemalloc traces allocations. Threads parked waiting for
+work are left out of the samples unless PROFILE_INCLUDE_IDLE is "true". When
+the task finishes the profile is written to its own run in the artifact store:
+
+- profile.collapsed: collapsed stacks ("thread;frame;frame count"), the input
+  of flamegraph.pl, speedscope and similar tools
+- allocations.txt: the source lines whose allocations grew most during the task
+- profile.json: duration, CPU time, RSS, traced memory peak and the hottest functions
+
+Only one task is profiled at a time; unprofiled tasks pay nothing.
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+from .artifacts import ArtifactRun, ArtifactStore
+
+logger = logging.getLogger(__name__)
+
+COLLAPSED_ARTIFACT = "profile.collapsed"
+ALLOCATIONS_ARTIFACT = "allocations.txt"
+SUMMARY_ARTIFACT = "profile.json"
+
+# Innermost frames of threads that are parked waiting for work, left out of profiles by default
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# Only one profile runs at a time: tracemalloc and the sampler are process-wide
+_active_lock = threading.Lock()
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _code_label(code) -> str:
+    filename = code.co_filename
+    prefixes = [prefix for prefix in sys.path if prefix and filename.startswith(prefix)]
+    if prefixes:
+        filename = filename[len(max(prefixes, key=len)):].lstrip(os.sep)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Background sampler of all threads' stacks, aggregated as collapsed stacks.
+
+    Attributes:
+        interval (float): Seconds between samples
+        max_depth (int): Innermost frames kept per stack
+        include_idle (bool): Whether to keep stacks of threads parked waiting for work
+        stacks (Counter): Sample counts per collapsed stack
+        samples (int): Number of sampling rounds taken
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64, include_idle: bool = False):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                labels: List[str] = []
+                current: Optional[FrameType] = frame
+                while current is not None and len(labels) < self.max_depth:
+                    label = self._labels.get(current.f_code)
+                    if label is None:
+                        label = self._labels[current.f_code] = _code_label(current.f_code)
+                    labels.append(label)
+                    current = current.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in collapsed-stack format, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return the functions most often on top of a stack (self samples)."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"function": function, "samples": count} for function, count in leaves.most_common(limit)]
+
+
+class TaskProfile:
+    """
+    A running profile of one task.
+
+    Attributes:
+        page_id (Optional[str]): The Notion page ID
+        reason (str): Why the task is profiled, e.g. "checkbox"
+    """
+
+    def __init__(
+        self,
+        page_id: Optional[str],
+        reason: str,
+        store: ArtifactStore,
+        interval: float = 0.01,
+        tracemalloc_frames: int = 1,
+        top_allocations: int = 25,
+        include_idle: bool = False
+    ):
+        self.page_id = page_id
+        self.reason = reason
+        self.store = store
+        self.sampler = StackSampler(interval, include_idle=include_idle)
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top_allocations = top_allocations
+        self._owns_tracemalloc = False
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started = 0.0
+        self._cpu_started = 0.0
+        self._rss_started: Optional[int] = None
+
+    def start(self) -> "TaskProfile":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self._rss_started = _rss_bytes()
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.sampler.start()
+        return self
+
+    def finish(self, status: str = "ok") -> Optional[ArtifactRun]:
+        """
+        Stop profiling and write the reports.
+
+        Args:
+            status (str): The task's outcome, recorded in the summary
+
+        Returns:
+            Optional[ArtifactRun]: The run holding the reports, or None if writing failed
+        """
+        try:
+            self.sampler.stop()
+            duration = time.perf_counter() - self._started
+            cpu = time.process_time() - self._cpu_started
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            _active_lock.release()
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        # Without a baseline (finish() before start()) no growth is reported
+        baseline, self._baseline = self._baseline or snapshot, None
+        growth = snapshot.filter_traces(ignore).compare_to(baseline.filter_traces(ignore), "lineno")
+        rss = _rss_bytes()
+        summary = {
+            "page_id": self.page_id,
+            "reason": self.reason,
+            "status": status,
+            "duration_seconds": round(duration, 3),
+            "cpu_seconds": round(cpu, 3),
+            "samples": self.sampler.samples,
+            "sample_interval_seconds": self.sampler.interval,
+            "top_functions": self.sampler.top_functions(),
+            "memory": {
+                "rss_start_bytes": self._rss_started,
+                "rss_end_bytes": rss,
+                "traced_peak_bytes": traced_peak,
+                "traced_growth_bytes": sum(stat.size_diff for stat in growth),
+            },
+        }
+        try:
+            run = self.store.new_run(self.page_id)
+            run.write_text(COLLAPSED_ARTIFACT, self.sampler.collapsed())
+            run.write_text(ALLOCATIONS_ARTIFACT, "".join(
+                f"{stat}\n" for stat in growth[:self.top_allocations]
+            ))
+            run.write_json(SUMMARY_ARTIFACT, summary)
+        except Exception as e:
+            logger.error(f"Error writing profile of task {self.page_id}: {str(e)}")
+            return None
+        logger.info(
+            f"Profiled task {self.page_id} ({self.reason}): {duration:.1f}s wall, {cpu:.1f}s CPU, "
+            f"{self.sampler.samples} samples, traced peak {traced_peak} bytes; reports in {run.path}"
+        )
+        return run
+
+
+class ProfilingPolicy:
+    """
+    Decides which tasks are profiled.
+
+    Attributes:
+        property_name (str): Notion checkbox property that requests a profile
+        pattern (Optional[re.Pattern]): Regex matched against page IDs and titles
+        sample_rate (float): Probability of profiling any other task
+    """
+
+    def __init__(
+        self,
+        property_name: str = "Profile",
+        pattern: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.01,
+        tracemalloc_frames: int = 1,
+        include_idle: bool = False,
+        store: Optional[ArtifactStore] = None
+    ):
+        self.property_name = property_name
+        self.pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames
+        self.include_idle = include_idle
+        self._store = store
+
+    @classmethod
+    def from_env(cls) -> "ProfilingPolicy":
+        """Build the policy from PROFILE_* environment variables."""
+        return cls(
+            property_name=os.getenv("PROFILE_PROPERTY", "Profile"),
+            pattern=os.getenv("PROFILE_TASK_PATTERN") or None,
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01")),
+            tracemalloc_frames=int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1")),
+            include_idle=os.getenv("PROFILE_INCLUDE_IDLE", "false").lower() == "true"
+        )
+
+    @property
+    def store(self) -> ArtifactStore:
+        if self._store is None:
+            self._store = ArtifactStore.from_env()
+        return self._store
+
+    def reason(self, page_id: Optional[str], title: str, properties: Dict[str, Any]) -> Optional[str]:
+        """
+        Return why a task should be profiled, or None if it should not.
+
+        Args:
+            page_id (Optional[str]): The Notion page ID
+            title (str): The task title
+            properties (Dict[str, Any]): The page's Notion properties
+        """
+        if (properties or {}).get(self.property_name, {}).get("checkbox"):
+            return "checkbox"
+        if self.pattern and (self.pattern.search(page_id or "") or self.pattern.search(title or "")):
+            return "pattern"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def start(self, page_id: Optional[str], title: str, properties: Dict[str, Any]) -> Optional[TaskProfile]:
+        """
+        Start profiling a task if the policy selects it.
+
+        Returns:
+            Optional[TaskProfile]: The running profile, or None if the task is not profiled
+            or another task's profile is still running
+        """
+        reason = self.reason(page_id, title, properties)
+        if reason is None:
+            return None
+        if not _active_lock.acquire(blocking=False):
+            logger.info(f"Not profiling task {page_id}: another profile is running")
+            return None
+        try:
+            profile = TaskProfile(
+                page_id, reason, self.store, self.interval, self.tracemalloc_frames, include_idle=self.include_idle
+            )
+            return profile.start()
+        except Exception as e:
+            _active_lock.release()
+            logger.error(f"Error starting profile of task {page_id}: {str(e)}")
+            return None
+
+
+_default_policy: Optional[ProfilingPolicy] = None
+_default_policy_lock = threading.Lock()
+
+
+def default_profiling_policy() -> ProfilingPolicy:
+    """Return the process-wide ProfilingPolicy configured from the environment."""
+    global _default_policy
+    with _default_policy_lock:
+        if _default_policy is None:
+            _default_policy = ProfilingPolicy.from_env()
+        return _default_policy
+
+
+def start_task_profile(page_id: Optional[str], title: str, properties: Dict[str, Any]) -> Optional[TaskProfile]:
+    """Start profiling a task if the default policy selects it."""
+    return default_profiling_policy().start(page_id, title, properties)
+
+
+def finish_task_profile(profile: Optional[TaskProfile], status: str) -> None:
+    """Stop a task's profile, if it has one, and write its reports."""
+    if profile is None:
+        return
+    try:
+        profile.finish(status)
+    except Exception as e:
+        logger.error(f"Error finishing profile of task {profile.page_id}: {str(e)}")
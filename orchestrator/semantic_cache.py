@@ -0,0 +1,336 @@
+"""
+Semantic response cache for the default processing path.
+
+Answers produced by default processing are embedded and kept in a small
+array-backed index per Notion database. A new task whose embedding is close
+enough to a previous one is answered from the cache instead of the LLM.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Offline embedding stand-in based on the hashing trick.
+
+    Words and word bigrams are hashed into a fixed number of signed buckets.
+    It needs no network access, so it is used in tests and as a fallback when
+    no OpenAI key is configured.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): The texts to embed
+
+        Returns:
+            np.ndarray: A (len(texts), dimensions) float32 matrix
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dimensions] += sign
+        return vectors
+
+
+class OpenAIEmbedder:
+    """Embeds texts with the OpenAI embeddings endpoint."""
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small"):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.name = f"openai-{model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): The texts to embed
+
+        Returns:
+            np.ndarray: A (len(texts), dimensions) float32 matrix
+        """
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+@dataclass
+class CacheHit:
+    """A cached answer returned by a lookup."""
+
+    answer: str
+    page_id: str
+    similarity: float
+    task_content: str
+
+
+class _ScopeIndex:
+    """
+    Nearest-neighbour index for a single scope (one Notion database).
+
+    Vectors are stored L2-normalised in a preallocated matrix so a lookup is
+    one matrix-vector product. When full, the least recently used row is
+    overwritten; recency is tracked with a logical clock.
+    """
+
+    def __init__(self, dimensions: int, capacity: int):
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries: List[Dict[str, str]] = [{} for _ in range(capacity)]
+        self.size = 0
+        self.clock = 0.0
+
+    def touch(self, row: int) -> None:
+        self.clock += 1
+        self.last_used[row] = self.clock
+
+    def search(self, query: np.ndarray) -> Optional[tuple]:
+        if self.size == 0:
+            return None
+        scores = self.vectors[:self.size] @ query
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def add(self, vector: np.ndarray, entry: Dict[str, str]) -> None:
+        capacity = len(self.entries)
+        if self.size < capacity:
+            row = self.size
+            self.size += 1
+        else:
+            row = int(np.argmin(self.last_used))
+            evicted = self.entries[row]["page_id"]
+            logger.debug(f"Semantic cache full, evicting entry for page {evicted}")
+        self.vectors[row] = vector
+        self.entries[row] = entry
+        self.touch(row)
+
+
+class SemanticCache:
+    """
+    Opt-in cache of default-processing answers keyed by task meaning.
+
+    The persisted index records which embedder produced it and the vector
+    dimensions, so switching embedders (for example when OPENAI_API_KEY is
+    unset and from_env falls back to hashing) discards the stale index
+    instead of comparing vectors from different spaces.
+
+    Attributes:
+        embedder: Object with an ``embed(texts) -> np.ndarray`` method
+        threshold (float): Minimum cosine similarity for a hit
+        max_entries (int): Maximum number of entries kept per scope
+        path (Optional[Path]): Directory used to persist the index, if any
+    """
+
+    def __init__(
+        self,
+        embedder,
+        threshold: float = 0.92,
+        max_entries: int = 500,
+        path: Optional[str] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder: Object with an ``embed(texts) -> np.ndarray`` method
+            threshold (float): Minimum cosine similarity for a hit
+            max_entries (int): Maximum number of entries kept per scope
+            path (Optional[str]): Directory to persist the index to
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self._scopes: Dict[str, _ScopeIndex] = {}
+        if self.path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """
+        Build the cache from environment variables.
+
+        Returns None unless SEMANTIC_CACHE_ENABLED is "true". SEMANTIC_CACHE_EMBEDDER
+        selects "openai" (default) or "hashing" for the offline stand-in.
+        """
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() != "true":
+            return None
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        embedder: Union[OpenAIEmbedder, HashingEmbedder]
+        if os.getenv("SEMANTIC_CACHE_EMBEDDER", "openai").lower() == "openai" and api_key:
+            embedder = OpenAIEmbedder(api_key=api_key)
+        else:
+            embedder = HashingEmbedder()
+        logger.info(f"Semantic cache using the {embedder.name} embedder")
+
+        return cls(
+            embedder=embedder,
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500")),
+            path=os.getenv("SEMANTIC_CACHE_PATH", "./.semantic_cache")
+        )
+
+    @property
+    def embedder_name(self) -> str:
+        """Identifies the embedding space the stored vectors belong to."""
+        return str(getattr(self.embedder, "name", type(self.embedder).__name__))
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self.embedder.embed([text])[0].astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _scope(self, scope: str, dimensions: int) -> _ScopeIndex:
+        index = self._scopes.get(scope)
+        if index is not None and index.vectors.shape[1] != dimensions:
+            logger.warning(
+                f"Semantic cache index for scope {scope} has {index.vectors.shape[1]} dimensions, "
+                f"the embedder produces {dimensions}; discarding it"
+            )
+            index = None
+        if index is None:
+            index = _ScopeIndex(dimensions, self.max_entries)
+            self._scopes[scope] = index
+        return index
+
+    def lookup(self, task_content: str, scope: str = "default") -> Optional[CacheHit]:
+        """
+        Find a previously answered task similar to this one.
+
+        Args:
+            task_content (str): The task text
+            scope (str): The cache scope, normally the Notion database ID
+
+        Returns:
+            Optional[CacheHit]: The cached answer, or None on a miss
+        """
+        index = self._scopes.get(scope)
+        if index is None:
+            return None
+
+        query = self._embed(task_content)
+        if len(query) != index.vectors.shape[1]:
+            return None
+        match = index.search(query)
+        if match is None:
+            return None
+
+        row, similarity = match
+        if similarity < self.threshold:
+            logger.debug(f"Semantic cache miss (best similarity {similarity:.3f})")
+            return None
+
+        index.touch(row)
+        entry = index.entries[row]
+        logger.info(
+            f"Semantic cache hit (similarity {similarity:.3f}) from page {entry['page_id']}"
+        )
+        return CacheHit(
+            answer=entry["answer"],
+            page_id=entry["page_id"],
+            similarity=similarity,
+            task_content=entry["task_content"]
+        )
+
+    def store(self, task_content: str, answer: str, page_id: str, scope: str = "default") -> None:
+        """
+        Remember an answer for later lookups.
+
+        Args:
+            task_content (str): The task text
+            answer (str): The answer produced for it
+            page_id (str): The Notion page the answer was published to
+            scope (str): The cache scope, normally the Notion database ID
+        """
+        vector = self._embed(task_content)
+        index = self._scope(scope, len(vector))
+        index.add(vector, {"task_content": task_content, "answer": answer, "page_id": page_id})
+        if self.path:
+            self._save(scope, index)
+
+    def _scope_file(self, path: Path, scope: str) -> Path:
+        name = hashlib.sha1(scope.encode("utf-8")).hexdigest()[:16]
+        return path / f"{name}.npz"
+
+    def _save(self, scope: str, index: _ScopeIndex) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            target = self._scope_file(self.path, scope)
+            tmp = target.with_name(target.name + ".tmp")
+            with open(tmp, "wb") as handle:
+                np.savez(
+                    handle,
+                    vectors=index.vectors[:index.size],
+                    last_used=index.last_used[:index.size],
+                    entries=np.array(json.dumps(index.entries[:index.size])),
+                    scope=np.array(scope),
+                    embedder=np.array(self.embedder_name),
+                    dimensions=np.array(index.vectors.shape[1])
+                )
+            os.replace(tmp, target)
+        except Exception as e:
+            logger.error(f"Error saving semantic cache: {str(e)}")
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        expected_dimensions = getattr(self.embedder, "dimensions", None)
+        for file in self.path.glob("*.npz"):
+            try:
+                with np.load(file) as data:
+                    vectors = data["vectors"]
+                    # Indexes written before the embedder was recorded cannot be trusted either
+                    embedder = str(data["embedder"]) if "embedder" in data else None
+                    dimensions = int(data["dimensions"]) if "dimensions" in data else None
+                    stale = embedder != self.embedder_name or dimensions != vectors.shape[1]
+                    if expected_dimensions is not None and dimensions != expected_dimensions:
+                        stale = True
+                    if stale:
+                        logger.warning(
+                            f"Discarding semantic cache file {file}: built with {embedder} "
+                            f"({dimensions} dimensions), now using {self.embedder_name}"
+                        )
+                        continue
+                    entries = json.loads(str(data["entries"]))
+                    index = _ScopeIndex(vectors.shape[1], self.max_entries)
+                    # Keep the most recently used rows if the size limit shrank
+                    order = np.argsort(data["last_used"])[::-1][:self.max_entries]
+                    for position, row in enumerate(order):
+                        index.vectors[position] = vectors[row]
+                        index.last_used[position] = data["last_used"][row]
+                        index.entries[position] = entries[row]
+                    index.size = len(order)
+                    index.clock = float(index.last_used[:index.size].max(initial=0.0))
+                    self._scopes[str(data["scope"])] = index
+            except Exception as e:
+                logger.error(f"Error loading semantic cache file {file}: {str(e)}")
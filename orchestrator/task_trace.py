@@ -0,0 +1,186 @@
+"""
+Per-task, memory-bounded trace of agent steps.
+
+Each crew run gets its own TaskTrace, so concurrent tasks never interleave.
+Recent steps are kept in memory up to a byte budget; older steps spill to a
+temporary file, and the trace is only rendered to text when it is published.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Iterator, List, Optional
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TraceStep:
+    """A single recorded agent step."""
+
+    type: str
+    timestamp: float
+    size: int
+    text: str
+
+
+class TaskTrace:
+    """
+    Ring buffer of agent steps with a total byte budget and spill-to-disk.
+
+    Attributes:
+        task_id (Optional[str]): The Notion page ID the trace belongs to
+        memory_budget (int): Maximum bytes of step text kept in memory
+        spill_budget (int): Maximum bytes written to the spill file
+        max_entry_chars (int): Maximum characters kept from a single step
+    """
+
+    def __init__(
+        self,
+        task_id: Optional[str] = None,
+        memory_budget: int = 256 * 1024,
+        spill_budget: int = 8 * 1024 * 1024,
+        max_entry_chars: int = 10000,
+        spill_dir: Optional[str] = None
+    ):
+        """
+        Initialize the trace.
+
+        Args:
+            task_id (Optional[str]): The Notion page ID the trace belongs to
+            memory_budget (int): Maximum bytes of step text kept in memory
+            spill_budget (int): Maximum bytes written to the spill file
+            max_entry_chars (int): Maximum characters kept from a single step
+            spill_dir (Optional[str]): Directory for the spill file (system temp by default)
+        """
+        self.task_id = task_id
+        self.memory_budget = memory_budget
+        self.spill_budget = spill_budget
+        self.max_entry_chars = max_entry_chars
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._steps: Deque[TraceStep] = deque()
+        self._memory_bytes = 0
+        self._spill_path: Optional[str] = None
+        self._spill_bytes = 0
+        self._spilled_steps = 0
+        self._dropped_steps = 0
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls, task_id: Optional[str] = None) -> "TaskTrace":
+        """Build a trace using TRACE_MEMORY_BUDGET/TRACE_SPILL_BUDGET (bytes) from the environment."""
+        return cls(
+            task_id=task_id,
+            memory_budget=int(os.getenv("TRACE_MEMORY_BUDGET", str(256 * 1024))),
+            spill_budget=int(os.getenv("TRACE_SPILL_BUDGET", str(8 * 1024 * 1024))),
+            spill_dir=os.getenv("TRACE_SPILL_DIR")
+        )
+
+    def add(self, step_type: str, text: str) -> None:
+        """
+        Record a step.
+
+        Args:
+            step_type (str): The kind of step, e.g. "tool_result" or "task_output"
+            text (str): The step text
+        """
+        if len(text) > self.max_entry_chars:
+            logger.warning(f"Truncating very long thought entry ({len(text)} chars)")
+            text = text[:self.max_entry_chars] + "... [truncated due to length]"
+
+        size = len(text.encode("utf-8"))
+        step = TraceStep(type=step_type, timestamp=time.time(), size=size, text=text)
+        with self._lock:
+            self._steps.append(step)
+            self._memory_bytes += size
+            self._total_bytes += size
+            while self._memory_bytes > self.memory_budget and len(self._steps) > 1:
+                self._spill(self._steps.popleft())
+        logger.debug(f"Thought process entry added ({size} bytes)")
+
+    def callback(self, output: Any) -> None:
+        """Step callback for CrewAI agents that records the step in this trace."""
+        tracing.event("agent.step", step=type(output).__name__, tool=getattr(output, "tool", None))
+        try:
+            if hasattr(output, 'output'):
+                self.add("task_output", f"Task completed!\nOutput: {output.output}\n")
+            elif hasattr(output, 'result'):
+                self.add("tool_result", f"Tool result: {output.result}\n")
+            elif hasattr(output, 'content'):
+                self.add("content", f"Content: {output.content}\n")
+            else:
+                self.add("tool_used", f"Tool used: {str(output)}\n")
+        except Exception as e:
+            error_entry = f"Error capturing thought: {str(e)}\n"
+            logger.error(error_entry)
+            self.add("error", error_entry)
+
+    def _spill(self, step: TraceStep) -> None:
+        """Move a step from memory to the spill file, or drop it if the file is full."""
+        self._memory_bytes -= step.size
+        if self._spill_bytes + step.size > self.spill_budget:
+            self._dropped_steps += 1
+            return
+        try:
+            if self._spill_path is None:
+                handle, self._spill_path = tempfile.mkstemp(
+                    prefix=f"trace-{self.task_id or 'task'}-", suffix=".jsonl", dir=self.spill_dir
+                )
+                os.close(handle)
+            with open(self._spill_path, "a", encoding="utf-8") as spill:
+                spill.write(json.dumps(asdict(step)) + "\n")
+            self._spill_bytes += step.size
+            self._spilled_steps += 1
+        except Exception as e:
+            logger.error(f"Error spilling trace step to disk: {str(e)}")
+            self._dropped_steps += 1
+
+    def _iter_spilled(self) -> Iterator[TraceStep]:
+        if not self._spill_path:
+            return
+        with open(self._spill_path, encoding="utf-8") as spill:
+            for line in spill:
+                yield TraceStep(**json.loads(line))
+
+    def steps(self) -> List[TraceStep]:
+        """Return all retained steps in order (spilled steps first)."""
+        with self._lock:
+            return list(self._iter_spilled()) + list(self._steps)
+
+    def render(self) -> str:
+        """Render the retained steps as the thought process text published to Notion."""
+        with self._lock:
+            parts = [step.text for step in self._iter_spilled()]
+            if self._dropped_steps:
+                parts.append(f"[{self._dropped_steps} steps omitted to stay within the trace budget]\n")
+            parts.extend(step.text for step in self._steps)
+        return "\n".join(parts)
+
+    def close(self) -> None:
+        """Delete the spill file, if one was created."""
+        with self._lock:
+            if self._spill_path and os.path.exists(self._spill_path):
+                os.remove(self._spill_path)
+            self._spill_path = None
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of step text currently held in memory."""
+        return self._memory_bytes
+
+    def __len__(self) -> int:
+        return self._total_bytes
+
+    def __bool__(self) -> bool:
+        return self._total_bytes > 0
+
+    def __str__(self) -> str:
+        return self.render()
@@ -0,0 +1,453 @@
+"""
+Lightweight in-process tracing of a task's lifecycle.
+
+Each Notion task starts a trace; spans opened while it runs (routing, LLM
+calls, crew runs, tool calls, Notion requests, publishing) nest under the
+current span through a context variable, so the trace follows the task into
+executor threads that copy the context. When the task's root span ends, its
+spans are written to a rotating JSON-lines file and, optionally, to a Chrome
+trace-event file per task that opens in chrome://tracing or Perfetto, and a
+one-line latency breakdown is logged.
+
+Spans opened outside a trace are no-ops, as is everything when tracing is
+disabled (TRACING_ENABLED=false, the default).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+from .metrics import endpoint_label
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation within a trace.
+
+    Attributes:
+        name (str): What the span measures, e.g. "crew.research"
+        trace_id (str): ID shared by all spans of the task
+        span_id (str): This span's ID
+        parent_id (Optional[str]): The enclosing span's ID, None for the root
+        start (float): Wall-clock start time in seconds since the epoch
+        duration (Optional[float]): Seconds between start and end, None while open
+        attributes (Dict[str, Any]): Extra details, e.g. the model or page ID
+        status (str): "ok" or "error"
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any], instant: bool = False):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration: Optional[float] = 0.0 if instant else None
+        self.attributes = attributes
+        self.status = "ok"
+        self.thread = threading.get_ident()
+        self.instant = instant
+        self._started = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, status: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        """
+        Close the span and restore its parent as the current span.
+
+        Args:
+            status (Optional[str]): Overrides the status, e.g. "skipped"
+            error (Optional[BaseException]): Marks the span failed and records the error
+        """
+        if self.duration is not None and not self.instant:
+            return
+        self.duration = 0.0 if self.instant else time.perf_counter() - self._started
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"[:500]
+        if status:
+            self.status = status
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Ended from another context; the span's own context is left as is
+                pass
+            self._token = None
+        self.tracer._finish(self)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(error=exc)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "thread": self.thread,
+            "instant": self.instant,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when there is no trace to record into."""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self, status: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def chrome_trace(spans: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert span dicts into the Chrome trace-event format.
+
+    Args:
+        spans (Iterable[dict]): Spans as produced by Span.to_dict()
+
+    Returns:
+        dict: A {"traceEvents": [...]} document for chrome://tracing or Perfetto
+    """
+    events = []
+    for record in spans:
+        event = {
+            "name": record["name"],
+            "cat": record["name"].split(".", 1)[0].split(" ", 1)[0],
+            "ts": int(record["start"] * 1_000_000),
+            "pid": 1,
+            "tid": record["thread"],
+            "args": {**record["attributes"], "status": record["status"], "span_id": record["span_id"]},
+        }
+        if record.get("instant"):
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=int((record["duration"] or 0) * 1_000_000))
+        events.append(event)
+    return {"traceEvents": sorted(events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+
+
+def read_trace(path: str, trace_id: str) -> List[Dict[str, Any]]:
+    """Load one trace's spans from a JSON-lines file (and its rotated backups)."""
+    spans: List[Dict[str, Any]] = []
+    for candidate in sorted(Path(path).parent.glob(Path(path).name + "*")):
+        with open(candidate, encoding="utf-8") as lines:
+            spans.extend(s for s in map(json.loads, lines) if s["trace_id"] == trace_id)
+    return sorted(spans, key=lambda s: s["start"])
+
+
+def breakdown(spans: List[Dict[str, Any]]) -> str:
+    """
+    Summarize where a trace's time went: the root and its direct children by name.
+
+    Args:
+        spans (List[dict]): The trace's spans
+
+    Returns:
+        str: E.g. "task.execute 84.20s: crew.research 80.10s, notion PATCH /pages/{id} 2.05s (x3)"
+    """
+    root = next((s for s in spans if s["parent_id"] is None), None)
+    if root is None:
+        return ""
+    totals: Dict[str, List[float]] = defaultdict(list)
+    for record in spans:
+        if record["parent_id"] == root["span_id"] and not record.get("instant"):
+            totals[record["name"]].append(record["duration"] or 0.0)
+    parts = [
+        f"{name} {sum(durations):.2f}s" + (f" (x{len(durations)})" if len(durations) > 1 else "")
+        for name, durations in sorted(totals.items(), key=lambda item: -sum(item[1]))
+    ]
+    return f"{root['name']} {root['duration'] or 0:.2f}s: " + ", ".join(parts)
+
+
+class JsonLinesExporter:
+    """
+    Appends spans to a size-rotated JSON-lines file.
+
+    Attributes:
+        path (Path): The current file; backups are path.1 ... path.<backups>
+        max_bytes (int): Size at which the file is rotated
+        backups (int): Number of rotated files kept
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self) -> None:
+        for index in range(self.backups - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with self._lock:
+            if self.path.exists() and self.path.stat().st_size + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as lines:
+                lines.write(data)
+
+
+class ChromeTraceExporter:
+    """
+    Writes each completed trace to <directory>/<trace_id>.json in Chrome trace-event format.
+
+    Attributes:
+        directory (Path): Where trace files are written
+        max_files (int): Number of most recent trace files kept
+    """
+
+    def __init__(self, directory: str, max_files: int = 200):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_files = max_files
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        root = next((s for s in spans if s["parent_id"] is None), None)
+        if root is None:
+            return
+        document = chrome_trace(spans)
+        document["otherData"] = {"trace_id": root["trace_id"], **{k: str(v) for k, v in root["attributes"].items()}}
+        target = self.directory / f"{root['trace_id']}.json"
+        target.write_text(json.dumps(document, default=str), encoding="utf-8")
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for stale in files[:-self.max_files] if self.max_files > 0 else []:
+            stale.unlink(missing_ok=True)
+
+
+class Tracer:
+    """
+    Creates spans and exports each trace when its root span ends.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded at all
+        exporters (list): Objects with an export(spans) method
+        max_spans (int): Maximum spans buffered per trace; later spans are dropped
+    """
+
+    def __init__(self, exporters: Optional[List[Any]] = None, enabled: bool = True, max_spans: int = 10000):
+        self.enabled = enabled
+        self.exporters = exporters or []
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._traces: Dict[str, List[Dict[str, Any]]] = {}
+        self._dropped: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build the tracer from TRACING_* environment variables; disabled unless TRACING_ENABLED=true."""
+        if os.getenv("TRACING_ENABLED", "false").lower() != "true":
+            return cls(enabled=False)
+        directory = os.getenv("TRACING_DIR", "./traces")
+        exporters: List[Any] = [JsonLinesExporter(
+            os.path.join(directory, "spans.jsonl"),
+            max_bytes=int(os.getenv("TRACING_MAX_BYTES", str(10 * 1024 * 1024))),
+            backups=int(os.getenv("TRACING_BACKUPS", "5"))
+        )]
+        if os.getenv("TRACING_CHROME", "true").lower() == "true":
+            exporters.append(ChromeTraceExporter(
+                os.path.join(directory, "chrome"), max_files=int(os.getenv("TRACING_CHROME_MAX_FILES", "200"))
+            ))
+        return cls(exporters)
+
+    def start_trace(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        """
+        Start a new trace and make its root span current.
+
+        Args:
+            name (str): The root span name, e.g. "task.execute"
+            trace_id (Optional[str]): The trace ID (random when omitted)
+            **attributes: Root span attributes, e.g. page_id
+
+        Returns:
+            Span: The root span; end it (or use it as a context manager) when the task is done
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        span = Span(self, name, trace_id or uuid.uuid4().hex, None, attributes)
+        with self._lock:
+            self._traces[span.trace_id] = []
+        span._token = _current_span.set(span)
+        return span
+
+    def start_span(self, name: str, **attributes: Any):
+        """Start a child of the current span and make it current; a no-op outside a trace."""
+        parent = _current_span.get()
+        if not self.enabled or parent is None:
+            return NOOP_SPAN
+        span = Span(self, name, parent.trace_id, parent.span_id, attributes)
+        span._token = _current_span.set(span)
+        return span
+
+    def event(self, name: str, **attributes: Any) -> None:
+        """Record an instant event under the current span, e.g. an agent step."""
+        parent = _current_span.get()
+        if self.enabled and parent is not None:
+            Span(self, name, parent.trace_id, parent.span_id, attributes, instant=True).end()
+
+    def _finish(self, span: Span) -> None:
+        record = span.to_dict()
+        with self._lock:
+            buffered = self._traces.get(span.trace_id)
+            if buffered is not None and span.parent_id is not None:
+                if len(buffered) < self.max_spans:
+                    buffered.append(record)
+                else:
+                    self._dropped[span.trace_id] += 1
+                return
+            spans = (self._traces.pop(span.trace_id, None) or []) + [record]
+            dropped = self._dropped.pop(span.trace_id, 0)
+        if span.parent_id is None:
+            if dropped:
+                record["attributes"]["dropped_spans"] = dropped
+            logger.info(f"Trace {span.trace_id}: {breakdown(spans)}")
+            exporters = self.exporters
+        else:
+            # A span that outlived its trace only goes to the line-oriented exporters
+            exporters = [e for e in self.exporters if isinstance(e, JsonLinesExporter)]
+        for exporter in exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.error(f"Error exporting trace {span.trace_id}: {str(e)}")
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, configured from the environment on first use."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+                if _tracer.enabled:
+                    install_crewai_tool_hooks()
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Replace the process-wide tracer (None re-reads the environment on next use)."""
+    global _tracer
+    _tracer = tracer
+
+
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes: Any):
+    return get_tracer().start_trace(name, trace_id, **attributes)
+
+
+def span(name: str, **attributes: Any):
+    """Start a child span of the current span; use as a context manager."""
+    return get_tracer().start_span(name, **attributes)
+
+
+def event(name: str, **attributes: Any) -> None:
+    get_tracer().event(name, **attributes)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+
+class TracedTransport(httpx.BaseTransport):
+    """
+    httpx transport that records each request as a span of the current trace.
+
+    Attributes:
+        transport (httpx.BaseTransport): The transport that sends the requests
+        service (str): Prefix of the span names, e.g. "notion"
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, service: str = "notion"):
+        self.transport = transport
+        self.service = service
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"{self.service} {endpoint_label(request.method, request.url.path)}") as request_span:
+            response = self.transport.handle_request(request)
+            request_span.set_attribute("status_code", response.status_code)
+            return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+_tool_hooks_installed = False
+
+
+def install_crewai_tool_hooks() -> None:
+    """
+    Record every CrewAI tool call (search, scrape, website search) as a span.
+
+    CrewAI runs tools in the agent's context, so the spans nest under the crew run.
+    """
+    global _tool_hooks_installed
+    if _tool_hooks_installed:
+        return
+    _tool_hooks_installed = True
+    from crewai.hooks import register_after_tool_call_hook, register_before_tool_call_hook
+
+    def before_tool_call(context) -> None:
+        span(f"tool.{context.tool_name}", agent=getattr(context.agent, "role", None))
+        return None
+
+    def after_tool_call(context) -> None:
+        current = _current_span.get()
+        if current is not None and current.name == f"tool.{context.tool_name}":
+            current.set_attribute("result_chars", len(str(context.tool_result or "")))
+            current.end()
+        return None
+
+    register_before_tool_call_hook(before_tool_call)
+    register_after_tool_call_hook(after_tool_call)
@@ -1,6 +1,9 @@
 import asyncio
 import logging
 from dotenv import load_dotenv
+from orchestrator.cassettes import install_cassette_from_env
+from orchestrator.loop_watchdog import LoopWatchdog
+from orchestrator.metrics import start_metrics_server_from_env
 from orchestrator.orchestrator import TaskOrchestrator
 import os
 
@@ -14,10 +17,27 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-async def main_loop():
-    """Main loop to run the service continuously"""
+async def main_loop(orchestrator=None, poll_interval=None):
+    """
+    Main loop to run the service continuously
+    
+    Args:
+        orchestrator: The TaskOrchestrator to drive, built from the environment if omitted
+        poll_interval: Seconds between polls (POLL_INTERVAL, default 300)
+    """
+    poll_interval = poll_interval if poll_interval is not None else float(os.getenv("POLL_INTERVAL", "300"))
+    # Expose /metrics when METRICS_PORT is set
+    start_metrics_server_from_env()
+    # Record or replay OpenAI, Serper, scrape and Notion traffic when CASSETTE_MODE is set
+    install_cassette_from_env()
+    # Measure event loop lag and log the stacks of blocking calls when LOOP_WATCHDOG_ENABLED=true
+    watchdog = LoopWatchdog.from_env()
+    if watchdog:
+        watchdog.start()
     # Initialize the orchestrator
-    orchestrator = TaskOrchestrator()
+    orchestrator = orchestrator or TaskOrchestrator()
+    # Build research crews and their tools while waiting for the first tasks
+    orchestrator.crew_manager.warm_up_in_background()
     
     while True:
         try:
@@ -25,13 +45,13 @@ async def main_loop():
             await orchestrator.process_execute_tasks()
             await orchestrator.process_iteration_tasks()
             
-            # Wait for 5 minutes before checking again
-            logger.info("Waiting for 5 minutes before next check...")
-            await asyncio.sleep(300)
+            # Wait before checking again
+            logger.info(f"Waiting for {poll_interval:g} seconds before next check...")
+            await asyncio.sleep(poll_interval)
         except Exception as e:
             logger.error(f"Error in main loop: {str(e)}")
             # Still wait before retrying to avoid rapid failure loops
-            await asyncio.sleep(60)
+            await asyncio.sleep(min(60, poll_interval))
 
 if __name__ == "__main__":
     logger.info("Starting scheduled Notion task processor...")
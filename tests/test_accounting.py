@@ -0,0 +1,205 @@
+"""
+Tests per-task usage accounting: token and API call totals, the usage store and publishing to Notion.
+"""
+import asyncio
+import contextvars
+import threading
+
+import httpx
+import pytest
+from crewai.types.usage_metrics import UsageMetrics
+from notion_client import Client
+
+from orchestrator import accounting
+from orchestrator.accounting import (
+    AccountedTransport,
+    TaskUsage,
+    UsageStore,
+    current_usage,
+    finish_task_usage,
+    record_llm_usage,
+    record_usage,
+    start_task_usage,
+)
+from orchestrator.model_cascade import CascadeStats, ModelCascade, estimate_cost
+from orchestrator.notion_api import NotionAPI
+from orchestrator.orchestrator import TaskOrchestrator
+
+PAGE_ID = "180ee158-0432-8041-b9f0-c28906016b3f"
+
+
+class FakeResponse:
+    content = "Paris is the capital of France."
+    usage_metadata = {"input_tokens": 1000, "output_tokens": 50, "input_token_details": {"cache_read": 800}}
+
+
+class FakeLLM:
+    def invoke(self, messages):
+        return FakeResponse()
+
+
+class FakeCrewOutput:
+    pydantic = None
+    token_usage = UsageMetrics(prompt_tokens=5000, completion_tokens=700, cached_prompt_tokens=1000,
+                               successful_requests=4)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    usage_store = UsageStore(str(tmp_path / "usage.sqlite3"))
+    monkeypatch.setattr(accounting, "_default_store", usage_store)
+    monkeypatch.setattr(accounting, "_default_store_loaded", True)
+    return usage_store
+
+
+def test_cascade_calls_and_crew_runs_are_accounted_to_the_current_task(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_ROUTING", "gpt-4o-mini")
+    monkeypatch.setenv("MODEL_CASCADE_RESEARCH", "openai/gpt-4o")
+    cascade = ModelCascade(stats=CascadeStats())
+    cascade._llms = {"gpt-4o-mini": FakeLLM()}
+
+    cascade.invoke("routing", [], lambda answer: (True, "ok"))
+    usage = start_task_usage(PAGE_ID, "execute")
+    cascade.invoke("routing", [], lambda answer: (True, "ok"))
+    cascade.run_escalating("research", lambda model: FakeCrewOutput(), lambda result: (True, "ok"))
+    usage.end()
+
+    assert usage.models == {
+        "gpt-4o-mini": {"calls": 1, "prompt_tokens": 1000, "completion_tokens": 50, "cached_tokens": 800},
+        "openai/gpt-4o": {"calls": 4, "prompt_tokens": 5000, "completion_tokens": 700, "cached_tokens": 1000},
+    }
+    totals = usage.totals()
+    assert totals["llm_calls"] == 5
+    assert totals["cost_usd"] == pytest.approx(
+        estimate_cost("gpt-4o-mini", 1000, 50, 800) + estimate_cost("gpt-4o", 5000, 700, 1000)
+    )
+    assert estimate_cost("gpt-4o", 1000, 0, 1000) == pytest.approx(estimate_cost("gpt-4o", 500, 0))
+    assert current_usage() is None
+
+
+def test_api_calls_are_counted_across_threads_and_ignored_outside_tasks():
+    record_usage(serper_calls=1)
+    record_llm_usage("gpt-4o", 10, 10)
+    usage = start_task_usage(PAGE_ID, "execute")
+
+    def tool_calls():
+        record_usage(serper_calls=1)
+        record_usage(scrape_bytes=2048)
+
+    workers = [threading.Thread(target=contextvars.copy_context().run, args=(tool_calls,)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    usage.end()
+
+    assert usage.counters == {"serper_calls": 3, "scrape_bytes": 6144, "notion_requests": 0}
+    assert usage.models == {}
+    with pytest.raises(ValueError):
+        usage.record(tweets=1)
+
+
+def test_accounting_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("ACCOUNTING_ENABLED", "false")
+
+    assert start_task_usage(PAGE_ID, "execute") is None
+    assert UsageStore.from_env() is None
+    finish_task_usage(None, "ok")
+
+
+def test_usage_store_aggregates_per_kind_and_model(store):
+    for kind, prompt in (("execute", 1000), ("execute", 3000), ("iterate", 500)):
+        usage = TaskUsage(PAGE_ID, kind)
+        usage.record_llm("gpt-4o-mini", prompt, 100)
+        usage.record(serper_calls=2, notion_requests=5)
+        finish_task_usage(usage, "ok")
+    store.record(TaskUsage("empty", "iterate"), "skipped")
+
+    summary = store.summary()
+
+    assert summary["kinds"]["execute"]["tasks"] == 2
+    assert summary["kinds"]["execute"]["serper_calls"] == 4
+    assert summary["kinds"]["execute"]["mean_cost_usd"] == pytest.approx(
+        (estimate_cost("gpt-4o-mini", 1000, 100) + estimate_cost("gpt-4o-mini", 3000, 100)) / 2
+    )
+    assert summary["kinds"]["iterate"]["tasks"] == 2
+    assert summary["models"]["gpt-4o-mini"]["prompt_tokens"] == 4500
+    assert summary["models"]["gpt-4o-mini"]["tasks"] == 3
+    assert store.summary(since=9e9) == {"kinds": {}, "models": {}}
+
+
+def test_usage_properties_are_dropped_when_the_database_rejects_them():
+    sent = []
+
+    def handler(request):
+        properties = httpx.Response(200, content=request.content).json()["properties"]
+        sent.append(sorted(properties))
+        if "Cost (USD)" in properties:
+            return httpx.Response(400, json={
+                "object": "error", "status": 400, "code": "validation_error",
+                "message": "Cost (USD) is not a property that exists."
+            })
+        return httpx.Response(200, json={"object": "page", "id": PAGE_ID})
+
+    api = NotionAPI(notion_api_key="secret", openai_api_key="test-key")
+    api.client = Client(
+        auth="secret", client=httpx.Client(transport=AccountedTransport(httpx.MockTransport(handler))), retry=False
+    )
+    usage = start_task_usage(PAGE_ID, "execute")
+    properties = usage.notion_properties()
+
+    asyncio.run(api.update_task_status(PAGE_ID, "Review", "Done", properties=properties))
+    asyncio.run(api.update_task_status(PAGE_ID, "Review", "Done", properties=properties))
+    usage.end()
+
+    assert sent == [sorted(["Response", "Status", *properties]), ["Response", "Status"], ["Response", "Status"]]
+    assert api.extra_properties_supported is False
+    assert usage.counters["notion_requests"] == 3
+
+
+class FakeNotionAPI:
+    database_id = "db"
+
+    def __init__(self):
+        self.properties = None
+
+    async def query_tasks_to_execute(self):
+        return {"results": [{"id": PAGE_ID, "properties": {"Task": {"title": [{"text": {"content": "Research AI"}}]}}}]}
+
+    async def update_task_status(self, page_id, status, summary=None, properties=None):
+        record_usage(notion_requests=1)
+        if properties:
+            self.properties = properties
+
+    async def update_page_content(self, page_id, blocks):
+        record_usage(notion_requests=1)
+
+
+class FakeCrewManager:
+    async def process_task(self, task_content, page_id, scope=None, depth=None):
+        record_llm_usage("gpt-4o-mini", 1200, 300, 200)
+        record_usage(serper_calls=2, scrape_bytes=4096)
+        return "Findings", "Thought process"
+
+    def pop_artifacts(self, page_id):
+        return None
+
+
+def test_orchestrator_publishes_and_stores_task_usage(store):
+    orchestrator = TaskOrchestrator.__new__(TaskOrchestrator)
+    orchestrator.notion_api = FakeNotionAPI()
+    orchestrator.crew_manager = FakeCrewManager()
+
+    asyncio.run(orchestrator.process_execute_tasks())
+
+    published = orchestrator.notion_api.properties
+    assert published["Prompt Tokens"] == {"number": 1200}
+    assert published["Cached Tokens"] == {"number": 200}
+    assert published["Serper Calls"] == {"number": 2}
+    assert published["Scraped Bytes"] == {"number": 4096}
+    # The "In progress" update has been made by the time the results are published
+    assert published["Notion Requests"] == {"number": 1}
+    summary = store.summary()
+    assert summary["kinds"]["execute"]["tasks"] == 1
+    assert summary["kinds"]["execute"]["notion_requests"] == 3
+    assert summary["models"]["gpt-4o-mini"]["cached_tokens"] == 200
@@ -0,0 +1,64 @@
+"""
+Tests the per-task artifact store.
+"""
+import os
+import time
+from types import SimpleNamespace
+
+from crews.research_crew.crew import InitialResearchOutput, ResearchOutput
+from orchestrator.artifacts import MARKDOWN_ARTIFACT, STRUCTURED_ARTIFACT, ArtifactStore
+
+
+def make_output():
+    return ResearchOutput(
+        executive_summary="Summary",
+        initial_research=InitialResearchOutput(
+            key_facts=["fact"], recent_developments=[], expert_opinions=[], statistics=[], sources=["https://a.example"]
+        ),
+        key_findings=["one", "two", "three"],
+        trend_analysis={"growth": "steady"},
+        recommendations=["invest"],
+    )
+
+
+def test_runs_are_isolated_and_keep_structured_output(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first, second = store.new_run("page-1"), store.new_run("page-1")
+
+    first.write_result(SimpleNamespace(raw="# First", pydantic=make_output()))
+    second.write_result(SimpleNamespace(raw="# Second", pydantic=None))
+
+    assert first.path != second.path
+    assert first.read_text(MARKDOWN_ARTIFACT) == "# First"
+    assert ResearchOutput.model_validate(first.read_json()).key_findings == ["one", "two", "three"]
+    assert second.read_json(STRUCTURED_ARTIFACT) is None
+    assert store.latest_run("page-1").run_id == second.run_id
+    # No temporary files are left behind by atomic writes
+    assert first.files() == [MARKDOWN_ARTIFACT, STRUCTURED_ARTIFACT]
+
+
+def test_stream_text_yields_bounded_chunks(tmp_path):
+    run = ArtifactStore(str(tmp_path)).new_run("page")
+    text = "é" * 4500
+    run.write_text(MARKDOWN_ARTIFACT, text)
+
+    chunks = list(run.stream_text(MARKDOWN_ARTIFACT, 2000))
+
+    assert [len(chunk) for chunk in chunks] == [2000, 2000, 500]
+    assert "".join(chunks) == text
+
+
+def test_cleanup_applies_retention_and_per_page_limit(tmp_path):
+    store = ArtifactStore(str(tmp_path), retention_seconds=3600, max_runs_per_page=2)
+    runs = [store.new_run("page") for _ in range(3)]
+    for run in runs:
+        run.write_text(MARKDOWN_ARTIFACT, "x")
+    expired = store.new_run("old-page")
+    past = time.time() - 7200
+    os.utime(expired.path, (past, past))
+
+    removed = store.cleanup()
+
+    assert removed["runs"] == 2
+    assert [run.run_id for run in store.runs("page")] == [runs[1].run_id, runs[2].run_id]
+    assert not (tmp_path / "old-page").exists()
@@ -0,0 +1,108 @@
+"""
+Tests the offline benchmark fakes and a small end-to-end benchmark run.
+"""
+import asyncio
+
+from benchmarks.e2e import E2EConfig, run_benchmark, summarize
+from benchmarks.fakes import FakeNotion, service_time
+from orchestrator.notion_api import NotionAPI
+
+DATABASE_ID = "db"
+
+
+def notion_api(notion):
+    return NotionAPI(
+        notion_api_key="secret", openai_api_key="test-key", database_id=DATABASE_ID, transport=notion.transport()
+    )
+
+
+def test_service_time_specs():
+    assert service_time("0.25")() == 0.25
+    assert 1 <= service_time("uniform:1,2", seed=1)() <= 2
+    samples = [service_time("lognormal:2,0.5", seed=3)() for _ in range(3)]
+    assert samples == [service_time("lognormal:2,0.5", seed=3)() for _ in range(3)]
+
+
+def test_fake_notion_filters_and_paginates_queries():
+    notion = FakeNotion(max_page_size=2)
+    for index in range(5):
+        notion.add_page(DATABASE_ID, f"Task {index}", status="Execute" if index % 2 == 0 else "Done")
+
+    status, _, first = notion.handle("POST", f"databases/{DATABASE_ID}/query", {}, {
+        "filter": {"property": "Status", "status": {"equals": "Execute"}}, "page_size": 10
+    })
+    assert status == 200 and first["has_more"] and len(first["results"]) == 2
+    _, _, second = notion.handle("POST", f"databases/{DATABASE_ID}/query", {}, {
+        "filter": {"property": "Status", "status": {"equals": "Execute"}}, "start_cursor": first["next_cursor"]
+    })
+    assert not second["has_more"]
+    titles = [page["properties"]["Task"]["title"][0]["plain_text"] for page in first["results"] + second["results"]]
+    assert titles == ["Task 0", "Task 2", "Task 4"]
+
+
+def test_notion_api_works_against_the_fake_and_retries_rate_limits():
+    notion = FakeNotion(rate_limit_rate=0.3, retry_after=0, seed=2)
+    page_id = notion.add_page(DATABASE_ID, "Research AI")
+    api = notion_api(notion)
+
+    async def run():
+        tasks = await api.get_tasks_to_execute()
+        await api.update_task_status(page_id, "In progress")
+        await api.update_page_content(page_id, "# Result\n\nDone.")
+        await api.update_task_status(page_id, "Review", "Summary", properties={"Cost (USD)": {"number": 0.5}})
+        return tasks
+
+    tasks = asyncio.run(run())
+
+    assert [task["id"] for task in tasks] == [page_id]
+    assert notion.status(page_id) == "Review"
+    assert notion.page(page_id)["properties"]["Cost (USD)"]["number"] == 0.5
+    assert notion.blocks(page_id)
+    assert notion.rate_limited > 0
+    assert set(notion.events[page_id]) == {"created", "Execute", "In progress", "Review"}
+
+
+def test_replacing_page_content_deletes_every_block_past_the_first_page():
+    notion = FakeNotion()
+    page_id = notion.add_page(DATABASE_ID, "Research AI")
+    for start in range(0, 250, 100):
+        notion.handle("PATCH", f"blocks/{page_id}/children", {}, {"children": [
+            {"type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": f"Old {i}"}}]}}
+            for i in range(start, min(start + 100, 250))
+        ]})
+    assert len(notion.blocks(page_id)) == 250
+
+    asyncio.run(notion_api(notion)._delete_page_children(page_id))
+
+    assert notion.blocks(page_id) == []
+    assert notion.requests["DELETE /blocks/{id}"] == 250
+
+
+def test_summarize_uses_nearest_rank_percentiles():
+    stats = summarize([float(value) for value in range(1, 101)])
+    assert (stats["p50"], stats["p95"], stats["p99"], stats["max"]) == (50.0, 95.0, 99.0, 100.0)
+    assert summarize([])["p50"] is None
+
+
+def test_end_to_end_benchmark_completes_all_tasks():
+    config = E2EConfig(
+        tasks=6,
+        initial_backlog=3,
+        arrival_rate=1200,
+        research_fraction=0.5,
+        poll_interval=0.1,
+        notion_latency="0.002",
+        llm_latency="0.005",
+        crew_latency="0.05",
+        timeout=60,
+    )
+
+    report = run_benchmark(config)
+
+    assert report["completed"] == report["tasks"] == 6
+    assert report["throughput_tasks_per_minute"] > 0
+    assert report["pickup_latency_seconds"]["count"] == 6
+    assert report["completion_latency_seconds"]["p95"] >= report["pickup_latency_seconds"]["p50"]
+    assert report["notion"]["endpoints"]["POST /databases/{id}/query"] >= 1
+    assert report["notion"]["requests_per_task"] >= 3
+    assert report["cascade"]["stages"]["routing"]["tasks"] == 6
@@ -0,0 +1,170 @@
+"""
+Tests recording HTTP traffic to cassettes and replaying it offline.
+"""
+import asyncio
+import gzip
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import httpx
+import pytest
+import requests
+
+from orchestrator.cassettes import (
+    REDACTED,
+    Cassette,
+    CassetteMissError,
+    install_cassette_from_env,
+    uninstall_cassette,
+    use_cassette,
+)
+
+SECRET = "sk-test-0123456789abcdef"
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(b"")
+
+    def do_POST(self):
+        self._respond(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+    def _respond(self, body):
+        self.server.calls += 1
+        time.sleep(0.05)
+        payload = json.dumps({
+            "path": self.path.split("?")[0], "body": body.decode("utf-8"), "call": self.server.calls
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "session=abc")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    httpd.calls = 0
+    thread = Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def secrets(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", SECRET)
+    yield
+    uninstall_cassette()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def session(server):
+    """One request per client stack the service uses."""
+    responses = [
+        httpx.post(url(server, "/v1/chat/completions"), json={"prompt": "hi"},
+                   headers={"Authorization": f"Bearer {SECRET}"}).json(),
+        requests.post(url(server, "/search"), json={"q": "batteries"},
+                      headers={"X-API-KEY": "serper"}).json(),
+        requests.get(url(server, f"/page?api_key={SECRET}&id=1")).json(),
+    ]
+
+    async def notion():
+        async with httpx.AsyncClient() as client:
+            return (await client.post(url(server, "/v1/databases/db/query"), json={})).json()
+
+    responses.append(asyncio.run(notion()))
+    return responses
+
+
+def test_replay_answers_offline_with_the_recorded_responses(server, tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    with use_cassette(path, mode="record") as cassette:
+        recorded = session(server)
+    assert cassette.stats()["recorded"] == 4
+    server.shutdown()
+
+    with use_cassette(path, mode="replay", timing=0) as cassette:
+        replayed = session(server)
+
+    assert replayed == recorded
+    assert cassette.stats() == {"loaded": 4, "exact": 4}
+    assert server.calls == 4
+
+
+def test_secrets_are_scrubbed_from_the_cassette(server, tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    with use_cassette(path, mode="record"):
+        session(server)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        content = f.read()
+    entries = [json.loads(line) for line in content.splitlines()[1:]]
+
+    assert SECRET not in content and "serper" not in content and "session=abc" not in content
+    assert entries[0]["request"]["headers"]["authorization"] == REDACTED
+    assert entries[1]["request"]["headers"]["x-api-key"] == REDACTED
+    assert "api_key=%3Credacted%3E" in entries[2]["request"]["url"]
+    assert entries[0]["response"]["headers"]["set-cookie"] == REDACTED
+    assert all(entry["duration"] >= 0.05 for entry in entries)
+
+
+def test_replay_sleeps_the_scaled_recorded_duration(server, tmp_path):
+    path = str(tmp_path / "timed.jsonl.gz")
+    with use_cassette(path, mode="record"):
+        requests.get(url(server, "/slow"))
+
+    with use_cassette(path, mode="replay", timing=2.0):
+        started = time.monotonic()
+        requests.get(url(server, "/slow"))
+        elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.1
+
+
+def test_changed_bodies_fall_back_to_the_same_url_unless_strict(server, tmp_path):
+    path = str(tmp_path / "loose.jsonl.gz")
+    with use_cassette(path, mode="record"):
+        first = httpx.post(url(server, "/v1/chat/completions"), json={"prompt": "at 10:00"}).json()
+        second = httpx.post(url(server, "/v1/chat/completions"), json={"prompt": "at 10:01"}).json()
+
+    with use_cassette(path, mode="replay", timing=0) as cassette:
+        chat = url(server, "/v1/chat/completions")
+        assert httpx.post(chat, json={"prompt": "at 11:00"}).json() == first
+        assert httpx.post(chat, json={"prompt": "at 10:01"}).json() == second
+        with pytest.raises(CassetteMissError):
+            httpx.post(url(server, "/v1/chat/completions"), json={"prompt": "again"})
+    assert cassette.stats() == {"loaded": 2, "loose": 1, "exact": 1, "misses": 1}
+
+    with use_cassette(path, mode="replay", timing=0, strict=True):
+        with pytest.raises(CassetteMissError):
+            httpx.post(url(server, "/v1/chat/completions"), json={"prompt": "at 11:00"})
+
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("CASSETTE_MODE", raising=False)
+    assert install_cassette_from_env() is None
+
+    monkeypatch.setenv("CASSETTE_MODE", "record")
+    monkeypatch.setenv("CASSETTE_PATH", str(tmp_path / "env.jsonl.gz"))
+    monkeypatch.setenv("CASSETTE_TIMING", "0.5")
+    monkeypatch.setenv("CASSETTE_MATCH", "strict")
+    cassette = install_cassette_from_env()
+    assert (cassette.mode, cassette.timing, cassette.strict) == ("record", 0.5, True)
+
+    monkeypatch.setenv("CASSETTE_MODE", "rewind")
+    with pytest.raises(ValueError):
+        Cassette.from_env()
@@ -0,0 +1,82 @@
+"""
+Tests the warm ResearchCrew pool with a stand-in crew factory.
+"""
+import threading
+import time
+
+from crews.research_crew.pool import ResearchCrewPool
+
+
+class FakeCrew:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def copy(self):
+        return FakeCrew(self.owner)
+
+
+class FakeResearchCrew:
+    built = 0
+
+    def __init__(self, model):
+        FakeResearchCrew.built += 1
+        self.model = model
+        self._crew = FakeCrew(self)
+        self.resets = 0
+
+    def crew(self):
+        return self._crew
+
+    def reset_task_state(self):
+        self.resets += 1
+
+    def task_stats(self):
+        return {}
+
+
+def make_pool(size=1):
+    FakeResearchCrew.built = 0
+    return ResearchCrewPool(size=size, acquire_timeout=5, factory=FakeResearchCrew)
+
+
+def test_warm_up_builds_one_instance_per_model_slot():
+    pool = make_pool(size=2)
+    pool.warm_up(["cheap", "large"])
+
+    assert FakeResearchCrew.built == 4
+
+
+def test_checkout_reuses_warm_instance_with_fresh_crew():
+    pool = make_pool()
+    pool.warm_up(["cheap"])
+
+    with pool.checkout("cheap") as first:
+        pass
+    with pool.checkout("cheap") as second:
+        pass
+
+    assert FakeResearchCrew.built == 1
+    assert first is not second
+    assert first.owner is second.owner
+    # Per-task tool state is cleared on every checkout
+    assert first.owner.resets == 2
+
+
+def test_pool_is_bounded_and_waits_for_a_free_instance():
+    pool = make_pool(size=1)
+    owners = []
+
+    def use():
+        with pool.checkout("cheap") as crew:
+            owners.append(crew.owner)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=use) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeResearchCrew.built == 1
+    assert len(owners) == 3
+    assert len(set(map(id, owners))) == 1
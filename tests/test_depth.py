@@ -0,0 +1,68 @@
+"""
+Tests research depth profiles and the per-task tool budget.
+"""
+from crewai import Agent, Crew, Process, Task
+from crewai.tools import BaseTool
+
+from crews.research_crew.depth import (
+    DEPTH_PROFILES,
+    BudgetedTool,
+    ToolBudget,
+    apply_depth_profile,
+    depth_from_properties,
+    get_profile,
+)
+from orchestrator.model_cascade import routing_gate
+
+
+class EchoTool(BaseTool):
+    name: str = "echo"
+    description: str = "Echoes the query"
+
+    def _run(self, query: str) -> str:
+        return f"echo: {query}"
+
+
+def test_profiles_come_from_notion_property_or_default(monkeypatch):
+    monkeypatch.delenv("RESEARCH_DEPTH", raising=False)
+    assert depth_from_properties({"Depth": {"select": {"name": "Deep"}}}) == "Deep"
+    assert depth_from_properties({"Depth": {"select": None}}) is None
+    assert get_profile("Deep") is DEPTH_PROFILES["deep"]
+    assert get_profile("bogus").name == "standard"
+    monkeypatch.setenv("RESEARCH_DEPTH", "quick")
+    assert get_profile(None).name == "quick"
+    assert routing_gate("research_crew [deep]: broad market analysis") == (True, "ok")
+
+
+def test_tool_budget_is_shared_and_reported():
+    budget = ToolBudget(max_calls=2, seconds=60)
+    tool = BudgetedTool(EchoTool(), budget)
+
+    assert tool.name == "echo"
+    first = tool.run(query="a")
+    assert first.startswith("echo: a") and "1 of 2 tool calls" in first
+    tool.run(query="b")
+    assert "budget exhausted" in tool.run(query="c")
+    assert budget.calls == 2
+
+
+def test_apply_depth_profile_bounds_agents_and_tasks(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    researcher = Agent(role="Researcher", goal="g", backstory="b", llm="gpt-4o-mini", tools=[EchoTool()])
+    crew = Crew(
+        agents=[researcher],
+        tasks=[Task(description="Research {topic}", expected_output="facts", agent=researcher)],
+        process=Process.sequential,
+    ).copy()
+    profile = DEPTH_PROFILES["quick"]
+
+    apply_depth_profile(crew, profile)
+
+    agent = crew.agents[0]
+    assert agent.max_iter == profile.max_iter
+    assert agent.max_execution_time == profile.max_execution_time
+    assert agent.llm.max_tokens == profile.max_tokens
+    assert researcher.llm.max_tokens is None
+    assert isinstance(agent.tools[0], BudgetedTool)
+    assert not isinstance(researcher.tools[0], BudgetedTool)
+    assert "quick research task" in crew.tasks[0].description
@@ -0,0 +1,141 @@
+"""
+Tests the scrape extraction pipeline: boilerplate stripping, cross-source dedupe and token caps.
+"""
+import pytest
+
+from crews.research_crew.extraction import (
+    ExtractionPipeline,
+    MinHashDeduper,
+    extract_main_text,
+    normalize_whitespace,
+)
+
+ARTICLE = """
+<html><body>
+  <nav><a href="/">Home</a> <a href="/about">About</a></nav>
+  <div class="cookie-banner">We use cookies to improve your experience on this site.</div>
+  <article>
+    <h1>Remote work and productivity</h1>
+    <p>Studies from 2023 found that hybrid teams   reported a 13% increase
+       in measured output compared with fully on-site teams.</p>
+    <p>Researchers attribute the gain to fewer interruptions and shorter commutes for employees.</p>
+  </article>
+  <footer>Copyright 2024 Example Media. All rights reserved.</footer>
+  <script>var tracking = true;</script>
+</body></html>
+"""
+
+
+def word_counter(text):
+    return len(text.split())
+
+
+def test_extract_main_text_keeps_article_and_drops_boilerplate():
+    text = extract_main_text(ARTICLE)
+
+    assert "hybrid teams reported a 13% increase" in text
+    assert "Remote work and productivity" in text
+    for boilerplate in ["Home", "cookies", "Copyright", "tracking"]:
+        assert boilerplate not in text
+    assert normalize_whitespace("a  \t b\n\n\n\nc ") == "a b\n\nc"
+
+
+def test_near_duplicate_paragraphs_are_detected_across_sources():
+    deduper = MinHashDeduper()
+    paragraph = ("The central bank raised interest rates by a quarter point on Wednesday, "
+                 "citing persistent inflation in services and a tight labour market.")
+
+    assert not deduper.is_duplicate(paragraph)
+    assert deduper.is_duplicate(paragraph.upper())
+    assert deduper.is_duplicate(paragraph.replace("Wednesday,", "Wednesday"))
+    assert not deduper.is_duplicate("Oil prices fell sharply after producers agreed to increase supply next quarter.")
+
+
+def test_pipeline_dedupes_across_sources_caps_tokens_and_reports_stats():
+    pipeline = ExtractionPipeline(token_cap=25, token_counter=word_counter)
+
+    first = pipeline.process("https://a.example/story", ARTICLE)
+    syndicated = pipeline.process("https://b.example/copy", ARTICLE.replace("Remote work", "Working remotely"))
+
+    assert "13% increase" in first
+    assert "13% increase" not in syndicated
+    assert word_counter(first) <= 25
+
+    stats = pipeline.stats()
+    assert stats["sources"] == 2
+    assert stats["duplicate_paragraphs"] >= 2
+    assert stats["capped_sources"] == 1
+    assert 0 < stats["reduction"] < 1
+
+    pipeline.reset()
+    assert pipeline.stats()["sources"] == 0
+    assert "13% increase" in pipeline.process("https://b.example/copy", ARTICLE)
+
+
+def test_over_cap_first_paragraph_is_truncated_and_only_the_kept_part_is_remembered():
+    pipeline = ExtractionPipeline(token_cap=10, token_counter=word_counter)
+    words = [f"word{index}" for index in range(30)]
+
+    first = pipeline.extract("https://a.example/long", " ".join(words))
+    second = pipeline.extract("https://b.example/tail", " ".join(words[10:]))
+
+    assert first.text == " ".join(words[:10])
+    assert first.capped and second.capped
+    assert pipeline.stats()["capped_sources"] == 2
+    # The cut-off words 10-19 were never passed on, so they are not duplicates
+    assert second.text == " ".join(words[10:20])
+    assert second.duplicate_paragraphs == 0
+
+
+def test_all_duplicate_source_is_reported_as_such():
+    pipeline = ExtractionPipeline(token_cap=100, token_counter=word_counter)
+    pipeline.process("https://a.example/story", ARTICLE)
+
+    repeat = pipeline.extract("https://b.example/copy", ARTICLE)
+
+    assert repeat.text == ""
+    assert repeat.duplicate_paragraphs >= 2
+    assert not repeat.capped
+
+
+def test_short_headings_are_kept_and_site_chrome_dropped():
+    text = "\n".join([
+        "Key findings", "Revenue growth", "Share this article", "Home | About | Contact | Careers",
+        "© 2024 Example Media", "Read more", "Hybrid teams reported higher output.",
+    ])
+
+    pipeline = ExtractionPipeline(token_cap=100, token_counter=word_counter)
+    output = pipeline.process("https://example.com", text)
+
+    assert output.split("\n\n") == [
+        "Key findings", "Revenue growth", "Hybrid teams reported higher output."
+    ]
+
+
+@pytest.mark.parametrize("page", [
+    '<html class="nav-open"><body>{}</body></html>',
+    '<html><body class="page has-sidebar">{}</body></html>',
+    '<html><body><article class="post share-enabled">{}</article></body></html>',
+    '<html><body><main id="main-content related-posts">{}</main></body></html>',
+    '<html><body><div class="sidebar">{}</div><div class="menu">Home</div></body></html>',
+])
+def test_page_containers_are_kept_whatever_their_class(page):
+    content = "<p>Hybrid teams reported a 13% increase in measured output.</p>"
+
+    assert extract_main_text(page.format(content)) == (
+        "Hybrid teams reported a 13% increase in measured output."
+    )
+
+
+def test_hinted_chrome_is_removed_by_whole_class_or_id_token():
+    text = extract_main_text(
+        '<body><div class="content"><p>Hybrid teams reported higher output.</p></div>'
+        '<div class="cookie-banner">We use cookies.</div>'
+        '<ul class="social-share"><li>Tweet</li></ul>'
+        '<div id="comments"><p>Nice post</p></div>'
+        '<div class="navigation-aid"><p>Kept because the token is not chrome.</p></div></body>'
+    )
+
+    assert text.split("\n\n") == [
+        "Hybrid teams reported higher output.", "Kept because the token is not chrome."
+    ]
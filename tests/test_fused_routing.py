@@ -0,0 +1,167 @@
+"""
+Tests the fused route-and-answer path of the CrewManager with fake models.
+"""
+import asyncio
+
+import pytest
+
+from orchestrator.crew_manager import CrewManager, RouteAndAnswer
+from orchestrator.model_cascade import CascadeStats, ModelCascade
+
+PAGE_ID = "page-1"
+SCOPE = "db-1"
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 100, "output_tokens": 20}
+
+
+class FakeLLM:
+    """Chat model whose structured output is a fixed verdict (or a parsing error)."""
+
+    def __init__(self, model_name, content="", verdict=None, error=None):
+        self.model_name = model_name
+        self.content = content
+        self.verdict = verdict
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(self.content)
+
+    def with_structured_output(self, schema, method, include_raw):
+        assert schema is RouteAndAnswer and include_raw
+        llm = self
+
+        class Structured:
+            def invoke(self, messages):
+                llm.calls += 1
+                return {"raw": FakeResponse(""), "parsed": llm.verdict, "parsing_error": llm.error}
+
+        return Structured()
+
+
+class FakeCache:
+    def __init__(self):
+        self.stored = []
+
+    def lookup(self, task_content, scope):
+        return None
+
+    def store(self, task_content, answer, page_id, scope):
+        self.stored.append((answer, page_id, scope))
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_ROUTING", "router")
+    monkeypatch.setenv("MODEL_CASCADE_DEFAULT", "gpt-4o")
+    manager = CrewManager.__new__(CrewManager)
+    manager.cascade = ModelCascade(stats=CascadeStats())
+    manager.cascade._llms = {
+        "router": FakeLLM("router", content="default: A general question"),
+        "gpt-4o": FakeLLM("gpt-4o", content="Paris is the capital and largest city of France."),
+    }
+    manager.llm = manager.cascade._llms["router"]
+    manager.semantic_cache = FakeCache()
+    manager.fused_routing = True
+    manager.crew_runs = []
+
+    async def process_with_crew(crew_name, task_content, task_id=None, depth=None, scope=None):
+        manager.crew_runs.append((crew_name, task_id, depth, scope))
+        return "Research findings", "trace"
+
+    manager.process_with_crew = process_with_crew
+    return manager
+
+
+def run(manager, task="What is the capital of France?"):
+    return asyncio.run(manager.process_task(task, PAGE_ID, SCOPE))
+
+
+def test_route_and_answer_returns_the_parsed_verdict(manager):
+    verdict = RouteAndAnswer(crew="default", reasoning="simple", answer="Paris")
+    manager.llm.verdict = verdict
+
+    assert asyncio.run(manager.route_and_answer("Capital of France?")) == verdict
+    assert manager.cascade.stats.snapshot()["models"]["router"]["prompt_tokens"] == 100
+
+
+def test_good_fused_answer_is_returned_and_cached(manager):
+    manager.llm.verdict = RouteAndAnswer(
+        crew="default", reasoning="simple", answer=" Paris is the capital of France. "
+    )
+
+    response, thought = run(manager)
+
+    assert response == "Paris is the capital of France."
+    assert thought == "Answered directly by the task router (simple)"
+    assert manager.cascade._llms["gpt-4o"].calls == 0
+    assert manager.semantic_cache.stored == [(response, PAGE_ID, SCOPE)]
+    assert manager.cascade.stats.snapshot()["stages"]["fused"]["escalations"] == 0
+
+
+def test_research_verdict_runs_the_crew(manager):
+    manager.llm.verdict = RouteAndAnswer(
+        crew="research_crew", reasoning="needs sources", depth="deep"
+    )
+
+    assert run(manager) == ("Research findings", "trace")
+    assert manager.crew_runs == [("research_crew", PAGE_ID, "deep", SCOPE)]
+
+
+@pytest.mark.parametrize("answer", [None, "", "I'm not sure, I cannot answer that."])
+def test_empty_or_failing_answer_escalates_to_default(manager, answer):
+    manager.llm.verdict = RouteAndAnswer(crew="default", reasoning="simple", answer=answer)
+
+    response, thought = run(manager)
+
+    assert response == "Paris is the capital and largest city of France."
+    assert "gpt-4o" in thought
+    assert manager.semantic_cache.stored == [(response, PAGE_ID, SCOPE)]
+    assert manager.cascade.stats.snapshot()["stages"]["fused"]["escalated_tasks"] == 1
+
+
+def test_error_falls_back_to_routing_with_task_and_scope(manager):
+    manager.llm.error = ValueError("bad json")
+
+    assert run(manager) == ("Research findings", "trace")
+    assert manager.crew_runs == [("default", PAGE_ID, None, SCOPE)]
+
+
+def test_crew_fallback_to_default_keeps_task_and_scope(manager):
+    del manager.process_with_crew
+
+    response, _ = asyncio.run(
+        manager.process_with_crew("default", "What is the capital of France?", PAGE_ID, None, SCOPE)
+    )
+
+    assert manager.semantic_cache.stored == [(response, PAGE_ID, SCOPE)]
+
+
+def test_iteration_crew_failure_falls_back_without_the_semantic_cache(manager):
+    class FailingPool:
+        def checkout(self, model):
+            raise RuntimeError("crew unavailable")
+
+    async def route(task_content):
+        return "research_crew", "needs sources", None
+
+    lookups = []
+    manager.semantic_cache.lookup = lambda task_content, scope: lookups.append(task_content)
+    manager.route = route
+    manager.crew_pool = FailingPool()
+    manager.parallel_research = None
+    del manager.process_with_crew
+
+    response, thought = asyncio.run(
+        manager.process_iteration("Shorten the previous answer", PAGE_ID, ["too long"])
+    )
+
+    assert response == "Paris is the capital and largest city of France."
+    assert "gpt-4o" in thought
+    assert lookups == []
+    assert manager.semantic_cache.stored == []
@@ -0,0 +1,96 @@
+"""
+Tests the token-budgeted iteration context builder.
+"""
+import pytest
+import tiktoken
+
+from orchestrator.iteration_context import (
+    IterationContextBuilder,
+    IterationStateStore,
+    comment_key,
+    count_tokens,
+)
+from orchestrator.notion_api import PageComment
+
+try:
+    tiktoken.get_encoding("o200k_base")
+except Exception:
+    pytest.skip("tiktoken encoding files are not available offline", allow_module_level=True)
+
+
+def make_builder(tmp_path, **kwargs):
+    state = IterationStateStore(str(tmp_path / "state.json"))
+    return IterationContextBuilder(state=state, **kwargs)
+
+
+def test_addressed_comments_are_not_resent(tmp_path):
+    builder = make_builder(tmp_path)
+    shorter = PageComment("c-1", "Page comment: shorter please")
+    first = builder.build("page-1", "Write a haiku", [shorter])
+    builder.mark_addressed("page-1", first)
+
+    autumn = PageComment("c-2", "Page comment: mention autumn")
+    second = builder.build("page-1", "Write a haiku", [shorter, autumn])
+
+    assert second.included_comments == [autumn]
+    assert second.skipped_comments == 1
+    assert "shorter please" not in second.prompt
+
+
+def test_comments_are_tracked_by_id_not_text(tmp_path):
+    builder = make_builder(tmp_path)
+    first = builder.build("page-1", "Task", [PageComment("c-1", "Page comment: +1")])
+    builder.mark_addressed("page-1", first)
+
+    repeated = PageComment("c-2", "Page comment: +1")
+    second = builder.build("page-1", "Task", [PageComment("c-1", "Page comment: +1"), repeated])
+
+    assert second.included_comments == [repeated]
+    assert builder.state.addressed("page-1") == {"c-1"}
+
+
+def test_text_keys_from_older_state_still_count_as_addressed(tmp_path):
+    state = IterationStateStore(str(tmp_path / "state.json"))
+    state.mark_addressed("page-1", [comment_key("Page comment: fix typo")])
+    builder = IterationContextBuilder(state=state)
+
+    context = builder.build("page-1", "Task", [PageComment("c-1", "Page comment: fix typo")])
+
+    assert context.included_comments == []
+    assert context.skipped_comments == 1
+
+
+def test_addressed_state_survives_restart(tmp_path):
+    builder = make_builder(tmp_path)
+    typo = PageComment("c-1", "Page comment: fix typo")
+    context = builder.build("page-1", "Task", [typo])
+    builder.mark_addressed("page-1", context)
+
+    reloaded = make_builder(tmp_path)
+
+    assert reloaded.build("page-1", "Task", [typo]).included_comments == []
+
+
+def test_prompt_stays_within_budget_as_thread_grows(tmp_path):
+    builder = make_builder(tmp_path, token_budget=300, summary_tokens=60)
+    comments = [
+        PageComment(f"c-{i}", f"Page comment: feedback item {i} " + "detail " * 20)
+        for i in range(200)
+    ]
+    previous = "\n\n".join(["A long previous paragraph. " * 30] * 10)
+
+    context = builder.build("page-1", "Research topic", comments, previous_response=previous)
+
+    assert context.token_count <= 300
+    assert count_tokens(context.prompt) == context.token_count
+    assert context.included_comments
+    assert len(context.included_comments) + len(context.deferred_comments) == 200
+
+
+def test_previous_response_is_summarised(tmp_path):
+    builder = make_builder(tmp_path, summary_tokens=20)
+    previous = "First paragraph is short.\n\n" + "Second paragraph is much longer. " * 50
+
+    summary = builder.summarize_previous(previous)
+
+    assert summary == "First paragraph is short."
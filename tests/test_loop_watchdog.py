@@ -0,0 +1,129 @@
+"""
+Tests the event loop watchdog and guards the Notion and crew code paths against blocking calls.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from notion_client import Client
+
+from orchestrator.crew_manager import CrewManager
+from orchestrator.loop_watchdog import LoopBlockedError, LoopWatchdog
+from orchestrator.model_cascade import CascadeStats, ModelCascade
+from orchestrator.notion_api import NotionAPI
+
+PAGE_ID = "180ee158-0432-8041-b9f0-c28906016b3f"
+SLOW = 0.2
+
+
+def watchdog():
+    return LoopWatchdog(interval=0.02, threshold=0.1)
+
+
+def blocking_call():
+    time.sleep(0.4)
+
+
+def test_blocking_call_is_reported_with_its_stack():
+    async def run():
+        async with watchdog() as dog:
+            await asyncio.sleep(0.1)
+            blocking_call()
+            await asyncio.sleep(0.1)
+        return dog
+
+    dog = asyncio.run(run())
+
+    (report,) = dog.reports
+    assert report.duration >= 0.3
+    assert "blocking_call" in report.location and "time.sleep" in report.stack
+    assert dog.percentiles()[1.0] >= 0.3
+    with pytest.raises(LoopBlockedError, match="blocking_call"):
+        dog.assert_no_blocks()
+
+
+def test_awaiting_does_not_count_as_blocking():
+    async def run():
+        async with watchdog() as dog:
+            await asyncio.gather(*(asyncio.sleep(0.2) for _ in range(10)))
+        return dog
+
+    dog = asyncio.run(run())
+
+    dog.assert_no_blocks()
+    assert dog.percentiles()[0.5] < 0.1
+
+
+def test_watchdog_is_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("LOOP_WATCHDOG_ENABLED", raising=False)
+    assert LoopWatchdog.from_env() is None
+
+    monkeypatch.setenv("LOOP_WATCHDOG_ENABLED", "true")
+    monkeypatch.setenv("LOOP_WATCHDOG_THRESHOLD", "0.5")
+    assert LoopWatchdog.from_env().threshold == 0.5
+
+
+def test_notion_api_does_not_block_the_loop():
+    def handler(request):
+        time.sleep(SLOW)
+        if request.url.path.endswith("/query"):
+            return httpx.Response(200, json={"object": "list", "results": [], "has_more": False})
+        if request.method == "GET":
+            return httpx.Response(200, json={"object": "list", "results": [], "has_more": False})
+        return httpx.Response(200, json={"object": "page", "id": PAGE_ID})
+
+    api = NotionAPI(notion_api_key="secret", openai_api_key="test-key")
+    api.client = Client(auth="secret", client=httpx.Client(transport=httpx.MockTransport(handler)), retry=False)
+
+    async def run():
+        async with watchdog() as dog:
+            await api.get_tasks_to_execute()
+            await api.query_tasks_to_iterate()
+            await api.get_task(PAGE_ID)
+            await api.get_page_comments(PAGE_ID)
+            await api.update_task_status(PAGE_ID, "Review", "Summary")
+            await api.update_page_content(PAGE_ID, "Result")
+            await api.create_error_log(PAGE_ID, "boom")
+        return dog
+
+    asyncio.run(run()).assert_no_blocks()
+
+
+class SlowResponse:
+    usage_metadata = {"input_tokens": 10, "output_tokens": 5}
+
+    def __init__(self, content):
+        self.content = content
+
+
+class SlowLLM:
+    def __init__(self, content):
+        self.content = content
+
+    def invoke(self, messages):
+        time.sleep(SLOW)
+        return SlowResponse(self.content)
+
+
+def test_crew_manager_default_path_does_not_block_the_loop(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_ROUTING", "gpt-4o-mini")
+    monkeypatch.setenv("MODEL_CASCADE_DEFAULT", "gpt-4o")
+    manager = CrewManager.__new__(CrewManager)
+    manager.cascade = ModelCascade(stats=CascadeStats())
+    manager.cascade._llms = {
+        "gpt-4o-mini": SlowLLM("default: A general question"),
+        "gpt-4o": SlowLLM("Paris is the capital of France."),
+    }
+    manager.semantic_cache = None
+    manager.fused_routing = False
+
+    async def run():
+        async with watchdog() as dog:
+            response, _ = await manager.process_task("Capital of France?", PAGE_ID)
+        return dog, response
+
+    dog, response = asyncio.run(run())
+
+    dog.assert_no_blocks()
+    assert response == "Paris is the capital of France."
@@ -0,0 +1,106 @@
+"""
+Tests the in-process metrics registry, its Prometheus rendering and the /metrics endpoint.
+"""
+import urllib.error
+import urllib.request
+
+import httpx
+import pytest
+from notion_client import Client
+
+from orchestrator.metrics import (
+    MeteredTransport,
+    MetricsRegistry,
+    endpoint_label,
+    start_metrics_server,
+    track,
+)
+
+PAGE_ID = "180ee158-0432-8041-b9f0-c28906016b3f"
+
+
+def test_render_counters_gauges_and_histograms():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["endpoint", "status"])
+    queued = registry.gauge("queued", "Queued tasks", ["kind"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1])
+
+    requests.labels("GET /pages/{id}", "200").inc()
+    requests.labels(endpoint='say "hi"', status="500").inc(2)
+    queued.labels("execute").set(3)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{endpoint="GET /pages/{id}",status="200"} 1' in text
+    assert 'requests_total{endpoint="say \\"hi\\"",status="500"} 2' in text
+    assert 'queued{kind="execute"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_sum 5.55' in text
+    assert 'latency_seconds_count 3' in text
+    assert registry.counter("requests_total", "Requests", ["endpoint", "status"]) is requests
+    with pytest.raises(ValueError):
+        requests.labels("only-one")
+
+
+def test_track_records_outcome_and_duration():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls", ["model", "status"])
+    latency = registry.histogram("call_seconds", "Latency", ["model"])
+
+    with track(calls, latency, "gpt-4o-mini"):
+        pass
+    with pytest.raises(RuntimeError):
+        with track(calls, latency, "gpt-4o-mini"):
+            raise RuntimeError("boom")
+
+    assert calls.labels("gpt-4o-mini", "ok").value == 1
+    assert calls.labels("gpt-4o-mini", "error").value == 1
+    assert latency.labels("gpt-4o-mini").count == 2
+
+
+def test_endpoint_label_replaces_ids():
+    assert endpoint_label("PATCH", f"/v1/pages/{PAGE_ID}") == "PATCH /pages/{id}"
+    assert endpoint_label("POST", f"/v1/databases/{PAGE_ID.replace('-', '')}/query") == "POST /databases/{id}/query"
+
+
+def test_metered_transport_counts_notion_requests_by_endpoint_and_status():
+    registry = MetricsRegistry()
+    requests = registry.counter("notion_requests_total", "Requests", ["endpoint", "status"])
+    latency = registry.histogram("notion_request_seconds", "Latency", ["endpoint"])
+
+    def handler(request):
+        if request.method == "PATCH":
+            return httpx.Response(429, json={"object": "error", "code": "rate_limited", "message": "slow down"})
+        return httpx.Response(200, json={"object": "page", "id": PAGE_ID})
+
+    transport = MeteredTransport(httpx.MockTransport(handler), requests, latency)
+    client = Client(auth="secret", client=httpx.Client(transport=transport), retry=False)
+
+    client.pages.retrieve(page_id=PAGE_ID)
+    with pytest.raises(Exception):
+        client.pages.update(page_id=PAGE_ID, properties={})
+
+    assert requests.labels("GET /pages/{id}", "200").value == 1
+    assert requests.labels("PATCH /pages/{id}", "429").value == 1
+    assert latency.labels("GET /pages/{id}").count == 1
+
+
+def test_metrics_server_serves_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("poll_cycles_total", "Poll cycles", ["kind"]).labels("execute").inc()
+    server = start_metrics_server(0, host="127.0.0.1", registry=registry)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'poll_cycles_total{kind="execute"} 1' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other")
+    finally:
+        server.shutdown()
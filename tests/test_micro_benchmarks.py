@@ -0,0 +1,81 @@
+"""
+Tests the micro-benchmark suite, its inputs and baseline comparison, and comment flattening.
+"""
+from benchmarks import micro
+from orchestrator.notion_api import NotionAPI, PageComment
+
+
+def test_inputs_have_the_requested_sizes():
+    report = micro.report_markdown(20_000)
+    assert 20_000 <= len(report) < 25_000
+    assert "## Section 1" in report and "\n- " in report and "**" in report
+    assert len(micro.page_blocks(150)) == 150
+    assert len(micro.comment_thread(40)) == 40
+
+
+def test_suite_reports_throughput_and_allocations(tmp_path):
+    results = micro.run_suite(scale=0.01, repeat=1, min_time=0.001)
+
+    assert set(results) == {case.name for case in micro.build_cases(0.01)}
+    for result in results.values():
+        assert result["seconds_per_call"] > 0
+        assert result["calls_per_second"] > 0
+        assert result["peak_bytes"] >= 0 and result["allocations"] >= 0
+
+    path = tmp_path / "micro.json"
+    micro.save_baseline(str(path), results, 0.01)
+    assert micro.load_baseline(str(path)) == results
+
+
+def test_compare_flags_slowdowns_and_memory_growth_above_the_threshold():
+    baseline = {
+        "split_text": {"seconds_per_call": 0.010, "peak_bytes": 1000},
+        "rich_text": {"seconds_per_call": 0.010, "peak_bytes": 1000},
+    }
+    results = {
+        "split_text": {"seconds_per_call": 0.011, "peak_bytes": 1500},
+        "rich_text": {"seconds_per_call": 0.013, "peak_bytes": 1000},
+        "new_case": {"seconds_per_call": 1.0, "peak_bytes": 1},
+    }
+
+    regressions = micro.compare(results, baseline, threshold=0.2)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("split_text: peak_bytes")
+    assert regressions[1].startswith("rich_text: seconds_per_call")
+
+
+def test_main_fails_on_regression(tmp_path, capsys):
+    path = tmp_path / "micro.json"
+    args = [
+        "--scale", "0.01", "--repeat", "1", "--min-time", "0.001",
+        "--case", "split_text", "--baseline", str(path),
+    ]
+    assert micro.main(args + ["--compare"]) == 2
+    assert micro.main(args + ["--save-baseline"]) == 0
+
+    fast = {"split_text": {"seconds_per_call": 1e-9, "peak_bytes": 1}}
+    micro.save_baseline(str(path), fast, 0.01)
+
+    assert micro.main(args + ["--compare"]) == 1
+    assert "REGRESSION split_text" in capsys.readouterr().err
+
+
+def test_format_comments_flattens_page_and_inline_comments():
+    comments = [
+        {
+            "id": "c-1",
+            "rich_text": [{"text": {"content": "Add "}}, {"text": {"content": "sources"}}]
+        },
+        {"rich_text": []},
+        {"id": "no-text"},
+    ]
+    block = {"type": "paragraph", "paragraph": {"rich_text": [{"text": {"content": "Intro"}}]}}
+
+    assert NotionAPI.format_comments(comments) == [PageComment("c-1", "Page comment: Add sources")]
+    assert NotionAPI.format_comments(comments, block) == [
+        PageComment("c-1", "Inline comment on 'Intro': Add sources")
+    ]
+    assert NotionAPI.format_comments(comments, {"type": "divider", "divider": {}}) == [
+        PageComment("c-1", "Inline comment: Add sources")
+    ]
@@ -0,0 +1,81 @@
+"""
+Tests the model cascade's quality-gated escalation and statistics.
+"""
+from orchestrator.metrics import REGISTRY
+from orchestrator.model_cascade import (
+    CascadeStats,
+    ModelCascade,
+    answer_gate,
+    cascade_for_stage,
+    routing_gate,
+)
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {"input_tokens": 100, "output_tokens": 20}
+
+
+class FakeLLM:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(self.content)
+
+
+def make_cascade(answers):
+    cascade = ModelCascade(stats=CascadeStats())
+    cascade._llms = {model: FakeLLM(answer) for model, answer in answers.items()}
+    return cascade
+
+
+def test_cheap_model_answer_is_accepted(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_DEFAULT", "gpt-4o-mini,gpt-4o")
+    cascade = make_cascade({"gpt-4o-mini": "Paris is the capital.", "gpt-4o": "Paris."})
+
+    answer, model = cascade.invoke("default", [], lambda a: answer_gate("Capital of France?", a))
+
+    assert (answer, model) == ("Paris is the capital.", "gpt-4o-mini")
+    assert cascade._llms["gpt-4o"].calls == 0
+    assert cascade.stats.snapshot()["stages"]["default"]["escalation_rate"] == 0.0
+
+
+def test_hedging_answer_escalates_to_larger_model(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_DEFAULT", "gpt-4o-mini,gpt-4o")
+    cascade = make_cascade({"gpt-4o-mini": "I'm not sure about that.", "gpt-4o": "Paris."})
+
+    answer, model = cascade.invoke("default", [], lambda a: answer_gate("Capital of France?", a))
+
+    stats = cascade.stats.snapshot()
+    assert (answer, model) == ("Paris.", "gpt-4o")
+    assert stats["stages"]["default"]["escalation_rate"] == 1.0
+    assert stats["models"]["gpt-4o"]["calls"] == 1
+    assert stats["models"]["gpt-4o"]["cost_usd"] > stats["models"]["gpt-4o-mini"]["cost_usd"]
+
+
+def test_stats_are_exported_as_metrics(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_METRICS", "model-a,model-b")
+    cascade = make_cascade({"model-a": "I don't know.", "model-b": "Paris."})
+
+    cascade.invoke("metrics", [], lambda a: answer_gate("Capital of France?", a))
+
+    text = REGISTRY.render()
+    assert 'notion_ops_cascade_tasks_total{stage="metrics",escalated="true"} 1' in text
+    assert 'notion_ops_cascade_escalations_total{stage="metrics"} 1' in text
+    assert 'notion_ops_cascade_call_duration_seconds_count{model="model-b"} 1' in text
+    assert 'notion_ops_llm_tokens_total{model="model-a",kind="prompt"} 100' in text
+
+
+def test_stage_order_can_be_configured(monkeypatch):
+    monkeypatch.setenv("MODEL_CASCADE_ROUTING", "gpt-4o-mini, gpt-4o")
+
+    assert cascade_for_stage("routing") == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_routing_gate_rejects_unparseable_response():
+    assert routing_gate("research_crew: needs sources")[0]
+    assert not routing_gate("I think research")[0]
@@ -0,0 +1,166 @@
+"""
+Tests rendering research results and markdown as native Notion blocks.
+"""
+import asyncio
+
+from crews.research_crew.crew import InitialResearchOutput, ResearchOutput
+from orchestrator.notion_api import NotionAPI
+from orchestrator.notion_blocks import (
+    batch_blocks,
+    count_blocks,
+    markdown_to_blocks,
+    paragraph,
+    research_output_to_blocks,
+    rich_text,
+    split_text,
+)
+
+
+def texts(block):
+    return [segment["text"]["content"] for segment in block[block["type"]]["rich_text"]]
+
+
+def test_long_text_is_packed_into_one_block_split_at_word_boundaries():
+    text = " ".join(f"word{i}" for i in range(1200))
+
+    blocks = paragraph(text)
+
+    assert len(blocks) == 1
+    segments = texts(blocks[0])
+    assert len(segments) == 5
+    assert all(len(segment) <= 2000 for segment in segments)
+    assert all(segment.endswith(" ") for segment in segments[:-1])
+    assert "".join(segments) == text
+    assert "".join(split_text("a" * 4500)) == "a" * 4500
+
+
+def test_inline_markdown_becomes_annotations_and_links():
+    segments = rich_text("Use **bold**, *italic*, `code` and [docs](https://example.com/docs).")
+
+    assert [s["text"]["content"] for s in segments] == ["Use ", "bold", ", ", "italic", ", ", "code", " and ", "docs", "."]
+    assert segments[1]["annotations"] == {"bold": True}
+    assert segments[3]["annotations"] == {"italic": True}
+    assert segments[5]["annotations"] == {"code": True}
+    assert segments[7]["text"]["link"] == {"url": "https://example.com/docs"}
+
+
+def test_markdown_maps_to_native_blocks():
+    markdown = """# Report
+
+Intro line one
+continues here.
+
+- First
+  - Nested
+- Second
+1. Step one
+> Quoted insight
+---
+```python
+print("hi")
+```"""
+
+    blocks = markdown_to_blocks(markdown)
+
+    assert [b["type"] for b in blocks] == [
+        "heading_1", "paragraph", "bulleted_list_item", "bulleted_list_item",
+        "numbered_list_item", "quote", "divider", "code",
+    ]
+    assert texts(blocks[1]) == ["Intro line one\ncontinues here."]
+    assert texts(blocks[2]["bulleted_list_item"]["children"][0]) == ["Nested"]
+    assert blocks[-1]["code"]["language"] == "python"
+
+
+def test_research_output_renders_sections_and_toggles_with_few_blocks():
+    output = ResearchOutput(
+        executive_summary="AI adoption grew quickly. " * 200,
+        initial_research=InitialResearchOutput(
+            key_facts=[f"Fact {i}" for i in range(3)],
+            recent_developments=[],
+            expert_opinions=[{"opinion": "It is transformative", "source": "Dr. Smith"}],
+            statistics=[{"statistic": "72% of firms use AI", "source": "Survey"}],
+            sources=["https://example.com/a", "Industry report"],
+        ),
+        key_findings=["one", "two", "three"],
+        trend_analysis={"Automation": "Rising steadily"},
+        recommendations=["Invest", "Train staff"],
+    )
+
+    blocks = research_output_to_blocks(output)
+    types = [b["type"] for b in blocks]
+
+    assert types.count("heading_2") == 5
+    assert types.count("toggle") == 4
+    summary = blocks[1]
+    assert summary["type"] == "paragraph" and len(texts(summary)) == 3
+    opinions = next(b for b in blocks if b["type"] == "toggle" and texts(b)[0].startswith("Expert opinions"))
+    assert opinions["toggle"]["children"][0]["type"] == "quote"
+    assert texts(opinions["toggle"]["children"][0]) == ["It is transformative — Dr. Smith"]
+    sources = next(b for b in blocks if b["type"] == "toggle" and texts(b)[0].startswith("Sources"))
+    assert sources["toggle"]["children"][0]["bulleted_list_item"]["rich_text"][0]["text"]["link"]
+    assert research_output_to_blocks(output.model_dump(mode="json")) == blocks
+
+
+def test_batches_respect_notion_request_limits():
+    blocks = paragraph("x") * 250
+    nested = markdown_to_blocks("- parent\n" + "\n".join(f"  - child {i}" for i in range(50)))
+
+    assert [len(batch) for batch in batch_blocks(blocks)] == [100, 100, 50]
+    assert count_blocks(nested) == 51
+    assert [len(batch) for batch in batch_blocks(nested * 30)] == [19, 11]
+
+
+class FakeChildren:
+    def __init__(self):
+        self.appended = []
+        self.pages = [
+            {"results": [{"id": "old-1"}], "has_more": True, "next_cursor": "c1"},
+            {"results": [{"id": "old-2"}], "has_more": False},
+        ]
+
+    def list(self, block_id, start_cursor=None):
+        return self.pages[1] if start_cursor == "c1" else self.pages[0]
+
+    def append(self, block_id, children):
+        self.appended.append(children)
+        return {"results": children}
+
+
+class FakeBlocks:
+    def __init__(self):
+        self.children = FakeChildren()
+        self.deleted = []
+
+    def delete(self, block_id):
+        self.deleted.append(block_id)
+
+
+def test_update_page_content_accepts_blocks_and_appends_in_batches():
+    api = NotionAPI("notion-key", "openai-key", database_id="db")
+    api.client = type("FakeClient", (), {"blocks": FakeBlocks()})()
+
+    asyncio.run(api.update_page_content("page", paragraph("x") * 150))
+
+    assert api.client.blocks.deleted == ["old-1", "old-2"]
+    assert [len(batch) for batch in api.client.blocks.children.appended] == [100, 50]
+
+
+def test_validation_fallback_drops_only_the_thought_process():
+    class RejectingChildren(FakeChildren):
+        def append(self, block_id, children):
+            if any(block["type"] == "heading_2" and texts(block) == ["Thought Process"]
+                   for block in children):
+                raise ValueError("validation_error: body.children failed validation")
+            return super().append(block_id, children)
+
+    api = NotionAPI("notion-key", "openai-key", database_id="db")
+    api.client = type("FakeClient", (), {"blocks": FakeBlocks()})()
+    api.client.blocks.children = RejectingChildren()
+
+    asyncio.run(api.update_page_content("page", "Part one\n\n---\n\nPart two", "Searched the web"))
+
+    [published] = api.client.blocks.children.appended
+    assert [block["type"] for block in published] == [
+        "heading_2", "paragraph", "divider", "paragraph"
+    ]
+    assert texts(published[-1]) == ["Part two"]
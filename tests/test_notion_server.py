@@ -0,0 +1,163 @@
+"""
+Tests the local Notion API server: query semantics, enforced limits, seeding and NotionAPI against it.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fakes import FakeNotion, NotionLimits, TokenBucket
+from benchmarks.notion_server import NotionServer, parse_status_mix
+from orchestrator.notion_api import NotionAPI
+from orchestrator.notion_blocks import paragraph
+
+DATABASE_ID = "db"
+HEADERS = {"Authorization": "Bearer secret", "Notion-Version": "2022-06-28"}
+
+
+def unlimited():
+    # Generous rate so tests are not throttled, Notion's size limits otherwise
+    return NotionLimits(requests_per_second=1000, burst=1000)
+
+
+@pytest.fixture
+def server():
+    notion = FakeNotion(limits=unlimited())
+    notion.create_database(DATABASE_ID)
+    with NotionServer(notion) as running:
+        yield running
+
+
+def query(server, body):
+    return httpx.post(f"{server.url}/v1/databases/{DATABASE_ID}/query", json=body, headers=HEADERS)
+
+
+def test_queries_filter_sort_and_paginate(server):
+    notion = server.notion
+    for index, status in enumerate(["Execute", "Done", "Execute", "Review", "Execute"]):
+        notion.add_page(DATABASE_ID, f"Task {index}", status=status, properties={"Priority": {"number": index % 3}})
+
+    first = query(server, {
+        "filter": {"or": [
+            {"property": "Status", "status": {"equals": "Execute"}},
+            {"and": [
+                {"property": "Status", "status": {"equals": "Review"}},
+                {"property": "Task", "title": {"contains": "3"}},
+            ]},
+        ]},
+        "sorts": [{"property": "Priority", "direction": "descending"}, {"property": "Task", "direction": "ascending"}],
+        "page_size": 3,
+    }).json()
+    second = query(server, {
+        "filter": {"or": [
+            {"property": "Status", "status": {"equals": "Execute"}},
+            {"and": [
+                {"property": "Status", "status": {"equals": "Review"}},
+                {"property": "Task", "title": {"contains": "3"}},
+            ]},
+        ]},
+        "sorts": [{"property": "Priority", "direction": "descending"}, {"property": "Task", "direction": "ascending"}],
+        "start_cursor": first["next_cursor"],
+    }).json()
+
+    titles = [page["properties"]["Task"]["title"][0]["plain_text"] for page in first["results"] + second["results"]]
+    assert titles == ["Task 2", "Task 4", "Task 0", "Task 3"]
+    assert first["has_more"] and not second["has_more"]
+
+
+def test_unsorted_cursors_walk_a_seeded_database_once(server):
+    ids = server.notion.seed(DATABASE_ID, 2_500, {"Done": 0.8, "Execute": 0.2}, seed=1)
+    seen, cursor = [], None
+    while True:
+        body = {"filter": {"property": "Status", "status": {"equals": "Execute"}}, "page_size": 100}
+        if cursor:
+            body["start_cursor"] = cursor
+        page = query(server, body).json()
+        seen.extend(result["id"] for result in page["results"])
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+
+    executing = [page_id for page_id in ids if server.notion.status(page_id) == "Execute"]
+    assert seen == executing
+    assert 400 < len(executing) < 600
+    assert ids == server.notion.seed("other", 2_500, {"Done": 0.8, "Execute": 0.2}, seed=1)
+
+
+def test_size_limits_fail_validation(server):
+    page_id = server.notion.add_page(DATABASE_ID, "Task")
+    url = f"{server.url}/v1/blocks/{page_id}/children"
+
+    too_many = httpx.patch(url, json={"children": paragraph("x") * 101}, headers=HEADERS)
+    assert too_many.status_code == 400 and too_many.json()["code"] == "validation_error"
+    assert "body.children.length should be ≤ `100`" in too_many.json()["message"]
+
+    long_text = {"children": [{"object": "block", "type": "paragraph", "paragraph": {
+        "rich_text": [{"type": "text", "text": {"content": "x" * 2001}}]
+    }}]}
+    response = httpx.patch(url, json=long_text, headers=HEADERS)
+    assert response.status_code == 400
+    assert "rich_text[0].text.content.length should be ≤ `2000`" in response.json()["message"]
+
+    big = {"children": [{"object": "block", "type": "paragraph", "paragraph": {
+        "rich_text": [{"type": "text", "text": {"content": "x" * 2000}}] * 100
+    }}] * 3}
+    response = httpx.patch(url, json=big, headers=HEADERS)
+    assert response.status_code == 400 and "request body size" in response.json()["message"]
+
+    assert query(server, {"page_size": 101}).status_code == 400
+    assert httpx.patch(url, json={"children": paragraph("ok")}, headers=HEADERS).status_code == 200
+    assert server.notion.blocks(page_id)[0]["paragraph"]["rich_text"][0]["text"]["content"] == "ok"
+
+
+def test_requests_need_a_token_and_valid_json(server):
+    assert httpx.post(f"{server.url}/v1/databases/{DATABASE_ID}/query", json={}).status_code == 401
+    response = httpx.post(
+        f"{server.url}/v1/databases/{DATABASE_ID}/query", content=b"{", headers=HEADERS
+    )
+    assert response.status_code == 400 and response.json()["code"] == "invalid_json"
+
+
+def test_rate_limit_answers_429_with_retry_after():
+    clock = [0.0]
+    bucket = TokenBucket(rate=3, burst=3, clock=lambda: clock[0])
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1 / 3)
+    clock[0] += 1 / 3
+    assert bucket.acquire() == 0.0
+
+    notion = FakeNotion(limits=NotionLimits())
+    notion.create_database(DATABASE_ID)
+    with NotionServer(notion) as server:
+        statuses = [query(server, {}) for _ in range(5)]
+    limited = [response for response in statuses if response.status_code == 429]
+    assert limited and limited[0].headers["Retry-After"] == "1"
+    assert limited[0].json()["code"] == "rate_limited"
+    assert notion.rate_limited == len(limited)
+
+
+def test_notion_api_publishes_long_pages_within_the_limits(server, monkeypatch):
+    monkeypatch.setenv("NOTION_BASE_URL", server.url)
+    page_id = server.notion.add_page(DATABASE_ID, "Research AI")
+    server.notion.add_comment(page_id, "Please add sources")
+    api = NotionAPI(notion_api_key="secret", openai_api_key="test-key", database_id=DATABASE_ID)
+    report = "\n\n".join(f"Paragraph {index}: " + "word " * 600 for index in range(250))
+
+    async def run():
+        tasks = await api.get_tasks_to_execute()
+        await api.update_page_content(page_id, report)
+        await api.update_task_status(page_id, "Review", "Summary " * 500)
+        return tasks, await api.get_page_comments(page_id)
+
+    tasks, comments = asyncio.run(run())
+
+    assert [task["id"] for task in tasks] == [page_id]
+    assert len(server.notion.blocks(page_id)) > 250
+    assert server.notion.status(page_id) == "Review"
+    assert [comment.text for comment in comments] == ["Page comment: Please add sources"]
+    assert comments[0].id
+    assert server.notion.requests["PATCH /blocks/{id}/children"] >= 3
+
+
+def test_parse_status_mix():
+    assert parse_status_mix("Done=0.9, Execute=0.1") == {"Done": 0.9, "Execute": 0.1}
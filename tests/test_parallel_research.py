@@ -0,0 +1,131 @@
+"""
+Tests the map-reduce research mode: decomposition parsing, merging and concurrent fan-out.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+from crewai import Agent, Crew, Process, Task
+from crewai.types.usage_metrics import UsageMetrics
+
+from crews.research_crew.crew import InitialResearchOutput, ResearchOutput
+from crews.research_crew.parallel import ParallelResearch, merge_initial_research, parse_sub_questions
+
+
+def findings(facts, sources):
+    return InitialResearchOutput(
+        key_facts=facts, recent_developments=[], expert_opinions=[], statistics=[], sources=sources
+    )
+
+
+def test_parse_sub_questions_handles_wrapped_json():
+    text = 'Here you go:\n["What is X?", "  ", "Who uses X?", "Why X?"]'
+    assert parse_sub_questions(text, 2) == ["What is X?", "Who uses X?"]
+    assert parse_sub_questions("no list here", 3) == []
+
+
+def test_merge_drops_near_duplicate_facts_and_repeated_sources():
+    merged = merge_initial_research([
+        findings(["Global EV sales reached 14 million units in 2023, up 35% year on year."],
+                 ["https://iea.example/report?utm_source=a", "IEA Outlook"]),
+        findings(["Global EV sales reached 14 million units in 2023, up 35% year on year",
+                  "China accounted for about 60% of new electric car registrations."],
+                 ["https://iea.example/report", "iea outlook", "https://news.example/ev"]),
+    ])
+
+    assert merged.key_facts == [
+        "Global EV sales reached 14 million units in 2023, up 35% year on year.",
+        "China accounted for about 60% of new electric car registrations.",
+    ]
+    assert merged.sources == ["https://iea.example/report?utm_source=a", "IEA Outlook", "https://news.example/ev"]
+
+
+def test_sub_questions_run_concurrently_and_are_synthesized(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    researcher = Agent(role="Researcher", goal="research", backstory="b", llm="gpt-4o-mini")
+    senior = Agent(role="Senior", goal="synthesize", backstory="b", llm="gpt-4o-mini")
+    crew = Crew(
+        agents=[researcher, senior],
+        tasks=[
+            Task(description="Research {topic}", expected_output="facts", agent=researcher),
+            Task(description="Analyze {topic}", expected_output="analysis", agent=senior),
+        ],
+        process=Process.sequential,
+    )
+    running, peak, synthesized = [0], [0], {}
+    lock = threading.Lock()
+
+    def fake_kickoff(self, inputs=None):
+        usage = UsageMetrics(total_tokens=10)
+        if "research" in inputs:
+            synthesized.update(inputs)
+            output = ResearchOutput(
+                executive_summary="s", initial_research=findings([], []), key_findings=["a", "b", "c"],
+                trend_analysis={}, recommendations=[]
+            )
+            return SimpleNamespace(pydantic=output, token_usage=usage)
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.2)
+        with lock:
+            running[0] -= 1
+        return SimpleNamespace(
+            pydantic=findings([f"Finding about {inputs['topic']}"], [f"https://{len(inputs['topic'])}.example"]),
+            token_usage=usage,
+        )
+
+    monkeypatch.setattr(Crew, "kickoff", fake_kickoff)
+    runner = ParallelResearch(max_concurrency=2, max_questions=4)
+    monkeypatch.setattr(runner, "decompose", lambda llm, topic, max_questions=None: ["q one", "q two two", "q three three three"])
+
+    output = runner.kickoff(crew, "EV market")
+
+    assert peak[0] == 2
+    assert synthesized["topic"] == "EV market"
+    assert "Finding about q two two" in synthesized["research"]
+    assert len(output.pydantic.initial_research.key_facts) == 3
+    assert output.token_usage.total_tokens == 40
+
+
+def test_failed_sub_question_is_dropped_and_decompose_tokens_are_counted(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    researcher = Agent(role="Researcher", goal="research", backstory="b", llm="gpt-4o-mini")
+    senior = Agent(role="Senior", goal="synthesize", backstory="b", llm="gpt-4o-mini")
+    crew = Crew(
+        agents=[researcher, senior],
+        tasks=[
+            Task(description="Research {topic}", expected_output="facts", agent=researcher),
+            Task(description="Analyze {topic}", expected_output="analysis", agent=senior),
+        ],
+        process=Process.sequential,
+    )
+    decompose_usage = [UsageMetrics()]
+    monkeypatch.setattr(researcher.llm, "get_token_usage_summary",
+                        lambda: decompose_usage[-1].model_copy())
+
+    def fake_decompose(llm, topic, max_questions=None):
+        decompose_usage.append(UsageMetrics(total_tokens=7, successful_requests=1))
+        return ["good question", "bad question"]
+
+    def fake_kickoff(self, inputs=None):
+        usage = UsageMetrics(total_tokens=10)
+        if "research" in inputs:
+            output = ResearchOutput(
+                executive_summary="s", initial_research=findings([], []), key_findings=[],
+                trend_analysis={}, recommendations=[]
+            )
+            return SimpleNamespace(pydantic=output, token_usage=usage)
+        if inputs["topic"] == "bad question":
+            raise RuntimeError("rate limited")
+        return SimpleNamespace(pydantic=findings(["A good finding"], []), token_usage=usage)
+
+    monkeypatch.setattr(Crew, "kickoff", fake_kickoff)
+    runner = ParallelResearch(max_concurrency=2, max_questions=4)
+    monkeypatch.setattr(runner, "decompose", fake_decompose)
+
+    output = runner.kickoff(crew, "EV market")
+
+    assert output.pydantic.initial_research.key_facts == ["A good finding"]
+    assert output.token_usage.total_tokens == 27
+    assert output.token_usage.successful_requests == 1
@@ -0,0 +1,60 @@
+"""
+Tests concurrent prefetching of search results.
+"""
+import threading
+import time
+
+from crews.research_crew.prefetch import Prefetcher
+
+
+class RecordingFetch:
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.calls.append((url, time.monotonic()))
+        time.sleep(self.delay)
+        return f"text of {url}"
+
+
+def test_top_results_are_fetched_concurrently_and_served_from_memory():
+    fetch = RecordingFetch(delay=0.2)
+    prefetcher = Prefetcher(fetch, top_k=3, max_workers=3, per_host_interval=0)
+    results = {"organic": [{"link": f"https://host{i}.example/page"} for i in range(5)]}
+
+    started = time.monotonic()
+    prefetcher.schedule_from_results(results)
+    texts = [prefetcher.get(f"https://host{i}.example/page") for i in range(3)]
+    elapsed = time.monotonic() - started
+
+    assert texts == [f"text of https://host{i}.example/page" for i in range(3)]
+    assert len(fetch.calls) == 3
+    assert elapsed < 0.5
+    assert prefetcher.get("https://host4.example/page") is None
+    prefetcher.close()
+
+
+def test_requests_to_one_host_are_spaced_out():
+    fetch = RecordingFetch(delay=0)
+    prefetcher = Prefetcher(fetch, top_k=3, max_workers=3, per_host_interval=0.2)
+    prefetcher.schedule([f"https://same.example/{i}" for i in range(3)])
+    for i in range(3):
+        prefetcher.get(f"https://same.example/{i}")
+
+    times = sorted(t for _, t in fetch.calls)
+    assert all(b - a >= 0.19 for a, b in zip(times, times[1:]))
+    prefetcher.close()
+
+
+def test_buffer_is_bounded():
+    prefetcher = Prefetcher(lambda url: "x" * 100, buffer_bytes=250, per_host_interval=0)
+    prefetcher.schedule([f"https://h{i}.example" for i in range(5)])
+    prefetcher._executor.shutdown(wait=True)
+
+    stats = prefetcher.stats()
+    assert stats["fetched"] == 5
+    assert stats["buffered_bytes"] <= 250
+    assert stats["evicted_unused"] == 3
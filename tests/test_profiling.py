@@ -0,0 +1,126 @@
+"""
+Tests per-task profiling: selection, the stack sampler and the reports written to the artifact store.
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from orchestrator import profiling
+from orchestrator.artifacts import ArtifactStore
+from orchestrator.orchestrator import TaskOrchestrator
+from orchestrator.profiling import (
+    ALLOCATIONS_ARTIFACT,
+    COLLAPSED_ARTIFACT,
+    SUMMARY_ARTIFACT,
+    ProfilingPolicy,
+    StackSampler,
+)
+
+PAGE_ID = "180ee158-0432-8041-b9f0-c28906016b3f"
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_policy_selects_by_checkbox_pattern_and_rate(monkeypatch):
+    policy = ProfilingPolicy(pattern="slow|^abc")
+
+    assert policy.reason(PAGE_ID, "Research AI", {"Profile": {"checkbox": True}}) == "checkbox"
+    assert policy.reason(PAGE_ID, "A SLOW task", {"Profile": {"checkbox": False}}) == "pattern"
+    assert policy.reason("abc123", "Research AI", {}) == "pattern"
+    assert policy.reason(PAGE_ID, "Research AI", {}) is None
+
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.05)
+    assert ProfilingPolicy(sample_rate=0.1).reason(PAGE_ID, "Research AI", {}) == "sampled"
+    assert ProfilingPolicy(sample_rate=0.01).reason(PAGE_ID, "Research AI", {}) is None
+
+
+def test_sampler_collapses_stacks_of_other_threads():
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    busy_loop(0.2)
+    sampler.stop()
+
+    assert sampler.samples > 10
+    # Other threads may be alive in the process, so only the busy thread's own stacks are compared
+    main_stacks = {
+        stack: count for stack, count in sampler.stacks.items() if stack.startswith("MainThread;")
+    }
+    hottest = max(main_stacks, key=main_stacks.__getitem__)
+    assert "busy_loop (" in hottest
+    assert sampler.collapsed().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+    assert "profile-sampler" not in sampler.collapsed()
+
+
+def test_profile_writes_collapsed_stacks_allocations_and_summary(tmp_path):
+    policy = ProfilingPolicy(interval=0.002, store=ArtifactStore(str(tmp_path)))
+
+    profile = policy.start(PAGE_ID, "Research AI", {"Profile": {"checkbox": True}})
+    assert policy.start("other", "Research AI", {"Profile": {"checkbox": True}}) is None
+    retained = [bytearray(1024) for _ in range(2000)]
+    busy_loop(0.1)
+    run = profile.finish("ok")
+
+    assert not tracemalloc.is_tracing()
+    assert "busy_loop" in run.read_text(COLLAPSED_ARTIFACT)
+    assert "test_profiling.py" in run.read_text(ALLOCATIONS_ARTIFACT).splitlines()[0]
+    summary = json.loads(run.read_text(SUMMARY_ARTIFACT))
+    assert summary["reason"] == "checkbox" and summary["status"] == "ok"
+    assert summary["cpu_seconds"] > 0
+    assert summary["memory"]["traced_growth_bytes"] >= 2000 * 1024
+    assert any("busy_loop" in entry["function"] for entry in summary["top_functions"])
+    assert len(retained) == 2000
+    # The next task can be profiled again
+    policy.start("other", "Research AI", {"Profile": {"checkbox": True}}).finish()
+
+
+class FakeNotionAPI:
+    database_id = "db"
+
+    async def query_tasks_to_execute(self):
+        return {"results": [{"id": PAGE_ID, "properties": {
+            "Task": {"title": [{"text": {"content": "Research AI"}}]},
+            "Profile": {"checkbox": True},
+        }}]}
+
+    async def update_task_status(self, page_id, status, summary=None, properties=None):
+        pass
+
+    async def update_page_content(self, page_id, blocks):
+        pass
+
+
+class FakeCrewManager:
+    async def process_task(self, task_content, page_id, scope=None, depth=None):
+        await asyncio.to_thread(busy_loop, 0.1)
+        return "Findings", "Thought process"
+
+    def pop_artifacts(self, page_id):
+        return None
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    artifacts = ArtifactStore(str(tmp_path))
+    monkeypatch.setattr(profiling, "_default_policy", ProfilingPolicy(interval=0.002, store=artifacts))
+    return artifacts
+
+
+def test_orchestrator_profiles_tasks_with_the_checkbox(store):
+    orchestrator = TaskOrchestrator.__new__(TaskOrchestrator)
+    orchestrator.notion_api = FakeNotionAPI()
+    orchestrator.crew_manager = FakeCrewManager()
+
+    asyncio.run(orchestrator.process_execute_tasks())
+
+    run = store.latest_run(PAGE_ID)
+    assert run.files() == sorted([ALLOCATIONS_ARTIFACT, COLLAPSED_ARTIFACT, SUMMARY_ARTIFACT])
+    assert "busy_loop" in run.read_text(COLLAPSED_ARTIFACT)
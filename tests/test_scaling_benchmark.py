@@ -0,0 +1,82 @@
+"""
+Tests the large-database scaling benchmark and NotionAPI's paginated task queries.
+"""
+import asyncio
+
+import pytest
+
+from benchmarks import scaling
+from benchmarks.fakes import FakeNotion
+from orchestrator.notion_api import NotionAPI
+
+DATABASE_ID = "db"
+
+
+def notion_api(notion, **kwargs):
+    return NotionAPI(
+        notion_api_key="secret", openai_api_key="test-key", database_id=DATABASE_ID,
+        transport=notion.transport(), **kwargs
+    )
+
+
+def test_paginated_mode_reads_every_matching_task(monkeypatch):
+    notion = FakeNotion()
+    page_ids = notion.seed(DATABASE_ID, 1_000, {"Done": 0.7, "Execute": 0.3}, seed=2)
+    executing = sum(notion.status(page_id) == "Execute" for page_id in page_ids)
+    assert executing > 200
+
+    single = asyncio.run(notion_api(notion).query_tasks_to_execute())
+    paginated = asyncio.run(notion_api(notion, query_mode="paginated").query_tasks_to_execute())
+    monkeypatch.setenv("NOTION_QUERY_MAX_PAGES", "2")
+    capped = asyncio.run(notion_api(notion, query_mode="paginated").get_tasks_to_execute())
+
+    assert len(single["results"]) == 100 and single["has_more"]
+    assert len(paginated["results"]) == executing and not paginated["has_more"]
+    assert len({task["id"] for task in paginated["results"]}) == executing
+    assert len(capped) == 200
+
+
+def test_query_mode_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("NOTION_QUERY_MODE", "Paginated")
+    assert notion_api(FakeNotion()).query_mode == "paginated"
+    monkeypatch.delenv("NOTION_QUERY_MODE")
+    assert notion_api(FakeNotion()).query_mode == "single"
+
+
+def test_simulation_picks_up_the_backlog_on_a_virtual_clock():
+    config = scaling.ScalingConfig(
+        status_mixes={"open": "Done=0.5,Execute=0.5"}, hours=1, poll_interval=300, memory_every=4
+    )
+
+    single = scaling.Simulation(config, 1_000, "open", 600, "single").run()
+    paginated = scaling.Simulation(config, 1_000, "open", 600, "paginated").run()
+
+    assert single["polls"] == paginated["polls"] == 12
+    # Roughly 500 open rows: single-page polls drain them 100 at a time, paginated ones at once
+    assert single["initial_backlog_drained_after_polls"] >= 5
+    assert paginated["initial_backlog_drained_after_polls"] == 1
+    assert paginated["requests"] > single["requests"] == 24
+    assert paginated["pickup_latency_seconds"]["max"] <= 300
+    assert paginated["pickup_latency_seconds"]["count"] > 0
+    assert paginated["peak_poll_memory_bytes"] > 0 and paginated["bytes_per_poll"] > 0
+
+
+def test_run_scaling_reports_growth_per_mode():
+    config = scaling.ScalingConfig(
+        sizes=[200, 2_000], status_mixes={"settled": "Done=0.99,Execute=0.01"},
+        edit_rates=[120], hours=0.5, memory_every=3
+    )
+
+    report = scaling.run_scaling(config)
+
+    assert len(report["results"]) == 4
+    assert {line["mode"] for line in report["growth"]} == {"single", "paginated"}
+    assert all(line["requests_per_poll"] == pytest.approx(0) for line in report["growth"])
+
+
+def test_growth_fits_the_exponent():
+    results = [
+        {"rows": rows, "bytes_per_poll": rows ** 0.5, "latency": {"p95": None}} for rows in (1_000, 10_000, 100_000)
+    ]
+    assert scaling.growth(results, "bytes_per_poll") == pytest.approx(0.5)
+    assert scaling.growth(results, "latency.p95") is None
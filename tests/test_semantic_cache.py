@@ -0,0 +1,108 @@
+"""
+Tests the semantic response cache using the offline hashing embedder.
+"""
+import asyncio
+
+import numpy as np
+
+from orchestrator.crew_manager import CrewManager
+from orchestrator.semantic_cache import HashingEmbedder, SemanticCache
+
+
+def make_cache(tmp_path=None, **kwargs):
+    return SemanticCache(
+        embedder=HashingEmbedder(),
+        path=str(tmp_path) if tmp_path else None,
+        **kwargs
+    )
+
+
+def test_repeated_question_is_served_from_cache():
+    cache = make_cache(threshold=0.8)
+    cache.store("What is the capital of France?", "Paris", "page-1", scope="db-1")
+
+    hit = cache.lookup("what is the capital of France", scope="db-1")
+
+    assert hit is not None
+    assert hit.answer == "Paris"
+    assert hit.page_id == "page-1"
+    assert hit.similarity >= 0.8
+
+
+def test_unrelated_question_misses():
+    cache = make_cache(threshold=0.8)
+    cache.store("What is the capital of France?", "Paris", "page-1", scope="db-1")
+
+    assert cache.lookup("Summarise our Q3 marketing plan", scope="db-1") is None
+
+
+def test_scopes_are_isolated():
+    cache = make_cache(threshold=0.8)
+    cache.store("What is the capital of France?", "Paris", "page-1", scope="db-1")
+
+    assert cache.lookup("What is the capital of France?", scope="db-2") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(threshold=0.9, max_entries=2)
+    cache.store("first question about apples", "a", "page-1")
+    cache.store("second question about bananas", "b", "page-2")
+    cache.lookup("first question about apples")
+    cache.store("third question about cherries", "c", "page-3")
+
+    assert cache.lookup("first question about apples") is not None
+    assert cache.lookup("second question about bananas") is None
+    assert cache.lookup("third question about cherries") is not None
+
+
+def test_index_persists_between_instances(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.9)
+    cache.store("How many days are in a leap year?", "366", "page-9", scope="db-1")
+
+    reloaded = make_cache(tmp_path, threshold=0.9)
+    hit = reloaded.lookup("How many days are in a leap year?", scope="db-1")
+
+    assert hit is not None
+    assert hit.answer == "366"
+
+
+def test_index_from_another_embedder_is_discarded(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.9)
+    cache.store("How many days are in a leap year?", "366", "page-9", scope="db-1")
+
+    reloaded = SemanticCache(embedder=HashingEmbedder(dimensions=64), path=str(tmp_path))
+
+    assert reloaded.lookup("How many days are in a leap year?", scope="db-1") is None
+    reloaded.store("How many days are in a leap year?", "366", "page-10", scope="db-1")
+    hit = reloaded.lookup("How many days are in a leap year?", scope="db-1")
+    assert hit is not None and hit.page_id == "page-10"
+
+
+def test_index_without_embedder_metadata_is_discarded(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.9)
+    cache.store("How many days are in a leap year?", "366", "page-9", scope="db-1")
+    (file,) = tmp_path.glob("*.npz")
+    with np.load(file) as data:
+        legacy = {key: data[key] for key in ("vectors", "last_used", "entries", "scope")}
+    np.savez(file, **legacy)
+
+    reloaded = make_cache(tmp_path, threshold=0.9)
+    assert reloaded.lookup("How many days are in a leap year?", scope="db-1") is None
+
+
+def test_cached_task_skips_routing():
+    manager = CrewManager.__new__(CrewManager)
+    manager.semantic_cache = make_cache(threshold=0.8)
+    manager.semantic_cache.store("What is the capital of France?", "Paris", "page-1", scope="db-1")
+    manager.fused_routing = False
+
+    async def route(task_content):
+        raise AssertionError("routed a cached task")
+
+    manager.route = route
+    response, thought = asyncio.run(
+        manager.process_task("what is the capital of France", "page-2", "db-1")
+    )
+
+    assert response == "Paris\n\n(cached from page-1)"
+    assert thought.startswith("Served from semantic cache")
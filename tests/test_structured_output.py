@@ -0,0 +1,140 @@
+"""
+Tests structured-output enforcement: strict schemas, local JSON repair and re-ask accounting.
+"""
+import json
+
+import pytest
+from crewai.utilities.converter import ConverterError, convert_to_model
+
+from crews.research_crew.crew import InitialResearchOutput, ResearchCrew, ResearchOutput
+from crews.research_crew.structured_output import (
+    from_strict,
+    repair_json,
+    repairing_converter,
+    strict_schema_model,
+    structured_output_stats,
+)
+
+RESEARCH = {
+    "key_facts": ["AI adoption doubled"],
+    "recent_developments": ["New regulation"],
+    "expert_opinions": [{"opinion": "It is transformative", "source": "Dr. Smith"}],
+    "statistics": [{"statistic": "72% of firms", "source": "Survey"}],
+    "sources": ["https://example.com"],
+}
+
+
+class FakeLLM:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def supports_function_calling(self):
+        return True
+
+    def call(self, messages, response_model=None):
+        self.calls.append(response_model)
+        return self.responses.pop(0)
+
+
+def convert(text, llm, model=InitialResearchOutput, role="researcher"):
+    converter = repairing_converter(role)(llm=llm, text=text, model=model, instructions="Return JSON")
+    return converter.to_pydantic()
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    structured_output_stats.reset()
+    yield
+    structured_output_stats.reset()
+
+
+@pytest.mark.parametrize("text", [
+    'Here you go:\n```json\n{"a": [1, 2,], "b": {"c": "d",},}\n```',
+    "{'a': [1, 2], 'b': {'c': 'd'}} Hope this helps!",
+    '{"a": [1, 2], "b": {"c": "d"}, "ok": True, "none": None}',
+])
+def test_repair_json_fixes_common_defects(text):
+    data = repair_json(text)
+
+    assert data["a"] == [1, 2] and data["b"] == {"c": "d"}
+
+
+def test_repair_json_recovers_truncated_output():
+    cut_in_value = '{"key_facts": ["one", "two"], "sources": ["https://a.com", "https://b.c'
+    cut_after_key = '{"key_facts": ["one", "two"], "sources": '
+
+    assert repair_json(cut_in_value) == {"key_facts": ["one", "two"], "sources": ["https://a.com", "https://b.c"]}
+    assert repair_json(cut_after_key) == {"key_facts": ["one", "two"]}
+    assert repair_json("no json here") is None
+    assert repair_json('{"a": "café", "b": é') == {"a": "café"}
+
+
+def test_strict_schema_turns_dicts_into_entries_and_back():
+    strict = strict_schema_model(ResearchOutput)
+    wire = {
+        "executive_summary": "Summary",
+        "initial_research": {
+            **RESEARCH,
+            "expert_opinions": [[{"key": "opinion", "value": "Bold"}]],
+            "statistics": [],
+        },
+        "key_findings": ["finding"],
+        "trend_analysis": [{"key": "Automation", "value": "Rising"}],
+        "recommendations": ["Invest"],
+    }
+
+    strict.model_validate(wire)
+    output = ResearchOutput.model_validate(from_strict(wire, ResearchOutput))
+
+    assert output.trend_analysis == {"Automation": "Rising"}
+    assert output.initial_research.expert_opinions == [{"opinion": "Bold"}]
+    assert strict_schema_model(ResearchOutput) is strict
+    assert from_strict(RESEARCH, InitialResearchOutput) == RESEARCH
+
+
+def test_malformed_output_is_repaired_without_an_llm_round_trip():
+    llm = FakeLLM([])
+    malformed = "```json\n" + json.dumps(RESEARCH)[:-1] + ",}\n```"
+
+    result = convert(malformed, llm)
+
+    assert result == InitialResearchOutput(**RESEARCH)
+    assert llm.calls == []
+    assert structured_output_stats.snapshot()["researcher"]["repaired"] == 1
+    assert structured_output_stats.reask_rate("researcher") == 0.0
+
+
+def test_unrepairable_output_is_reasked_with_the_strict_schema():
+    llm = FakeLLM([InitialResearchOutput(**RESEARCH)])
+
+    result = convert("I could not find anything useful.", llm)
+
+    assert result.key_facts == RESEARCH["key_facts"]
+    assert llm.calls == [strict_schema_model(InitialResearchOutput)]
+    stats = structured_output_stats.snapshot()["researcher"]
+    assert stats["reasked"] == 1 and stats["reasks"] == 1 and stats["reask_rate"] == 1.0
+
+
+def test_conversion_fails_after_max_attempts():
+    llm = FakeLLM(["still not json"] * 3)
+
+    with pytest.raises(ConverterError):
+        convert("nothing", llm)
+
+    assert structured_output_stats.snapshot()["researcher"]["failed"] == 1
+    assert len(llm.calls) == 3
+
+
+def test_research_tasks_enforce_structured_output(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    crew = ResearchCrew(tools=[]).crew().copy()
+    research_task, synthesis_task = crew.tasks
+
+    assert research_task.output_pydantic is InitialResearchOutput
+    assert synthesis_task.response_model is strict_schema_model(ResearchOutput)
+
+    wire = json.dumps({**RESEARCH, "statistics": [[{"key": "statistic", "value": "72%"}]]})
+    result = convert_to_model(wire, InitialResearchOutput, None, research_task.agent, research_task.converter_cls)
+    assert result.statistics == [{"statistic": "72%"}]
+    assert structured_output_stats.snapshot()["researcher"]["parsed"] == 1
@@ -0,0 +1,69 @@
+"""
+Tests the per-task bounded trace buffer.
+"""
+import os
+import threading
+
+from orchestrator.task_trace import TaskTrace
+
+
+class ToolStep:
+    def __init__(self, result):
+        self.result = result
+
+
+def test_callback_records_structured_steps():
+    trace = TaskTrace("page-1")
+    trace.callback(ToolStep("search results"))
+
+    steps = trace.steps()
+    assert len(steps) == 1
+    assert steps[0].type == "tool_result"
+    assert steps[0].size == len(steps[0].text.encode("utf-8"))
+    assert "Tool result: search results" in trace.render()
+
+
+def test_memory_is_bounded_and_old_steps_spill_to_disk(tmp_path):
+    trace = TaskTrace("page-1", memory_budget=1000, spill_dir=str(tmp_path))
+    for i in range(100):
+        trace.add("tool_result", f"step {i:03d} " + "x" * 90)
+
+    assert trace.memory_bytes <= 1000
+    assert len(os.listdir(tmp_path)) == 1
+    rendered = trace.render()
+    assert rendered.index("step 000") < rendered.index("step 099")
+    assert len(trace.steps()) == 100
+
+    trace.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_steps_beyond_spill_budget_are_omitted(tmp_path):
+    trace = TaskTrace("page-1", memory_budget=500, spill_budget=500, spill_dir=str(tmp_path))
+    for i in range(50):
+        trace.add("tool_result", f"step {i:03d} " + "x" * 90)
+
+    rendered = trace.render()
+    assert "step 000" in rendered
+    assert "step 049" in rendered
+    assert "steps omitted" in rendered
+    trace.close()
+
+
+def test_concurrent_tasks_do_not_interleave():
+    traces = [TaskTrace(f"page-{n}") for n in range(4)]
+
+    def record(trace, n):
+        for i in range(200):
+            trace.callback(ToolStep(f"task {n} step {i}"))
+
+    threads = [threading.Thread(target=record, args=(t, n)) for n, t in enumerate(traces)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for n, trace in enumerate(traces):
+        steps = trace.steps()
+        assert len(steps) == 200
+        assert all(f"task {n} " in step.text for step in steps)
@@ -0,0 +1,137 @@
+"""
+Tests the content-addressed cache used by the researcher's search and scrape tools.
+"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from crewai_tools import SerperDevTool
+
+from crews.research_crew import tool_cache
+from crews.research_crew.extraction import ExtractionPipeline
+from crews.research_crew.tool_cache import (
+    CachedScrapeWebsiteTool,
+    CachedSerperDevTool,
+    ToolCache,
+    canonical_url,
+)
+
+
+def test_canonical_url_ignores_tracking_and_cosmetic_differences():
+    assert canonical_url("HTTPS://Example.com:443/a/?utm_source=x&b=2&a=1#top") == \
+        canonical_url("https://example.com/a?a=1&b=2")
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    cache = ToolCache(str(tmp_path))
+    first = cache.put("scrape", "https://a.example/page", b"same body")
+    second = cache.put("scrape", "https://b.example/mirror", b"same body")
+
+    assert first == second
+    assert cache.stats()["store"]["entries"] == 2
+    assert len(list((tmp_path / "objects").rglob(first))) == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ToolCache(str(tmp_path), ttls={"serper": 0})
+    cache.put("serper", "search:ai", b"{}")
+
+    assert cache.get("serper", "search:ai") is None
+    assert cache.stats()["serper"]["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ToolCache(str(tmp_path), max_bytes=2500)
+    bodies = {f"https://site/{i}": random.Random(i).randbytes(1000) for i in range(4)}
+    for url, body in list(bodies.items())[:2]:
+        cache.put("scrape", url, body)
+    cache.get("scrape", "https://site/0")
+    for url, body in list(bodies.items())[2:]:
+        cache.put("scrape", url, body)
+
+    assert cache.stats()["store"]["compressed_bytes"] <= 2500
+    assert cache.get("scrape", "https://site/1") is None
+    assert cache.get("scrape", "https://site/3") is not None
+
+
+def test_cached_tools_only_hit_the_network_once(tmp_path, monkeypatch):
+    calls = {"serper": 0, "scrape": 0}
+
+    def fake_search(self, **kwargs):
+        calls["serper"] += 1
+        return {"organic": [{"link": "https://example.com"}]}
+
+    def fake_get(url, **kwargs):
+        calls["scrape"] += 1
+        return SimpleNamespace(
+            ok=True, status_code=200, content=b"page text", text="page text",
+            apparent_encoding="utf-8"
+        )
+
+    monkeypatch.setattr(SerperDevTool, "_run", fake_search)
+    monkeypatch.setattr(tool_cache.requests, "get", fake_get)
+    monkeypatch.setattr(tool_cache, "validate_url", lambda url: url)
+    cache = ToolCache(str(tmp_path))
+    search = CachedSerperDevTool(cache=cache)
+    scrape = CachedScrapeWebsiteTool(cache=cache)
+
+    for query in ["AI  Productivity", "ai productivity"]:
+        assert search._run(search_query=query) == {"organic": [{"link": "https://example.com"}]}
+    for url in ["https://example.com/", "https://example.com?utm_medium=x"]:
+        assert scrape._run(website_url=url).endswith("page text")
+
+    stats = cache.stats()
+    assert calls == {"serper": 1, "scrape": 1}
+    assert stats["serper"]["hit_rate"] == 0.5
+    assert stats["scrape"]["bytes_saved"] == len(b"page text")
+
+
+def test_scrape_reports_capped_and_duplicate_pages(tmp_path, monkeypatch):
+    page = "Paragraph one has several words.\n\n" + "filler " * 50
+    monkeypatch.setattr(tool_cache.requests, "get", lambda url, **kwargs: SimpleNamespace(
+        ok=True, status_code=200, content=page.encode("utf-8"), text=page, apparent_encoding="utf-8"
+    ))
+    monkeypatch.setattr(tool_cache, "validate_url", lambda url: url)
+    pipeline = ExtractionPipeline(token_cap=20, token_counter=lambda text: len(text.split()))
+    scrape = CachedScrapeWebsiteTool(cache=ToolCache(str(tmp_path)), pipeline=pipeline)
+
+    capped = scrape._run(website_url="https://example.com/a")
+    repeated = scrape._run(website_url="https://example.com/a")
+
+    assert "Paragraph one" in capped and "20-token limit" in capped
+    assert repeated == "The page had no new content beyond what was already scraped for this task."
+
+
+@pytest.mark.parametrize("status", [404, 429, 503])
+def test_failed_scrapes_are_not_cached(tmp_path, monkeypatch, status):
+    responses = [
+        SimpleNamespace(ok=False, status_code=status, content=b"Too many requests",
+                        text="Too many requests", apparent_encoding="utf-8"),
+        SimpleNamespace(ok=True, status_code=200, content=b"page text",
+                        text="page text", apparent_encoding="utf-8"),
+    ]
+    monkeypatch.setattr(tool_cache.requests, "get", lambda url, **kwargs: responses.pop(0))
+    monkeypatch.setattr(tool_cache, "validate_url", lambda url: url)
+    cache = ToolCache(str(tmp_path))
+    scrape = CachedScrapeWebsiteTool(cache=cache)
+
+    assert scrape.load("https://example.com/a") == "Too many requests"
+    assert scrape.load("https://example.com/a") == "page text"
+    assert scrape.load("https://example.com/a") == "page text"
+    assert responses == []
+    assert cache.stats()["scrape"]["hits"] == 1
+
+
+def test_failed_prefetch_raises_instead_of_returning_the_error_page(tmp_path, monkeypatch):
+    def raise_for_status():
+        raise tool_cache.requests.HTTPError("429 Client Error")
+
+    monkeypatch.setattr(tool_cache.requests, "get", lambda url, **kwargs: SimpleNamespace(
+        ok=False, status_code=429, content=b"", raise_for_status=raise_for_status
+    ))
+    monkeypatch.setattr(tool_cache, "validate_url", lambda url: url)
+    scrape = CachedScrapeWebsiteTool(cache=ToolCache(str(tmp_path)))
+
+    with pytest.raises(tool_cache.requests.HTTPError):
+        scrape.fetch("https://example.com/a", raise_for_status=True)
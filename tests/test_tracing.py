@@ -0,0 +1,144 @@
+"""
+Tests task tracing: span nesting across threads, exporters and the orchestrator's per-task traces.
+"""
+import asyncio
+import contextvars
+import json
+import threading
+
+import pytest
+
+from orchestrator import tracing
+from orchestrator.orchestrator import TaskOrchestrator
+from orchestrator.tracing import (
+    ChromeTraceExporter,
+    JsonLinesExporter,
+    Tracer,
+    breakdown,
+    read_trace,
+    span,
+    start_trace,
+)
+
+
+class MemoryExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+@pytest.fixture
+def exporter():
+    memory = MemoryExporter()
+    tracing.set_tracer(Tracer([memory]))
+    yield memory
+    tracing.set_tracer(None)
+
+
+def by_name(spans):
+    return {s["name"]: s for s in spans}
+
+
+def test_spans_nest_across_threads_and_export_when_the_root_ends(exporter):
+    def in_thread():
+        with span("tool.search", query="ai"):
+            pass
+
+    with start_trace("task.execute", page_id="page-1") as root:
+        with span("crew.research", model="gpt-4o-mini"):
+            worker = threading.Thread(target=contextvars.copy_context().run, args=(in_thread,))
+            worker.start()
+            worker.join()
+            tracing.event("agent.step", step="AgentFinish")
+        with pytest.raises(ValueError):
+            with span("notion.publish"):
+                raise ValueError("validation_error")
+        assert exporter.traces == []
+
+    (spans,) = exporter.traces
+    named = by_name(spans)
+    assert {s["trace_id"] for s in spans} == {root.trace_id}
+    assert named["crew.research"]["parent_id"] == named["task.execute"]["span_id"]
+    assert named["tool.search"]["parent_id"] == named["crew.research"]["span_id"]
+    assert named["agent.step"]["instant"] is True
+    assert named["notion.publish"]["status"] == "error"
+    assert "validation_error" in named["notion.publish"]["attributes"]["error"]
+    assert breakdown(spans).startswith("task.execute ")
+    assert tracing.current_trace_id() is None
+
+
+def test_spans_outside_a_trace_or_when_disabled_are_noops(exporter):
+    with span("orphan") as orphan:
+        orphan.set_attribute("ignored", True)
+    tracing.set_tracer(Tracer([exporter], enabled=False))
+    with start_trace("task.execute") as root:
+        with span("child"):
+            pass
+
+    assert root is tracing.NOOP_SPAN
+    assert exporter.traces == []
+
+
+def test_exporters_write_rotating_json_lines_and_chrome_traces(tmp_path):
+    lines = JsonLinesExporter(str(tmp_path / "spans.jsonl"), max_bytes=2000, backups=2)
+    chrome = ChromeTraceExporter(str(tmp_path / "chrome"))
+    tracer = Tracer([lines, chrome])
+
+    trace_ids = []
+    for index in range(10):
+        with tracer.start_trace("task.execute", page_id=f"page-{index}") as root:
+            with tracer.start_span("notion PATCH /pages/{id}", status_code=200):
+                pass
+        trace_ids.append(root.trace_id)
+
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("spans")) == [
+        "spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"
+    ]
+    assert [s["name"] for s in read_trace(str(tmp_path / "spans.jsonl"), trace_ids[-1])] == [
+        "task.execute", "notion PATCH /pages/{id}"
+    ]
+    document = json.loads((tmp_path / "chrome" / f"{trace_ids[-1]}.json").read_text())
+    assert [e["ph"] for e in document["traceEvents"]] == ["X", "X"]
+    assert document["otherData"]["page_id"] == "page-9"
+
+
+class FakeNotionAPI:
+    database_id = "db"
+
+    async def query_tasks_to_execute(self):
+        return {"results": [{"id": "page-1", "properties": {"Task": {"title": [{"text": {"content": "Research AI"}}]}}}]}
+
+    async def update_task_status(self, page_id, status, summary=None, properties=None):
+        with span("notion PATCH /pages/{id}"):
+            await asyncio.sleep(0)
+
+    async def update_page_content(self, page_id, blocks):
+        with span("notion PATCH /blocks/{id}/children"):
+            await asyncio.sleep(0)
+
+
+class FakeCrewManager:
+    async def process_task(self, task_content, page_id, scope=None, depth=None):
+        with span("crew.research"):
+            return "Findings", "Thought process"
+
+    def pop_artifacts(self, page_id):
+        return None
+
+
+def test_orchestrator_traces_each_task(exporter):
+    orchestrator = TaskOrchestrator.__new__(TaskOrchestrator)
+    orchestrator.notion_api = FakeNotionAPI()
+    orchestrator.crew_manager = FakeCrewManager()
+
+    asyncio.run(orchestrator.process_execute_tasks())
+
+    (spans,) = exporter.traces
+    named = by_name(spans)
+    root = named["task.execute"]
+    assert root["attributes"] == {"page_id": "page-1", "title": "Research AI"}
+    assert named["crew.research"]["parent_id"] == root["span_id"]
+    assert named["notion.publish"]["parent_id"] == root["span_id"]
+    assert named["notion PATCH /blocks/{id}/children"]["parent_id"] == named["notion.publish"]["span_id"]
@@ -0,0 +1,148 @@
+"""
+Tests the managed vector store behind the researcher's website search tool.
+"""
+import hashlib
+import re
+import time
+
+import numpy as np
+
+from crews.research_crew.vector_store import ManagedWebsiteSearchTool, VectorStore
+
+
+class CountingEmbedder:
+    """Bag-of-words hashing embedder that counts the texts it embeds."""
+
+    def __init__(self, dimensions=64):
+        self.dimensions = dimensions
+        self.embedded = 0
+
+    def __call__(self, texts):
+        self.embedded += len(texts)
+        vectors = []
+        for text in texts:
+            vector = np.zeros(self.dimensions)
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1
+            vectors.append((vector / (np.linalg.norm(vector) or 1)).tolist())
+        return vectors
+
+
+def paragraph_chunker(text):
+    return [part for part in text.split("\n\n") if part.strip()]
+
+
+PAGE = "Solar capacity grew by a third last year.\n\nWind farms faced supply chain delays.\n\nBattery prices kept falling."
+
+
+def make_store(tmp_path, **kwargs):
+    embedder = CountingEmbedder()
+    return VectorStore(str(tmp_path), embedder, chunker=paragraph_chunker, **kwargs), embedder
+
+
+def test_unchanged_pages_reuse_embeddings(tmp_path):
+    store, embedder = make_store(tmp_path)
+
+    collection = store.ensure("https://energy.example/report?utm_source=x", PAGE)
+    assert store.ensure("https://energy.example/report", PAGE) == collection
+    assert embedder.embedded == 3
+
+    assert store.search(collection, "wind farms supply chain", limit=1, similarity_threshold=0.3) == \
+        ["Wind farms faced supply chain delays."]
+
+    store.ensure("https://energy.example/report", PAGE + "\n\nGrid storage doubled.")
+    stats = store.stats()
+    assert stats["embeddings_computed"] == 7
+    assert stats["embeddings_reused"] == 3
+    assert stats["collections"] == 1
+    store.close()
+
+
+def test_embeddings_survive_a_restart(tmp_path):
+    store, _ = make_store(tmp_path)
+    store.ensure("https://energy.example/report", PAGE)
+    store.close()
+
+    reopened, embedder = make_store(tmp_path)
+    reopened.ensure("https://energy.example/report", PAGE)
+    assert embedder.embedded == 0
+    reopened.close()
+
+
+def test_least_recently_used_sites_are_evicted_and_compacted(tmp_path):
+    store, _ = make_store(tmp_path, max_bytes=3000)
+    for i in range(4):
+        store.ensure(f"https://site{i}.example", PAGE.replace("year", f"year {i}"))
+        time.sleep(0.01)
+    store.compact()
+
+    stats = store.stats()
+    assert stats["evicted"] >= 1
+    assert stats["estimated_bytes"] <= 3000
+    assert stats["compactions"] == 1
+    remaining = {row[0] for row in store._manifest.execute("SELECT url_key FROM collections")}
+    assert "https://site3.example/" in remaining
+    assert "https://site0.example/" not in remaining
+    store.close()
+
+
+def test_search_tool_loads_pages_through_the_scrape_loader(tmp_path):
+    store, embedder = make_store(tmp_path)
+    html = "<html><body><article>" + "".join(f"<p>{p}</p>" for p in PAGE.split("\n\n")) + "</article></body></html>"
+    loads = []
+    tool = ManagedWebsiteSearchTool(store=store, load_page=lambda url: loads.append(url) or html)
+
+    for _ in range(2):
+        result = tool._run(search_query="battery prices", website="https://energy.example/report", limit=1,
+                           similarity_threshold=0.3)
+        assert result == "Battery prices kept falling."
+
+    assert len(loads) == 2
+    assert store.stats()["embeddings_reused"] == 3
+    store.close()
+
+
+def test_store_stays_usable_after_compaction(tmp_path):
+    store, embedder = make_store(tmp_path)
+    collection = store.ensure("https://energy.example/report", PAGE)
+    store.ensure("https://energy.example/report", PAGE + "\n\nGrid storage doubled.")
+
+    store.compact()
+
+    assert store.search(collection, "grid storage", limit=1, similarity_threshold=0.3) == \
+        ["Grid storage doubled."]
+    store.ensure("https://other.example", "Hydrogen pilots expanded.")
+    assert store.stats()["collections"] == 2
+    store.close()
+
+
+def test_website_in_use_is_not_evicted_until_released(tmp_path):
+    store, _ = make_store(tmp_path, max_bytes=1000)
+
+    with store.website("https://energy.example/report", PAGE) as collection:
+        store.ensure("https://other.example", PAGE.replace("year", "decade"))
+        assert store.search(collection, "battery prices", limit=1, similarity_threshold=0.3) == \
+            ["Battery prices kept falling."]
+        assert store.stats()["evicted"] == 0
+
+    store.ensure("https://third.example", PAGE.replace("year", "month"))
+    remaining = {row[0] for row in store._manifest.execute("SELECT url_key FROM collections")}
+    assert "https://energy.example/report" not in remaining
+    store.close()
+
+
+def test_compaction_is_skipped_when_the_client_cannot_be_stopped(tmp_path, monkeypatch):
+    store, _ = make_store(tmp_path)
+    collection = store.ensure("https://energy.example/report", PAGE)
+
+    def stop():
+        raise RuntimeError("system internals changed")
+
+    monkeypatch.setattr(store._client._system, "stop", stop)
+
+    store.compact()
+
+    assert store.stats()["compactions"] == 0
+    assert store.search(collection, "battery prices", limit=1, similarity_threshold=0.3) == \
+        ["Battery prices kept falling."]
+    store.close()